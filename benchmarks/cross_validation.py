@@ -0,0 +1,110 @@
+"""
+Benchmark `RankingPipeline.cross_validate` against independent pipelines.
+
+Estimates the ranking metrics of the same parameters with `--folds`
+folds twice: by `cross_validate`, which reads, joins and bins the data
+once and trains the folds in parallel, and by `--folds` independent
+pipelines, each preparing a session split with 1/`--folds` of the
+sessions as the val set and training on the rest.
+
+    python benchmarks/cross_validation.py --rows 1000000 --folds 5
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import tempfile
+import time
+
+from personalization.ranking_pipeline import RankingPipeline
+from personalization.synthetic import write_synthetic_csvs
+
+TRAIN_PARAMS = {
+    "objective": "lambdarank",
+    "num_leaves": 31,
+    "metric": "ndcg",
+    "ndcg_eval_at": [10],
+    "learning_rate": 0.1,
+    "force_row_wise": True,
+    "num_iterations": 50,
+    "verbosity": -1,
+}
+
+
+def independent_pipelines(sessions_path, venues_path, n_folds, params):
+    """Score of every fold trained by its own pipeline."""
+    scores = []
+    for fold in range(n_folds):
+        pipeline = RankingPipeline(
+            sessions_path,
+            venues_path,
+            split_strategy="session",
+            # EXPLAIN: the fractions must leave a test split
+            split_fractions=(0.999 - 1 / n_folds, 1 / n_folds),
+            split_seed=fold,
+        )
+        pipeline.prepare_datasets()
+        pipeline.train(params=dict(params))
+        scores.append(pipeline.model.best_score["val"]["ndcg@10"])
+    return scores
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--num-iterations", type=int, default=50)
+    parser.add_argument(
+        "--executor", choices=["thread", "process"], default="thread"
+    )
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    params = {**TRAIN_PARAMS, "num_iterations": args.num_iterations}
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        sessions_path, venues_path = write_synthetic_csvs(
+            data_dir, args.rows, seed=0
+        )
+        start = time.perf_counter()
+        results = RankingPipeline(
+            sessions_path, venues_path
+        ).cross_validate(
+            params,
+            n_folds=args.folds,
+            executor=args.executor,
+        )
+        cv_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        # EXPLAIN: `train` prints the evaluation logs
+        with contextlib.redirect_stdout(io.StringIO()):
+            scores = independent_pipelines(
+                sessions_path, venues_path, args.folds, params
+            )
+        independent_seconds = time.perf_counter() - start
+
+    print(
+        json.dumps(
+            {
+                "rows": args.rows,
+                "folds": args.folds,
+                "num_iterations": args.num_iterations,
+                "executor": args.executor,
+                "cross_validate_seconds": round(cv_seconds, 3),
+                "independent_seconds": round(independent_seconds, 3),
+                "speedup": round(independent_seconds / cv_seconds, 2),
+                "cross_validate_ndcg@10": round(
+                    results["mean"]["ndcg@10"], 5
+                ),
+                "independent_lightgbm_ndcg@10": round(
+                    sum(scores) / len(scores), 5
+                ),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
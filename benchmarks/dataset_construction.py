@@ -0,0 +1,111 @@
+"""
+Benchmark peak memory of building LightGBM datasets from Polars.
+
+Each mode runs in a fresh process and the peak RSS is reset once the
+input frame is built, so only the construction itself is measured:
+
+* pandas: the former `to_pandas()` path,
+* numpy: one C-contiguous float32 matrix (`to_float32_matrix`),
+* chunked: LightGBM's Sequence API (`PolarsSequence`).
+
+    python benchmarks/dataset_construction.py --rows 5000000
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import time
+from typing import Dict
+
+import lightgbm as lgb
+import numpy as np
+import polars as pl
+
+from personalization.dataset_utils import (
+    DEFAULT_CHUNK_SIZE,
+    build_lgb_dataset,
+)
+
+FEATURES = [f"feature_{i}" for i in range(9)]
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        pages = int(statm.read().split()[1])
+    return pages * resource.getpagesize() / 2**20
+
+
+def reset_peak_rss() -> None:
+    # EXPLAIN: Linux resets VmHWM, the peak RSS, when 5 is written here
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5")
+
+
+def peak_rss_mb() -> float:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 2**10
+    raise RuntimeError("VmHWM not found in /proc/self/status")
+
+
+def make_frame(rows: int) -> pl.DataFrame:
+    rng = np.random.default_rng(0)
+    columns = {name: rng.random(rows) for name in FEATURES}
+    columns["label"] = rng.integers(0, 2, rows)
+    return pl.DataFrame(columns)
+
+
+def run(mode: str, rows: int, queue: multiprocessing.Queue) -> None:
+    frame = make_frame(rows)
+    group = np.full(rows // 20, 20)
+    reset_peak_rss()
+    baseline = current_rss_mb()
+    start = time.perf_counter()
+    if mode == "pandas":
+        lgb.Dataset(
+            frame[FEATURES].to_pandas(),
+            label=frame[["label"]].to_pandas(),
+            group=group,
+            free_raw_data=True,
+        ).construct()
+    else:
+        build_lgb_dataset(
+            frame,
+            FEATURES,
+            "label",
+            group=group,
+            chunk_size=DEFAULT_CHUNK_SIZE
+            if mode == "chunked"
+            else None,
+        )
+    queue.put(
+        {
+            "mode": mode,
+            "seconds": time.perf_counter() - start,
+            "baseline_rss_mb": baseline,
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_over_baseline_mb": peak_rss_mb() - baseline,
+        }
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    args = parser.parse_args()
+    context = multiprocessing.get_context("spawn")
+    results: Dict[str, Dict[str, float]] = {}
+    for mode in ["pandas", "numpy", "chunked"]:
+        queue = context.Queue()
+        process = context.Process(
+            target=run, args=(mode, args.rows, queue)
+        )
+        process.start()
+        results[mode] = queue.get()
+        process.join()
+    print(json.dumps({"rows": args.rows, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
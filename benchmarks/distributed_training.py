@@ -0,0 +1,104 @@
+"""
+Benchmark the training throughput of distributed LightGBM per worker count.
+
+Writes one partition of whole sessions per worker from synthetic data,
+as the distributed RankingPipeline does, and times
+`distributed.train_distributed` on them. Throughput is rows times
+boosting rounds per second of training wall time. Workers share the
+CPUs of this machine, so beyond one worker per core the workers only
+add network overhead.
+
+    python benchmarks/distributed_training.py --rows 1000000 \
+        --workers 1 2 4 8
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import polars as pl
+
+from personalization.distributed import train_distributed
+from personalization.out_of_core import remove_partitions
+from personalization.ranking_pipeline import RankingPipeline
+from personalization.synthetic import write_synthetic_csvs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, 2, 4]
+    )
+    parser.add_argument(
+        "--tree-learner", choices=["data", "voting"], default="data"
+    )
+    parser.add_argument("--num-iterations", type=int, default=50)
+    parser.add_argument("--total-threads", type=int)
+    args = parser.parse_args()
+
+    params = {
+        "objective": "lambdarank",
+        "num_leaves": 100,
+        "learning_rate": 0.1,
+        "force_row_wise": True,
+        "num_iterations": args.num_iterations,
+        "verbosity": -1,
+    }
+    results = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        sessions_path, venues_path = write_synthetic_csvs(
+            data_dir, args.rows, seed=0
+        )
+        for n_workers in args.workers:
+            pipeline = RankingPipeline(
+                sessions_path,
+                venues_path,
+                split_strategy="session",
+                split_fractions=(0.8, 0.1),
+                distributed_workers=n_workers,
+                out_of_core_dir=os.path.join(data_dir, "partitions"),
+            )
+            pipeline.prepare_datasets()
+            shards = pipeline.partition_paths["train"]
+            rows = sum(
+                pl.read_ipc(path, memory_map=True).height
+                for path in shards
+            )
+            start = time.perf_counter()
+            train_distributed(
+                shards,
+                pipeline.features,
+                pipeline.label_column,
+                pipeline.group_column,
+                params,
+                tree_learner=args.tree_learner,
+                total_threads=args.total_threads,
+            )
+            seconds = time.perf_counter() - start
+            remove_partitions(pipeline.partition_paths)
+            results.append(
+                {
+                    "workers": len(shards),
+                    "train_rows": rows,
+                    "seconds": seconds,
+                    "row_rounds_per_second": rows
+                    * args.num_iterations
+                    / seconds,
+                }
+            )
+    print(
+        json.dumps(
+            {
+                "cpus": os.cpu_count(),
+                "tree_learner": args.tree_learner,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark the ranking metrics of `personalization.evaluation`.
+
+Times `ranking_metrics` over all sessions at once against a loop
+computing NDCG@k one session at a time, the way per-query evaluation
+is usually written, on random scores of synthetic sessions.
+
+    python benchmarks/evaluation.py --rows 10000000 --loop-rows 1000000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import polars as pl
+
+from personalization.evaluation import (
+    DEFAULT_CUTOFFS,
+    group_codes,
+    ranking_metrics,
+)
+from personalization.synthetic import (
+    generate_venues,
+    iter_sessions,
+)
+
+
+def per_session_ndcg(groups, scores, labels, cutoffs):
+    """Mean NDCG@k with one Python iteration per session."""
+    order = np.argsort(groups, kind="stable")
+    boundaries = np.flatnonzero(np.diff(groups[order])) + 1
+    values = {k: [] for k in cutoffs}
+    for rows in np.split(order, boundaries):
+        ranked = labels[rows][np.argsort(-scores[rows], kind="stable")]
+        if not (ranked > 0).any():
+            continue
+        ideal = np.sort(ranked)[::-1]
+        discounts = 1 / np.log2(np.arange(len(ranked)) + 2)
+        for k in cutoffs:
+            dcg = ((2 ** ranked[:k] - 1) * discounts[:k]).sum()
+            idcg = ((2 ** ideal[:k] - 1) * discounts[:k]).sum()
+            values[k].append(dcg / idcg)
+    return {f"ndcg@{k}": float(np.mean(values[k])) for k in cutoffs}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument(
+        "--loop-rows",
+        type=int,
+        default=1_000_000,
+        help="Rows of the per-session loop, which is much slower",
+    )
+    args = parser.parse_args()
+
+    venues = generate_venues(max(100, args.rows // 100), seed=0)
+    sessions = pl.concat(list(iter_sessions(args.rows, venues, seed=0)))
+    labels = (
+        sessions.get_column("has_seen_venue_in_this_session")
+        .cast(pl.Float64)
+        .to_numpy()
+    )
+    scores = np.random.default_rng(0).random(sessions.height)
+
+    start = time.perf_counter()
+    groups = group_codes(sessions, "session_id")
+    codes_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    metrics = ranking_metrics(groups, scores, labels, DEFAULT_CUTOFFS)
+    vectorized_seconds = time.perf_counter() - start
+
+    loop_rows = min(args.loop_rows, sessions.height)
+    # EXPLAIN: whole sessions, about `loop_rows` of them
+    subset = groups < (groups.max() + 1) * loop_rows // len(groups)
+    start = time.perf_counter()
+    looped = per_session_ndcg(
+        groups[subset], scores[subset], labels[subset], DEFAULT_CUTOFFS
+    )
+    loop_seconds = time.perf_counter() - start
+    subset_metrics = ranking_metrics(
+        groups[subset], scores[subset], labels[subset], DEFAULT_CUTOFFS
+    )
+    for name, value in looped.items():
+        assert np.isclose(subset_metrics[name], value), name
+
+    print(
+        json.dumps(
+            {
+                "rows": sessions.height,
+                "sessions": int(groups.max()) + 1,
+                "group_codes_seconds": codes_seconds,
+                "ranking_metrics_seconds": vectorized_seconds,
+                "rows_per_second": sessions.height / vectorized_seconds,
+                "loop_rows": int(subset.sum()),
+                "loop_rows_per_second": int(subset.sum())
+                / loop_seconds,
+                "metrics": metrics,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
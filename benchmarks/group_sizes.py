@@ -0,0 +1,82 @@
+"""
+Benchmark the LightGBM group array computed from a sorted frame.
+
+Compares the former groupby/count/sort aggregation with the run-length
+`group_sizes` used by RankingPipeline, and checks both agree.
+
+    python benchmarks/group_sizes.py --rows 10000000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import polars as pl
+
+from personalization.ranking_pipeline import group_sizes
+
+
+def groupby_group_sizes(
+    frame: pl.DataFrame, group_column: str
+) -> np.ndarray:
+    """The aggregation prepare_datasets used before run-length encoding."""
+    return (
+        frame.groupby(group_column)
+        .agg(pl.col(group_column).count().alias("count"))
+        .sort(group_column)
+        .select("count")
+        .to_numpy()
+        .ravel()
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--mean-session-length", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    n_sessions = max(args.rows // args.mean_session_length, 1)
+    frame = (
+        pl.DataFrame(
+            {
+                "session_id": rng.integers(0, n_sessions, args.rows),
+                "rating": rng.random(args.rows),
+            }
+        )
+        .with_columns(pl.col("session_id").cast(pl.Utf8))
+        .sort(by=["session_id", "rating"])
+    )
+
+    timings = {}
+    results = {}
+    for name, function in [
+        ("groupby", groupby_group_sizes),
+        ("run_length", group_sizes),
+    ]:
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results[name] = function(frame, "session_id")
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    np.testing.assert_array_equal(
+        results["groupby"], results["run_length"]
+    )
+    print(
+        json.dumps(
+            {
+                "rows": args.rows,
+                "groups": int(results["run_length"].shape[0]),
+                "seconds": timings,
+                "speedup": timings["groupby"] / timings["run_length"],
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark the startup time and memory of the package entry points.
+
+Runs every entry point `--repeat` times in a fresh interpreter and
+reports the median wall time and the peak RSS, and exits with status 1
+if the CLI or the loader is over its budget:
+
+- "import": `import personalization`
+- "cli_help": `python -m personalization --help`
+- "lazy_loader": `load_model_from_artifact(..., lazy=True)` and its
+  feature names, e.g. a serving process before its first request
+- "loader": loading a model and scoring one row
+- "pipeline": `from personalization import RankingPipeline`
+
+    python benchmarks/import_time.py --repeat 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import lightgbm as lgb
+import numpy as np
+
+from personalization.model_artifact import save_model_artifact
+
+LOAD = (
+    "from personalization import load_model_from_artifact\n"
+    "booster = load_model_from_artifact({path!r}, lazy=True)\n"
+    "booster.feature_name()\n"
+)
+ENTRY_POINTS = {
+    "import": "import personalization\n",
+    "cli_help": (
+        "import contextlib, io, runpy, sys\n"
+        "sys.argv = ['personalization', '--help']\n"
+        "with contextlib.redirect_stdout(io.StringIO()):\n"
+        "    try:\n"
+        "        runpy.run_module('personalization', run_name='__main__')\n"
+        "    except SystemExit:\n"
+        "        pass\n"
+    ),
+    "lazy_loader": LOAD,
+    "loader": LOAD + "booster.predict([[0.5, 0.5]])\n",
+    "pipeline": "from personalization import RankingPipeline\n",
+}
+# EXPLAIN: ru_maxrss would include the RSS of the benchmark process
+# the interpreter was forked from, VmHWM starts afresh at exec
+PEAK_RSS = (
+    "for line in open('/proc/self/status'):\n"
+    "    if line.startswith('VmHWM:'):\n"
+    "        print(line.split()[1])\n"
+)
+
+
+def run(code, env):
+    """Wall seconds and peak RSS in MB of `code` in a new interpreter."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", code + PEAK_RSS],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    seconds = time.perf_counter() - start
+    return seconds, int(result.stdout.splitlines()[-1]) / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--cli-budget-ms", type=float, default=300)
+    parser.add_argument("--loader-budget-ms", type=float, default=400)
+    args = parser.parse_args()
+
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    results = {}
+    with tempfile.TemporaryDirectory() as model_dir:
+        matrix = np.random.default_rng(0).random((100, 2))
+        booster = lgb.train(
+            {"objective": "regression", "verbosity": -1},
+            lgb.Dataset(matrix, label=matrix[:, 0]),
+            num_boost_round=2,
+        )
+        path = os.path.join(model_dir, "model")
+        save_model_artifact(booster, path)
+        baseline = [run("", env)[0] for _ in range(args.repeat)]
+        for name, code in ENTRY_POINTS.items():
+            runs = [
+                run(code.format(path=path), env)
+                for _ in range(args.repeat)
+            ]
+            results[name] = {
+                "median_ms": round(
+                    1000 * statistics.median(s for s, _ in runs), 1
+                ),
+                "peak_rss_mb": round(max(rss for _, rss in runs), 1),
+            }
+    results["interpreter"] = {
+        "median_ms": round(1000 * statistics.median(baseline), 1)
+    }
+    print(json.dumps(results, indent=2))
+    over = [
+        name
+        for name, budget in (
+            ("cli_help", args.cli_budget_ms),
+            ("lazy_loader", args.loader_budget_ms),
+        )
+        if results[name]["median_ms"] > budget
+    ]
+    if over:
+        print(f"Over the startup budget: {over}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
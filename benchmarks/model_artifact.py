@@ -0,0 +1,108 @@
+"""
+Benchmark the size and load time of joblib and native model artifacts.
+
+The defaults train a model of roughly 50 MB of model text, the size
+of the production models mentioned in the README.
+
+    python benchmarks/model_artifact.py --num-trees 2000 --num-leaves 255
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+)
+
+import lightgbm as lgb
+import numpy as np
+
+from personalization.model_artifact import (
+    load_model_from_artifact,
+    save_model_to_file,
+)
+
+
+def directory_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(path, name))
+        for name in os.listdir(path)
+    )
+
+
+def best_of(function: Callable[[], Any], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num-trees", type=int, default=2_000)
+    parser.add_argument("--num-leaves", type=int, default=255)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    matrix = rng.random((args.rows, 10))
+    label = matrix[:, 0] + rng.random(args.rows)
+    booster = lgb.train(
+        {
+            "objective": "regression",
+            "num_leaves": args.num_leaves,
+            "min_data_in_leaf": 5,
+            "verbosity": -1,
+        },
+        lgb.Dataset(matrix, label=label),
+        num_boost_round=args.num_trees,
+    )
+    variants: Dict[str, Dict[str, Any]] = {
+        "joblib": {"artifact_format": "joblib"},
+        "native": {"artifact_format": "native"},
+        "native_gzip": {
+            "artifact_format": "native",
+            "compression": "gzip",
+        },
+        "native_lzma": {
+            "artifact_format": "native",
+            "compression": "lzma",
+        },
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, kwargs in variants.items():
+            path = os.path.join(tmp_dir, name)
+            start = time.perf_counter()
+            save_model_to_file(booster, path, **kwargs)
+            save_seconds = time.perf_counter() - start
+            results[name] = {
+                "megabytes": directory_size(path) / 2**20,
+                "save_seconds": save_seconds,
+                "load_seconds": best_of(
+                    lambda: load_model_from_artifact(path), args.repeat
+                ),
+            }
+            if kwargs["artifact_format"] == "native":
+                results[name]["lazy_open_seconds"] = best_of(
+                    lambda: load_model_from_artifact(path, lazy=True),
+                    args.repeat,
+                )
+    print(
+        json.dumps(
+            {"num_trees": booster.num_trees(), "results": results},
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
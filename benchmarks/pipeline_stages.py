@@ -0,0 +1,156 @@
+"""
+Time and memory-profile every RankingPipeline stage on synthetic data.
+
+For each size the data is generated once into `--data-dir` and the
+pipeline runs in a fresh process with `profile=True`, which records
+the wall time, CPU time, peak RSS and output shape of every stage.
+Results are written as JSON together with the package versions, so
+runs of different versions can be compared.
+
+    python benchmarks/pipeline_stages.py --rows 10000 1000000 \
+        --output pipeline_stages.json
+
+`--compact-dtypes` reads only the model columns with narrow dtypes and
+`--out-of-core-partitions` builds the datasets from session partitions
+on disk; compare the peak RSS and `estimated_mb` of each stage with a
+default run of the same size.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import tempfile
+from typing import (
+    Any,
+    Dict,
+    List,
+)
+
+import lightgbm as lgb
+import polars as pl
+
+import personalization
+from personalization.ranking_pipeline import RankingPipeline
+from personalization.synthetic import write_synthetic_csvs
+
+TRAIN_PARAMS = {
+    "objective": "lambdarank",
+    "num_leaves": 100,
+    "min_sum_hessian_in_leaf": 10,
+    "metric": "ndcg",
+    "ndcg_eval_at": [10, 20],
+    "learning_rate": 0.1,
+    "force_row_wise": True,
+    "num_iterations": 10,
+    "verbosity": -1,
+}
+
+
+def profile_stages(
+    sessions_path: str,
+    venues_path: str,
+    pipeline_kwargs: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    """Prepare the datasets and train with the pipeline profiler on."""
+    pipeline = RankingPipeline(
+        sessions_path, venues_path, profile=True, **pipeline_kwargs
+    )
+    pipeline.prepare_datasets()
+    pipeline.train(params=dict(TRAIN_PARAMS))
+    return pipeline.profile_report
+
+
+def run(
+    sessions_path: str,
+    venues_path: str,
+    pipeline_kwargs: Dict[str, Any],
+    queue: multiprocessing.Queue,
+) -> None:
+    queue.put(
+        profile_stages(sessions_path, venues_path, pipeline_kwargs)
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--rows",
+        type=int,
+        nargs="+",
+        default=[10_000, 100_000, 1_000_000],
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--null-fraction", type=float, default=0.01)
+    parser.add_argument(
+        "--data-dir",
+        type=str,
+        default=os.path.join(
+            tempfile.gettempdir(), "personalization_bench"
+        ),
+        help="Where the generated data is kept between runs",
+    )
+    parser.add_argument("--lazy", action="store_true")
+    parser.add_argument("--split-strategy", type=str, default="random")
+    parser.add_argument("--compact-dtypes", action="store_true")
+    parser.add_argument("--out-of-core-partitions", type=int)
+    parser.add_argument("--output", type=str, help="JSON file to write")
+    args = parser.parse_args()
+
+    pipeline_kwargs = {
+        "lazy": args.lazy,
+        "split_strategy": args.split_strategy,
+        "compact_dtypes": args.compact_dtypes,
+        "out_of_core_partitions": args.out_of_core_partitions,
+        "train_data_path": os.path.join(args.data_dir, "train.binary"),
+        "val_data_path": os.path.join(args.data_dir, "val.binary"),
+    }
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for rows in args.rows:
+        data_dir = os.path.join(
+            args.data_dir, f"rows{rows}-seed{args.seed}"
+        )
+        sessions_path = os.path.join(data_dir, "sessions.csv")
+        venues_path = os.path.join(data_dir, "venues.csv")
+        if not (
+            os.path.isfile(sessions_path)
+            and os.path.isfile(venues_path)
+        ):
+            write_synthetic_csvs(
+                data_dir,
+                rows,
+                seed=args.seed,
+                null_fraction=args.null_fraction,
+            )
+        queue = context.Queue()
+        process = context.Process(
+            target=run,
+            args=(sessions_path, venues_path, pipeline_kwargs, queue),
+        )
+        process.start()
+        runs.append({"rows": rows, "stages": queue.get()})
+        process.join()
+    report = {
+        "versions": {
+            "personalization": personalization.__version__,
+            "polars": pl.__version__,
+            "lightgbm": lgb.__version__,
+            "python": platform.python_version(),
+        },
+        "pipeline_kwargs": {
+            "lazy": args.lazy,
+            "split_strategy": args.split_strategy,
+            "compact_dtypes": args.compact_dtypes,
+            "out_of_core_partitions": args.out_of_core_partitions,
+        },
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark prefetched reads of inputs on simulated network storage.
+
+Writes synthetic sessions and venues as csv files and reads them
+through a throttled file that waits `--latency-ms` per read and
+transfers at most `--stream-mbps` MB/s per open handle, a stand-in for
+a network mount. Compares reading each file whole, venues then
+sessions, with constructing a `RankingPipeline` over
+`PrefetchingFileSource`s fetching `--chunk-mb` chunks with several
+numbers of chunks ahead of the parser.
+
+    python benchmarks/prefetch_read.py --rows 1000000 --prefetch 1 4 8
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+from personalization.data_sources import PrefetchingFileSource
+from personalization.ranking_pipeline import RankingPipeline
+from personalization.synthetic import write_synthetic_csvs
+
+
+class ThrottledFile:
+    """A local file read with the latency and bandwidth of a remote one."""
+
+    def __init__(self, path, latency, bytes_per_second):
+        self.file = open(path, "rb")
+        self.latency = latency
+        self.bytes_per_second = bytes_per_second
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+    def seek(self, offset):
+        return self.file.seek(offset)
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        time.sleep(self.latency + len(data) / self.bytes_per_second)
+        return data
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--stream-mbps", type=float, default=50)
+    parser.add_argument("--chunk-mb", type=float, default=4)
+    parser.add_argument(
+        "--prefetch", type=int, nargs="+", default=[1, 4, 8]
+    )
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    def opener(path):
+        return ThrottledFile(
+            path, args.latency_ms / 1000, args.stream_mbps * 1e6
+        )
+
+    results = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        sessions_path, venues_path = write_synthetic_csvs(
+            data_dir, args.rows, seed=0
+        )
+        start = time.perf_counter()
+        for path in (venues_path, sessions_path):
+            # EXPLAIN: one chunk of the whole file, fetched in one read
+            # before parsing, as an unprefetched read of the mount
+            PrefetchingFileSource(
+                path,
+                chunk_size=os.path.getsize(path),
+                prefetch_chunks=1,
+                opener=opener,
+            ).read()
+        results.append(
+            {
+                "read": "whole_files_in_sequence",
+                "seconds": round(time.perf_counter() - start, 3),
+            }
+        )
+        chunk_size = int(args.chunk_mb * 2**20)
+        for prefetch_chunks in args.prefetch:
+            start = time.perf_counter()
+            RankingPipeline(
+                *(
+                    PrefetchingFileSource(
+                        path, chunk_size, prefetch_chunks, opener
+                    )
+                    for path in (sessions_path, venues_path)
+                )
+            )
+            results.append(
+                {
+                    "read": "pipeline_prefetching",
+                    "prefetch_chunks": prefetch_chunks,
+                    "seconds": round(time.perf_counter() - start, 3),
+                }
+            )
+    print(
+        json.dumps(
+            {
+                "rows": args.rows,
+                "latency_ms": args.latency_ms,
+                "stream_mbps": args.stream_mbps,
+                "chunk_mb": args.chunk_mb,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark RankingScorer latency for ranking a batch of candidates.
+
+    python benchmarks/scoring_latency.py --candidates 500 --venues 100000
+"""
+import argparse
+import json
+import time
+
+import lightgbm as lgb
+import numpy as np
+import polars as pl
+
+from personalization.scoring import RankingScorer
+
+VENUE_FEATURES = [
+    "conversions_per_impression",
+    "price_range",
+    "rating",
+    "popularity",
+    "retention_rate",
+]
+FEATURES = [
+    "venue_id",
+    *VENUE_FEATURES,
+    "position_in_list",
+    "is_from_order_again",
+    "is_recommended",
+]
+
+
+def make_venues(
+    n_venues: int, rng: np.random.Generator
+) -> pl.DataFrame:
+    return pl.DataFrame(
+        {
+            "venue_id": rng.integers(-(2**62), 2**62, n_venues),
+            "conversions_per_impression": rng.beta(2, 8, n_venues),
+            "price_range": rng.integers(1, 5, n_venues),
+            "rating": rng.uniform(6, 10, n_venues),
+            "popularity": rng.lognormal(1, 1, n_venues),
+            "retention_rate": rng.beta(3, 5, n_venues),
+        }
+    )
+
+
+def train_booster(
+    rng: np.random.Generator, num_trees: int, num_leaves: int
+) -> lgb.Booster:
+    n_rows = 200_000
+    matrix = rng.random((n_rows, len(FEATURES)), dtype=np.float32)
+    label = (matrix[:, 1] + rng.random(n_rows) > 1).astype(int)
+    return lgb.train(
+        {
+            "objective": "lambdarank",
+            "num_leaves": num_leaves,
+            "verbosity": -1,
+        },
+        lgb.Dataset(
+            matrix,
+            label=label,
+            group=np.full(n_rows // 50, 50),
+            feature_name=FEATURES,
+        ),
+        num_boost_round=num_trees,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--venues", type=int, default=100_000)
+    parser.add_argument("--candidates", type=int, default=500)
+    parser.add_argument("--sessions-per-batch", type=int, default=1)
+    parser.add_argument("--num-trees", type=int, default=100)
+    parser.add_argument("--num-leaves", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=1_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    venues = make_venues(args.venues, rng)
+    scorer = RankingScorer(
+        train_booster(rng, args.num_trees, args.num_leaves),
+        venues,
+    )
+    venue_ids = venues["venue_id"].to_numpy()
+    latencies = []
+    for _ in range(args.repeat):
+        requests = [
+            {
+                "venue_ids": rng.choice(venue_ids, args.candidates),
+                "position_in_list": np.arange(args.candidates),
+                "is_from_order_again": 0,
+                "is_recommended": 1,
+            }
+            for _ in range(args.sessions_per_batch)
+        ]
+        start = time.perf_counter()
+        scorer.rank_batch(requests)
+        latencies.append(time.perf_counter() - start)
+    milliseconds = np.array(latencies) * 1_000
+    print(
+        json.dumps(
+            {
+                "candidates": args.candidates,
+                "sessions_per_batch": args.sessions_per_batch,
+                "num_trees": args.num_trees,
+                "p50_ms": float(np.percentile(milliseconds, 50)),
+                "p99_ms": float(np.percentile(milliseconds, 99)),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
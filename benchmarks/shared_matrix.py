@@ -0,0 +1,124 @@
+"""
+Benchmark the memory of workers reading `personalization.shared_matrix`.
+
+Starts `--workers` processes that each read the whole feature matrix,
+once receiving a pickled copy of the array and once attaching to a
+`SharedFeatureMatrix`, and sums the proportional set size (PSS) of the
+workers, which splits every shared page between the processes mapping
+it, above that of workers given no matrix.
+
+    python benchmarks/shared_matrix.py --rows 10000000 --workers 4
+"""
+import argparse
+import json
+import multiprocessing
+import tempfile
+import time
+
+import numpy as np
+
+from personalization.feature_store import VenueFeatureStore
+from personalization.shared_matrix import SharedFeatureMatrix
+from personalization.synthetic import (
+    generate_sessions,
+    generate_venues,
+)
+
+FEATURES = [
+    "venue_id",
+    "price_range",
+    "position_in_list",
+    "is_from_order_again",
+    "is_recommended",
+]
+
+
+def pss_mb() -> float:
+    """Proportional set size of this process in MB."""
+    with open("/proc/self/smaps_rollup") as file:
+        for line in file:
+            if line.startswith("Pss:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("No Pss in /proc/self/smaps_rollup")
+
+
+def read_matrix(matrix, barrier):
+    """Touch every page of the matrix and report the PSS."""
+    data = matrix.matrix if hasattr(matrix, "matrix") else matrix
+    checksum = (
+        0.0 if data is None else float(data.sum(dtype=np.float64))
+    )
+    # EXPLAIN: PSS is measured while all workers map the matrix
+    barrier.wait()
+    pss = pss_mb()
+    barrier.wait()
+    return checksum, pss
+
+
+def run_workers(payload, n_workers):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Manager().Barrier(n_workers)
+    start = time.perf_counter()
+    with context.Pool(n_workers) as pool:
+        results = pool.starmap(
+            read_matrix, [(payload, barrier)] * n_workers
+        )
+    seconds = time.perf_counter() - start
+    return (
+        [checksum for checksum, _ in results],
+        sum(pss for _, pss in results),
+        seconds,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    venues = generate_venues(max(100, args.rows // 100), seed=0)
+    rows = VenueFeatureStore(venues).enrich(
+        generate_sessions(args.rows, venues, seed=0)
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        matrix = SharedFeatureMatrix.build(
+            rows,
+            FEATURES,
+            "has_seen_venue_in_this_session",
+            "session_id",
+            directory=directory,
+        )
+        matrix_mb = matrix.matrix.nbytes / 2**20
+        _, baseline_pss, _ = run_workers(None, args.workers)
+        copied = np.array(matrix.matrix)
+        copy_sums, copy_pss, copy_seconds = run_workers(
+            copied, args.workers
+        )
+        shared_sums, shared_pss, shared_seconds = run_workers(
+            matrix, args.workers
+        )
+    assert copy_sums == shared_sums
+
+    print(
+        json.dumps(
+            {
+                "rows": args.rows,
+                "workers": args.workers,
+                "matrix_mb": round(matrix_mb, 1),
+                "pickled_workers_pss_mb": round(
+                    copy_pss - baseline_pss, 1
+                ),
+                "shared_workers_pss_mb": round(
+                    shared_pss - baseline_pss, 1
+                ),
+                "pickled_seconds": round(copy_seconds, 3),
+                "shared_seconds": round(shared_seconds, 3),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark partitioned reads of a `personalization.data_sources.SqlSource`.
+
+Writes synthetic sessions to a SQLite file and reads them back with one
+partition per connection for several partition counts, reporting rows
+per second against reading the same rows from a csv file.
+
+    python benchmarks/sql_read.py --rows 1000000 --partitions 1 2 4 8
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+from personalization.data_sources import (
+    FileSource,
+    SqlSource,
+    sqlite_connect,
+)
+from personalization.synthetic import (
+    generate_sessions,
+    generate_venues,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument(
+        "--partitions", type=int, nargs="+", default=[1, 2, 4, 8]
+    )
+    args = parser.parse_args()
+
+    venues = generate_venues(max(100, args.rows // 100), seed=0)
+    sessions = generate_sessions(args.rows, venues, seed=0)
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        database_path = os.path.join(work_dir, "sessions.db")
+        columns = ", ".join(
+            f'"{column}"' for column in sessions.columns
+        )
+        markers = ", ".join("?" for _ in sessions.columns)
+        with sqlite3.connect(database_path) as connection:
+            connection.execute(f"CREATE TABLE sessions ({columns})")
+            connection.executemany(
+                f"INSERT INTO sessions VALUES ({markers})",
+                sessions.iter_rows(),
+            )
+        connection.close()
+        csv_path = os.path.join(work_dir, "sessions.csv")
+        sessions.write_csv(csv_path)
+
+        start = time.perf_counter()
+        FileSource(csv_path).read()
+        seconds = time.perf_counter() - start
+        results.append(
+            {
+                "source": "csv",
+                "seconds": round(seconds, 3),
+                "rows_per_second": round(args.rows / seconds),
+            }
+        )
+        for num_partitions in args.partitions:
+            source = SqlSource(
+                sqlite_connect(database_path),
+                table="sessions",
+                partition_column="venue_id",
+                num_partitions=num_partitions,
+            )
+            start = time.perf_counter()
+            frame = source.read()
+            seconds = time.perf_counter() - start
+            source.pool.close()
+            assert frame.height == args.rows
+            results.append(
+                {
+                    "source": "sqlite",
+                    "partitions": num_partitions,
+                    "seconds": round(seconds, 3),
+                    "rows_per_second": round(args.rows / seconds),
+                }
+            )
+    print(
+        json.dumps({"cpus": os.cpu_count(), "reads": results}, indent=2)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark enriching sessions with venue features.
+
+Compares the hash join RankingPipeline used to run per call with the
+lookup and gather of a `VenueFeatureStore` built once, and checks both
+give the same frame.
+
+    python benchmarks/venue_join.py --rows 100000000 --venues 1000000
+"""
+import argparse
+import json
+import time
+
+import polars as pl
+
+from personalization.feature_store import VenueFeatureStore
+from personalization.synthetic import (
+    generate_venues,
+    iter_sessions,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--venues", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    venues = generate_venues(args.venues, seed=0)
+    sessions = pl.concat(list(iter_sessions(args.rows, venues, seed=0)))
+
+    start = time.perf_counter()
+    store = VenueFeatureStore(venues)
+    build_seconds = time.perf_counter() - start
+
+    timings = {}
+    results = {}
+    for name, function in [
+        ("hash_join", lambda: sessions.join(venues, on="venue_id")),
+        ("feature_store", lambda: store.enrich(sessions)),
+    ]:
+        best = float("inf")
+        for _ in range(args.repeat):
+            results.pop(name, None)
+            start = time.perf_counter()
+            results[name] = function()
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    assert results["hash_join"].frame_equal(results["feature_store"])
+    print(
+        json.dumps(
+            {
+                "rows": args.rows,
+                "venues": args.venues,
+                "store_build_seconds": build_seconds,
+                "seconds": timings,
+                "speedup": timings["hash_join"]
+                / timings["feature_store"],
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark the cached window aggregates of `personalization.feature_engineering`.
+
+Adds the `DEFAULT_AGGREGATES` of the last of `--days` synthetic days
+twice: with a `FeatureCache` holding the statistics of the earlier days,
+so only the new day is aggregated, and by aggregating the full history
+of all earlier days again.
+
+    python benchmarks/window_features.py --rows-per-day 1000000 --days 30
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import polars as pl
+
+from personalization.feature_engineering import (
+    DEFAULT_AGGREGATES,
+    FeatureCache,
+    add_window_features,
+)
+from personalization.synthetic import (
+    generate_sessions,
+    generate_venues,
+)
+
+
+def full_history_features(days, rows):
+    """The same features, aggregating every earlier day from scratch."""
+    history = pl.concat(days).lazy()
+    plan = rows
+    for aggregate in DEFAULT_AGGREGATES:
+        plan = plan.join(
+            aggregate.merge([aggregate.window_statistics(history)]),
+            on=aggregate.keys,
+            how="left",
+        )
+    return plan.collect()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows-per-day", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    venues = generate_venues(max(100, args.rows_per_day // 100), seed=0)
+    days = [
+        generate_sessions(args.rows_per_day, venues, seed=day)
+        for day in range(args.days)
+    ]
+    new_day = days.pop()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = FeatureCache(cache_dir)
+        for day, rows in enumerate(days):
+            cache.add_windows(
+                DEFAULT_AGGREGATES, f"day-{day}", rows.lazy()
+            )
+        start = time.perf_counter()
+        cached = add_window_features(
+            new_day.lazy(), DEFAULT_AGGREGATES, cache, "new-day"
+        ).collect()
+        cached_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    recomputed = full_history_features(days, new_day.lazy())
+    full_seconds = time.perf_counter() - start
+    assert cached.frame_equal(recomputed, null_equal=True)
+
+    print(
+        json.dumps(
+            {
+                "rows_per_day": args.rows_per_day,
+                "history_days": len(days),
+                "cached_seconds": round(cached_seconds, 3),
+                "full_history_seconds": round(full_seconds, 3),
+                "speedup": round(full_seconds / cached_seconds, 2),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
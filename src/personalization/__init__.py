@@ -3,9 +3,18 @@ pipeline to train personalization model
 """
 __version__ = "0.0.1"
 
+import importlib
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    List,
+)
 
-from .file_utils import load_model_from_artifact
-from .ranking_pipeline import RankingPipeline
+if TYPE_CHECKING:
+    from .feature_store import VenueFeatureStore
+    from .model_artifact import load_model_from_artifact
+    from .ranking_pipeline import RankingPipeline
+    from .scoring import RankingScorer
 
 __DEFAULT__LGB__PARAMS__ = {
     "objective": "lambdarank",
@@ -18,9 +27,36 @@ __DEFAULT__LGB__PARAMS__ = {
     "num_iterations": 10,
 }
 
+# module of every public name, imported on first access so that
+# `import personalization` does not import LightGBM, Polars or NumPy
+_LAZY_ATTRIBUTES = {
+    "RankingPipeline": ".ranking_pipeline",
+    "RankingScorer": ".scoring",
+    "VenueFeatureStore": ".feature_store",
+    "load_model_from_artifact": ".model_artifact",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}"
+        )
+    value = getattr(
+        importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name
+    )
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted([*globals(), *_LAZY_ATTRIBUTES])
+
 
 __all__ = [
     "RankingPipeline",
+    "RankingScorer",
+    "VenueFeatureStore",
     "load_model_from_artifact",
     "__DEFAULT__LGB__PARAMS__",
 ]
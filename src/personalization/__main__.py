@@ -1,19 +1,36 @@
 import argparse
+import json
+import os
+import sys
+import tempfile
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    Optional,
+)
 
-from .ranking_pipeline import RankingPipeline
+if TYPE_CHECKING:
+    from .ranking_pipeline import RankingPipeline
 
+# EXPLAIN: the modules running the commands are imported by them, so
+# that parsing the arguments, e.g. `--help`, imports no LightGBM,
+# Polars or NumPy
 
-def parse_arguments() -> argparse.Namespace:
-    """Parse command-line arguments and return an `argparse.Namespace` object.
+# splits of the session split strategy the evaluate command can select
+EVALUATION_SPLITS = ("train", "val", "test")
 
-    Returns:
-        argparse.Namespace: An object containing the parsed command-line arguments.
-    """
-    import argparse
+# parameters whose candidate values are searched by the tune command
+TUNABLE_PARAMETERS = (
+    "num_leaves",
+    "learning_rate",
+    "min_sum_hessian_in_leaf",
+)
 
-    parser = argparse.ArgumentParser(
-        description="Description of your program"
-    )
+
+def add_data_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments locating and preparing the input data."""
     parser.add_argument(
         "--sessions-bucket-path",
         type=str,
@@ -26,6 +43,169 @@ def parse_arguments() -> argparse.Namespace:
         required=True,
         help="Path to venues file",
     )
+    parser.add_argument(
+        "--split-strategy",
+        type=str,
+        choices=["random", "session"],
+        default="random",
+        help="Shuffle rows or keep whole sessions in one split",
+    )
+    parser.add_argument(
+        "--split-fractions",
+        type=float,
+        nargs=2,
+        default=[0.2, 0.16],
+        help="Fractions of the data in the train and val splits",
+    )
+    parser.add_argument(
+        "--split-seed",
+        type=int,
+        default=0,
+        help="Seed of the session hash used by the session split",
+    )
+    parser.add_argument(
+        "--lazy",
+        action="store_true",
+        help="Stream sessions and venues instead of reading them eagerly",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=os.path.join(
+            tempfile.gettempdir(), "personalization_cache"
+        ),
+        help="Directory for the columnar copies of the csv inputs",
+    )
+    parser.add_argument(
+        "--cache-format",
+        type=str,
+        choices=["ipc", "parquet"],
+        default="ipc",
+        help="Format of the columnar copies of the csv inputs",
+    )
+    parser.add_argument(
+        "--rebuild-cache",
+        action="store_true",
+        help="Convert the csv inputs again even if they are cached",
+    )
+    parser.add_argument(
+        "--dataset-cache-dir",
+        type=str,
+        default=os.path.join(
+            tempfile.gettempdir(), "personalization_cache", "datasets"
+        ),
+        help="Directory for constructed LightGBM train/val datasets",
+    )
+    parser.add_argument(
+        "--dataset-cache-max-gb",
+        type=float,
+        default=20.0,
+        help="Disk budget of the dataset cache in GB",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always parse the csv inputs and rebuild the datasets",
+    )
+    parser.add_argument(
+        "--compact-dtypes",
+        action="store_true",
+        help="Read only the model columns, with narrow integer, float32 "
+        "and hashed session id dtypes",
+    )
+    parser.add_argument(
+        "--out-of-core-partitions",
+        type=int,
+        help="Build the datasets from this many session partitions "
+        "written to disk, for data larger than memory; needs "
+        "--split-strategy session",
+    )
+    parser.add_argument(
+        "--reference-sample-rows",
+        type=int,
+        default=200_000,
+        help="Rows the out-of-core dataset bins are computed on",
+    )
+    parser.add_argument(
+        "--distributed-workers",
+        type=int,
+        help="Train with LightGBM's parallel learning on this many "
+        "local worker processes, each holding a partition of the "
+        "sessions; needs --split-strategy session",
+    )
+    parser.add_argument(
+        "--tree-learner",
+        type=str,
+        choices=["data", "voting"],
+        default="data",
+        help="Parallel learner of the distributed workers",
+    )
+    parser.add_argument(
+        "--checkpoint-dir",
+        type=str,
+        help="Run as stages checkpointed in this directory, so a rerun "
+        "skips the stages whose inputs and config are unchanged",
+    )
+    parser.add_argument(
+        "--prefetch-chunks",
+        type=int,
+        help="Read the input files in chunks, this many fetched "
+        "concurrently ahead of the parser, e.g. on network storage",
+    )
+    parser.add_argument(
+        "--window-features",
+        action="store_true",
+        help="Add the venue click-through and purchase rates of the "
+        "earlier session windows cached in --feature-cache-dir",
+    )
+    parser.add_argument(
+        "--feature-cache-dir",
+        type=str,
+        default=os.path.join(
+            tempfile.gettempdir(), "personalization_cache", "features"
+        ),
+        help="Directory of the per-window feature statistics",
+    )
+    parser.add_argument(
+        "--feature-window",
+        type=str,
+        help="Name of the window of the sessions, e.g. its date; "
+        "by default the fingerprint of the sessions file",
+    )
+    parser.add_argument(
+        "--init-model-path",
+        type=str,
+        help="Continue boosting the model of this artifact on the new "
+        "sessions only, with the bins saved in the artifact",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print wall time, CPU time, peak RSS and shape per stage",
+    )
+    parser.add_argument(
+        "--profile-json",
+        type=str,
+        help="Write the per-stage profile to this JSON file",
+    )
+    parser.add_argument(
+        "--profile-trace",
+        type=str,
+        help="Write the stages as a Chrome trace, see chrome://tracing",
+    )
+
+
+def add_lgbm_arguments(
+    parser: argparse.ArgumentParser, search: bool = False
+) -> None:
+    """Add the LightGBM parameters.
+
+    Args:
+        parser: The parser to add the arguments to.
+        search: Accept several candidate values for the parameters in
+            TUNABLE_PARAMETERS.
+    """
+    candidates: Dict[str, Any] = {"nargs": "+"} if search else {}
     parser.add_argument(
         "--objective",
         type=str,
@@ -35,14 +215,16 @@ def parse_arguments() -> argparse.Namespace:
     parser.add_argument(
         "--num_leaves",
         type=int,
-        default=100,
+        default=[31, 100, 255] if search else 100,
         help="Number of leaves in LightGBM model",
+        **candidates,
     )
     parser.add_argument(
         "--min_sum_hessian_in_leaf",
         type=int,
-        default=10,
+        default=[1, 10] if search else 10,
         help="Minimum sum of hessian in one leaf",
+        **candidates,
     )
     parser.add_argument(
         "--metric",
@@ -60,8 +242,9 @@ def parse_arguments() -> argparse.Namespace:
     parser.add_argument(
         "--learning_rate",
         type=float,
-        default=0.8,
+        default=[0.05, 0.2, 0.8] if search else 0.8,
         help="Learning rate for LightGBM model",
+        **candidates,
     )
     parser.add_argument(
         "--force_row_wise",
@@ -72,7 +255,7 @@ def parse_arguments() -> argparse.Namespace:
     parser.add_argument(
         "--num_iterations",
         type=int,
-        default=10,
+        default=100 if search else 10,
         help="Number of boosting iterations",
     )
     parser.add_argument(
@@ -80,15 +263,322 @@ def parse_arguments() -> argparse.Namespace:
         type=str,
         help="path to save the trained model",
     )
+    parser.add_argument(
+        "--artifact-format",
+        type=str,
+        choices=["native", "joblib"],
+        help="Save LightGBM's model text with a manifest, or a joblib "
+        "pickle; by default joblib for a --trained-model-path with a "
+        "file suffix, e.g. model.joblib, else native",
+    )
+    parser.add_argument(
+        "--artifact-compression",
+        type=str,
+        choices=["gzip", "lzma"],
+        help="Compress the model text of a native artifact",
+    )
 
-    args = parser.parse_args()
+
+def parse_arguments(
+    argv: Optional[List[str]] = None,
+) -> argparse.Namespace:
+    """Parse command-line arguments and return an `argparse.Namespace` object.
+
+    `python -m personalization tune ...` parses the arguments of the
+    hyperparameter search, `python -m personalization cv ...` those of
+    a cross-validation, `python -m personalization evaluate ...` those
+    of an offline evaluation, anything else those of a single training.
+
+    Args:
+        argv: The arguments to parse, by default `sys.argv[1:]`.
+
+    Returns:
+        argparse.Namespace: An object containing the parsed command-line arguments.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "tune":
+        return parse_tune_arguments(argv[1:])
+    if argv and argv[0] == "cv":
+        return parse_cv_arguments(argv[1:])
+    if argv and argv[0] == "evaluate":
+        return parse_evaluate_arguments(argv[1:])
+
+    parser = argparse.ArgumentParser(
+        description="Train a LightGBM ranking model on sessions and venues",
+        epilog="Run `python -m personalization tune --help` to search "
+        "LightGBM parameters, `python -m personalization cv --help` to "
+        "cross-validate them, or `python -m personalization evaluate "
+        "--help` to evaluate a trained model instead.",
+    )
+    add_data_arguments(parser)
+    add_lgbm_arguments(parser)
+    parser.set_defaults(command="train")
+
+    args = parser.parse_args(argv)
 
     # Parse arguments
     return args
 
 
-def train_and_export(parsed_args: argparse.Namespace) -> None:
-    lgbm_params = {
+def parse_tune_arguments(argv: List[str]) -> argparse.Namespace:
+    """Parse the arguments of the `tune` command.
+
+    Args:
+        argv: The arguments following `tune`.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m personalization tune",
+        description="Search LightGBM parameters with successive halving "
+        "over datasets built once",
+    )
+    add_data_arguments(parser)
+    add_lgbm_arguments(parser, search=True)
+    parser.add_argument(
+        "--n-workers",
+        type=int,
+        help="Parallel trainings, by default one per configuration "
+        "up to the number of CPUs",
+    )
+    parser.add_argument(
+        "--executor",
+        type=str,
+        choices=["process", "thread"],
+        default="process",
+        help="Run the trainings in worker processes or threads",
+    )
+    parser.add_argument(
+        "--total-threads",
+        type=int,
+        help="Threads split between the workers, by default all CPUs",
+    )
+    parser.add_argument(
+        "--min-rounds",
+        type=int,
+        default=10,
+        help="Boosting rounds of the first successive halving rung",
+    )
+    parser.add_argument(
+        "--eta",
+        type=int,
+        default=3,
+        help="Keep the best 1/eta configurations at each rung",
+    )
+    parser.add_argument(
+        "--leaderboard-path",
+        type=str,
+        help="Path to write the leaderboard to as JSON",
+    )
+    parser.set_defaults(command="tune")
+    return parser.parse_args(argv)
+
+
+def parse_cv_arguments(argv: List[str]) -> argparse.Namespace:
+    """Parse the arguments of the `cv` command.
+
+    Args:
+        argv: The arguments following `cv`.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m personalization cv",
+        description="Cross-validate LightGBM parameters on folds of "
+        "whole sessions trained in parallel",
+    )
+    add_data_arguments(parser)
+    add_lgbm_arguments(parser)
+    parser.add_argument(
+        "--n-folds",
+        type=int,
+        default=5,
+        help="Number of folds the sessions are assigned to",
+    )
+    parser.add_argument(
+        "--n-workers",
+        type=int,
+        help="Parallel folds, by default one per fold up to the "
+        "number of CPUs",
+    )
+    parser.add_argument(
+        "--executor",
+        type=str,
+        choices=["process", "thread"],
+        default="thread",
+        help="Train the folds in threads or worker processes",
+    )
+    parser.add_argument(
+        "--total-threads",
+        type=int,
+        help="Threads split between the workers, by default all CPUs",
+    )
+    parser.add_argument(
+        "--early-stopping-rounds",
+        type=int,
+        help="Stop a fold when its val score did not improve for this "
+        "many rounds",
+    )
+    parser.add_argument(
+        "--cutoffs",
+        type=int,
+        nargs="+",
+        help="Values of k of NDCG@k, MAP@k and recall@k, by default "
+        "evaluation.DEFAULT_CUTOFFS",
+    )
+    parser.add_argument(
+        "--metrics-path",
+        type=str,
+        help="Path to write the per-fold and aggregated metrics to as "
+        "JSON",
+    )
+    parser.set_defaults(command="cv")
+    return parser.parse_args(argv)
+
+
+def parse_evaluate_arguments(argv: List[str]) -> argparse.Namespace:
+    """Parse the arguments of the `evaluate` command.
+
+    Args:
+        argv: The arguments following `evaluate`.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m personalization evaluate",
+        description="Compute NDCG, MAP, recall at several cutoffs and "
+        "MRR of a trained model and of the ranking by position",
+    )
+    parser.add_argument(
+        "--model-path",
+        type=str,
+        required=True,
+        help="Model artifact to evaluate",
+    )
+    parser.add_argument(
+        "--sessions-bucket-path",
+        type=str,
+        required=True,
+        help="Path to the sessions file to evaluate on",
+    )
+    parser.add_argument(
+        "--venues-bucket-path",
+        type=str,
+        required=True,
+        help="Path to venues file",
+    )
+    parser.add_argument(
+        "--split",
+        type=str,
+        choices=EVALUATION_SPLITS,
+        help="Evaluate on this split of the session split strategy "
+        "only, e.g. the held-out test split of the training data",
+    )
+    parser.add_argument(
+        "--split-fractions",
+        type=float,
+        nargs=2,
+        default=[0.2, 0.16],
+        help="Fractions of the train and val splits used in training",
+    )
+    parser.add_argument(
+        "--split-seed",
+        type=int,
+        default=0,
+        help="Seed of the session hash used in training",
+    )
+    parser.add_argument(
+        "--compact-dtypes",
+        action="store_true",
+        help="The model was trained with hashed session ids, which "
+        "changes the session split",
+    )
+    parser.add_argument(
+        "--cutoffs",
+        type=int,
+        nargs="+",
+        help="Values of k of NDCG@k, MAP@k and recall@k, by default "
+        "evaluation.DEFAULT_CUTOFFS",
+    )
+    parser.add_argument(
+        "--no-baseline",
+        action="store_true",
+        help="Skip the ranking by position_in_list",
+    )
+    parser.add_argument(
+        "--feature-cache-dir",
+        type=str,
+        default=os.path.join(
+            tempfile.gettempdir(), "personalization_cache", "features"
+        ),
+        help="Directory of the per-window feature statistics the model "
+        "was trained with, read if it uses --window-features",
+    )
+    parser.add_argument(
+        "--feature-window",
+        type=str,
+        help="Name of the window of the sessions, the window features "
+        "use the windows before it; by default the fingerprint of the "
+        "sessions file",
+    )
+    parser.add_argument(
+        "--metrics-path",
+        type=str,
+        help="Path to write the metrics to as JSON",
+    )
+    parser.set_defaults(command="evaluate")
+    return parser.parse_args(argv)
+
+
+def build_pipeline(
+    parsed_args: argparse.Namespace,
+) -> "RankingPipeline":
+    from .feature_engineering import DEFAULT_AGGREGATES
+    from .ranking_pipeline import RankingPipeline
+
+    return RankingPipeline(
+        sessions_bucket_path=parsed_args.sessions_bucket_path,
+        venues_bucket_path=parsed_args.venues_bucket_path,
+        lazy=parsed_args.lazy,
+        split_strategy=parsed_args.split_strategy,
+        split_fractions=parsed_args.split_fractions,
+        split_seed=parsed_args.split_seed,
+        cache_dir=None
+        if parsed_args.no_cache
+        else parsed_args.cache_dir,
+        cache_format=parsed_args.cache_format,
+        rebuild_cache=parsed_args.rebuild_cache,
+        dataset_cache_dir=None
+        if parsed_args.no_cache
+        else parsed_args.dataset_cache_dir,
+        dataset_cache_max_bytes=int(
+            parsed_args.dataset_cache_max_gb * 2**30
+        ),
+        compact_dtypes=parsed_args.compact_dtypes,
+        out_of_core_partitions=parsed_args.out_of_core_partitions,
+        reference_sample_rows=parsed_args.reference_sample_rows,
+        init_model_path=parsed_args.init_model_path,
+        distributed_workers=parsed_args.distributed_workers,
+        tree_learner=parsed_args.tree_learner,
+        checkpoint_dir=parsed_args.checkpoint_dir,
+        prefetch_chunks=parsed_args.prefetch_chunks,
+        feature_aggregates=DEFAULT_AGGREGATES
+        if parsed_args.window_features
+        else None,
+        feature_cache_dir=parsed_args.feature_cache_dir,
+        feature_window=parsed_args.feature_window,
+        profile=parsed_args.profile
+        or bool(parsed_args.profile_json or parsed_args.profile_trace),
+    )
+
+
+def lgbm_params_from_args(
+    parsed_args: argparse.Namespace,
+) -> Dict[str, Any]:
+    return {
         "objective": parsed_args.objective,
         "num_leaves": parsed_args.num_leaves,
         "min_sum_hessian_in_leaf": parsed_args.min_sum_hessian_in_leaf,
@@ -98,19 +588,192 @@ def train_and_export(parsed_args: argparse.Namespace) -> None:
         "force_row_wise": parsed_args.force_row_wise,
         "num_iterations": parsed_args.num_iterations,
     }
-    pipeline = RankingPipeline(
-        sessions_bucket_path=parsed_args.sessions_bucket_path,
-        venues_bucket_path=parsed_args.venues_bucket_path,
-    )
-    
+
+
+def train_and_export(
+    parsed_args: argparse.Namespace,
+) -> "RankingPipeline":
+    lgbm_params = lgbm_params_from_args(parsed_args)
+    pipeline = build_pipeline(parsed_args)
+
     pipeline.prepare_datasets()
-    
+
     pipeline.train(params=lgbm_params)
     pipeline.export_model_artifact(
-        model_path=parsed_args.trained_model_path
+        model_path=parsed_args.trained_model_path,
+        artifact_format=parsed_args.artifact_format,
+        compression=parsed_args.artifact_compression,
     )
+    return pipeline
+
+
+def tune_and_export(
+    parsed_args: argparse.Namespace,
+) -> "RankingPipeline":
+    """Search parameters, print the leaderboard and export the best model."""
+    base_params = lgbm_params_from_args(parsed_args)
+    search_space = {
+        name: base_params.pop(name) for name in TUNABLE_PARAMETERS
+    }
+    pipeline = build_pipeline(parsed_args)
+    leaderboard = pipeline.search(
+        search_space,
+        base_params=base_params,
+        n_workers=parsed_args.n_workers,
+        executor=parsed_args.executor,
+        total_threads=parsed_args.total_threads,
+        min_rounds=parsed_args.min_rounds,
+        max_rounds=parsed_args.num_iterations,
+        eta=parsed_args.eta,
+    )
+    for rank, result in enumerate(leaderboard, start=1):
+        print(
+            f"{rank:>3} {result['metric']}={result['score']:.5f} "
+            f"rounds={result['rounds']} {json.dumps(result['config'])}"
+        )
+    if parsed_args.leaderboard_path:
+        with open(parsed_args.leaderboard_path, "w") as file:
+            json.dump(leaderboard, file, indent=2)
+    if parsed_args.trained_model_path:
+        pipeline.train(
+            params={**base_params, **leaderboard[0]["config"]}
+        )
+        pipeline.export_model_artifact(
+            model_path=parsed_args.trained_model_path,
+            artifact_format=parsed_args.artifact_format,
+            compression=parsed_args.artifact_compression,
+        )
+    return pipeline
+
+
+def cross_validate(
+    parsed_args: argparse.Namespace,
+) -> "RankingPipeline":
+    """Cross-validate the parameters, print and save the metrics."""
+    from .evaluation import DEFAULT_CUTOFFS
+
+    pipeline = build_pipeline(parsed_args)
+    results = pipeline.cross_validate(
+        lgbm_params_from_args(parsed_args),
+        n_folds=parsed_args.n_folds,
+        n_workers=parsed_args.n_workers,
+        executor=parsed_args.executor,
+        total_threads=parsed_args.total_threads,
+        early_stopping_rounds=parsed_args.early_stopping_rounds,
+        cutoffs=parsed_args.cutoffs or DEFAULT_CUTOFFS,
+    )
+    print(f"{'metric':<28}{'mean':>12}{'std':>12}")
+    for name, mean in results["mean"].items():
+        print(f"{name:<28}{mean:>12.5f}{results['std'][name]:>12.5f}")
+    if parsed_args.metrics_path:
+        with open(parsed_args.metrics_path, "w") as file:
+            json.dump(results, file, indent=2)
+    return pipeline
+
+
+def evaluate(
+    parsed_args: argparse.Namespace,
+) -> Dict[str, Dict[str, float]]:
+    """Evaluate a model artifact, print and save its metrics."""
+    from .evaluation import (
+        DEFAULT_CUTOFFS,
+        evaluate_model,
+    )
+    from .feature_engineering import (
+        FeatureCache,
+        window_aggregates,
+    )
+    from .feature_store import VenueFeatureStore
+    from .file_utils import (
+        file_fingerprint,
+        read_table,
+    )
+    from .model_artifact import load_model_from_artifact
+    from .ranking_pipeline import session_split
+    from .schema import hash_session_id
+
+    booster = load_model_from_artifact(parsed_args.model_path)
+    window = parsed_args.feature_window
+    # EXPLAIN: like the training, the window of the sessions defaults
+    # to the fingerprint of their file, whose history excludes itself
+    if window is None and window_aggregates(booster.feature_name()):
+        window = file_fingerprint(parsed_args.sessions_bucket_path)
+    sessions = read_table(parsed_args.sessions_bucket_path)
+    if parsed_args.split:
+        if parsed_args.compact_dtypes:
+            sessions = hash_session_id(sessions)
+        sessions = sessions.filter(
+            session_split(
+                "session_id",
+                tuple(parsed_args.split_fractions),
+                parsed_args.split_seed,
+            )
+            == EVALUATION_SPLITS.index(parsed_args.split)
+        )
+    results = evaluate_model(
+        booster,
+        sessions,
+        VenueFeatureStore.from_path(parsed_args.venues_bucket_path),
+        cutoffs=parsed_args.cutoffs or DEFAULT_CUTOFFS,
+        baseline=not parsed_args.no_baseline,
+        feature_cache=FeatureCache(parsed_args.feature_cache_dir),
+        window=window,
+    )
+    names = list(results["model"])
+    print(
+        f"{'metric':<28}" + "".join(f"{name:>20}" for name in results)
+    )
+    for name in names:
+        print(
+            f"{name:<28}"
+            + "".join(
+                f"{metrics[name]:>20.5f}"
+                for metrics in results.values()
+            )
+        )
+    if parsed_args.metrics_path:
+        with open(parsed_args.metrics_path, "w") as file:
+            json.dump(results, file, indent=2)
+    return results
+
+
+def write_profile(
+    pipeline: "RankingPipeline", parsed_args: argparse.Namespace
+) -> None:
+    """Print and save the per-stage profile as requested."""
+    from .profiling import format_mb
+
+    if parsed_args.profile:
+        for record in pipeline.profile_report:
+            shape = (
+                f" {record['rows']}x{record['columns']}"
+                if "rows" in record
+                else ""
+            )
+            print(
+                f"{record['stage']:<22} wall={record['wall_seconds']:.3f}s "
+                f"cpu={record['cpu_seconds']:.3f}s "
+                f"peak_rss={format_mb(record['peak_rss_mb'])}MB{shape}"
+            )
+    if parsed_args.profile_json:
+        pipeline.profiler.write_json(parsed_args.profile_json)
+    if parsed_args.profile_trace:
+        pipeline.profiler.write_chrome_trace(parsed_args.profile_trace)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parsed_args = parse_arguments(argv)
+    if parsed_args.command == "evaluate":
+        evaluate(parsed_args)
+        return
+    if parsed_args.command == "tune":
+        pipeline = tune_and_export(parsed_args)
+    elif parsed_args.command == "cv":
+        pipeline = cross_validate(parsed_args)
+    else:
+        pipeline = train_and_export(parsed_args)
+    write_profile(pipeline, parsed_args)
 
 
 if __name__ == "__main__":
-    parsed_args = parse_arguments()
-    train_and_export(parsed_args)
+    main()
@@ -4,9 +4,17 @@ from abc import (
 )
 from typing import (
     Any,
+    ContextManager,
+    Dict,
+    List,
     Optional,
 )
 
+from .profiling import (
+    StageProfiler,
+    StageRecord,
+)
+
 
 class BaseMachineLearningPipeline(ABC):
     """
@@ -14,6 +22,8 @@ class BaseMachineLearningPipeline(ABC):
 
     Attributes:
         model: The machine learning model used by the pipeline.
+        profiler: Records the stages wrapped in `profile_stage` when the
+            pipeline is created with `profile=True`.
 
     Methods:
         __init__(): Constructor method for the machine learning pipeline.
@@ -21,12 +31,26 @@ class BaseMachineLearningPipeline(ABC):
         train(): Abstract method that trains the machine learning model.
         model(): Getter method for the machine learning model.
         model(): Setter method for the machine learning model.
+        profile_stage(): measure a stage of the pipeline
+        profile_report(): per-stage measurements
         __del__(): release memory occupied by the pipeline
     """
 
     def __init__(self, **kwargs: Any) -> None:
         """Constructor method for the machine learning pipeline."""
         self._model: Optional[Any] = None
+        self.profiler = StageProfiler(
+            enabled=bool(kwargs.get("profile", False))
+        )
+
+    def profile_stage(self, name: str) -> ContextManager[StageRecord]:
+        """Measure the body of a `with` block as stage `name`."""
+        return self.profiler.stage(name)
+
+    @property
+    def profile_report(self) -> List[Dict[str, Any]]:
+        """Wall time, CPU time, RSS and output shape of every stage."""
+        return self.profiler.report()
 
     @abstractmethod
     def prepare_datasets(self) -> None:
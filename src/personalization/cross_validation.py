@@ -0,0 +1,267 @@
+"""
+Grouped k-fold cross-validation over one binned dataset.
+"""
+import logging
+import os
+import threading
+import time
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
+
+import lightgbm as lgb
+import numpy as np
+
+from .evaluation import (
+    DEFAULT_CUTOFFS,
+    ranking_metrics,
+)
+from .shared_matrix import SharedFeatureMatrix
+from .tuning import (
+    EXECUTORS,
+    make_executor,
+)
+
+# binary of the binned rows, saved next to the shared matrix for
+# process workers
+BINNED_FILE_NAME = "binned.bin"
+# parameters setting the boosting rounds, which are passed separately
+ROUND_PARAMETERS = ("num_iterations", "num_boost_round", "n_estimators")
+
+# binned datasets loaded by the current worker, keyed by their paths
+_worker_datasets = threading.local()
+
+
+def assign_folds(
+    n_groups: int, n_folds: int, seed: int = 0
+) -> np.ndarray:
+    """Assign every group to one of `n_folds` folds at random.
+
+    Folds differ in size by at most one group.
+
+    Args:
+        n_groups: Number of groups, e.g. sessions.
+        n_folds: Number of folds, at least 2.
+        seed: Seed of the assignment.
+
+    Returns:
+        The fold of every group.
+    """
+    if n_folds < 2:
+        raise ValueError("Cross-validation needs at least 2 folds")
+    if n_groups < n_folds:
+        raise ValueError(
+            f"Cannot split {n_groups} groups into {n_folds} folds"
+        )
+    folds = np.arange(n_groups) % n_folds
+    np.random.default_rng(seed).shuffle(folds)
+    return folds
+
+
+def _load_binned(path: str, params: Dict[str, Any]) -> Any:
+    """Load the binary once per worker and reuse it across folds."""
+    cache: Dict[str, Any] = getattr(_worker_datasets, "cache", {})
+    _worker_datasets.cache = cache
+    if path not in cache:
+        cache[path] = lgb.Dataset(path, params=params).construct()
+    return cache[path]
+
+
+def train_fold(
+    binned: Union[Any, str],
+    matrix: SharedFeatureMatrix,
+    folds: np.ndarray,
+    fold: int,
+    params: Dict[str, Any],
+    num_boost_round: int,
+    early_stopping_rounds: Optional[int] = None,
+    cutoffs: Sequence[int] = DEFAULT_CUTOFFS,
+    dataset_params: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Train on all folds but one and evaluate on that one.
+
+    The train and val sets are subsets of the binned rows of all
+    groups, which bins them with the same bin mappers without
+    re-binning; the val scores are predicted from the raw features of
+    the shared matrix.
+
+    Args:
+        binned: Constructed dataset of all rows of `matrix`, or the
+            path of its binary.
+        matrix: The features, labels and groups.
+        folds: Fold of every group, from `assign_folds`.
+        fold: The val fold.
+        params: LightGBM parameters.
+        num_boost_round: Boosting rounds.
+        early_stopping_rounds: Stop when the val score did not improve
+            for this many rounds, by default never.
+        cutoffs: The values of k of the metrics.
+        dataset_params: Parameters to load the binary with.
+
+    Returns:
+        The fold, its sizes, best iteration, wall time and the val
+        metrics of `ranking_metrics`.
+    """
+    if isinstance(binned, str):
+        binned = _load_binned(binned, dict(dataset_params or {}))
+    val_groups = np.flatnonzero(folds == fold)
+    train_groups = np.flatnonzero(folds != fold)
+    val_rows = matrix.group_rows(val_groups)
+    val_sizes = matrix.group_sizes[val_groups]
+    # EXPLAIN: subsets of a dataset loaded from a binary lose its query
+    # boundaries, so the groups are set on every subset
+    train_set = binned.subset(matrix.group_rows(train_groups))
+    train_set.set_group(matrix.group_sizes[train_groups])
+    val_set = binned.subset(val_rows)
+    val_set.set_group(val_sizes)
+    callbacks = []
+    if early_stopping_rounds:
+        callbacks.append(
+            lgb.early_stopping(early_stopping_rounds, verbose=False)
+        )
+    start = time.perf_counter()
+    booster = lgb.train(
+        params=params,
+        train_set=train_set,
+        num_boost_round=num_boost_round,
+        valid_sets=[val_set],
+        valid_names=["val"],
+        verbose_eval=False,
+        callbacks=callbacks,
+    )
+    scores = booster.predict(
+        matrix.matrix[val_rows],
+        num_iteration=booster.best_iteration or None,
+    )
+    seconds = time.perf_counter() - start
+    metrics = ranking_metrics(
+        np.repeat(np.arange(len(val_groups)), val_sizes),
+        scores,
+        matrix.labels[val_rows],
+        cutoffs,
+    )
+    logging.info("Fold %s %s", fold, metrics)
+    return {
+        "fold": fold,
+        "train_sessions": len(train_groups),
+        "val_sessions": len(val_groups),
+        "best_iteration": booster.best_iteration,
+        "seconds": seconds,
+        "metrics": metrics,
+    }
+
+
+def aggregate_folds(
+    fold_results: Sequence[Dict[str, Any]]
+) -> Dict[str, Dict[str, float]]:
+    """Mean and standard deviation of every metric over the folds."""
+    names = list(fold_results[0]["metrics"])
+    values = {
+        name: np.array(
+            [result["metrics"][name] for result in fold_results]
+        )
+        for name in names
+    }
+    return {
+        "mean": {name: float(values[name].mean()) for name in names},
+        "std": {name: float(values[name].std()) for name in names},
+    }
+
+
+def cross_validate(
+    matrix: SharedFeatureMatrix,
+    params: Dict[str, Any],
+    n_folds: int = 5,
+    seed: int = 0,
+    num_boost_round: int = 100,
+    early_stopping_rounds: Optional[int] = None,
+    n_workers: Optional[int] = None,
+    executor: str = "thread",
+    total_threads: Optional[int] = None,
+    dataset_params: Optional[Dict[str, Any]] = None,
+    cutoffs: Sequence[int] = DEFAULT_CUTOFFS,
+) -> Dict[str, Any]:
+    """Grouped k-fold cross-validation of LightGBM parameters.
+
+    Groups are assigned to folds once, and all rows are binned once
+    into a dataset every fold takes its train and val subsets from, so
+    the folds share the bin mappers and none of them re-bins the data.
+    The folds are trained in parallel, each with its share of the
+    threads.
+
+    Args:
+        matrix: The features, labels and groups of all rows.
+        params: LightGBM parameters; the rounds are `num_boost_round`.
+        n_folds: Number of folds.
+        seed: Seed of the fold assignment.
+        num_boost_round: Boosting rounds per fold.
+        early_stopping_rounds: Stop a fold when its val score did not
+            improve for this many rounds, by default never.
+        n_workers: Parallel folds, by default one per fold up to the
+            number of CPUs.
+        executor: "thread" trains the folds on the binned dataset of
+            this process; "process" saves it as a binary next to the
+            matrix, which every worker loads once and attaches to the
+            matrix.
+        total_threads: Thread budget split between the workers'
+            `num_threads`, by default the number of CPUs.
+        dataset_params: LightGBM Dataset parameters, e.g. `max_bin`.
+        cutoffs: The values of k of the metrics.
+
+    Returns:
+        The per-fold results of `train_fold` as "folds", and the "mean"
+        and "std" of every metric over the folds.
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(
+            f"Unknown executor {executor}, expected one of {EXECUTORS}"
+        )
+    folds = assign_folds(matrix.n_groups, n_folds, seed)
+    total_threads = total_threads or os.cpu_count() or 1
+    n_workers = n_workers or min(n_folds, total_threads)
+    params = {
+        **{
+            key: value
+            for key, value in params.items()
+            if key not in ROUND_PARAMETERS
+        },
+        "num_threads": max(1, total_threads // n_workers),
+    }
+    params.setdefault("verbosity", -1)
+    dataset_params = {"verbosity": -1, **(dataset_params or {})}
+    dataset = matrix.dataset(params=dataset_params).construct()
+    binned: Union[Any, str] = dataset
+    if executor == "process":
+        binned = os.path.join(matrix.directory, BINNED_FILE_NAME)
+        dataset.save_binary(binned)
+    logging.info(
+        "Training %s folds on %s workers with %s threads each",
+        n_folds,
+        n_workers,
+        params["num_threads"],
+    )
+    with make_executor(executor, n_workers) as pool:
+        futures = [
+            pool.submit(
+                train_fold,
+                binned,
+                matrix,
+                folds,
+                fold,
+                params,
+                num_boost_round,
+                early_stopping_rounds,
+                cutoffs,
+                dataset_params,
+            )
+            for fold in range(n_folds)
+        ]
+        fold_results: List[Dict[str, Any]] = [
+            future.result() for future in futures
+        ]
+    return {"folds": fold_results, **aggregate_folds(fold_results)}
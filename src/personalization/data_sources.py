@@ -0,0 +1,679 @@
+"""
+Sources of the sessions and venues tables: files or a SQL database.
+"""
+import collections
+import contextlib
+import datetime
+import hashlib
+import io
+import logging
+import os
+import pathlib
+import queue
+import sqlite3
+import threading
+from abc import (
+    ABC,
+    abstractmethod,
+)
+from concurrent.futures import (
+    Future,
+    ThreadPoolExecutor,
+)
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import polars as pl
+import pyarrow as pa
+from polars.type_aliases import PolarsDataType
+
+from .file_utils import (
+    COLUMNAR_FORMATS,
+    file_fingerprint,
+    read_table,
+    scan_table,
+)
+from .schema import (
+    cast_dtypes,
+    csv_parse_dtypes,
+)
+
+# rows fetched per cursor call when the driver has no Arrow interface
+DEFAULT_FETCH_ROWS = 100_000
+# placeholder of a query parameter by DB-API paramstyle
+PLACEHOLDERS = {
+    "qmark": "?",
+    "format": "%s",
+    "pyformat": "%s",
+}
+# bytes fetched per read of a `PrefetchingFileSource`
+DEFAULT_PREFETCH_CHUNK_SIZE = 8 << 20
+DEFAULT_PREFETCH_CHUNKS = 4
+
+Connect = Callable[[], Any]
+Opener = Callable[[str], BinaryIO]
+Bound = Union[int, float, str, datetime.date, datetime.datetime]
+
+
+class DataSource(ABC):
+    """
+    A table the pipeline reads, e.g. the sessions or the venues.
+
+    Sources are read as a whole with `read`, or as a lazy query with
+    `scan`; both read only the requested columns and cast them to the
+    requested dtypes, see `schema.plan_read`.
+    """
+
+    @property
+    @abstractmethod
+    def uri(self) -> str:
+        """Names the source, e.g. in the partitions of a model manifest."""
+
+    @property
+    @abstractmethod
+    def columns(self) -> List[str]:
+        """The columns of the table, in table order."""
+
+    @abstractmethod
+    def fingerprint(self) -> str:
+        """A hex digest that changes whenever the data changes."""
+
+    @abstractmethod
+    def read(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        dtypes: Optional[Mapping[str, PolarsDataType]] = None,
+    ) -> pl.DataFrame:
+        """Read the table, or only `columns` of it."""
+
+    def scan(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        dtypes: Optional[Mapping[str, PolarsDataType]] = None,
+    ) -> pl.LazyFrame:
+        """A lazy query over the table, by default over `read`."""
+        return self.read(columns, dtypes).lazy()
+
+
+class FileSource(DataSource):
+    """
+    A csv, Arrow IPC or Parquet file, read by its extension.
+
+    Parameters
+    ----------
+    path : str
+        The file.
+    """
+
+    def __init__(self, path: str) -> None:
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"File {path} does not exist.")
+        self.path = path
+
+    def __repr__(self) -> str:
+        return f"FileSource({self.path!r})"
+
+    @property
+    def uri(self) -> str:
+        return str(pathlib.Path(self.path).resolve())
+
+    @property
+    def columns(self) -> List[str]:
+        return scan_table(self.path).columns
+
+    def fingerprint(self) -> str:
+        return file_fingerprint(self.path)
+
+    def read(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        dtypes: Optional[Mapping[str, PolarsDataType]] = None,
+    ) -> pl.DataFrame:
+        return read_table(self.path, columns, dtypes)
+
+    def scan(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        dtypes: Optional[Mapping[str, PolarsDataType]] = None,
+    ) -> pl.LazyFrame:
+        return scan_table(self.path, columns, dtypes)
+
+
+def _open_binary(path: str) -> BinaryIO:
+    return open(path, "rb")
+
+
+class PrefetchingFileSource(FileSource):
+    """
+    A file read in byte ranges fetched concurrently ahead of the parser.
+
+    For files on network-mounted storage, where every read waits on a
+    round trip, `read` fetches the file in chunks of `chunk_size` bytes
+    on background threads, each through its own handle, and keeps up to
+    `prefetch_chunks` chunks fetched or in flight ahead of the one being
+    parsed. A csv file is parsed chunk by chunk at line boundaries as
+    the chunks arrive, with the dtypes inferred on the first chunk, so
+    fetching overlaps parsing and at most `prefetch_chunks + 1` raw
+    chunks are held at once; Arrow IPC and Parquet files are parsed
+    once all their chunks have arrived. Csv fields must not contain
+    line breaks. `scan` reads the table, there is no lazy prefetching.
+
+    Parameters
+    ----------
+    path : str
+        The file.
+    chunk_size : int, optional
+        Bytes per fetched range.
+    prefetch_chunks : int, optional
+        Chunks fetched concurrently ahead of the parser.
+    opener : Callable[[str], BinaryIO], optional
+        Opens the file for binary reading, by default `open(path, "rb")`;
+        e.g. a client of the remote store, or a throttled file in tests.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        chunk_size: int = DEFAULT_PREFETCH_CHUNK_SIZE,
+        prefetch_chunks: int = DEFAULT_PREFETCH_CHUNKS,
+        opener: Opener = _open_binary,
+    ) -> None:
+        super().__init__(path)
+        if chunk_size < 1 or prefetch_chunks < 1:
+            raise ValueError(
+                "chunk_size and prefetch_chunks must be positive integers"
+            )
+        self.chunk_size = chunk_size
+        self.prefetch_chunks = prefetch_chunks
+        self.opener = opener
+
+    def __repr__(self) -> str:
+        return (
+            f"PrefetchingFileSource({self.path!r}, "
+            f"chunk_size={self.chunk_size}, "
+            f"prefetch_chunks={self.prefetch_chunks})"
+        )
+
+    def _fetch(self, start: int, size: int) -> bytes:
+        with self.opener(self.path) as file:
+            file.seek(start)
+            return file.read(size)
+
+    def chunks(self) -> Iterator[bytes]:
+        """The bytes of the file in order, fetched ahead of the caller."""
+        file_size = os.path.getsize(self.path)
+        starts = range(0, file_size, self.chunk_size)
+        pending: Deque["Future[bytes]"] = collections.deque()
+        with ThreadPoolExecutor(
+            max_workers=self.prefetch_chunks
+        ) as executor:
+            try:
+                # EXPLAIN: one chunk is being consumed while the window
+                # of `prefetch_chunks` behind it is fetched
+                for start in starts:
+                    pending.append(
+                        executor.submit(
+                            self._fetch,
+                            start,
+                            min(self.chunk_size, file_size - start),
+                        )
+                    )
+                    if len(pending) > self.prefetch_chunks:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _read_csv(
+        self,
+        columns: Optional[Sequence[str]],
+        dtypes: Mapping[str, PolarsDataType],
+    ) -> pl.DataFrame:
+        selected = list(columns) if columns is not None else None
+        parse_dtypes: Dict[str, PolarsDataType] = csv_parse_dtypes(
+            dtypes
+        )
+        header = b""
+        rest = b""
+        frames: List[pl.DataFrame] = []
+        for chunk in self.chunks():
+            data = rest + chunk
+            if not header:
+                end = data.find(b"\n") + 1
+                if not end:
+                    rest = data
+                    continue
+                header, data = data[:end], data[end:]
+            end = data.rfind(b"\n") + 1
+            data, rest = data[:end], data[end:]
+            if not data:
+                continue
+            frame = pl.read_csv(
+                io.BytesIO(header + data),
+                columns=selected,
+                dtypes=parse_dtypes or None,
+            )
+            if not frames:
+                # EXPLAIN: later chunks keep the dtypes inferred on the
+                # first one, as a whole-file read infers them on its
+                # first rows
+                parse_dtypes = dict(frame.schema)
+            frames.append(frame)
+        if rest or not frames:
+            frames.append(
+                pl.read_csv(
+                    io.BytesIO(header + rest),
+                    columns=selected,
+                    dtypes=parse_dtypes or None,
+                )
+            )
+        return pl.concat(frames, rechunk=True)
+
+    def read(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        dtypes: Optional[Mapping[str, PolarsDataType]] = None,
+    ) -> pl.DataFrame:
+        suffix = pathlib.Path(self.path).suffix
+        if suffix == COLUMNAR_FORMATS["ipc"]:
+            frame = pl.read_ipc(
+                io.BytesIO(b"".join(self.chunks())),
+                columns=list(columns) if columns is not None else None,
+            )
+        elif suffix == COLUMNAR_FORMATS["parquet"]:
+            frame = pl.read_parquet(
+                io.BytesIO(b"".join(self.chunks())),
+                columns=list(columns) if columns is not None else None,
+            )
+        else:
+            frame = self._read_csv(columns, dtypes or {})
+        logging.info(
+            "Read %s rows of %s in chunks of %s bytes",
+            frame.height,
+            self.uri,
+            self.chunk_size,
+        )
+        return cast_dtypes(frame, dtypes or {})
+
+    def scan(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        dtypes: Optional[Mapping[str, PolarsDataType]] = None,
+    ) -> pl.LazyFrame:
+        return self.read(columns, dtypes).lazy()
+
+
+def as_source(source: Union[str, DataSource]) -> DataSource:
+    """A `FileSource` of a path, other sources as they are."""
+    if isinstance(source, DataSource):
+        return source
+    return FileSource(source)
+
+
+class ConnectionPool:
+    """
+    At most `size` database connections, reused across threads.
+
+    Connections are opened on first demand by `connect`, which must
+    return connections usable from any thread, e.g. SQLite connections
+    opened with `check_same_thread=False`.
+
+    Parameters
+    ----------
+    connect : Callable[[], Any]
+        Opens a DB-API connection.
+    size : int
+        Maximum number of connections in use at once.
+    """
+
+    def __init__(self, connect: Connect, size: int) -> None:
+        if size < 1:
+            raise ValueError("size must be a positive integer")
+        self.connect = connect
+        self.size = size
+        self.opened = 0
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Borrow a connection, waiting while all `size` are in use."""
+        with self._slots:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self.connect()
+                with self._lock:
+                    self.opened += 1
+            try:
+                yield connection
+            finally:
+                self._idle.put(connection)
+
+    def close(self) -> None:
+        """Close the idle connections."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def sqlite_connect(database_path: str) -> Connect:
+    """`connect` of a `ConnectionPool` over a SQLite file, read-only."""
+    uri = f"{pathlib.Path(database_path).resolve().as_uri()}?mode=ro"
+
+    def connect() -> Any:
+        return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+    return connect
+
+
+def _parse_bound(value: Bound) -> Tuple[Any, Callable[[Any], Bound]]:
+    """A bound as a number or datetime, and the way to format it back."""
+    if isinstance(value, str):
+        try:
+            parsed = datetime.datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(
+                f"Cannot partition by {value!r}, expected numbers, "
+                "dates or ISO formatted date strings"
+            ) from None
+        if len(value) == 10:
+            return parsed, lambda bound: bound.date().isoformat()
+        separator = "T" if "T" in value else " "
+        return parsed, lambda bound: bound.isoformat(sep=separator)
+    if isinstance(value, datetime.datetime):
+        return value, lambda bound: bound
+    if isinstance(value, datetime.date):
+        return (
+            datetime.datetime.combine(value, datetime.time()),
+            lambda bound: bound.date(),
+        )
+    return value, lambda bound: bound
+
+
+def partition_bounds(
+    low: Bound, high: Bound, num_partitions: int
+) -> List[Bound]:
+    """Split the key range [low, high] into up to `num_partitions` ranges.
+
+    Args:
+        low: Smallest key.
+        high: Largest key.
+        num_partitions: Number of ranges.
+
+    Returns:
+        The distinct range edges, from `low` to `high`; range i holds
+        the keys in [edge i, edge i + 1), the last one also `high`.
+    """
+    start, formatted = _parse_bound(low)
+    stop, _ = _parse_bound(high)
+    span = stop - start
+    edges: List[Any] = [start]
+    for index in range(1, num_partitions):
+        if isinstance(start, int):
+            edge = start + span * index // num_partitions
+        else:
+            edge = start + span * index / num_partitions
+        edges.append(edge)
+    edges.append(stop)
+    return list(dict.fromkeys(formatted(edge) for edge in edges))
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _fetch_arrow(cursor: Any, fetch_rows: int) -> Any:
+    """The result of an executed query as a pyarrow Table."""
+    # EXPLAIN: Arrow-native drivers, e.g. ADBC and DuckDB, return
+    # columns directly; other DB-API drivers return row tuples, turned
+    # into columns one batch at a time
+    fetch_arrow_table = getattr(cursor, "fetch_arrow_table", None)
+    if fetch_arrow_table is not None:
+        return fetch_arrow_table()
+    names = [column[0] for column in cursor.description]
+    batches = []
+    while True:
+        rows = cursor.fetchmany(fetch_rows)
+        if not rows:
+            break
+        batches.append(
+            pa.table(
+                [pa.array(values) for values in zip(*rows)], names=names
+            )
+        )
+    if not batches:
+        return pa.table(
+            [pa.array([], pa.null()) for _ in names], names=names
+        )
+    # EXPLAIN: a batch of nulls only has the null type, promoted to
+    # the type of the other batches
+    return pa.concat_tables(batches, promote=True)
+
+
+class SqlSource(DataSource):
+    """
+    A table or query result of a SQL database, read in parallel.
+
+    With a `partition_column`, the rows are split into
+    `num_partitions` ranges of that column, by number or date, and the
+    ranges are queried concurrently on the connections of a
+    `ConnectionPool`. Each result arrives as Arrow columns, taken
+    straight from drivers that produce Arrow, which Polars takes over
+    without going through Python objects. Rows with a null partition key are
+    read with the first range.
+
+    Parameters
+    ----------
+    connect : Callable[[], Any]
+        Opens a DB-API connection, e.g. `sqlite_connect(path)`.
+    table : str, optional
+        The table to read.
+    query : str, optional
+        A query to read instead of a table.
+    partition_column : str, optional
+        Numeric or date column to split the reads by.
+    num_partitions : int, optional
+        Number of ranges of `partition_column`, by default 1.
+    pool_size : int, optional
+        Concurrent connections, by default `num_partitions`.
+    dtypes : Mapping[str, PolarsDataType], optional
+        Dtypes of some of the columns, e.g. Boolean for columns stored
+        as integers; overridden by the dtypes passed to `read`.
+    paramstyle : str, optional
+        The driver's DB-API paramstyle, "qmark" (default), "format" or
+        "pyformat".
+    fetch_rows : int, optional
+        Rows fetched per cursor call.
+    """
+
+    def __init__(
+        self,
+        connect: Connect,
+        table: Optional[str] = None,
+        query: Optional[str] = None,
+        partition_column: Optional[str] = None,
+        num_partitions: int = 1,
+        pool_size: Optional[int] = None,
+        dtypes: Optional[Mapping[str, PolarsDataType]] = None,
+        paramstyle: str = "qmark",
+        fetch_rows: int = DEFAULT_FETCH_ROWS,
+    ) -> None:
+        if (table is None) == (query is None):
+            raise ValueError("Pass either a table or a query")
+        if num_partitions < 1:
+            raise ValueError(
+                "num_partitions must be a positive integer"
+            )
+        if num_partitions > 1 and partition_column is None:
+            raise ValueError("num_partitions needs a partition_column")
+        if paramstyle not in PLACEHOLDERS:
+            raise ValueError(
+                f"Unsupported paramstyle {paramstyle}, "
+                f"expected one of {sorted(PLACEHOLDERS)}"
+            )
+        self.query = query or f"SELECT * FROM {_quote(str(table))}"
+        self.partition_column = partition_column
+        self.num_partitions = num_partitions
+        self.dtypes: Dict[str, PolarsDataType] = dict(dtypes or {})
+        self.placeholder = PLACEHOLDERS[paramstyle]
+        self.fetch_rows = fetch_rows
+        self.pool = ConnectionPool(connect, pool_size or num_partitions)
+        self._columns: Optional[List[str]] = None
+        self._range: Optional[
+            Tuple[int, Optional[Bound], Optional[Bound]]
+        ] = None
+
+    def __repr__(self) -> str:
+        return f"SqlSource({self.query!r})"
+
+    @property
+    def uri(self) -> str:
+        return f"sql:{self.query}"
+
+    def _execute(
+        self, sql: str, params: Sequence[Any] = ()
+    ) -> Tuple[Any, List[Any]]:
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(sql, tuple(params))
+                return cursor.description, cursor.fetchall()
+            finally:
+                cursor.close()
+
+    @property
+    def columns(self) -> List[str]:
+        if self._columns is None:
+            description, _ = self._execute(
+                f"SELECT * FROM ({self.query}) AS source WHERE 1 = 0"
+            )
+            self._columns = [column[0] for column in description]
+        return self._columns
+
+    def _key_range(
+        self,
+    ) -> Tuple[int, Optional[Bound], Optional[Bound]]:
+        """Row count and smallest and largest partition key.
+
+        Queried once per source and shared by `fingerprint` and
+        `partition_predicates`, so the fingerprint always describes the
+        ranges that are read.
+        """
+        if self._range is None:
+            if self.partition_column is None:
+                _, rows = self._execute(
+                    f"SELECT COUNT(*) FROM ({self.query}) AS source"
+                )
+                self._range = int(rows[0][0]), None, None
+            else:
+                key = _quote(self.partition_column)
+                _, rows = self._execute(
+                    f"SELECT COUNT(*), MIN({key}), MAX({key}) "
+                    f"FROM ({self.query}) AS source"
+                )
+                count, low, high = rows[0]
+                self._range = int(count), low, high
+        return self._range
+
+    def fingerprint(self) -> str:
+        """Digest of the query, row count and partition key range.
+
+        The database is not hashed, so rows updated in place without a
+        change in count or key range keep the fingerprint. The count and
+        range are taken once per source, a new `SqlSource` sees rows
+        written since.
+        """
+        key = "|".join(
+            str(value) for value in (self.uri,) + self._key_range()
+        )
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def partition_predicates(
+        self,
+    ) -> List[Tuple[str, List[Any]]]:
+        """The WHERE clause and parameters of each partition read."""
+        if self.partition_column is None:
+            return [("1 = 1", [])]
+        _, low, high = self._key_range()
+        if low is None or high is None:
+            return [("1 = 1", [])]
+        key = _quote(self.partition_column)
+        edges = partition_bounds(low, high, self.num_partitions)
+        if len(edges) == 1:
+            return [("1 = 1", [])]
+        marker = self.placeholder
+        predicates = []
+        for index, (lower, upper) in enumerate(zip(edges, edges[1:])):
+            last = index == len(edges) - 2
+            clause = (
+                f"{key} >= {marker} AND {key} "
+                f"{'<=' if last else '<'} {marker}"
+            )
+            if index == 0:
+                clause = f"({clause}) OR {key} IS NULL"
+            predicates.append((clause, [lower, upper]))
+        return predicates
+
+    def _read_partition(
+        self, select: str, predicate: str, params: Sequence[Any]
+    ) -> Any:
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(
+                    f"SELECT {select} FROM ({self.query}) AS source "
+                    f"WHERE {predicate}",
+                    tuple(params),
+                )
+                return _fetch_arrow(cursor, self.fetch_rows)
+            finally:
+                cursor.close()
+
+    def read(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        dtypes: Optional[Mapping[str, PolarsDataType]] = None,
+    ) -> pl.DataFrame:
+        select = (
+            ", ".join(_quote(column) for column in columns)
+            if columns is not None
+            else "*"
+        )
+        predicates = self.partition_predicates()
+        with ThreadPoolExecutor(
+            max_workers=min(self.pool.size, len(predicates))
+        ) as executor:
+            tables = list(
+                executor.map(
+                    lambda predicate: self._read_partition(
+                        select, *predicate
+                    ),
+                    predicates,
+                )
+            )
+        logging.info(
+            "Read %s rows of %s in %s partitions",
+            sum(table.num_rows for table in tables),
+            self.uri,
+            len(tables),
+        )
+        frame = pl.DataFrame(pa.concat_tables(tables, promote=True))
+        return cast_dtypes(frame, {**self.dtypes, **(dtypes or {})})
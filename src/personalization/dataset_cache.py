@@ -0,0 +1,165 @@
+"""
+Content-addressed cache of constructed LightGBM binary datasets.
+"""
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import shutil
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+TRAIN_FILE_NAME = "train_set.binary"
+VAL_FILE_NAME = "val_set.binary"
+# bins of the train set, saved with the model artifacts it trains
+BINS_FILE_NAME = "bins.bin"
+STAGING_SUFFIX = ".staging"
+
+
+def cache_key(**parts: Any) -> str:
+    """Hash everything that determines the content of the datasets.
+
+    Args:
+        **parts: JSON-serializable values, e.g. input fingerprints,
+            the feature list, the split seed and the dataset params.
+
+    Returns:
+        A hex digest identifying a cache entry.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class DatasetCache:
+    """
+    Directory of train/val binary datasets keyed by `cache_key`.
+
+    Every entry is a sub-directory holding the train and val binaries,
+    and the bins of the train set as `BINS_FILE_NAME` next to them.
+    A hit refreshes the entry mtime, and committing a new entry evicts
+    the least recently used ones until the cache fits `max_bytes`.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory holding the entries.
+    max_bytes : int, optional
+        Disk budget of the cache, unlimited if None.
+    """
+
+    def __init__(
+        self, cache_dir: str, max_bytes: Optional[int] = None
+    ) -> None:
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    def _entry_dir(self, key: str) -> pathlib.Path:
+        return self.cache_dir / key
+
+    def paths(self, key: str) -> Tuple[str, str]:
+        """Paths of the train and val binaries of a committed entry."""
+        entry_dir = self._entry_dir(key)
+        return (
+            str(entry_dir / TRAIN_FILE_NAME),
+            str(entry_dir / VAL_FILE_NAME),
+        )
+
+    def staging_paths(self, key: str) -> Tuple[str, str]:
+        """Paths to save new binaries to before `commit`."""
+        staging_dir = self.cache_dir / f"{key}{STAGING_SUFFIX}"
+        staging_dir.mkdir(parents=True, exist_ok=True)
+        return (
+            str(staging_dir / TRAIN_FILE_NAME),
+            str(staging_dir / VAL_FILE_NAME),
+        )
+
+    def lookup(self, key: str) -> Optional[Tuple[str, str]]:
+        """Return the binaries of an entry and mark it as recently used.
+
+        Args:
+            key: The entry key.
+
+        Returns:
+            The train and val paths, or None on a miss.
+        """
+        train_path, val_path = self.paths(key)
+        if not (
+            os.path.isfile(train_path) and os.path.isfile(val_path)
+        ):
+            return None
+        os.utime(self._entry_dir(key))
+        logging.info("Dataset cache hit for %s", key)
+        return train_path, val_path
+
+    def commit(self, key: str) -> Tuple[str, str]:
+        """Publish the staged binaries of `key` and enforce the budget.
+
+        Args:
+            key: The entry key passed to `staging_paths`.
+
+        Returns:
+            The train and val paths of the committed entry.
+        """
+        staging_dir = self.cache_dir / f"{key}{STAGING_SUFFIX}"
+        entry_dir = self._entry_dir(key)
+        if entry_dir.exists():
+            shutil.rmtree(entry_dir)
+        os.replace(staging_dir, entry_dir)
+        self.evict(keep=key)
+        return self.paths(key)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """List committed entries with their size and last use time."""
+        if not self.cache_dir.is_dir():
+            return []
+        entries = []
+        for entry_dir in self.cache_dir.iterdir():
+            if not entry_dir.is_dir() or entry_dir.name.endswith(
+                STAGING_SUFFIX
+            ):
+                continue
+            entries.append(
+                {
+                    "key": entry_dir.name,
+                    "bytes": sum(
+                        path.stat().st_size
+                        for path in entry_dir.iterdir()
+                        if path.is_file()
+                    ),
+                    "last_used": entry_dir.stat().st_mtime,
+                }
+            )
+        return entries
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """Remove least recently used entries until the budget is met.
+
+        Args:
+            keep: An entry never to evict, e.g. the one just committed.
+
+        Returns:
+            The keys of the evicted entries.
+        """
+        if self.max_bytes is None:
+            return []
+        entries = sorted(self.entries(), key=lambda e: e["last_used"])
+        total_bytes = sum(entry["bytes"] for entry in entries)
+        evicted = []
+        for entry in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            if entry["key"] == keep:
+                continue
+            logging.info(
+                "Evicting dataset cache entry %s", entry["key"]
+            )
+            shutil.rmtree(self._entry_dir(entry["key"]))
+            total_bytes -= entry["bytes"]
+            evicted.append(entry["key"])
+        return evicted
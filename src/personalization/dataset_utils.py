@@ -0,0 +1,219 @@
+"""
+Helpers to build LightGBM datasets straight from Polars frames.
+"""
+import numbers
+from typing import (
+    Any,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
+
+import lightgbm as lgb
+import numpy as np
+import polars as pl
+
+# rows pushed to LightGBM per batch when building a Dataset in chunks
+DEFAULT_CHUNK_SIZE = 100_000
+# LightGBM's default `bin_construct_sample_cnt`
+DEFAULT_BIN_SAMPLE_ROWS = 200_000
+
+
+def to_float32_matrix(
+    frame: pl.DataFrame, columns: Sequence[str]
+) -> np.ndarray:
+    """Copy `columns` of a frame into one C-contiguous float32 matrix.
+
+    LightGBM reads row-major float32/float64 buffers without converting
+    them, so this is the only copy made between Polars and LightGBM.
+    Nulls become NaN, which LightGBM treats as missing.
+
+    Args:
+        frame: The frame to read the columns from.
+        columns: The columns to copy, in the order of the matrix.
+
+    Returns:
+        A (frame.height, len(columns)) float32 matrix.
+    """
+    matrix = np.empty((frame.height, len(columns)), dtype=np.float32)
+    for position, column in enumerate(columns):
+        matrix[:, position] = (
+            frame.get_column(column).cast(pl.Float32).to_numpy()
+        )
+    return matrix
+
+
+def to_float32_vector(frame: pl.DataFrame, column: str) -> np.ndarray:
+    """Read one column of a frame as a float32 vector.
+
+    Args:
+        frame: The frame to read the column from.
+        column: The column to read.
+
+    Returns:
+        A float32 vector of length frame.height.
+    """
+    return np.ascontiguousarray(
+        frame.get_column(column).cast(pl.Float32).to_numpy()
+    )
+
+
+def group_sizes(frame: pl.DataFrame, group_column: str) -> np.ndarray:
+    """Sizes of the consecutive runs of `group_column` in a sorted frame.
+
+    This is the `group` array LightGBM expects for a frame sorted by
+    its query column, computed by run-length encoding the column
+    instead of a second hash aggregation and sort.
+
+    Args:
+        frame: Frame sorted (or at least grouped) by `group_column`.
+        group_column: Name of the query column.
+
+    Returns:
+        Number of rows in each group, in the order of the frame.
+    """
+    if frame.is_empty():
+        return np.zeros(0, dtype=np.int32)
+    group = pl.col(group_column)
+    run_starts = (
+        frame.select(
+            (group != group.shift(1)).fill_null(True).arg_true()
+        )
+        .to_series()
+        .to_numpy()
+        .astype(np.int64)
+    )
+    return np.diff(run_starts, append=frame.height).astype(np.int32)
+
+
+class PolarsSequence(lgb.Sequence):  # type: ignore[no-any-unimported]
+    """Row access to a Polars frame for LightGBM's chunked construction.
+
+    LightGBM samples single rows to find bin boundaries and then pulls
+    `batch_size` rows at a time, so only one batch is ever held as a
+    float32 matrix.
+    """
+
+    def __init__(
+        self,
+        frame: pl.DataFrame,
+        columns: Sequence[str],
+        batch_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> None:
+        self.frame = frame.select(list(columns))
+        self.columns = list(columns)
+        self.batch_size = batch_size
+
+    def __len__(self) -> int:
+        return int(self.frame.height)
+
+    def __getitem__(
+        self, idx: Union[int, slice, List[int]]
+    ) -> np.ndarray:
+        if isinstance(idx, numbers.Integral):
+            # EXPLAIN: LightGBM requires the sampled rows to be float64,
+            # rounding through float32 keeps the bins of the batches
+            row = np.array(self.frame.row(int(idx)), dtype=np.float32)
+            return row.astype(np.float64)
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if step != 1:
+                raise ValueError(
+                    "PolarsSequence slices must be contiguous"
+                )
+            return to_float32_matrix(
+                self.frame.slice(start, stop - start), self.columns
+            )
+        if isinstance(idx, list):
+            return to_float32_matrix(self.frame[idx], self.columns)
+        raise TypeError(
+            "Sequence index must be integer, slice or list, "
+            f"got {type(idx).__name__}"
+        )
+
+
+def build_bin_reference(
+    frame: pl.DataFrame,
+    features: Sequence[str],
+    params: Optional[dict] = None,
+    sample_rows: Optional[int] = None,
+    seed: int = 0,
+) -> Any:
+    """Build a Dataset holding the bins of a sample of `frame`.
+
+    LightGBM finds the bin boundaries on a sample of
+    `bin_construct_sample_cnt` rows anyway; sampling them here instead
+    gives a small Dataset that can be saved and reused as the
+    `reference` of later datasets, so they are binned the same way.
+
+    Args:
+        frame: The rows to sample.
+        features: The feature columns, in model order.
+        params: Dataset parameters, e.g. `max_bin`.
+        sample_rows: Rows to sample, by default the
+            `bin_construct_sample_cnt` of `params`.
+        seed: Seed of the row sample.
+
+    Returns:
+        The constructed reference lgb.Dataset, without a label.
+    """
+    if sample_rows is None:
+        sample_rows = int(
+            (params or {}).get(
+                "bin_construct_sample_cnt", DEFAULT_BIN_SAMPLE_ROWS
+            )
+        )
+    if frame.height > sample_rows:
+        frame = frame.sample(n=sample_rows, seed=seed)
+    return lgb.Dataset(
+        to_float32_matrix(frame, features),
+        feature_name=list(features),
+        params=params,
+        free_raw_data=True,
+    ).construct()
+
+
+def build_lgb_dataset(
+    frame: pl.DataFrame,
+    features: Sequence[str],
+    label_column: str,
+    group: Optional[np.ndarray] = None,
+    reference: Optional[Any] = None,
+    chunk_size: Optional[int] = None,
+    params: Optional[dict] = None,
+    construct: bool = True,
+) -> Any:
+    """Build and construct a LightGBM Dataset from a Polars frame.
+
+    Args:
+        frame: The frame holding the features and the label.
+        features: The feature columns, in model order.
+        label_column: The label column.
+        group: Sizes of the query groups, in frame order.
+        reference: Dataset whose bin mappers are reused.
+        chunk_size: If given, push the features to LightGBM in batches
+            of this many rows instead of materializing the full matrix.
+        params: Dataset parameters.
+        construct: If False, return the Dataset unconstructed, holding
+            the float32 matrix until LightGBM bins it, e.g. so that
+            `lgb.train` can compute the scores of an `init_model` on it.
+
+    Returns:
+        The lgb.Dataset, constructed unless `construct` is False.
+    """
+    data: Any
+    if chunk_size and construct:
+        data = PolarsSequence(frame, features, batch_size=chunk_size)
+    else:
+        data = to_float32_matrix(frame, features)
+    dataset = lgb.Dataset(
+        data,
+        label=to_float32_vector(frame, label_column),
+        group=group,
+        reference=reference,
+        feature_name=list(features),
+        params=params,
+        free_raw_data=True,
+    )
+    return dataset.construct() if construct else dataset
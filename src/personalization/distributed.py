@@ -0,0 +1,247 @@
+"""
+Data-parallel LightGBM training across worker processes or hosts.
+"""
+import logging
+import multiprocessing
+import os
+import socket
+import tempfile
+import time
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import lightgbm as lgb
+
+from .dataset_utils import (
+    build_lgb_dataset,
+    group_sizes,
+)
+from .out_of_core import read_partition
+
+# LightGBM's parallel learners that shard rows across machines
+TREE_LEARNERS = ("data", "voting")
+LOCALHOST = "127.0.0.1"
+# minutes LightGBM waits for the other machines before failing
+NETWORK_TIME_OUT = 10
+# seconds between checks of the worker processes
+POLL_INTERVAL = 0.1
+
+Machine = Tuple[str, int]
+
+
+def find_free_ports(n_ports: int, host: str = LOCALHOST) -> List[int]:
+    """Ports of `host` free right now, for the local workers to listen on.
+
+    All sockets are bound before any is closed, so the ports are
+    distinct; another process may still take one before LightGBM binds
+    it, in which case training fails and can be retried.
+    """
+    sockets = []
+    try:
+        for _ in range(n_ports):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind((host, 0))
+            sockets.append(sock)
+        return [sock.getsockname()[1] for sock in sockets]
+    finally:
+        for sock in sockets:
+            sock.close()
+
+
+def local_machines(n_workers: int) -> List[Machine]:
+    """A machine list of `n_workers` workers on free localhost ports."""
+    return [(LOCALHOST, port) for port in find_free_ports(n_workers)]
+
+
+def network_params(
+    machines: Sequence[Machine],
+    rank: int,
+    tree_learner: str = "data",
+) -> Dict[str, Any]:
+    """LightGBM parameters of the worker `rank` of `machines`.
+
+    Args:
+        machines: Host and listen port of every worker, in rank order;
+            the same list is passed to every worker.
+        rank: Index of this worker in `machines`.
+        tree_learner: "data" or "voting" parallel learning.
+
+    Returns:
+        The network parameters to add to the training parameters.
+    """
+    if tree_learner not in TREE_LEARNERS:
+        raise ValueError(
+            f"Unknown tree learner {tree_learner}, "
+            f"expected one of {TREE_LEARNERS}"
+        )
+    if not 0 <= rank < len(machines):
+        raise ValueError(
+            f"Rank {rank} is not in a list of {len(machines)} machines"
+        )
+    return {
+        "tree_learner": tree_learner,
+        "num_machines": len(machines),
+        "machines": ",".join(
+            f"{host}:{port}" for host, port in machines
+        ),
+        "local_listen_port": machines[rank][1],
+        "time_out": NETWORK_TIME_OUT,
+        # EXPLAIN: every worker holds its own sessions, LightGBM must not
+        # shard the rows again
+        "pre_partition": True,
+    }
+
+
+def train_worker(
+    rank: int,
+    machines: Sequence[Machine],
+    shard_path: str,
+    features: Sequence[str],
+    label_column: str,
+    group_column: str,
+    params: Dict[str, Any],
+    tree_learner: str = "data",
+    model_path: Optional[str] = None,
+) -> Any:
+    """Train on one shard as one worker of a distributed training.
+
+    This is what runs on every host of a multi-host training: each host
+    calls it with the same `machines` list, its own rank and its shard
+    of whole sessions. The workers find common bins and grow the same
+    trees, so every worker ends up with the full model.
+
+    Args:
+        rank: Index of this worker in `machines`.
+        machines: Host and listen port of every worker, in rank order.
+        shard_path: Arrow IPC file of this worker's rows, sorted by
+            session, e.g. a partition of `out_of_core.write_partitions`.
+        features: The feature columns, in model order.
+        label_column: The label column.
+        group_column: The session column.
+        params: LightGBM training parameters.
+        tree_learner: "data" or "voting" parallel learning.
+        model_path: If given, the file to save the model to.
+
+    Returns:
+        The trained booster.
+    """
+    params = {**params, **network_params(machines, rank, tree_learner)}
+    shard = read_partition(shard_path)
+    # EXPLAIN: constructed by lgb.train once the network is up, so that
+    # the workers agree on the bins of all shards
+    train_set = build_lgb_dataset(
+        shard,
+        features,
+        label_column,
+        group=group_sizes(shard, group_column),
+        params=params,
+        construct=False,
+    )
+    del shard
+    booster = lgb.train(params, train_set)
+    if model_path:
+        booster.save_model(model_path)
+    return booster
+
+
+def train_distributed(
+    shard_paths: Sequence[str],
+    features: Sequence[str],
+    label_column: str,
+    group_column: str,
+    params: Dict[str, Any],
+    tree_learner: str = "data",
+    total_threads: Optional[int] = None,
+) -> Any:
+    """Train one model with one local worker process per shard.
+
+    The workers talk over localhost sockets exactly like workers on
+    separate hosts would, see `train_worker`. If a worker fails, the
+    others are terminated instead of waiting for it until the network
+    time-out.
+
+    Args:
+        shard_paths: Arrow IPC files of whole sessions, one per worker.
+        features: The feature columns, in model order.
+        label_column: The label column.
+        group_column: The session column.
+        params: LightGBM training parameters.
+        tree_learner: "data" or "voting" parallel learning.
+        total_threads: Thread budget split between the workers, by
+            default all CPUs.
+
+    Returns:
+        The trained booster.
+    """
+    if not shard_paths:
+        raise ValueError("No shards to train on")
+    n_workers = len(shard_paths)
+    total_threads = total_threads or os.cpu_count() or 1
+    params = {
+        "num_threads": max(1, total_threads // n_workers),
+        **params,
+    }
+    machines = local_machines(n_workers)
+    # EXPLAIN: forking a process that already ran OpenMP threads can
+    # deadlock, so workers are spawned
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="distributed_") as work_dir:
+        model_path = os.path.join(work_dir, "model.txt")
+        workers = [
+            context.Process(
+                target=train_worker,
+                args=(
+                    rank,
+                    machines,
+                    shard_path,
+                    list(features),
+                    label_column,
+                    group_column,
+                    params,
+                    tree_learner,
+                    # EXPLAIN: every worker holds the same model
+                    model_path if rank == 0 else None,
+                ),
+            )
+            for rank, shard_path in enumerate(shard_paths)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            while any(worker.is_alive() for worker in workers):
+                failed = [
+                    rank
+                    for rank, worker in enumerate(workers)
+                    if worker.exitcode not in (None, 0)
+                ]
+                if failed:
+                    raise RuntimeError(
+                        f"Distributed training workers {failed} failed"
+                    )
+                time.sleep(POLL_INTERVAL)
+            failed = [
+                rank
+                for rank, worker in enumerate(workers)
+                if worker.exitcode != 0
+            ]
+            if failed:
+                raise RuntimeError(
+                    f"Distributed training workers {failed} failed"
+                )
+        finally:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+                worker.join()
+        logging.info(
+            "Trained on %s workers with the %s parallel learner",
+            n_workers,
+            tree_learner,
+        )
+        return lgb.Booster(model_file=model_path)
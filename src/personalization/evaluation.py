@@ -0,0 +1,305 @@
+"""
+Offline ranking metrics computed group-wise over all sessions at once.
+"""
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Optional,
+    Sequence,
+    Union,
+)
+
+import numpy as np
+import polars as pl
+
+from .dataset_utils import (
+    to_float32_matrix,
+    to_float32_vector,
+)
+from .feature_engineering import (
+    DEFAULT_AGGREGATES,
+    FeatureCache,
+    WindowAggregate,
+    join_history_features,
+    window_aggregates,
+)
+from .feature_store import VenueFeatureStore
+
+DEFAULT_CUTOFFS = (1, 5, 10, 20, 40)
+GROUP_COLUMN = "session_id"
+LABEL_COLUMN = "has_seen_venue_in_this_session"
+POSITION_COLUMN = "position_in_list"
+# name of the ranking by the position the venue was shown at
+POSITION_BASELINE = "position_baseline"
+
+
+def group_codes(frame: pl.DataFrame, group_column: str) -> np.ndarray:
+    """Number the groups of a frame 0, 1, ..., in no particular order.
+
+    String ids are numbered by a categorical cast, a single hash pass,
+    instead of sorting the strings.
+
+    Args:
+        frame: Rows of any number of groups, in any order.
+        group_column: The query column, e.g. `session_id`.
+
+    Returns:
+        One int64 code per row.
+    """
+    group = frame.get_column(group_column)
+    if group.dtype == pl.Utf8:
+        return (
+            group.cast(pl.Categorical)
+            .to_physical()
+            .to_numpy()
+            .astype(np.int64)
+        )
+    return group.rank(method="dense").to_numpy().astype(np.int64) - 1
+
+
+def sort_within_groups(
+    groups: np.ndarray, keys: np.ndarray
+) -> np.ndarray:
+    """Order sorting rows by group and descending key, ties by row."""
+    frame = pl.DataFrame({"group": groups, "key": keys}).with_row_count(
+        "row"
+    )
+    order: np.ndarray = (
+        frame.select(
+            pl.arg_sort_by(
+                ["group", "key", "row"], descending=[False, True, False]
+            )
+        )
+        .to_series()
+        .to_numpy()
+    )
+    return order
+
+
+def ranking_metrics(
+    groups: np.ndarray,
+    scores: np.ndarray,
+    labels: np.ndarray,
+    cutoffs: Sequence[int] = DEFAULT_CUTOFFS,
+) -> Dict[str, float]:
+    """Mean NDCG@k, MAP@k, recall@k and MRR over groups.
+
+    Rows are sorted by group and descending score, and once more by
+    descending label for the ideal ranking. Every metric is
+    then a sum over the top k rows of each group of a per-row term, read
+    off the cumulative sum of that term at the group boundaries, so each
+    extra cutoff costs one gather per group. Ties keep the input order.
+
+    NDCG uses the gain `2**label - 1` of LightGBM's `lambdarank`; the
+    other metrics count rows with a positive label as relevant. Groups
+    without a relevant row are left out of every mean, whereas LightGBM
+    scores them an NDCG of 1.
+
+    Args:
+        groups: Integer group of every row, e.g. from `group_codes`.
+        scores: Model scores, higher is ranked first.
+        labels: Relevance labels.
+        cutoffs: The values of k.
+
+    Returns:
+        The metrics by name, e.g. "ndcg@10" and "mrr", plus the number
+        of evaluated `sessions` and `sessions_without_relevant`.
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    labels = np.asarray(labels, dtype=np.float64)
+    order = sort_within_groups(groups, np.asarray(scores, np.float64))
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(
+        np.diff(sorted_groups, prepend=sorted_groups[:1] - 1)
+    )
+    ends = np.append(starts[1:], len(groups))[: len(starts)]
+    ranks = np.arange(len(groups)) - np.repeat(starts, ends - starts)
+    discounts = 1.0 / np.log2(ranks + 2.0)
+
+    ranked_labels = labels[order]
+    # EXPLAIN: the rows are grouped already, sorting them again by label
+    # keeps the group boundaries and is much cheaper than the first sort
+    ideal_labels = ranked_labels[
+        sort_within_groups(
+            np.repeat(np.arange(len(starts)), ends - starts),
+            ranked_labels,
+        )
+    ]
+    relevant = ranked_labels > 0
+    hits = np.cumsum(relevant)
+    # EXPLAIN: relevant rows at or above each row within its group
+    hits -= np.repeat(hits[starts] - relevant[starts], ends - starts)
+
+    def top_k_sums(values: np.ndarray) -> Callable[[float], np.ndarray]:
+        totals = np.concatenate([[0.0], np.cumsum(values)])
+
+        def top_k(k: float) -> np.ndarray:
+            stops = np.minimum(starts + k, ends).astype(np.int64)
+            sums: np.ndarray = totals[stops] - totals[starts]
+            return sums
+
+        return top_k
+
+    dcg = top_k_sums((np.exp2(ranked_labels) - 1.0) * discounts)
+    idcg = top_k_sums((np.exp2(ideal_labels) - 1.0) * discounts)
+    precision_sum = top_k_sums(
+        np.where(relevant, hits / (ranks + 1.0), 0.0)
+    )
+    hits_sum = top_k_sums(relevant)
+    n_relevant = hits_sum(np.inf)
+    valid = n_relevant > 0
+    n_valid = int(valid.sum())
+
+    def mean(values: np.ndarray) -> float:
+        return float(values[valid].mean()) if n_valid else float("nan")
+
+    first_hit = top_k_sums(
+        np.where(relevant & (hits == 1), 1.0 / (ranks + 1.0), 0.0)
+    )
+    metrics: Dict[str, float] = {
+        "sessions": float(n_valid),
+        "sessions_without_relevant": float(len(starts) - n_valid),
+        "mrr": mean(first_hit(np.inf)),
+    }
+    for k in cutoffs:
+        metrics[f"ndcg@{k}"] = mean(
+            dcg(k) / np.where(valid, idcg(k), 1.0)
+        )
+        metrics[f"map@{k}"] = mean(
+            precision_sum(k)
+            / np.maximum(np.minimum(n_relevant, k), 1.0)
+        )
+        metrics[f"recall@{k}"] = mean(
+            hits_sum(k) / np.maximum(n_relevant, 1.0)
+        )
+    return metrics
+
+
+def evaluate_scores(
+    frame: pl.DataFrame,
+    scores: Union[np.ndarray, str],
+    group_column: str = GROUP_COLUMN,
+    label_column: str = LABEL_COLUMN,
+    cutoffs: Sequence[int] = DEFAULT_CUTOFFS,
+) -> Dict[str, float]:
+    """Evaluate the ranking given by scores of the rows of a frame.
+
+    Args:
+        frame: Rows with a group and a label column.
+        scores: One score per row, or the name of a column holding them.
+        group_column: The query column.
+        label_column: The relevance label column.
+        cutoffs: The values of k.
+
+    Returns:
+        The metrics of `ranking_metrics`.
+    """
+    if isinstance(scores, str):
+        scores = to_float32_vector(frame, scores)
+    return ranking_metrics(
+        group_codes(frame, group_column),
+        scores,
+        to_float32_vector(frame, label_column),
+        cutoffs,
+    )
+
+
+def position_baseline_scores(
+    frame: pl.DataFrame, position_column: str = POSITION_COLUMN
+) -> np.ndarray:
+    """Scores ranking the rows in the order they were shown in."""
+    return -to_float32_vector(frame, position_column)
+
+
+def evaluate_model(
+    booster: Any,
+    sessions: pl.DataFrame,
+    venues: Union[pl.DataFrame, VenueFeatureStore],
+    cutoffs: Sequence[int] = DEFAULT_CUTOFFS,
+    group_column: str = GROUP_COLUMN,
+    label_column: str = LABEL_COLUMN,
+    baseline: bool = True,
+    batch_size: Optional[int] = None,
+    feature_cache: Optional[FeatureCache] = None,
+    window: Optional[str] = None,
+    aggregates: Sequence[WindowAggregate] = DEFAULT_AGGREGATES,
+) -> Dict[str, Dict[str, float]]:
+    """Evaluate a model, and the position baseline, on sessions.
+
+    The sessions are enriched with the venue features by a
+    `VenueFeatureStore` and scored in one `predict` call, or in batches
+    of `batch_size` rows. Like the training data, rows of unknown venues
+    and rows with a null in any session or venue column are dropped.
+    The window features among the model features are added from the
+    `FeatureCache` the model was trained with, without caching the
+    sessions.
+
+    Args:
+        booster: Trained model, its feature names define the features.
+        sessions: Impressions with the columns of `sessions.csv`.
+        venues: Venue features, or a store of them.
+        cutoffs: The values of k.
+        group_column: The query column.
+        label_column: The relevance label column.
+        baseline: Also evaluate the ranking by `position_in_list`.
+        batch_size: Rows scored per `predict` call, by default all.
+        feature_cache: The window statistics of the training, needed by
+            models with window features.
+        window: Name of the window of `sessions`, the features use the
+            windows before it; by default every cached window.
+        aggregates: The window features the model may use.
+
+    Returns:
+        The metrics of `ranking_metrics` by ranking, "model" and
+        optionally "position_baseline".
+
+    Raises:
+        ValueError: If the model uses window features and no
+            `feature_cache` is given.
+    """
+    features = list(booster.feature_name())
+    used_aggregates = window_aggregates(features, aggregates)
+    if used_aggregates and feature_cache is None:
+        raise ValueError(
+            "The model uses the window features "
+            f"{[aggregate.name for aggregate in used_aggregates]}, "
+            "evaluate it with the feature cache it was trained with"
+        )
+    store = (
+        venues
+        if isinstance(venues, VenueFeatureStore)
+        else VenueFeatureStore(venues)
+    )
+    # EXPLAIN: the venue columns are checked after the lookup, as the
+    # training drops venues with nulls before joining them
+    enriched = store.enrich(sessions.drop_nulls()).drop_nulls()
+    if used_aggregates:
+        assert feature_cache is not None
+        enriched = join_history_features(
+            enriched.lazy(), used_aggregates, feature_cache, window
+        ).collect()
+    step = batch_size or max(1, enriched.height)
+    scores = np.concatenate(
+        [np.zeros(0)]
+        + [
+            np.asarray(
+                booster.predict(
+                    to_float32_matrix(
+                        enriched.slice(start, step), features
+                    )
+                )
+            )
+            for start in range(0, enriched.height, step)
+        ]
+    )
+    groups = group_codes(enriched, group_column)
+    labels = to_float32_vector(enriched, label_column)
+    results = {
+        "model": ranking_metrics(groups, scores, labels, cutoffs)
+    }
+    if baseline:
+        results[POSITION_BASELINE] = ranking_metrics(
+            groups, position_baseline_scores(enriched), labels, cutoffs
+        )
+    return results
@@ -0,0 +1,448 @@
+"""
+Aggregate features of past session windows, cached one window at a time.
+"""
+import json
+import logging
+import os
+import pathlib
+import tempfile
+from typing import (
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+)
+
+import polars as pl
+
+from .dataset_cache import cache_key
+
+LABEL_COLUMN = "has_seen_venue_in_this_session"
+MANIFEST_FILE_NAME = "windows.json"
+
+
+class WindowAggregate:
+    """
+    A feature computed from additive statistics of past windows.
+
+    Every window, e.g. the sessions of one day, is reduced to per-key
+    statistics that add up across windows, such as counts and sums.
+    The feature of a row is `value` evaluated on the statistics of all
+    windows before its own, so labels never leak into their features
+    and a new window only costs one aggregation of its own rows.
+
+    Parameters
+    ----------
+    name : str
+        Name of the feature column.
+    keys : Sequence[str]
+        Columns the statistics are grouped by, e.g. ["venue_id"].
+    statistics : Mapping[str, pl.Expr]
+        Aggregations of a window by name; they must be sums or counts,
+        windows are merged by adding them up.
+    value : pl.Expr
+        The feature, an expression of the merged statistic columns.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        keys: Sequence[str],
+        statistics: Mapping[str, pl.Expr],
+        value: pl.Expr,
+    ) -> None:
+        self.name = name
+        self.keys = list(keys)
+        self.statistics = dict(statistics)
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"WindowAggregate({self.name!r}, keys={self.keys})"
+
+    @property
+    def input_columns(self) -> List[str]:
+        """Columns of the rows the statistics are computed from."""
+        columns = list(self.keys)
+        for expression in self.statistics.values():
+            columns.extend(expression.meta.root_names())
+        return list(dict.fromkeys(columns))
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the statistics, windows of other ones are not reused."""
+        return cache_key(
+            keys=self.keys,
+            statistics={
+                name: str(expression)
+                for name, expression in self.statistics.items()
+            },
+        )[:16]
+
+    def window_statistics(self, rows: pl.LazyFrame) -> pl.LazyFrame:
+        """The statistics of one window of rows, one row per key."""
+        return rows.groupby(self.keys).agg(
+            [
+                expression.alias(name)
+                for name, expression in self.statistics.items()
+            ]
+        )
+
+    def merge(self, windows: Sequence[pl.LazyFrame]) -> pl.LazyFrame:
+        """Add up the statistics of windows and compute the feature."""
+        return (
+            pl.concat(list(windows), how="vertical")
+            .groupby(self.keys)
+            .agg([pl.col(name).sum() for name in self.statistics])
+            .select(
+                [
+                    *self.keys,
+                    self.value.cast(pl.Float32).alias(self.name),
+                ]
+            )
+        )
+
+
+def shared_window_statistics(
+    aggregates: Sequence[WindowAggregate], rows: pl.LazyFrame
+) -> List[pl.DataFrame]:
+    """The statistics of one window for several aggregates in one pass.
+
+    The rows are grouped once by the keys of all the aggregates, and as
+    statistics add up, those of an aggregate are the sums of these
+    groups by its own keys. There is one group per combination of keys
+    present in the window, e.g. per venue and user type.
+
+    Args:
+        aggregates: The features.
+        rows: The rows of the window.
+
+    Returns:
+        The `WindowAggregate.window_statistics` of every aggregate, in
+        the order of `aggregates`.
+    """
+    keys = list(
+        dict.fromkeys(
+            key for aggregate in aggregates for key in aggregate.keys
+        )
+    )
+    # EXPLAIN: statistics shared by aggregates, e.g. the impressions,
+    # are computed once
+    columns: Dict[str, pl.Expr] = {}
+    for aggregate in aggregates:
+        for expression in aggregate.statistics.values():
+            columns.setdefault(
+                str(expression),
+                expression.alias(f"__statistic_{len(columns)}__"),
+            )
+    groups = (
+        rows.groupby(keys)
+        .agg(list(columns.values()))
+        .collect(streaming=True)
+    )
+    statistics = []
+    for aggregate in aggregates:
+        aggregations = []
+        for name, expression in aggregate.statistics.items():
+            column = columns[str(expression)].meta.output_name()
+            aggregations.append(
+                pl.col(column)
+                .sum()
+                .cast(groups.schema[column])
+                .alias(name)
+            )
+        statistics.append(
+            groups.groupby(aggregate.keys).agg(aggregations)
+        )
+    return statistics
+
+
+def ratio(numerator: str, denominator: str) -> pl.Expr:
+    """`numerator / denominator`, null where the denominator is 0."""
+    return (
+        pl.when(pl.col(denominator) > 0)
+        .then(pl.col(numerator) / pl.col(denominator))
+        .otherwise(None)
+    )
+
+
+def _impressions_and(column: str) -> Dict[str, pl.Expr]:
+    return {
+        "impressions": pl.count(),
+        column: pl.col(column).cast(pl.Int64).sum(),
+    }
+
+
+DEFAULT_AGGREGATES = [
+    WindowAggregate(
+        "venue_ctr",
+        ["venue_id"],
+        _impressions_and(LABEL_COLUMN),
+        ratio(LABEL_COLUMN, "impressions"),
+    ),
+    WindowAggregate(
+        "venue_purchase_rate",
+        ["venue_id"],
+        _impressions_and("purchased"),
+        ratio("purchased", "impressions"),
+    ),
+    WindowAggregate(
+        "venue_user_type_ctr",
+        ["venue_id", "is_new_user"],
+        _impressions_and(LABEL_COLUMN),
+        ratio(LABEL_COLUMN, "impressions"),
+    ),
+]
+
+
+class FeatureCache:
+    """
+    Directory of the window statistics of `WindowAggregate` features.
+
+    Each aggregate has a sub-directory named by its fingerprint holding
+    one Arrow IPC file per window and a manifest listing the windows in
+    the order they were added, which is the order the history of a
+    window is taken in.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory holding the statistics.
+    """
+
+    def __init__(self, cache_dir: str) -> None:
+        self.cache_dir = pathlib.Path(cache_dir)
+
+    def _aggregate_dir(
+        self, aggregate: WindowAggregate
+    ) -> pathlib.Path:
+        return self.cache_dir / aggregate.fingerprint
+
+    def windows(self, aggregate: WindowAggregate) -> List[str]:
+        """The cached windows of an aggregate, oldest first."""
+        manifest = self._aggregate_dir(aggregate) / MANIFEST_FILE_NAME
+        if not manifest.is_file():
+            return []
+        with open(manifest) as file:
+            windows: List[str] = json.load(file)
+        return windows
+
+    def history_windows(
+        self, aggregate: WindowAggregate, window: Optional[str]
+    ) -> List[str]:
+        """The windows before `window`, all cached ones if it is new.
+
+        A `window` of None stands for one after every cached window,
+        e.g. the requests scored after training.
+        """
+        windows = self.windows(aggregate)
+        if window in windows:
+            return windows[: windows.index(window)]
+        return windows
+
+    def _window_path(
+        self, aggregate: WindowAggregate, window: str
+    ) -> pathlib.Path:
+        digest = cache_key(window=window)[:16]
+        return self._aggregate_dir(aggregate) / f"{digest}.arrow"
+
+    def add_window(
+        self,
+        aggregate: WindowAggregate,
+        window: str,
+        rows: pl.LazyFrame,
+    ) -> bool:
+        """Compute and store the statistics of a window once.
+
+        Args:
+            aggregate: The feature.
+            window: Name of the window, e.g. a date or the fingerprint
+                of its sessions file.
+            rows: The rows of the window.
+
+        Returns:
+            Whether the window was new.
+        """
+        return self.add_windows([aggregate], window, rows)[0]
+
+    def add_windows(
+        self,
+        aggregates: Sequence[WindowAggregate],
+        window: str,
+        rows: pl.LazyFrame,
+    ) -> List[bool]:
+        """Store the statistics of a window for several aggregates.
+
+        The statistics of the aggregates without the window are
+        computed in one pass over `rows`, see `shared_window_statistics`.
+
+        Args:
+            aggregates: The features.
+            window: Name of the window.
+            rows: The rows of the window.
+
+        Returns:
+            Whether the window was new, by aggregate.
+        """
+        new = [
+            window not in self.windows(aggregate)
+            for aggregate in aggregates
+        ]
+        missing = [
+            aggregate
+            for aggregate, is_new in zip(aggregates, new)
+            if is_new
+        ]
+        if missing:
+            for aggregate, statistics in zip(
+                missing, shared_window_statistics(missing, rows)
+            ):
+                self._store_window(aggregate, window, statistics)
+        return new
+
+    def _store_window(
+        self,
+        aggregate: WindowAggregate,
+        window: str,
+        statistics: pl.DataFrame,
+    ) -> None:
+        aggregate_dir = self._aggregate_dir(aggregate)
+        aggregate_dir.mkdir(parents=True, exist_ok=True)
+        # EXPLAIN: written under a temporary name and renamed, so a
+        # manifest never lists a partial file
+        path = self._window_path(aggregate, window)
+        with tempfile.NamedTemporaryFile(
+            dir=aggregate_dir, suffix=".staging", delete=False
+        ) as file:
+            staging_path = file.name
+        statistics.write_ipc(staging_path, compression="uncompressed")
+        os.replace(staging_path, path)
+        self._write_manifest(
+            aggregate, self.windows(aggregate) + [window]
+        )
+        logging.info(
+            "Cached %s statistics of window %s, %s keys",
+            aggregate.name,
+            window,
+            statistics.height,
+        )
+
+    def _write_manifest(
+        self, aggregate: WindowAggregate, windows: List[str]
+    ) -> None:
+        manifest = self._aggregate_dir(aggregate) / MANIFEST_FILE_NAME
+        staging = manifest.with_suffix(".staging")
+        with open(staging, "w") as file:
+            json.dump(windows, file, indent=2)
+        os.replace(staging, manifest)
+
+    def history(
+        self, aggregate: WindowAggregate, window: Optional[str]
+    ) -> Optional[pl.LazyFrame]:
+        """The feature by key over the windows before `window`.
+
+        Args:
+            aggregate: The feature.
+            window: Name of the window, None for all cached windows.
+
+        Returns:
+            A lazy frame of the keys and the feature, None if there is
+            no earlier window.
+        """
+        windows = self.history_windows(aggregate, window)
+        if not windows:
+            return None
+        return aggregate.merge(
+            [
+                pl.scan_ipc(self._window_path(aggregate, name))
+                for name in windows
+            ]
+        )
+
+
+def window_aggregates(
+    features: Sequence[str],
+    aggregates: Sequence[WindowAggregate] = DEFAULT_AGGREGATES,
+) -> List[WindowAggregate]:
+    """The aggregates among the features of a model.
+
+    Args:
+        features: Feature names of a model, e.g.
+            `booster.feature_name()`.
+        aggregates: The aggregates the model may have been trained with.
+
+    Returns:
+        The aggregates named in `features`, in the order of
+        `aggregates`.
+    """
+    names = set(features)
+    return [
+        aggregate for aggregate in aggregates if aggregate.name in names
+    ]
+
+
+def join_history_features(
+    rows: pl.LazyFrame,
+    aggregates: Sequence[WindowAggregate],
+    cache: FeatureCache,
+    window: Optional[str] = None,
+) -> pl.LazyFrame:
+    """Add the history features of cached windows without caching `rows`.
+
+    Args:
+        rows: The rows, holding the keys of every aggregate.
+        aggregates: The features to add.
+        cache: The window statistics.
+        window: Name of the window of `rows`, its history is the windows
+            before it; None or a new window takes every cached window.
+
+    Returns:
+        `rows` with one column per aggregate, null for keys without
+        history, in the order of `rows`.
+    """
+    plan = rows
+    for aggregate in aggregates:
+        history = cache.history(aggregate, window)
+        if history is None:
+            plan = plan.with_columns(
+                pl.lit(None, dtype=pl.Float32).alias(aggregate.name)
+            )
+            continue
+        # EXPLAIN: the history is cast to the key dtypes of the rows,
+        # e.g. booleans become Int8 after the join; it holds one row
+        # per key and is collected, so that the join of the rows can
+        # stream, e.g. to the out-of-core partitions
+        key_casts = [
+            pl.col(key).cast(dtype)
+            for key, dtype in rows.schema.items()
+            if key in aggregate.keys
+        ]
+        plan = plan.join(
+            history.with_columns(key_casts).collect().lazy(),
+            on=aggregate.keys,
+            how="left",
+        )
+    return plan
+
+
+def add_window_features(
+    rows: pl.LazyFrame,
+    aggregates: Sequence[WindowAggregate],
+    cache: FeatureCache,
+    window: str,
+) -> pl.LazyFrame:
+    """Cache the statistics of a window and add its history features.
+
+    Args:
+        rows: The rows of the window, holding the input columns of every
+            aggregate.
+        aggregates: The features to add.
+        cache: The window statistics.
+        window: Name of the window of `rows`.
+
+    Returns:
+        `rows` with one column per aggregate, null for keys without
+        history, in the order of `rows`.
+    """
+    cache.add_windows(aggregates, window, rows)
+    return join_history_features(rows, aggregates, cache, window)
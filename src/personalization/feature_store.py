@@ -0,0 +1,155 @@
+"""
+Venue features indexed by id, for joins by gather instead of hashing.
+"""
+from typing import (
+    Dict,
+    List,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from .dataset_utils import to_float32_matrix
+from .file_utils import read_table
+
+VENUE_ID_COLUMN = "venue_id"
+
+
+def duplicated_ids(venues: pl.DataFrame) -> int:
+    """Number of venue ids held by more than one row, nulls aside."""
+    ids = venues.get_column(VENUE_ID_COLUMN).drop_nulls()
+    return int(ids.filter(ids.is_duplicated()).n_unique())
+
+
+class VenueFeatureStore:
+    """
+    Venue features with a precomputed id-to-row index.
+
+    The venues are sorted by id once and indexed by a `pd.Index`, whose
+    hash table is built on the first lookup and kept, so enriching
+    sessions with venue features is a lookup and a gather instead of a
+    hash join built per call. The same store serves
+    training, validation and online scoring.
+
+    Parameters
+    ----------
+    venues : pl.DataFrame
+        Venue features with an integer `venue_id` column, one row per
+        id; rows without an id are dropped.
+
+    Raises
+    ------
+    ValueError
+        If an id has several rows, which a join would fan out to.
+    """
+
+    def __init__(self, venues: pl.DataFrame) -> None:
+        if VENUE_ID_COLUMN not in venues.columns:
+            raise ValueError(
+                f"Column '{VENUE_ID_COLUMN}' is not found in venues"
+            )
+        if venues.schema[VENUE_ID_COLUMN] not in pl.INTEGER_DTYPES:
+            raise ValueError(
+                f"Column '{VENUE_ID_COLUMN}' must hold integers, "
+                f"got {venues.schema[VENUE_ID_COLUMN]}"
+            )
+        duplicated = duplicated_ids(venues)
+        if duplicated:
+            raise ValueError(
+                f"{duplicated} venue ids have several rows, a "
+                "VenueFeatureStore needs one row per venue"
+            )
+        self.venues: pl.DataFrame = venues.filter(
+            pl.col(VENUE_ID_COLUMN).is_not_null()
+        ).sort(VENUE_ID_COLUMN)
+        self.venue_ids: np.ndarray = np.ascontiguousarray(
+            self.venues.get_column(VENUE_ID_COLUMN)
+            .to_numpy()
+            .astype(np.int64)
+        )
+        self.index = pd.Index(self.venue_ids)
+        self._tables: Dict[Tuple[str, ...], np.ndarray] = {}
+
+    @classmethod
+    def from_path(cls, venues_path: str) -> "VenueFeatureStore":
+        """Read the venues table from a csv, parquet or ipc file."""
+        return cls(read_table(venues_path))
+
+    @property
+    def feature_columns(self) -> List[str]:
+        """The venue columns besides the id."""
+        return [
+            column
+            for column in self.venues.columns
+            if column != VENUE_ID_COLUMN
+        ]
+
+    def __len__(self) -> int:
+        return len(self.venue_ids)
+
+    def rows(self, venue_ids: np.ndarray) -> np.ndarray:
+        """Rows of the given venue ids in `venues`, -1 if unknown."""
+        # EXPLAIN: a binary search, e.g. np.searchsorted, is several
+        # times slower on millions of ids than one hash table lookup
+        rows: np.ndarray = self.index.get_indexer(
+            np.asarray(venue_ids, dtype=np.int64)
+        )
+        return rows
+
+    def enrich(self, sessions: pl.DataFrame) -> pl.DataFrame:
+        """Add the venue features to every session row.
+
+        This gives the rows of an inner join on `venue_id`, in the order
+        of `sessions`: rows of unknown venues are dropped, and venue
+        columns clashing with session columns get a "_right" suffix.
+
+        Args:
+            sessions: Rows with a `venue_id` column.
+
+        Returns:
+            The session columns followed by the venue features.
+        """
+        venue_id = sessions.get_column(VENUE_ID_COLUMN)
+        rows = self.rows(
+            venue_id.fill_null(0).cast(pl.Int64).to_numpy()
+        )
+        if venue_id.null_count():
+            rows[venue_id.is_null().to_numpy()] = -1
+        known = rows >= 0
+        if not known.all():
+            sessions = sessions.filter(pl.Series(known))
+            rows = rows[known]
+        features = self.venues.select(self.feature_columns)[rows]
+        return sessions.hstack(
+            [
+                column.alias(f"{column.name}_right")
+                if column.name in sessions.columns
+                else column
+                for column in features.get_columns()
+            ]
+        )
+
+    def feature_table(self, features: Sequence[str]) -> np.ndarray:
+        """Dense float32 table of `features`, one row per venue.
+
+        The extra last row is all NaN and stands for unknown venues,
+        LightGBM treats NaN as missing. Tables are built once per
+        feature list.
+
+        Args:
+            features: Venue columns, in the order of the table.
+
+        Returns:
+            A (len(self) + 1, len(features)) float32 matrix.
+        """
+        key = tuple(features)
+        if key not in self._tables:
+            table = np.full(
+                (len(self) + 1, len(key)), np.nan, dtype=np.float32
+            )
+            table[:-1] = to_float32_matrix(self.venues, key)
+            self._tables[key] = table
+        return self._tables[key]
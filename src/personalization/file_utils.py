@@ -1,8 +1,26 @@
+import hashlib
 import logging
+import os
 import pathlib
-from typing import Any
+from typing import (
+    Callable,
+    Mapping,
+    Optional,
+    Sequence,
+)
 
-import joblib
+import polars as pl
+from polars.type_aliases import PolarsDataType
+
+from .schema import (
+    cast_dtypes,
+    csv_parse_dtypes,
+)
+
+COLUMNAR_FORMATS = {"ipc": ".arrow", "parquet": ".parquet"}
+# size of each block read from the input file to compute its content hash
+CONTENT_HASH_BLOCK_SIZE = 1 << 20
+CONTENT_HASH_NUM_BLOCKS = 8
 
 
 def delete_file_if_exists(file_path: str) -> None:
@@ -38,11 +56,175 @@ def check_file_location(file_path: str) -> bool:
     return bool(pathlib_instance.is_file())
 
 
-def load_model_from_artifact(model_artifact_bucket: str) -> Any:
-    """we load it locally for demo only"""
-    loaded_model = joblib.load(open(model_artifact_bucket, "rb"))
-    return loaded_model
+def content_hash(file_path: str) -> str:
+    """Hash a fixed number of evenly spaced blocks of a file.
+
+    Reading the whole of a multi-GB file on every run would cost as much
+    as parsing it, so only the first, last and a few inner blocks are
+    hashed. Together with the size and mtime in `file_fingerprint` this
+    catches both in-place edits and replaced files.
+
+    Args:
+        file_path: The path to the file to hash.
+
+    Returns:
+        The hex digest of the sampled blocks.
+    """
+    size = os.path.getsize(file_path)
+    digest = hashlib.blake2b(digest_size=16)
+    block_size = CONTENT_HASH_BLOCK_SIZE
+    if size <= block_size * CONTENT_HASH_NUM_BLOCKS:
+        offsets = range(0, size, block_size)
+    else:
+        step = (size - block_size) // (CONTENT_HASH_NUM_BLOCKS - 1)
+        offsets = range(0, size - block_size + 1, step)
+    with open(file_path, "rb") as file:
+        for offset in offsets:
+            file.seek(offset)
+            digest.update(file.read(block_size))
+    return digest.hexdigest()
+
+
+def file_fingerprint(file_path: str) -> str:
+    """Fingerprint a file by its path, size, mtime and content hash.
+
+    Args:
+        file_path: The path to the file to fingerprint.
+
+    Returns:
+        A hex digest that changes whenever the file changes.
+    """
+    resolved_path = pathlib.Path(file_path).resolve()
+    stat = resolved_path.stat()
+    key = "|".join(
+        [
+            str(resolved_path),
+            str(stat.st_size),
+            str(stat.st_mtime_ns),
+            content_hash(str(resolved_path)),
+        ]
+    )
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def cache_as_columnar(
+    csv_path: str,
+    cache_dir: str,
+    file_format: str = "ipc",
+    rebuild: bool = False,
+    read: Optional[Callable[[], pl.DataFrame]] = None,
+) -> str:
+    """Convert a csv file once into a columnar file kept in `cache_dir`.
+
+    The cached file name embeds the fingerprint of the csv file, so a
+    changed input gets a fresh conversion and stale copies of the same
+    input are removed.
 
+    Args:
+        csv_path: The path to the csv file to convert.
+        cache_dir: The directory holding the converted files.
+        file_format: Either "ipc" (Arrow IPC, can be memory-mapped) or
+            "parquet".
+        rebuild: Convert again even if a cached file exists.
+        read: Reads the csv file for a conversion, e.g. the `read` of
+            a `PrefetchingFileSource` on slow storage; by default the
+            file is streamed with `pl.scan_csv`.
+
+    Returns:
+        The path to the cached columnar file.
+    """
+    if file_format not in COLUMNAR_FORMATS:
+        raise ValueError(
+            f"Unknown cache format {file_format}, "
+            f"expected one of {sorted(COLUMNAR_FORMATS)}"
+        )
+    resolved_path = pathlib.Path(csv_path).resolve()
+    path_digest = hashlib.sha256(
+        str(resolved_path).encode()
+    ).hexdigest()
+    prefix = f"{resolved_path.stem}-{path_digest[:8]}"
+    extension = COLUMNAR_FORMATS[file_format]
+    cache_path = pathlib.Path(cache_dir) / (
+        f"{prefix}-{file_fingerprint(csv_path)[:16]}{extension}"
+    )
+    if cache_path.is_file() and not rebuild:
+        logging.info("Using cached %s for %s", cache_path, csv_path)
+        return str(cache_path)
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    for stale_path in cache_path.parent.glob(f"{prefix}-*{extension}"):
+        delete_file_if_exists(str(stale_path))
+    logging.info("Converting %s to %s", csv_path, cache_path)
+    tmp_path = cache_path.with_suffix(extension + ".tmp")
+    plan = pl.scan_csv(csv_path) if read is None else read().lazy()
+    if file_format == "ipc":
+        # EXPLAIN: uncompressed, so that the file can be memory-mapped
+        plan.sink_ipc(tmp_path, compression=None)
+    else:
+        plan.sink_parquet(tmp_path)
+    os.replace(tmp_path, cache_path)
+    return str(cache_path)
+
+
+def scan_table(
+    file_path: str,
+    columns: Optional[Sequence[str]] = None,
+    dtypes: Optional[Mapping[str, PolarsDataType]] = None,
+) -> pl.LazyFrame:
+    """Lazily scan a csv, Arrow IPC or Parquet file by its extension.
+
+    Args:
+        file_path: The path to the file to scan.
+        columns: Only read these columns, by default all.
+        dtypes: Dtypes of some of the columns, see `schema.cast_dtypes`.
 
-def save_model_to_file(traine_model: Any, model_path: str) -> None:
-    joblib.dump(traine_model, model_path)
+    Returns:
+        A LazyFrame over the file, Arrow IPC files are memory-mapped.
+    """
+    suffix = pathlib.Path(file_path).suffix
+    plan: pl.LazyFrame
+    if suffix == COLUMNAR_FORMATS["ipc"]:
+        plan = pl.scan_ipc(file_path, memory_map=True)
+    elif suffix == COLUMNAR_FORMATS["parquet"]:
+        plan = pl.scan_parquet(file_path)
+    else:
+        plan = pl.scan_csv(
+            file_path, dtypes=csv_parse_dtypes(dtypes or {}) or None
+        )
+    if columns is not None:
+        plan = plan.select(list(columns))
+    return cast_dtypes(plan, dtypes or {})
+
+
+def read_table(
+    file_path: str,
+    columns: Optional[Sequence[str]] = None,
+    dtypes: Optional[Mapping[str, PolarsDataType]] = None,
+) -> pl.DataFrame:
+    """Read a csv, Arrow IPC or Parquet file by its extension.
+
+    Args:
+        file_path: The path to the file to read.
+        columns: Only read these columns, by default all; the others
+            are never parsed.
+        dtypes: Dtypes of some of the columns, see `schema.cast_dtypes`.
+
+    Returns:
+        A DataFrame, Arrow IPC files are memory-mapped instead of copied.
+    """
+    suffix = pathlib.Path(file_path).suffix
+    selected = list(columns) if columns is not None else None
+    frame: pl.DataFrame
+    if suffix == COLUMNAR_FORMATS["ipc"]:
+        frame = pl.read_ipc(
+            file_path, columns=selected, memory_map=True
+        )
+    elif suffix == COLUMNAR_FORMATS["parquet"]:
+        frame = pl.read_parquet(file_path, columns=selected)
+    else:
+        frame = pl.read_csv(
+            file_path,
+            columns=selected,
+            dtypes=csv_parse_dtypes(dtypes or {}) or None,
+        )
+    return cast_dtypes(frame, dtypes or {})
@@ -0,0 +1,347 @@
+"""
+Model artifacts holding LightGBM's native model text and a manifest.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import lzma
+import os
+import pathlib
+import shutil
+import tempfile
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+)
+
+# EXPLAIN: LightGBM is imported by the functions parsing or writing
+# models only, reading a manifest or a LazyBooster does not need it
+
+ARTIFACT_FORMATS = ("native", "joblib")
+MANIFEST_FILE_NAME = "manifest.json"
+MODEL_FILE_NAME = "model.txt"
+BIN_REFERENCE_FILE_NAME = "bins.bin"
+# file suffix and opener of every supported compression
+COMPRESSIONS: Dict[str, Any] = {
+    "gzip": (".gz", gzip.open),
+    "lzma": (".xz", lzma.open),
+}
+MANIFEST_VERSION = 1
+
+
+def is_native_artifact(artifact_path: str) -> bool:
+    """Whether `artifact_path` is a directory written by `save_model_artifact`."""
+    return os.path.isfile(
+        os.path.join(artifact_path, MANIFEST_FILE_NAME)
+    )
+
+
+def default_artifact_format(model_path: str) -> str:
+    """The format of a model path whose format was not given.
+
+    A path with a file suffix, e.g. `model.joblib`, or an existing file
+    keeps the joblib pickle the models were saved as before native
+    artifacts; any other path gets a native artifact directory.
+    """
+    if os.path.isfile(model_path) or pathlib.Path(model_path).suffix:
+        return "joblib"
+    return "native"
+
+
+def _open_model_file(
+    model_path: pathlib.Path, compression: Optional[str], mode: str
+) -> IO[Any]:
+    opener: Callable[..., IO[Any]] = (
+        COMPRESSIONS[compression][1] if compression else open
+    )
+    return opener(model_path, mode)
+
+
+def _file_sha256(file_path: pathlib.Path) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_model_artifact(
+    booster: Any,
+    artifact_path: str,
+    compression: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    data_fingerprint: Optional[str] = None,
+    metrics: Optional[Dict[str, Any]] = None,
+    partitions: Optional[List[Dict[str, str]]] = None,
+    bin_reference: Optional[Any] = None,
+) -> str:
+    """Save a booster as its native model text plus a manifest.
+
+    The artifact is a directory holding `model.txt` (optionally
+    compressed), `manifest.json` and optionally `bins.bin`, the bins of
+    the training data. It is written to a temporary directory first
+    and moved into place, so readers never see a partial artifact. An
+    existing directory is only replaced if it is an artifact or empty.
+
+    Args:
+        booster: The trained model.
+        artifact_path: The directory to write the artifact to.
+        compression: None, "gzip" or "lzma".
+        params: The LightGBM parameters the model was trained with.
+        data_fingerprint: Identifies the training data.
+        metrics: Evaluation results, e.g. `booster.best_score`.
+        partitions: The session inputs the model was trained on so far,
+            each a dict with their `path` and `fingerprint`.
+        bin_reference: A constructed lgb.Dataset holding the bins of
+            the training data, see `dataset_utils.build_bin_reference`,
+            to bin the data of later incremental trainings the same way.
+
+    Returns:
+        The artifact path.
+
+    Raises:
+        FileExistsError: `artifact_path` is a directory holding other
+            files than an artifact.
+    """
+    if (
+        os.path.isdir(artifact_path)
+        and os.listdir(artifact_path)
+        and not is_native_artifact(artifact_path)
+    ):
+        raise FileExistsError(
+            f"{artifact_path} is a directory that is not a model "
+            "artifact, it is not replaced"
+        )
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError(
+            f"Unknown compression {compression}, "
+            f"expected None or one of {sorted(COMPRESSIONS)}"
+        )
+    import lightgbm as lgb
+
+    target = pathlib.Path(artifact_path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = pathlib.Path(
+        tempfile.mkdtemp(prefix=f".{target.name}.", dir=target.parent)
+    )
+    model_file = MODEL_FILE_NAME + (
+        COMPRESSIONS[compression][0] if compression else ""
+    )
+    try:
+        if compression:
+            with _open_model_file(
+                staging / model_file, compression, "wt"
+            ) as file:
+                file.write(booster.model_to_string(num_iteration=-1))
+        else:
+            booster.save_model(
+                str(staging / model_file), num_iteration=-1
+            )
+        if bin_reference is not None:
+            bin_reference.save_binary(
+                str(staging / BIN_REFERENCE_FILE_NAME)
+            )
+        manifest = {
+            "manifest_version": MANIFEST_VERSION,
+            "lightgbm_version": lgb.__version__,
+            "model_file": model_file,
+            "compression": compression,
+            "sha256": _file_sha256(staging / model_file),
+            "features": list(booster.feature_name()),
+            "num_trees": booster.num_trees(),
+            "best_iteration": booster.best_iteration,
+            "params": params or {},
+            "data_fingerprint": data_fingerprint,
+            "metrics": metrics or {},
+            "partitions": partitions or [],
+            "bin_reference_file": BIN_REFERENCE_FILE_NAME
+            if bin_reference is not None
+            else None,
+        }
+        with open(staging / MANIFEST_FILE_NAME, "w") as file:
+            json.dump(manifest, file, indent=2, default=str)
+        if target.is_dir():
+            shutil.rmtree(target)
+        elif target.exists():
+            target.unlink()
+        os.replace(staging, target)
+    finally:
+        if staging.exists():
+            shutil.rmtree(staging)
+    return str(target)
+
+
+def read_manifest(artifact_path: str) -> Dict[str, Any]:
+    """Read the manifest of an artifact without loading the model.
+
+    Args:
+        artifact_path: The artifact directory.
+
+    Returns:
+        The manifest as a dict.
+    """
+    with open(os.path.join(artifact_path, MANIFEST_FILE_NAME)) as file:
+        manifest: Dict[str, Any] = json.load(file)
+    return manifest
+
+
+def load_native_booster(
+    artifact_path: str, verify: bool = False
+) -> Any:
+    """Load the booster of an artifact.
+
+    Uncompressed models are parsed by LightGBM straight from the file,
+    without building a Python string first.
+
+    Args:
+        artifact_path: The artifact directory.
+        verify: Check the model file against the manifest checksum.
+
+    Returns:
+        The booster.
+    """
+    import lightgbm as lgb
+
+    manifest = read_manifest(artifact_path)
+    model_path = pathlib.Path(artifact_path) / manifest["model_file"]
+    if verify and _file_sha256(model_path) != manifest["sha256"]:
+        raise ValueError(
+            f"Model file {model_path} does not match its manifest"
+        )
+    compression = manifest.get("compression")
+    if not compression:
+        booster = lgb.Booster(model_file=str(model_path))
+    else:
+        with _open_model_file(model_path, compression, "rt") as file:
+            booster = lgb.Booster(model_str=file.read())
+    best_iteration = manifest.get("best_iteration") or 0
+    if best_iteration > 0:
+        booster.best_iteration = best_iteration
+    return booster
+
+
+def load_bin_reference(
+    artifact_path: str, params: Optional[Dict[str, Any]] = None
+) -> Optional[Any]:
+    """Load the bins saved with an artifact.
+
+    Args:
+        artifact_path: The artifact directory.
+        params: Dataset parameters, must match those of the training.
+
+    Returns:
+        The constructed lgb.Dataset, None if the artifact has no bins.
+    """
+    if not is_native_artifact(artifact_path):
+        return None
+    bin_reference_file = read_manifest(artifact_path).get(
+        "bin_reference_file"
+    )
+    if not bin_reference_file:
+        return None
+    import lightgbm as lgb
+
+    return lgb.Dataset(
+        pathlib.Path(artifact_path) / bin_reference_file, params=params
+    ).construct()
+
+
+class LazyBooster:
+    """
+    A booster that is only parsed on first use.
+
+    The manifest is read right away, so the feature names are available
+    at once, and the model file is parsed when any other booster
+    attribute is first accessed, e.g. `predict`. Call `load` to pay
+    that cost at a chosen time, e.g. before serving traffic.
+
+    Parameters
+    ----------
+    artifact_path : str
+        The artifact directory.
+    """
+
+    def __init__(self, artifact_path: str) -> None:
+        self.artifact_path = artifact_path
+        self.manifest = read_manifest(artifact_path)
+        self._booster: Optional[Any] = None
+
+    def load(self) -> Any:
+        """Parse the model file if needed and return the booster."""
+        if self._booster is None:
+            logging.info("Loading model from %s", self.artifact_path)
+            self._booster = load_native_booster(self.artifact_path)
+        return self._booster
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._booster is not None
+
+    def feature_name(self) -> List[str]:
+        return list(self.manifest["features"])
+
+    def __getattr__(self, name: str) -> Any:
+        # EXPLAIN: only called for attributes LazyBooster lacks, so
+        # everything else is forwarded to the parsed booster
+        if name.startswith("__") or name == "_booster":
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+
+def load_model_from_artifact(
+    model_artifact_bucket: str, lazy: bool = False
+) -> Any:
+    """Load a model saved by `save_model_to_file`.
+
+    Args:
+        model_artifact_bucket: A native artifact directory or a joblib
+            file.
+        lazy: Parse a native model on first use instead of right away.
+
+    Returns:
+        The booster, a `LazyBooster` if `lazy` and the artifact is
+        native.
+    """
+    if is_native_artifact(model_artifact_bucket):
+        if lazy:
+            return LazyBooster(model_artifact_bucket)
+        return load_native_booster(model_artifact_bucket)
+    import joblib
+
+    with open(model_artifact_bucket, "rb") as file:
+        loaded_model = joblib.load(file)
+    return loaded_model
+
+
+def save_model_to_file(
+    traine_model: Any,
+    model_path: str,
+    artifact_format: str = "joblib",
+    **kwargs: Any,
+) -> None:
+    """Save a trained model.
+
+    Args:
+        traine_model: The booster to save.
+        model_path: The file (joblib) or directory (native) to write.
+        artifact_format: "native" for LightGBM's model text and a
+            manifest, see `save_model_artifact`, or "joblib".
+        **kwargs: Passed to `save_model_artifact`, e.g. `compression`,
+            `params`, `data_fingerprint` and `metrics`.
+    """
+    if artifact_format not in ARTIFACT_FORMATS:
+        raise ValueError(
+            f"Unknown artifact format {artifact_format}, "
+            f"expected one of {ARTIFACT_FORMATS}"
+        )
+    if artifact_format == "native":
+        save_model_artifact(traine_model, model_path, **kwargs)
+    else:
+        import joblib
+
+        joblib.dump(traine_model, model_path)
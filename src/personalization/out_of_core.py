@@ -0,0 +1,292 @@
+"""
+Out-of-core construction of LightGBM datasets from session partitions.
+"""
+import functools
+import logging
+import math
+import operator
+import os
+import pathlib
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+)
+
+import lightgbm as lgb
+import numpy as np
+import polars as pl
+import pyarrow as pa
+
+from .dataset_utils import (
+    DEFAULT_BIN_SAMPLE_ROWS,
+    DEFAULT_CHUNK_SIZE,
+    PolarsSequence,
+    build_bin_reference,
+    group_sizes,
+    to_float32_vector,
+)
+
+PARTITION_FILE_PATTERN = "{split}-{partition:05d}.arrow"
+# the joined rows, streamed to disk once before they are partitioned
+SPILL_FILE_NAME = "spill.arrow"
+UNSORTED_FILE_PATTERN = "unsorted-{partition:05d}.arrow"
+PARTITION_COLUMN = "__partition__"
+SPLIT_COLUMN = "__split__"
+
+
+def partition_expression(
+    group_column: str, n_partitions: int, seed: int
+) -> pl.Expr:
+    """Partition of each row, whole sessions share a partition."""
+    return pl.col(group_column).hash(seed=seed) % n_partitions
+
+
+def drop_nulls(plan: pl.LazyFrame) -> pl.LazyFrame:
+    """`plan.drop_nulls()` as a filter, which streaming sinks can run."""
+    return plan.filter(
+        functools.reduce(
+            operator.and_,
+            [pl.col(column).is_not_null() for column in plan.columns],
+        )
+    )
+
+
+def scatter_partitions(
+    spill_path: str,
+    output_dir: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict[int, str]:
+    """Append the rows of a spill file to one file per partition.
+
+    The memory-mapped spill file is read `chunk_size` rows at a time
+    and the rows of each chunk are appended to the Arrow IPC file of
+    their `PARTITION_COLUMN`, so one chunk is in memory at a time.
+
+    Args:
+        spill_path: Arrow IPC file with a `PARTITION_COLUMN`.
+        output_dir: The directory to write the partitions to.
+        chunk_size: Rows read per chunk.
+
+    Returns:
+        The unsorted file of every non-empty partition, without the
+        partition column.
+    """
+    spill = read_partition(spill_path)
+    paths: Dict[int, str] = {}
+    writers: Dict[int, Any] = {}
+    try:
+        for offset in range(0, spill.height, chunk_size):
+            chunk = spill.slice(offset, chunk_size)
+            for index, part in chunk.partition_by(
+                PARTITION_COLUMN, as_dict=True
+            ).items():
+                table = part.drop(PARTITION_COLUMN).to_arrow()
+                if index not in writers:
+                    paths[index] = os.path.join(
+                        output_dir,
+                        UNSORTED_FILE_PATTERN.format(partition=index),
+                    )
+                    writers[index] = pa.ipc.new_file(
+                        paths[index], table.schema
+                    )
+                writers[index].write_table(table)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return paths
+
+
+def write_partitions(
+    ranking_plan: pl.LazyFrame,
+    output_dir: str,
+    n_partitions: int,
+    partition: pl.Expr,
+    split: pl.Expr,
+    sort_columns: Sequence[str],
+    splits: Sequence[str] = ("train", "val"),
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict[str, List[str]]:
+    """Run a ranking query once and write it in session partitions.
+
+    The query streams the inputs once into a spill file, which is
+    scattered into one file per partition, see `scatter_partitions`.
+    Each partition is then sorted by session on its own and the rows
+    of each split are written to an uncompressed Arrow IPC file, so
+    only one partition is ever in memory and later reads are
+    memory-mapped.
+
+    Args:
+        ranking_plan: Lazy join of sessions and venues, projected to the
+            model columns; it must run on the streaming engine, e.g.
+            with `drop_nulls` of this module.
+        output_dir: The directory to write the partitions to.
+        n_partitions: Number of partitions.
+        partition: Expression giving the partition of a row.
+        split: Expression giving the split index of a row, indexes into
+            `splits`; rows of other splits are dropped.
+        sort_columns: Columns to sort each partition by, the session
+            column first.
+        splits: Names of the splits to keep.
+        chunk_size: Rows of the spill file scattered at a time.
+
+    Returns:
+        The non-empty partition files of every split, in order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    spill_path = os.path.join(output_dir, SPILL_FILE_NAME)
+    ranking_plan.with_columns(
+        [split.alias(SPLIT_COLUMN), partition.alias(PARTITION_COLUMN)]
+    ).filter(pl.col(SPLIT_COLUMN) < len(splits)).sink_ipc(
+        spill_path, compression=None
+    )
+    try:
+        unsorted_paths = scatter_partitions(
+            spill_path, output_dir, chunk_size
+        )
+    finally:
+        os.remove(spill_path)
+    paths: Dict[str, List[str]] = {name: [] for name in splits}
+    for index in sorted(unsorted_paths):
+        frame = read_partition(unsorted_paths[index]).sort(
+            list(sort_columns)
+        )
+        parts = frame.partition_by(SPLIT_COLUMN, as_dict=True)
+        for split_index, name in enumerate(splits):
+            part = parts.get(split_index)
+            if part is None or part.is_empty():
+                continue
+            path = os.path.join(
+                output_dir,
+                PARTITION_FILE_PATTERN.format(
+                    split=name, partition=index
+                ),
+            )
+            part.drop(SPLIT_COLUMN).write_ipc(
+                path, compression="uncompressed"
+            )
+            paths[name].append(path)
+        logging.info(
+            "Wrote partition %s of %s, %s rows",
+            index + 1,
+            n_partitions,
+            frame.height,
+        )
+        del frame, parts
+        os.remove(unsorted_paths[index])
+    return paths
+
+
+def read_partition(path: str) -> pl.DataFrame:
+    return pl.read_ipc(path, memory_map=True)
+
+
+def sample_reference(
+    paths: Sequence[str],
+    features: Sequence[str],
+    sample_rows: int = DEFAULT_BIN_SAMPLE_ROWS,
+    params: Optional[Dict[str, Any]] = None,
+    seed: int = 0,
+) -> Any:
+    """Build a Dataset holding only the bins of a sample of partitions.
+
+    Args:
+        paths: Partition files of the train split.
+        features: The feature columns, in model order.
+        sample_rows: Rows to find the bin boundaries on, spread over
+            the partitions in proportion to their size.
+        params: Dataset parameters, e.g. `max_bin`.
+        seed: Seed of the row sample.
+
+    Returns:
+        The constructed reference lgb.Dataset.
+
+    Raises:
+        ValueError: If there are no partitions to sample.
+    """
+    if not paths:
+        raise ValueError("No partitions to sample the bins from")
+    heights = [read_partition(path).height for path in paths]
+    fraction = min(1.0, sample_rows / max(1, sum(heights)))
+    samples = [
+        read_partition(path)
+        .select(list(features))
+        .sample(
+            n=min(height, math.ceil(height * fraction)),
+            seed=seed + index,
+        )
+        for index, (path, height) in enumerate(zip(paths, heights))
+    ]
+    return build_bin_reference(
+        pl.concat(samples),
+        features,
+        params=params,
+        sample_rows=sample_rows,
+        seed=seed,
+    )
+
+
+def build_partitioned_dataset(
+    paths: Sequence[str],
+    features: Sequence[str],
+    label_column: str,
+    group_column: str,
+    reference: Any,
+    chunk_size: Optional[int] = None,
+    params: Optional[Dict[str, Any]] = None,
+) -> Any:
+    """Bin memory-mapped partitions into one Dataset, a batch at a time.
+
+    Only the binned Dataset, the label and the group sizes are held in
+    memory; the raw features are read from the partition files one
+    batch of `chunk_size` rows at a time.
+
+    Args:
+        paths: Partition files, each sorted by `group_column`.
+        features: The feature columns, in model order.
+        label_column: The label column.
+        group_column: The session column.
+        reference: Dataset whose bin mappers are used.
+        chunk_size: Rows pushed to LightGBM per batch.
+        params: Dataset parameters.
+
+    Returns:
+        The constructed lgb.Dataset.
+
+    Raises:
+        ValueError: If there are no partitions, e.g. the split is empty.
+    """
+    if not paths:
+        raise ValueError("No partitions to build a Dataset from")
+    sequences = []
+    labels = []
+    groups = []
+    for path in paths:
+        frame = read_partition(path)
+        sequences.append(
+            PolarsSequence(
+                frame,
+                features,
+                batch_size=chunk_size or DEFAULT_CHUNK_SIZE,
+            )
+        )
+        labels.append(to_float32_vector(frame, label_column))
+        groups.append(group_sizes(frame, group_column))
+    return lgb.Dataset(
+        sequences,
+        label=np.concatenate(labels),
+        group=np.concatenate(groups),
+        reference=reference,
+        feature_name=list(features),
+        params=params,
+        free_raw_data=True,
+    ).construct()
+
+
+def remove_partitions(paths: Dict[str, List[str]]) -> None:
+    """Delete the partition files once the datasets are saved."""
+    for split_paths in paths.values():
+        for path in split_paths:
+            pathlib.Path(path).unlink(missing_ok=True)
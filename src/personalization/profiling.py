@@ -0,0 +1,238 @@
+"""
+Per-stage wall time, CPU time, memory and shape records of a pipeline.
+"""
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+)
+
+PROC_STATUS_PATH = "/proc/self/status"
+PROC_CLEAR_REFS_PATH = "/proc/self/clear_refs"
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process, None where /proc is missing."""
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+    except OSError:
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def reset_peak_rss() -> bool:
+    """Reset the peak RSS of this process, return whether it worked."""
+    if not sys.platform.startswith("linux") or not os.path.exists(
+        PROC_CLEAR_REFS_PATH
+    ):
+        return False
+    try:
+        # EXPLAIN: Linux resets VmHWM, the peak RSS, when 5 is written
+        with open(PROC_CLEAR_REFS_PATH, "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak RSS since the last `reset_peak_rss`, or of the whole process.
+
+    Returns:
+        The peak in MB, None where neither /proc nor the `resource`
+        module is available, e.g. on Windows.
+    """
+    try:
+        with open(PROC_STATUS_PATH) as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # EXPLAIN: ru_maxrss is in bytes on macOS and in KB elsewhere
+    return (
+        max_rss / 2**20
+        if sys.platform == "darwin"
+        else max_rss / 2**10
+    )
+
+
+def format_mb(megabytes: Optional[float]) -> str:
+    """Megabytes without decimals, "n/a" where unknown."""
+    return "n/a" if megabytes is None else f"{megabytes:.0f}"
+
+
+def frame_shape(frame: Any) -> Dict[str, Any]:
+    """Rows and columns of a DataFrame or a constructed lgb.Dataset.
+
+    DataFrames also report their estimated in-memory size in MB.
+    """
+    if hasattr(frame, "height") and hasattr(frame, "width"):
+        return {
+            "rows": int(frame.height),
+            "columns": int(frame.width),
+            "estimated_mb": float(frame.estimated_size("mb")),
+        }
+    if hasattr(frame, "num_data") and hasattr(frame, "num_feature"):
+        try:
+            return {
+                "rows": int(frame.num_data()),
+                "columns": int(frame.num_feature()),
+            }
+        except Exception:
+            # EXPLAIN: the Dataset is not constructed yet
+            return {}
+    return {}
+
+
+class StageRecord:
+    """
+    Measurements of one pipeline stage.
+
+    Parameters
+    ----------
+    name : str
+        Name of the stage, e.g. "join".
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.shape: Dict[str, Any] = {}
+        self.start_seconds = 0.0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.rss_start_mb: Optional[float] = None
+        self.rss_end_mb: Optional[float] = None
+        self.peak_rss_mb: Optional[float] = None
+        self.peak_rss_scope = "stage"
+        self.thread_id = threading.get_ident()
+
+    def set_output(self, frame: Any) -> None:
+        """Record the row and column counts of the stage output."""
+        self.shape = frame_shape(frame)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.name,
+            "start_seconds": self.start_seconds,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "rss_start_mb": self.rss_start_mb,
+            "rss_end_mb": self.rss_end_mb,
+            "peak_rss_mb": self.peak_rss_mb,
+            "peak_rss_scope": self.peak_rss_scope,
+            **self.shape,
+        }
+
+
+class StageProfiler:
+    """
+    Record wall time, CPU time, RSS and output shape of named stages.
+
+    Where Linux allows it the peak RSS is reset at the start of every
+    top-level stage, so each record holds the peak of its own stage;
+    elsewhere it is the peak of the whole process so far and
+    `peak_rss_scope` says "process". Nested stages do not reset the
+    peak of the stage around them, their scope is "enclosing". A
+    disabled profiler records nothing.
+
+    Parameters
+    ----------
+    enabled : bool
+        Whether to record anything.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.records: List[StageRecord] = []
+        self._origin = time.perf_counter()
+        self._depth = 0
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[StageRecord]:
+        """Measure the body of a `with` block as stage `name`.
+
+        Args:
+            name: Name of the stage.
+
+        Yields:
+            The record of the stage, call `set_output` on it to add the
+            shape of the stage output.
+        """
+        record = StageRecord(name)
+        if not self.enabled:
+            yield record
+            return
+        if self._depth > 0:
+            record.peak_rss_scope = "enclosing"
+        elif not reset_peak_rss():
+            record.peak_rss_scope = "process"
+        self._depth += 1
+        record.rss_start_mb = current_rss_mb()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            self._depth -= 1
+            record.start_seconds = wall_start - self._origin
+            record.wall_seconds = time.perf_counter() - wall_start
+            record.cpu_seconds = time.process_time() - cpu_start
+            record.rss_end_mb = current_rss_mb()
+            record.peak_rss_mb = peak_rss_mb()
+            self.records.append(record)
+            logging.info(
+                "Stage %s took %.3fs wall, %.3fs CPU, peak RSS %s MB",
+                name,
+                record.wall_seconds,
+                record.cpu_seconds,
+                format_mb(record.peak_rss_mb),
+            )
+
+    def report(self) -> List[Dict[str, Any]]:
+        """The records as dicts, in the order the stages finished."""
+        return [record.to_dict() for record in self.records]
+
+    def write_json(self, path: str) -> None:
+        """Write the report as a JSON list."""
+        with open(path, "w") as file:
+            json.dump(self.report(), file, indent=2)
+
+    def write_chrome_trace(self, path: str) -> None:
+        """Write the stages as a Chrome trace, see chrome://tracing or Perfetto."""
+        events = [
+            {
+                "name": record.name,
+                "cat": "stage",
+                "ph": "X",
+                "ts": record.start_seconds * 1e6,
+                "dur": record.wall_seconds * 1e6,
+                "pid": os.getpid(),
+                "tid": record.thread_id,
+                "args": {
+                    key: value
+                    for key, value in record.to_dict().items()
+                    if key not in ("stage", "start_seconds")
+                },
+            }
+            for record in self.records
+        ]
+        with open(path, "w") as file:
+            json.dump(
+                {"traceEvents": events, "displayTimeUnit": "ms"}, file
+            )
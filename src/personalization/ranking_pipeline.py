@@ -2,25 +2,105 @@
 This module defines a Pipeline for ranking sessions based on venue features.
 """
 import gc
+import importlib.metadata
 import logging
 import os
 import pathlib
+import shutil
+import tempfile
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from typing import (
     Any,
     Dict,
+    List,
     Optional,
+    Tuple,
+    Union,
 )
 
 import lightgbm as lgb
 import polars as pl
-from sklearn.model_selection import train_test_split
 
 from .abstract_pipeline import BaseMachineLearningPipeline
+from .cross_validation import cross_validate
+from .data_sources import (
+    DEFAULT_PREFETCH_CHUNK_SIZE,
+    DataSource,
+    FileSource,
+    PrefetchingFileSource,
+    as_source,
+)
+from .dataset_cache import (
+    BINS_FILE_NAME,
+    TRAIN_FILE_NAME,
+    VAL_FILE_NAME,
+    DatasetCache,
+    cache_key,
+)
+from .dataset_utils import (
+    DEFAULT_BIN_SAMPLE_ROWS,
+    DEFAULT_CHUNK_SIZE,
+    build_bin_reference,
+    build_lgb_dataset,
+    group_sizes,
+    to_float32_matrix,
+)
+from .distributed import (
+    TREE_LEARNERS,
+    train_distributed,
+)
+from .evaluation import (
+    DEFAULT_CUTOFFS,
+    evaluate_scores,
+)
+from .feature_engineering import (
+    FeatureCache,
+    WindowAggregate,
+    add_window_features,
+)
+from .feature_store import (
+    VenueFeatureStore,
+    duplicated_ids,
+)
 from .file_utils import (
+    cache_as_columnar,
     check_file_location,
     delete_file_if_exists,
+)
+from .model_artifact import (
+    default_artifact_format,
+    is_native_artifact,
+    load_bin_reference,
+    load_model_from_artifact,
+    read_manifest,
     save_model_to_file,
 )
+from .out_of_core import (
+    build_partitioned_dataset,
+    drop_nulls,
+    partition_expression,
+    read_partition,
+    remove_partitions,
+    sample_reference,
+    write_partitions,
+)
+from .schema import (
+    SESSIONS_DTYPES,
+    VENUES_DTYPES,
+    hash_session_id,
+    plan_read,
+)
+from .shared_matrix import SharedFeatureMatrix
+from .stages import (
+    CheckpointStore,
+    Stage,
+    StageGraph,
+)
+from .tuning import (
+    expand_grid,
+    successive_halving,
+)
 
 __DEFAULT__LGB__PARAMS__ = {
     "objective": "lambdarank",
@@ -33,6 +113,45 @@ __DEFAULT__LGB__PARAMS__ = {
     "num_iterations": 10,
 }
 
+FrameType = Union[pl.DataFrame, pl.LazyFrame]
+
+SPLIT_STRATEGIES = ("random", "session")
+# resolution of the hashed session id when assigning it to a split
+SPLIT_BUCKETS = 1_000_000
+
+
+def session_split(
+    group_column: str,
+    split_fractions: Tuple[float, float],
+    seed: int,
+) -> pl.Expr:
+    """
+    Split of each row from its hashed session id.
+
+    Parameters
+    ----------
+    group_column : str
+        The session column.
+    split_fractions : Tuple[float, float]
+        Fractions of the sessions in the train and val splits.
+    seed : int
+        Seed of the session hash.
+
+    Returns
+    -------
+    pl.Expr
+        0 for train, 1 for val and 2 for test rows.
+    """
+    train_fraction, val_fraction = split_fractions
+    bucket = (
+        pl.col(group_column).hash(seed=seed) % SPLIT_BUCKETS
+    ) / SPLIT_BUCKETS
+    # EXPLAIN: a sum of comparisons rather than when/then, which the
+    # streaming sinks of the out-of-core partitioning cannot run
+    return (bucket >= train_fraction).cast(pl.UInt8) + (
+        bucket >= train_fraction + val_fraction
+    ).cast(pl.UInt8)
+
 
 class RankingPipeline(BaseMachineLearningPipeline):
     """
@@ -40,54 +159,339 @@ class RankingPipeline(BaseMachineLearningPipeline):
 
     Attributes
     ----------
-    venues : pl.DataFrame
+    venues : pl.DataFrame or pl.LazyFrame
         DataFrame with information about venues.
-    sessions : pl.DataFrame
+    sessions : pl.DataFrame or pl.LazyFrame
         DataFrame with information about sessions.
+    inputs_deferred : bool
+        Whether the eager read of `venues` and `sessions` waits for a
+        miss of the dataset cache, because their datasets were cached.
+    dataset_dir : str or None
+        Directory of this run holding the train and val binaries, None
+        if `train_data_path` and `val_data_path` are given.
 
     Parameters
     ----------
-    sessions_bucket_path : str
-        Path to the CSV file containing the sessions data.
-    venues_bucket_path : str
-        Path to the CSV file containing the venues data.
+    sessions_bucket_path : str or DataSource
+        Path to the CSV file containing the sessions data, or a source
+        of them such as a `SqlSource`.
+    venues_bucket_path : str or DataSource
+        Path to the CSV file containing the venues data, or a source.
+    lazy : bool, optional
+        If True, scan the CSV files instead of reading them, so that
+        dropping nulls, the join and the projection to the model
+        columns run as one streaming query in `prepare_datasets`.
+    cache_dir : str, optional
+        Directory where the CSV inputs are converted once to a columnar
+        format and memory-mapped on later constructions.
+    cache_format : str, optional
+        "ipc" (default) or "parquet".
+    rebuild_cache : bool, optional
+        Convert the CSV inputs again even if they are cached.
+    split_strategy : str, optional
+        "random" shuffles rows with scikit-learn, "session" assigns
+        whole sessions to train/val/test by hashing `session_id`.
+    split_fractions : tuple of float, optional
+        Fractions of the data in the train and val splits, the rest is
+        the test split.
+    split_seed : int, optional
+        Seed of the session hash used by the "session" strategy.
+    dataset_chunk_size : int, optional
+        If given, LightGBM datasets are built from batches of this many
+        rows instead of one float32 matrix per split.
+    dataset_params : dict, optional
+        LightGBM Dataset parameters, e.g. `max_bin`.
+    dataset_cache_dir : str, optional
+        Directory of constructed train/val binaries keyed by the input
+        fingerprints, features, split, dataset params and the versions
+        of the libraries the binning and split depend on. On a hit
+        the inputs are not read and `prepare_datasets` loads the
+        binaries and skips all other work.
+    dataset_cache_max_bytes : int, optional
+        Disk budget of the dataset cache, least recently used entries
+        are evicted beyond it.
+    profile : bool, optional
+        Record wall time, CPU time, peak RSS and output shape of every
+        stage in `profile_report`, see `profiling.StageProfiler`.
+    compact_dtypes : bool, optional
+        Read only the columns the model uses, with the compact dtypes of
+        `schema` (Int16 positions, Int8 price ranges, float32 rates) and
+        `session_id` hashed to UInt64.
+    out_of_core_partitions : int, optional
+        If given, `prepare_datasets` never holds the joined data in
+        memory: the joined sessions are streamed to disk once and split
+        into this many partitions by their hashed id, each partition is
+        sorted and split on its own, and the LightGBM datasets are
+        binned from the memory-mapped partitions with the bins of a
+        sample. Requires the "session" split strategy and implies
+        `lazy`.
+    out_of_core_dir : str, optional
+        Directory of the temporary partition files.
+    reference_sample_rows : int, optional
+        Rows of the train split the out-of-core bins are computed on.
+    init_model_path : str, optional
+        Artifact of a previous training to continue boosting from on
+        the sessions of this pipeline only, e.g. one new day. The new
+        rows are binned with the bins saved in the artifact, and the
+        artifact manifest lists the session files consumed so far;
+        re-running on one of them trains nothing.
+    distributed_workers : int, optional
+        If given, `train` runs LightGBM's parallel learning on this many
+        local worker processes, each holding the sessions of one
+        partition written by `prepare_datasets`, see `distributed`.
+        Requires the "session" split strategy and implies `lazy`.
+    tree_learner : str, optional
+        "data" or "voting" parallel learning of the distributed mode.
+    feature_aggregates : list of WindowAggregate, optional
+        Features computed between the join and the split from the
+        statistics of earlier windows of sessions, e.g.
+        `feature_engineering.DEFAULT_AGGREGATES`. The statistics of the
+        sessions of this pipeline are added to `feature_cache_dir` as
+        the window `feature_window`, so later windows reuse them.
+    feature_cache_dir : str, optional
+        Directory of the window statistics, required with
+        `feature_aggregates`.
+    feature_window : str, optional
+        Name of the window of the sessions, e.g. their date.
+    checkpoint_dir : str, optional
+        If given, `prepare_datasets`, `train` and
+        `export_model_artifact` run as the stages ingest, clean, join,
+        split, construct, train and export, see `stages`. The outputs
+        of each stage are checkpointed in this directory by a hash of
+        their inputs and config, so a rerun resumes from the last
+        checkpoint still valid, e.g. at train after a failed training.
+        Implies `lazy` and takes the place of the dataset cache.
+    prefetch_chunks : int, optional
+        If given, eager reads of the input files fetch them in chunks
+        of `prefetch_chunk_size` bytes, this many ahead of the parser,
+        see `data_sources.PrefetchingFileSource`; for inputs on slow
+        network-mounted storage. The sessions and venues are always
+        read concurrently. With `cache_dir`, the input files are
+        prefetched when converted, the local copies are not.
+    prefetch_chunk_size : int, optional
+        Bytes per prefetched chunk.
     """
 
     def __init__(
         self,
-        sessions_bucket_path: str,
-        venues_bucket_path: str,
-        **kwargs: str,
+        sessions_bucket_path: Union[str, DataSource],
+        venues_bucket_path: Union[str, DataSource],
+        **kwargs: Any,
     ) -> None:
         """
         Initialize the RankingPipeline object.
 
         Parameters
         ----------
-        sessions_bucket_path : str
-            Path to the CSV file containing the sessions data.
-        venues_bucket_path : str
-            Path to the CSV file containing the venues data.
+        sessions_bucket_path : str or DataSource
+            Path to the CSV file containing the sessions data, or a
+            source of them.
+        venues_bucket_path : str or DataSource
+            Path to the CSV file containing the venues data, or a
+            source of them.
+        lazy : bool, optional
+            Build a lazy query plan instead of reading the files,
+            by default False.
+        cache_dir : str, optional
+            Columnar cache directory, by default None (no cache).
+        cache_format : str, optional
+            Columnar cache format, by default "ipc".
+        rebuild_cache : bool, optional
+            Force the cached columnar files to be rebuilt, by default
+            False.
+        split_strategy : str, optional
+            How to split the data, by default "random".
+        split_fractions : tuple of float, optional
+            Train and val fractions, by default (0.2, 0.16).
+        split_seed : int, optional
+            Seed of the session hash, by default 0.
+        dataset_chunk_size : int, optional
+            Rows per batch pushed to LightGBM, by default None (build
+            from a single matrix).
+        dataset_params : dict, optional
+            LightGBM Dataset parameters, by default None.
+        dataset_cache_dir : str, optional
+            Dataset cache directory, by default None (no cache).
+        dataset_cache_max_bytes : int, optional
+            Dataset cache disk budget, by default None (unlimited).
+        profile : bool, optional
+            Record per-stage measurements, by default False.
+        compact_dtypes : bool, optional
+            Read with compact dtypes, by default False.
+        out_of_core_partitions : int, optional
+            Number of session partitions, by default None (build the
+            datasets in memory).
+        out_of_core_dir : str, optional
+            Partition directory, by default a temporary directory.
+        reference_sample_rows : int, optional
+            Rows sampled for the out-of-core bins, by default 200000.
+        init_model_path : str, optional
+            Artifact to continue training from, by default None
+            (train from scratch).
+        distributed_workers : int, optional
+            Number of local training workers, by default None (train
+            in this process).
+        tree_learner : str, optional
+            Parallel learner of the workers, by default "data".
+        feature_aggregates : list of WindowAggregate, optional
+            Engineered features, by default None (raw columns only).
+        feature_cache_dir : str, optional
+            Window statistics directory, by default None.
+        feature_window : str, optional
+            Window name, by default the sessions file fingerprint.
+        checkpoint_dir : str, optional
+            Stage checkpoint directory, by default None (no stages).
+        prefetch_chunks : int, optional
+            Chunks fetched ahead of the parser, by default None (read
+            the files whole).
+        prefetch_chunk_size : int, optional
+            Bytes per prefetched chunk, by default 8 MiB.
         """
-        super().__init__()
+        super().__init__(profile=kwargs.get("profile", False))
         if not sessions_bucket_path or not venues_bucket_path:
             raise ValueError(
                 "Either sessions path or venues path is not provided"
             )
-        if not os.path.isfile(
-            sessions_bucket_path
-        ) or not os.path.isfile(venues_bucket_path):
-            raise FileNotFoundError(
-                f"File {venues_bucket_path} or {sessions_bucket_path} does not exist."
+        sessions_source = as_source(sessions_bucket_path)
+        venues_source = as_source(venues_bucket_path)
+        self.lazy: bool = bool(kwargs.get("lazy", False))
+        self.split_strategy: str = kwargs.get(
+            "split_strategy", "random"
+        )
+        if self.split_strategy not in SPLIT_STRATEGIES:
+            raise ValueError(
+                f"Unknown split strategy {self.split_strategy}, "
+                f"expected one of {SPLIT_STRATEGIES}"
             )
-        # EXPLAIN: we assume that we can fit datasets in memory, i.e.
-        # either data volume is moderate or we are inside a high-mem instance
-        self.venues: pl.DataFrame = pl.read_csv(venues_bucket_path)
-        # if venue_id is not Int64, then enforce it, so we can join
-
-        self.sessions: pl.DataFrame = pl.read_csv(sessions_bucket_path)
-        self.ranking_data: pl.DataFrame = pl.DataFrame()
-        self.__validate__columns__()
+        self.out_of_core_partitions: Optional[int] = kwargs.get(
+            "out_of_core_partitions"
+        )
+        if self.out_of_core_partitions is not None:
+            if self.out_of_core_partitions < 1:
+                raise ValueError(
+                    "out_of_core_partitions must be a positive integer"
+                )
+            if self.split_strategy != "session":
+                raise ValueError(
+                    "Out-of-core datasets need the 'session' split "
+                    "strategy, a random split needs all rows at once"
+                )
+            # EXPLAIN: the inputs are only ever streamed, one partition
+            # at a time
+            self.lazy = True
+        self.distributed_workers: Optional[int] = kwargs.get(
+            "distributed_workers"
+        )
+        self.tree_learner: str = kwargs.get("tree_learner", "data")
+        if self.distributed_workers is not None:
+            if self.distributed_workers < 1:
+                raise ValueError(
+                    "distributed_workers must be a positive integer"
+                )
+            if self.tree_learner not in TREE_LEARNERS:
+                raise ValueError(
+                    f"Unknown tree learner {self.tree_learner}, "
+                    f"expected one of {TREE_LEARNERS}"
+                )
+            if self.split_strategy != "session":
+                raise ValueError(
+                    "Distributed training shards whole sessions, it "
+                    "needs the 'session' split strategy"
+                )
+            if self.out_of_core_partitions is not None:
+                raise ValueError(
+                    "distributed_workers and out_of_core_partitions "
+                    "cannot be combined"
+                )
+            self.lazy = True
+        self.out_of_core_dir: Optional[str] = kwargs.get(
+            "out_of_core_dir"
+        )
+        self.reference_sample_rows: int = int(
+            kwargs.get("reference_sample_rows", DEFAULT_BIN_SAMPLE_ROWS)
+        )
+        self.split_fractions: Tuple[float, float] = tuple(
+            kwargs.get("split_fractions", (0.2, 0.16))
+        )
+        if (
+            len(self.split_fractions) != 2
+            or min(self.split_fractions) <= 0
+            or sum(self.split_fractions) >= 1
+        ):
+            raise ValueError(
+                "split_fractions must be two positive fractions "
+                "summing to less than 1"
+            )
+        self.split_seed: int = int(kwargs.get("split_seed", 0))
+        self.dataset_chunk_size: Optional[int] = kwargs.get(
+            "dataset_chunk_size"
+        )
+        self.dataset_params: Dict[str, Any] = dict(
+            kwargs.get("dataset_params") or {}
+        )
+        dataset_cache_dir: Optional[str] = kwargs.get(
+            "dataset_cache_dir"
+        )
+        self.dataset_cache: Optional[DatasetCache] = None
+        # EXPLAIN: identify the training data in the dataset cache key
+        # and the model manifest
+        self.input_fingerprints: List[str] = [
+            sessions_source.fingerprint(),
+            venues_source.fingerprint(),
+        ]
+        # EXPLAIN: the partition is named by the input, not by the
+        # columnar cache file it may be replaced with below
+        self.partition: Dict[str, str] = {
+            "path": sessions_source.uri,
+            "fingerprint": self.input_fingerprints[0],
+        }
+        if dataset_cache_dir:
+            self.dataset_cache = DatasetCache(
+                dataset_cache_dir, kwargs.get("dataset_cache_max_bytes")
+            )
+        cache_dir: Optional[str] = kwargs.get("cache_dir")
+        prefetch_chunks: Optional[int] = kwargs.get("prefetch_chunks")
+        prefetch_chunk_size: int = kwargs.get(
+            "prefetch_chunk_size", DEFAULT_PREFETCH_CHUNK_SIZE
+        )
+        # EXPLAIN: a prefetched source reads the whole table, lazy
+        # plans scan the files instead unless they are converted to the
+        # columnar cache first; checkpoints imply lazy below
+        if prefetch_chunks is not None and (
+            cache_dir or not (self.lazy or kwargs.get("checkpoint_dir"))
+        ):
+            venues_source, sessions_source = (
+                PrefetchingFileSource(
+                    source.path, prefetch_chunk_size, prefetch_chunks
+                )
+                if type(source) is FileSource
+                else source
+                for source in (venues_source, sessions_source)
+            )
+        if cache_dir:
+            with self.profile_stage("columnar_cache"):
+                cache_format = kwargs.get("cache_format", "ipc")
+                rebuild_cache = bool(kwargs.get("rebuild_cache", False))
+                # EXPLAIN: only files are converted, a database is
+                # queried on every run; a prefetched input is read
+                # through its chunks once, by the conversion, and the
+                # local columnar copy is memory-mapped as usual
+                venues_source, sessions_source = (
+                    FileSource(
+                        cache_as_columnar(
+                            source.path,
+                            cache_dir,
+                            cache_format,
+                            rebuild_cache,
+                            read=source.read
+                            if isinstance(source, PrefetchingFileSource)
+                            else None,
+                        )
+                    )
+                    if isinstance(source, FileSource)
+                    else source
+                    for source in (venues_source, sessions_source)
+                )
         self.group_column: str = "session_id"
         self.rank_column: str = "rating"
         self.label_column: str = "has_seen_venue_in_this_session"
@@ -102,31 +506,284 @@ class RankingPipeline(BaseMachineLearningPipeline):
             "is_from_order_again",
             "is_recommended",
         ]
+        self.feature_aggregates: List[WindowAggregate] = list(
+            kwargs.get("feature_aggregates") or []
+        )
+        self.feature_cache: Optional[FeatureCache] = None
+        if self.feature_aggregates:
+            feature_cache_dir: Optional[str] = kwargs.get(
+                "feature_cache_dir"
+            )
+            if not feature_cache_dir:
+                raise ValueError(
+                    "feature_aggregates need a feature_cache_dir to "
+                    "keep the statistics of past windows in"
+                )
+            self.feature_cache = FeatureCache(feature_cache_dir)
+        self.feature_window: str = (
+            kwargs.get("feature_window") or self.input_fingerprints[0]
+        )
+        self.features += [
+            aggregate.name for aggregate in self.feature_aggregates
+        ]
+        self.compact_dtypes: bool = bool(
+            kwargs.get("compact_dtypes", False)
+        )
+        self.init_model_path: Optional[str] = kwargs.get(
+            "init_model_path"
+        )
+        self.init_model: Optional[Any] = None
+        self.bin_reference: Optional[Any] = None
+        self.consumed_partitions: List[Dict[str, str]] = []
+        checkpoint_dir: Optional[str] = kwargs.get("checkpoint_dir")
+        self.stage_graph: Optional[StageGraph] = None
+        if checkpoint_dir:
+            if (
+                self.init_model_path
+                or self.out_of_core_partitions is not None
+                or self.distributed_workers is not None
+            ):
+                raise ValueError(
+                    "checkpoint_dir stages the in-memory preparation, "
+                    "it cannot be combined with init_model_path, "
+                    "out_of_core_partitions or distributed_workers"
+                )
+            self.stage_graph = StageGraph(
+                CheckpointStore(checkpoint_dir, self.dataset_params),
+                profile=self.profile_stage,
+            )
+            # EXPLAIN: the inputs are only read by the ingest stage,
+            # which a checkpoint downstream of it skips
+            self.lazy = True
+        if self.init_model_path:
+            self.__load__init__model__(self.init_model_path)
+        self.venues: FrameType
+        self.sessions: FrameType
+        self.input_sources: Tuple[DataSource, DataSource] = (
+            venues_source,
+            sessions_source,
+        )
+        self.ranking_data: FrameType = pl.DataFrame()
+        # EXPLAIN: an eager read parses the inputs in full, which a hit
+        # of the dataset cache makes unnecessary, so it waits for a
+        # miss; only the headers are checked here
+        self.inputs_deferred: bool = (
+            self.dataset_cache is not None
+            and not self.lazy
+            and not self.incremental
+            and self.__cached__datasets__() is not None
+        )
+        if self.inputs_deferred:
+            self.__validate__columns__(
+                venues_source.columns, sessions_source.columns
+            )
+        else:
+            self.__read__inputs__()
 
         self.val_set: lgb.Dataset = lgb.Dataset(data=[])  # type: ignore[no-any-unimported]
-        # read train_data_path parameter if provided
+        # EXPLAIN: by default the binaries go to a directory of this
+        # run, removed with the pipeline, so concurrent runs on a host
+        # never overwrite each other's files in a shared tmp
+        self.dataset_dir: Optional[str] = None
+        if not (
+            kwargs.get("train_data_path")
+            and kwargs.get("val_data_path")
+        ):
+            self.dataset_dir = tempfile.mkdtemp(
+                prefix="ranking_datasets_"
+            )
+            weakref.finalize(
+                self,
+                shutil.rmtree,
+                self.dataset_dir,
+                ignore_errors=True,
+            )
         self.train_data_path: str = kwargs.get(
-            "train_data_path", "/tmp/train_set.binary"
+            "train_data_path"
+        ) or os.path.join(str(self.dataset_dir), TRAIN_FILE_NAME)
+        self.val_data_path: str = kwargs.get(
+            "val_data_path"
+        ) or os.path.join(str(self.dataset_dir), VAL_FILE_NAME)
+        self.n_features = len(self.features)
+
+    def __load__init__model__(self, artifact_path: str) -> None:
+        """
+        Load the model, bins and consumed partitions of an artifact.
+
+        Parameters
+        ----------
+        artifact_path : str
+            Artifact of the previous training.
+        """
+        if (
+            self.out_of_core_partitions is not None
+            or self.distributed_workers is not None
+        ):
+            raise ValueError(
+                "Incremental training builds the dataset of one "
+                "partition in memory, out_of_core_partitions and "
+                "distributed_workers must not be set"
+            )
+        self.init_model = load_model_from_artifact(artifact_path)
+        if list(self.init_model.feature_name()) != self.features:
+            raise ValueError(
+                f"Model {artifact_path} was trained on features "
+                f"{self.init_model.feature_name()}, "
+                f"expected {self.features}"
+            )
+        if is_native_artifact(artifact_path):
+            self.consumed_partitions = list(
+                read_manifest(artifact_path).get("partitions", [])
+            )
+        self.bin_reference = load_bin_reference(
+            artifact_path, self.dataset_params
         )
-        self.val_data_path = kwargs.get(
-            "val_data_path", "/tmp/val_set.binary"
+        if self.bin_reference is None:
+            logging.warning(
+                "Artifact %s has no bins, the new sessions are binned "
+                "with bins of their own",
+                artifact_path,
+            )
+
+    @property
+    def incremental(self) -> bool:
+        """Whether training continues from `init_model_path`."""
+        return self.init_model is not None
+
+    @property
+    def partition_consumed(self) -> bool:
+        """Whether the init model was already trained on the sessions."""
+        return any(
+            consumed.get("fingerprint") == self.partition["fingerprint"]
+            for consumed in self.consumed_partitions
+        )
+
+    def __read__table__(
+        self, source: DataSource, dtypes: Dict[str, Any]
+    ) -> FrameType:
+        """
+        Read or scan an input, with compact dtypes if requested.
+
+        Parameters
+        ----------
+        source : DataSource
+            The file or database table.
+        dtypes : Dict[str, Any]
+            The planned dtypes of the file columns, see `schema`.
+
+        Returns
+        -------
+        pl.DataFrame or pl.LazyFrame
+            The DataFrame, or a LazyFrame in lazy mode.
+        """
+        if not self.compact_dtypes:
+            return source.scan() if self.lazy else source.read()
+        # EXPLAIN: columns the model does not use are never parsed, and
+        # session ids are hashed batch by batch, so the strings are
+        # never all in memory
+        columns, planned_dtypes = plan_read(
+            source.columns,
+            self.__input__columns__(),
+            dtypes,
+        )
+        plan = source.scan(columns, planned_dtypes)
+        if self.group_column in columns:
+            plan = hash_session_id(plan)
+        return plan if self.lazy else plan.collect(streaming=True)
+
+    def __read__inputs__(self) -> None:
+        """
+        Read or scan the venues and sessions of `input_sources`.
+        """
+        venues_source, sessions_source = self.input_sources
+        with self.profile_stage("read") as stage:
+            # EXPLAIN: lazily only the file headers are read here, the
+            # data is streamed in bounded memory when prepare_datasets
+            # collects; eagerly we assume that we can fit datasets in
+            # memory, i.e. either data volume is moderate or we are
+            # inside a high-mem instance. Both inputs are read at once,
+            # so the wait on one overlaps the parsing of the other
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                venues = executor.submit(
+                    self.__read__table__, venues_source, VENUES_DTYPES
+                )
+                sessions = executor.submit(
+                    self.__read__table__,
+                    sessions_source,
+                    SESSIONS_DTYPES,
+                )
+                self.venues = venues.result()
+                self.sessions = sessions.result()
+            stage.set_output(self.sessions)
+        self.inputs_deferred = False
+        self.__validate__columns__(
+            self.venues.columns, self.sessions.columns
         )
-        self.n_features = len(self.features)
-        delete_file_if_exists(self.train_data_path)
-        delete_file_if_exists(self.val_data_path)
 
-    def __validate__columns__(self) -> None:
-        if "venue_id" not in self.venues.columns:
+    def __validate__columns__(
+        self, venues_columns: List[str], sessions_columns: List[str]
+    ) -> None:
+        if "venue_id" not in venues_columns:
             raise ValueError(
                 "Column 'venue_id' is not found in venues file"
             )
-        if "venue_id" not in self.sessions.columns:
+        if "venue_id" not in sessions_columns:
             raise ValueError(
                 "Column 'venue_id' is not found in sessions file"
             )
 
+    def __input__columns__(self) -> List[str]:
+        """Columns needed from the inputs, before feature engineering."""
+        engineered = {
+            aggregate.name for aggregate in self.feature_aggregates
+        }
+        columns = [
+            column
+            for column in self.__model__columns__()
+            if column not in engineered
+        ]
+        for aggregate in self.feature_aggregates:
+            columns.extend(aggregate.input_columns)
+        return list(dict.fromkeys(columns))
+
+    def __engineer__features__(self, rows: FrameType) -> FrameType:
+        """
+        Add the `feature_aggregates` to the joined rows.
+
+        Parameters
+        ----------
+        rows : pl.DataFrame or pl.LazyFrame
+            Sessions joined with venues.
+
+        Returns
+        -------
+        pl.DataFrame or pl.LazyFrame
+            The rows with one more column per aggregate.
+        """
+        if self.feature_cache is None:
+            return rows
+        with self.profile_stage("feature_engineering") as stage:
+            # EXPLAIN: eager rows are collected again with the model
+            # columns by __collect__ranking__data__
+            rows = add_window_features(
+                rows.lazy(),
+                self.feature_aggregates,
+                self.feature_cache,
+                self.feature_window,
+            )
+            stage.set_output(rows)
+        return rows
+
+    def __model__columns__(self) -> List[str]:
+        """Columns needed downstream of the join, in a stable order."""
+        columns = [self.group_column, self.label_column, *self.features]
+        return list(dict.fromkeys(columns))
+
     def __convert__boolean__to__int__(self) -> None:
-        if self.ranking_data.is_empty():
+        if (
+            isinstance(self.ranking_data, pl.DataFrame)
+            and self.ranking_data.is_empty()
+        ):
             return
         bool_cols = self.ranking_data.select(pl.col(pl.Boolean)).columns
         if len(bool_cols) == 0:
@@ -147,6 +804,14 @@ class RankingPipeline(BaseMachineLearningPipeline):
         -------
         None
         """
+        if isinstance(self.venues, pl.LazyFrame) or isinstance(
+            self.sessions, pl.LazyFrame
+        ):
+            # row counts are unknown until the plan is collected
+            self.venues = self.venues.drop_nulls()
+            self.sessions = self.sessions.drop_nulls()
+            logging.info("dropping rows with null values lazily ..")
+            return
         init_rows_cnt = self.venues.shape[0]
         self.venues = self.venues.drop_nulls()
         self.sessions = self.sessions.drop_nulls()
@@ -160,107 +825,803 @@ class RankingPipeline(BaseMachineLearningPipeline):
         logging.info("dropping them ..")
 
     def __join__sessions__and__venues__(self) -> None:
-        self.ranking_data = self.sessions.join(
-            self.venues, on="venue_id"
+        """
+        Enrich the sessions with the venue features.
+
+        Eager frames with integer venue ids are enriched through a
+        `VenueFeatureStore`, an index lookup and a gather instead of a
+        hash join; the store is kept as `venue_store` for scoring. Lazy
+        plans, and venues with duplicated ids, keep Polars' join.
+        """
+        if isinstance(self.sessions, pl.DataFrame) and isinstance(
+            self.venues, pl.DataFrame
+        ):
+            duplicated = duplicated_ids(self.venues)
+            if duplicated:
+                logging.warning(
+                    "%s venue ids have several rows, their sessions are "
+                    "joined to each of them",
+                    duplicated,
+                )
+            elif self.venues.schema["venue_id"] in pl.INTEGER_DTYPES:
+                self.venue_store = VenueFeatureStore(self.venues)
+                self.ranking_data = self.venue_store.enrich(
+                    self.sessions
+                )
+                self.__convert__boolean__to__int__()
+                return
+        ranking_plan = self.sessions.lazy().join(
+            self.venues.lazy(), on="venue_id"
+        )
+        self.ranking_data = (
+            ranking_plan if self.lazy else ranking_plan.collect()
         )
         self.__convert__boolean__to__int__()
 
+    def __collect__ranking__data__(self) -> None:
+        """Run the lazy plan, keeping only the columns the model needs."""
+        if not isinstance(self.ranking_data, pl.LazyFrame):
+            return
+        self.ranking_data = self.ranking_data.select(
+            self.__model__columns__()
+        ).collect(streaming=True)
+
     def __save__datasets__(self) -> None:
         if not hasattr(self, "train_set") or self.train_set is None:
             raise Exception("No attribute 'train_set' found")
         if isinstance(self.train_set, pl.DataFrame):
             raise ValueError("self.train_set is not Polars dataframe")
+        # EXPLAIN: LightGBM does not overwrite an existing binary, the
+        # files of an earlier run at the same path are replaced
+        delete_file_if_exists(self.train_data_path)
         self.train_set.save_binary(self.train_data_path)
         if not hasattr(self, "val_set") or self.val_set is None:
             raise Exception("No attribute 'val_set' found")
         if isinstance(self.val_set, pl.DataFrame):
             raise ValueError("self.val_set is not Polars dataframe")
+        delete_file_if_exists(self.val_data_path)
         self.val_set.save_binary(self.val_data_path)
 
-    def prepare_datasets(self) -> None:
+    def __split__id__(self) -> pl.Expr:
+        """
+        Split of each row from its hashed session id.
+
+        Returns
+        -------
+        pl.Expr
+            0 for train, 1 for val and 2 for test rows.
+        """
+        return session_split(
+            self.group_column, self.split_fractions, self.split_seed
+        )
+
+    def __split__by__session__(
+        self,
+    ) -> Tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+        """
+        Split the ranking data into train, val and test sets, keeping
+        each session whole.
+
+        Each session is assigned to a split by its hashed id, so the
+        assignment is a single vectorized pass that is reproducible for
+        a given seed and does not shuffle or copy rows in Python.
+
+        Returns
+        -------
+        Tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]
+            The train, val and test sets.
+        """
+        split_column = "__split__"
+        split_id = self.__split__id__().alias(split_column)
+        ranking_data: pl.DataFrame = self.ranking_data  # type: ignore[assignment]
+        splits = ranking_data.with_columns(split_id).partition_by(
+            split_column, as_dict=True
+        )
+        empty = ranking_data.clear()
+        train_set, val_set, test_set = (
+            splits[split].drop(split_column)
+            if split in splits
+            else empty
+            for split in range(3)
+        )
+        return train_set, val_set, test_set
+
+    def __dataset__cache__key__(self) -> str:
+        # EXPLAIN: options are only part of the key when set, so keys
+        # of runs without them stay valid
+        options: Dict[str, Any] = {}
+        if self.compact_dtypes:
+            # hashed session ids change the session split
+            options["compact_dtypes"] = True
+        if self.out_of_core_partitions is not None:
+            # the bins come from a sample, so they depend on the sample
+            # size and the partitioning
+            options.update(
+                out_of_core_partitions=self.out_of_core_partitions,
+                reference_sample_rows=self.reference_sample_rows,
+            )
+        if self.feature_cache is not None:
+            # the features of a window depend on the windows before it
+            options["feature_history"] = self.__feature__history__()
+        if self.split_strategy == "random":
+            # train_test_split's shuffle may change between releases
+            options["sklearn_version"] = importlib.metadata.version(
+                "scikit-learn"
+            )
+        return cache_key(
+            inputs=self.input_fingerprints,
+            features=self.features,
+            group_column=self.group_column,
+            rank_column=self.rank_column,
+            label_column=self.label_column,
+            split_strategy=self.split_strategy,
+            split_fractions=list(self.split_fractions),
+            split_seed=self.split_seed,
+            dataset_params=self.dataset_params,
+            lightgbm_version=lgb.__version__,
+            # EXPLAIN: the session split and the hashed session ids
+            # use Polars' hash, which is not stable across releases
+            polars_version=pl.__version__,
+            **options,
+        )
+
+    def __feature__history__(self) -> Dict[str, List[str]]:
+        """The windows the features are aggregated over, by aggregate."""
+        if self.feature_cache is None:
+            return {}
+        return {
+            aggregate.fingerprint: self.feature_cache.history_windows(
+                aggregate, self.feature_window
+            )
+            for aggregate in self.feature_aggregates
+        }
+
+    def __stages__(
+        self,
+        params: Optional[Dict[str, Any]] = None,
+        export: Optional[Tuple[str, str, Optional[str]]] = None,
+    ) -> List[Stage]:
+        """
+        The stages of `checkpoint_dir` mode, in dependency order.
+
+        Parameters
+        ----------
+        params : Dict[str, Any], optional
+            LightGBM parameters; if given, the train stage is added.
+        export : Tuple[str, str, Optional[str]], optional
+            Model path, artifact format and compression; if given, the
+            export stage is added.
+
+        Returns
+        -------
+        List[Stage]
+            The stages.
+        """
+        stages = [
+            Stage(
+                "ingest",
+                self.__ingest__,
+                inputs=[],
+                outputs={"sessions": "frame", "venues": "frame"},
+                config={
+                    "inputs": self.input_fingerprints,
+                    "compact_dtypes": self.compact_dtypes,
+                    "columns": self.__input__columns__(),
+                },
+            ),
+            Stage(
+                "clean",
+                self.__clean__,
+                inputs=["sessions", "venues"],
+                outputs={
+                    "clean_sessions": "frame",
+                    "clean_venues": "frame",
+                },
+            ),
+            Stage(
+                "join",
+                self.__join__,
+                inputs=["clean_sessions", "clean_venues"],
+                outputs={"ranking_data": "frame"},
+                config={
+                    "columns": self.__model__columns__(),
+                    "feature_history": self.__feature__history__(),
+                },
+            ),
+            Stage(
+                "split",
+                self.__split__,
+                inputs=["ranking_data"],
+                outputs={"train_rows": "frame", "val_rows": "frame"},
+                config={
+                    "split_strategy": self.split_strategy,
+                    "split_fractions": list(self.split_fractions),
+                    "split_seed": self.split_seed,
+                },
+            ),
+            Stage(
+                "construct",
+                self.__construct__,
+                inputs=["train_rows", "val_rows"],
+                outputs={
+                    "train_set": "dataset",
+                    "val_set": "dataset",
+                    "bins": "dataset",
+                },
+                config={
+                    "features": self.features,
+                    "group_column": self.group_column,
+                    "rank_column": self.rank_column,
+                    "label_column": self.label_column,
+                    "dataset_params": self.dataset_params,
+                    "lightgbm_version": lgb.__version__,
+                },
+            ),
+        ]
+        if params is not None:
+            stages.append(
+                Stage(
+                    "train",
+                    self.__fit__,
+                    inputs=["train_set", "val_set"],
+                    outputs={"model": "booster"},
+                    config={"params": params},
+                )
+            )
+        if export is not None:
+            model_path, artifact_format, compression = export
+            stages.append(
+                Stage(
+                    "export",
+                    lambda model, bins: self.__export__(
+                        model,
+                        bins,
+                        model_path,
+                        artifact_format,
+                        compression,
+                    ),
+                    inputs=["model", "bins"],
+                    outputs={"artifact": "path"},
+                    checkpoint=False,
+                )
+            )
+        return stages
+
+    def __ingest__(self) -> Dict[str, Any]:
+        """Read the inputs."""
+        return {
+            "sessions": self.sessions.lazy().collect(streaming=True),
+            "venues": self.venues.lazy().collect(streaming=True),
+        }
+
+    def __clean__(
+        self, sessions: pl.DataFrame, venues: pl.DataFrame
+    ) -> Dict[str, Any]:
+        """Drop the rows with missing values."""
+        self.sessions, self.venues = sessions, venues
         self.__drop__nulls__()
+        return {
+            "clean_sessions": self.sessions,
+            "clean_venues": self.venues,
+        }
+
+    def __join__(
+        self, clean_sessions: pl.DataFrame, clean_venues: pl.DataFrame
+    ) -> Dict[str, Any]:
+        """Join the venue and engineered features to the sessions."""
+        self.sessions, self.venues = clean_sessions, clean_venues
         self.__join__sessions__and__venues__()
         del self.sessions
         del self.venues
+        self.ranking_data = self.__engineer__features__(
+            self.ranking_data
+        )
+        ranking_data = (
+            self.ranking_data.lazy()
+            .select(self.__model__columns__())
+            .collect(streaming=True)
+        )
+        self.ranking_data = pl.DataFrame()
+        return {"ranking_data": ranking_data}
+
+    def __split__(self, ranking_data: pl.DataFrame) -> Dict[str, Any]:
+        """Split the rows into the train and val rows."""
+        self.ranking_data = ranking_data
+        train_rows, val_rows = self.__split__ranking__data__()
+        self.ranking_data = pl.DataFrame()
+        return {"train_rows": train_rows, "val_rows": val_rows}
+
+    def __construct__(
+        self, train_rows: pl.DataFrame, val_rows: pl.DataFrame
+    ) -> Dict[str, Any]:
+        """Bin the train and val rows into LightGBM datasets."""
+        self.__build__lgb__datasets__(train_rows, val_rows)
+        return {
+            "train_set": self.train_set,
+            "val_set": self.val_set,
+            "bins": self.bin_reference,
+        }
+
+    def __fit__(self, train_set: Any, val_set: Any) -> Dict[str, Any]:
+        """Train the model on the datasets."""
+        self.train_set, self.val_set = train_set, val_set
+        return {"model": self.__boost__(self.params)}
+
+    def __export__(
+        self,
+        model: Any,
+        bins: Any,
+        model_path: str,
+        artifact_format: str,
+        compression: Optional[str],
+    ) -> Dict[str, Any]:
+        """Save the model as an artifact, with the bins of its datasets."""
+        self.model = model
+        self.bin_reference = bins
+        self.__export__model__(model_path, artifact_format, compression)
+        return {"artifact": model_path}
+
+    def __prepare__staged__(self) -> None:
+        """
+        Produce the datasets with the stages, from their checkpoints.
+
+        The datasets are used from the checkpoint files, which also
+        serve `search` as the saved binaries.
+        """
+        assert self.stage_graph is not None
+        stages = self.__stages__()
+        datasets = self.stage_graph.run(
+            stages, ["train_set", "val_set", "bins"]
+        )
+        self.train_set = datasets["train_set"]
+        self.val_set = datasets["val_set"]
+        self.bin_reference = datasets["bins"]
+        (
+            self.train_data_path,
+            self.val_data_path,
+            _,
+        ) = self.stage_graph.output_paths(stages, "construct")
+
+    def prepare_datasets(self) -> None:
+        if self.stage_graph is not None:
+            self.__prepare__staged__()
+            return
+        if self.incremental:
+            self.__prepare__incremental__()
+            return
+        if self.distributed_workers is not None:
+            self.__prepare__distributed__(self.distributed_workers)
+            return
+        if self.dataset_cache is not None:
+            key = self.__dataset__cache__key__()
+            cached_paths = self.__cached__datasets__()
+            if cached_paths is not None:
+                self.train_data_path, self.val_data_path = cached_paths
+                with self.profile_stage("load_datasets") as stage:
+                    self.__load__datasets__()
+                    self.bin_reference = lgb.Dataset(
+                        self.__bins__path__(),
+                        params=self.dataset_params,
+                    ).construct()
+                    stage.set_output(self.train_set)
+                return
+            (
+                self.train_data_path,
+                self.val_data_path,
+            ) = self.dataset_cache.staging_paths(key)
+        if self.inputs_deferred:
+            # EXPLAIN: the entry was evicted since the constructor
+            self.__read__inputs__()
+        if self.out_of_core_partitions is not None:
+            self.__prepare__out__of__core__(self.out_of_core_partitions)
+        else:
+            self.__prepare__in__memory__()
+        if self.dataset_cache is not None:
+            # EXPLAIN: a hit loads the binned datasets only, the bins
+            # are kept for the model artifact
+            assert self.bin_reference is not None
+            self.bin_reference.save_binary(self.__bins__path__())
+            (
+                self.train_data_path,
+                self.val_data_path,
+            ) = self.dataset_cache.commit(
+                self.__dataset__cache__key__()
+            )
+
+    def __bins__path__(self) -> str:
+        """The bins of a dataset cache entry, next to its binaries."""
+        return os.path.join(
+            os.path.dirname(self.train_data_path), BINS_FILE_NAME
+        )
+
+    def __cached__datasets__(self) -> Optional[Tuple[str, str]]:
+        """
+        The train and val binaries of the dataset cache, if cached.
+
+        Returns
+        -------
+        Tuple[str, str] or None
+            The paths, None on a miss or for an entry without bins,
+            e.g. one written before the bins were cached.
+        """
+        assert self.dataset_cache is not None
+        key = self.__dataset__cache__key__()
+        cached_paths = self.dataset_cache.lookup(key)
+        if cached_paths is None:
+            return None
+        bins_path = os.path.join(
+            os.path.dirname(cached_paths[0]), BINS_FILE_NAME
+        )
+        if not os.path.isfile(bins_path):
+            logging.info("Dataset cache entry %s has no bins", key)
+            return None
+        return cached_paths
+
+    def __prepare__in__memory__(self) -> None:
+        with self.profile_stage("drop_nulls") as stage:
+            self.__drop__nulls__()
+            stage.set_output(self.sessions)
+        with self.profile_stage("join") as stage:
+            self.__join__sessions__and__venues__()
+            stage.set_output(self.ranking_data)
+        self.ranking_data = self.__engineer__features__(
+            self.ranking_data
+        )
+        self.__collect__ranking__data__()
+        del self.sessions
+        del self.venues
         gc.collect()
-        train_set, unseen_set = train_test_split(
-            self.ranking_data, train_size=0.2, test_size=0.8
+        with self.profile_stage("split") as stage:
+            train_set, val_set = self.__split__ranking__data__()
+            stage.set_output(train_set)
+        with self.profile_stage("dataset_construction") as stage:
+            self.__build__lgb__datasets__(train_set, val_set)
+            stage.set_output(self.train_set)
+        # some memory management
+        del train_set
+        del val_set
+        gc.collect()
+        with self.profile_stage("save_datasets"):
+            self.__save__datasets__()
+
+    def __prepare__incremental__(self) -> None:
+        """
+        Build the datasets of the new sessions for `init_model`.
+
+        The datasets are left unconstructed: `lgb.train` computes the
+        scores of the init model on their raw rows before binning them,
+        so they bypass the dataset cache and the saved binaries.
+        """
+        if self.partition_consumed:
+            logging.info(
+                "Sessions %s were already consumed by %s, "
+                "nothing to train",
+                self.partition["path"],
+                self.init_model_path,
+            )
+            return
+        with self.profile_stage("drop_nulls") as stage:
+            self.__drop__nulls__()
+            stage.set_output(self.sessions)
+        with self.profile_stage("join") as stage:
+            self.__join__sessions__and__venues__()
+            stage.set_output(self.ranking_data)
+        self.ranking_data = self.__engineer__features__(
+            self.ranking_data
+        )
+        self.__collect__ranking__data__()
+        del self.sessions
+        del self.venues
+        gc.collect()
+        with self.profile_stage("split") as stage:
+            train_set, val_set = self.__split__ranking__data__()
+            stage.set_output(train_set)
+        with self.profile_stage("dataset_construction"):
+            self.__build__lgb__datasets__(
+                train_set, val_set, construct=False
+            )
+
+    def __prepare__out__of__core__(self, n_partitions: int) -> None:
+        """
+        Build the train and val datasets one session partition at a time.
+
+        LightGBM 3 cannot append rows to a binary dataset on disk, so
+        the partitions are written as memory-mapped Arrow files and
+        binned batch by batch into one Dataset with the bins of a
+        sample. Peak memory is the binned train set, about one byte per
+        feature and row, plus one partition, instead of the joined data
+        and its float32 matrix.
+
+        Parameters
+        ----------
+        n_partitions : int
+            Number of session partitions.
+        """
+        paths = self.__write__partitions__(n_partitions)
+        try:
+            with self.profile_stage("reference_sample"):
+                reference = sample_reference(
+                    paths["train"],
+                    self.features,
+                    sample_rows=self.reference_sample_rows,
+                    params=self.dataset_params,
+                    seed=self.split_seed,
+                )
+            with self.profile_stage("dataset_construction") as stage:
+                self.train_set = build_partitioned_dataset(
+                    paths["train"],
+                    self.features,
+                    self.label_column,
+                    self.group_column,
+                    reference=reference,
+                    chunk_size=self.dataset_chunk_size,
+                    params=self.dataset_params,
+                )
+                self.val_set = build_partitioned_dataset(
+                    paths["val"],
+                    self.features,
+                    self.label_column,
+                    self.group_column,
+                    reference=self.train_set,
+                    chunk_size=self.dataset_chunk_size,
+                    params=self.dataset_params,
+                )
+                stage.set_output(self.train_set)
+            self.bin_reference = reference
+            del reference
+            gc.collect()
+            with self.profile_stage("save_datasets"):
+                self.__save__datasets__()
+        finally:
+            self.__remove__partitions__(paths)
+
+    def __write__partitions__(
+        self, n_partitions: int
+    ) -> Dict[str, List[str]]:
+        """
+        Join, split and write the sessions in `n_partitions` partitions.
+
+        Parameters
+        ----------
+        n_partitions : int
+            Number of session partitions.
+
+        Returns
+        -------
+        Dict[str, List[str]]
+            The non-empty train and val partition files.
+        """
+        # EXPLAIN: the partitions are written from one streaming pass,
+        # which cannot run `LazyFrame.drop_nulls`
+        ranking_plan = (
+            drop_nulls(self.sessions.lazy())
+            .join(drop_nulls(self.venues.lazy()), on="venue_id")
+            .select(self.__input__columns__())
+        )
+        ranking_plan = (
+            self.__engineer__features__(ranking_plan)
+            .lazy()
+            .select(self.__model__columns__())
+        )
+        del self.sessions
+        del self.venues
+        self.partition_dir = self.out_of_core_dir or tempfile.mkdtemp(
+            prefix="ranking_partitions_"
         )
+        with self.profile_stage("partition"):
+            # EXPLAIN: a different seed than the split, otherwise every
+            # partition would hold the sessions of one split only
+            return write_partitions(
+                ranking_plan,
+                self.partition_dir,
+                n_partitions,
+                partition=partition_expression(
+                    self.group_column,
+                    n_partitions,
+                    self.split_seed + 1,
+                ),
+                split=self.__split__id__(),
+                sort_columns=[self.group_column, self.rank_column],
+            )
+
+    def __remove__partitions__(
+        self, paths: Dict[str, List[str]]
+    ) -> None:
+        remove_partitions(paths)
+        if self.out_of_core_dir is None:
+            os.rmdir(self.partition_dir)
+
+    def __prepare__distributed__(self, n_workers: int) -> None:
+        """
+        Write one partition of whole sessions per training worker.
 
+        Parameters
+        ----------
+        n_workers : int
+            Number of training workers.
+        """
+        self.partition_paths = self.__write__partitions__(n_workers)
+        if len(self.partition_paths["train"]) < n_workers:
+            logging.warning(
+                "Only %s of %s partitions hold train sessions, "
+                "training on as many workers",
+                len(self.partition_paths["train"]),
+                n_workers,
+            )
+        if not self.partition_paths["train"]:
+            self.__remove__partitions__(self.partition_paths)
+            raise ValueError("No train sessions to train on")
+
+    def __train__distributed__(self, params: Dict[str, Any]) -> None:
+        """
+        Train on the partitions of `prepare_datasets`, then remove them.
+
+        The workers train without validation sets, early stopping would
+        need them to agree on when to stop. The val partitions are
+        scored afterwards with `evaluation.ranking_metrics` instead.
+
+        Parameters
+        ----------
+        params : Dict[str, Any]
+            LightGBM training parameters.
+        """
+        if not hasattr(self, "partition_paths"):
+            self.prepare_datasets()
+        paths = self.partition_paths
+        try:
+            with self.profile_stage("train"):
+                self.model = train_distributed(
+                    paths["train"],
+                    self.features,
+                    self.label_column,
+                    self.group_column,
+                    params,
+                    tree_learner=self.tree_learner,
+                )
+            if paths["val"]:
+                with self.profile_stage("evaluate"):
+                    val_set = pl.concat(
+                        [read_partition(path) for path in paths["val"]]
+                    )
+                    self.val_metrics = evaluate_scores(
+                        val_set,
+                        self.model.predict(
+                            to_float32_matrix(val_set, self.features)
+                        ),
+                        group_column=self.group_column,
+                        label_column=self.label_column,
+                        cutoffs=params.get(
+                            "ndcg_eval_at", DEFAULT_CUTOFFS
+                        ),
+                    )
+                    del val_set
+        finally:
+            self.__remove__partitions__(paths)
+            del self.partition_paths
+
+    def __split__ranking__data__(
+        self,
+    ) -> Tuple[pl.DataFrame, pl.DataFrame]:
+        """
+        Split the collected ranking data into train and val sets.
+
+        Returns
+        -------
+        Tuple[pl.DataFrame, pl.DataFrame]
+            The train and val sets, the rest of the data is dropped.
+        """
+        if self.split_strategy == "session":
+            train_set, val_set, _ = self.__split__by__session__()
+            return train_set, val_set
+        # EXPLAIN: scikit-learn is only imported by the random split
+        from sklearn.model_selection import train_test_split
+
+        train_fraction, val_fraction = self.split_fractions
+        train_set, unseen_set = train_test_split(
+            self.ranking_data,
+            train_size=train_fraction,
+            random_state=self.split_seed,
+        )
+        # EXPLAIN: val_fraction is relative to the whole data, the
+        # rounding guards against float error flooring a row away
         val_set, _ = train_test_split(
-            unseen_set, train_size=0.2, test_size=0.8
+            unseen_set,
+            train_size=round(val_fraction / (1 - train_fraction), 9),
+            random_state=self.split_seed,
         )
+        return train_set, val_set
+
+    def __build__lgb__datasets__(
+        self,
+        train_set: pl.DataFrame,
+        val_set: pl.DataFrame,
+        construct: bool = True,
+    ) -> None:
+        """
+        Sort the splits by session and construct the LightGBM datasets.
+
+        The train set is binned with `bin_reference`, the bins of the
+        init model or else of a sample of the train set, which are kept
+        to be saved with the model artifact.
+
+        Parameters
+        ----------
+        train_set : pl.DataFrame
+            Rows of the train set.
+        val_set : pl.DataFrame
+            Rows of the val set, binned with the train set bins.
+        construct : bool, optional
+            Construct the datasets, by default True.
+        """
         group_column = self.group_column
         rank_column = self.rank_column
         label_column = self.label_column
         features = self.features
 
         train_set = train_set.sort(
-            by=[group_column, rank_column], reverse=False
-        )
-        train_set_group_sizes = (
-            train_set.groupby(group_column)
-            .agg(pl.col(group_column).count().alias("count"))
-            .sort(group_column)
-            .select("count")
+            by=[group_column, rank_column], descending=False
         )
+        train_set_group_sizes = group_sizes(train_set, group_column)
 
         val_set = val_set.sort(
-            by=[group_column, rank_column], reverse=False
-        )
-        val_set_group_sizes = (
-            val_set.groupby(group_column)
-            .agg(pl.col(group_column).count().alias("count"))
-            .sort(group_column)
-            .select("count")
+            by=[group_column, rank_column], descending=False
         )
+        val_set_group_sizes = group_sizes(val_set, group_column)
 
-        train_y = train_set[[label_column]]
-        train_x = train_set[features]
-
-        val_y = val_set[[label_column]]
-        val_x = val_set[features]
-
-        # test_x = test_set[features]
-
-        lgb_train_set: Any = lgb.Dataset(
-            train_x.to_pandas(),
-            label=train_y.to_pandas(),
-            group=train_set_group_sizes.to_numpy(),
-            free_raw_data=True,
-        ).construct()
+        if self.bin_reference is None:
+            # EXPLAIN: LightGBM finds the bins on a sample of
+            # `bin_construct_sample_cnt` rows anyway
+            self.bin_reference = build_bin_reference(
+                train_set,
+                features,
+                params=self.dataset_params,
+                seed=self.split_seed,
+            )
+        lgb_train_set: Any = build_lgb_dataset(
+            train_set,
+            features,
+            label_column,
+            group=train_set_group_sizes,
+            reference=self.bin_reference,
+            chunk_size=self.dataset_chunk_size,
+            params=self.dataset_params,
+            construct=construct,
+        )
 
-        lgb_valid_set: Any = lgb.Dataset(
-            val_x.to_pandas(),
-            label=val_y.to_pandas(),
-            group=val_set_group_sizes.to_numpy(),
+        lgb_valid_set: Any = build_lgb_dataset(
+            val_set,
+            features,
+            label_column,
+            group=val_set_group_sizes,
             reference=lgb_train_set,
-            free_raw_data=True,
-        ).construct()
-
-        # some memory management
-        # del train_set
-        # del val_set
-        del train_y
-        del train_x
-
-        gc.collect()
+            chunk_size=self.dataset_chunk_size,
+            params=self.dataset_params,
+            construct=construct,
+        )
 
         self.train_set = lgb_train_set
         self.val_set = lgb_valid_set
-        self.__save__datasets__()
 
     def __load__datasets__(self) -> None:
         if check_file_location(self.train_data_path) is False:
-            raise ValueError(f"No train file found at {self.train}")
-        with pathlib.Path(self.train_data_path) as train_data_pathlib:
-            self.train_set = lgb.Dataset(train_data_pathlib)
+            raise ValueError(
+                f"No train file found at {self.train_data_path}"
+            )
+        self.train_set = lgb.Dataset(
+            pathlib.Path(self.train_data_path),
+            params=self.dataset_params,
+        ).construct()
 
         if check_file_location(self.val_data_path) is False:
-            raise ValueError(f"No val file found at {self.train}")
+            raise ValueError(
+                f"No val file found at {self.val_data_path}"
+            )
 
-        with pathlib.Path(self.val_data_path) as val_data_pathlib:
-            self.val_set = lgb.Dataset(val_data_pathlib)
+        self.val_set = lgb.Dataset(
+            pathlib.Path(self.val_data_path),
+            reference=self.train_set,
+            params=self.dataset_params,
+        ).construct()
 
     def train(self, params: Optional[Any]) -> None:
         # EXPLAIN: due to mypy nagging typing from base class
@@ -277,13 +1638,28 @@ class RankingPipeline(BaseMachineLearningPipeline):
             raise ValueError(
                 "params parameter is expected to be of type dict"
             )
-        evals_logs: Dict[Any, Any] = {}
+        self.params: Dict[str, Any] = dict(params)
+        if self.incremental and self.partition_consumed:
+            self.model = self.init_model
+            return
+        if self.distributed_workers is not None:
+            self.__train__distributed__(self.params)
+            return
+        if self.stage_graph is not None:
+            self.model = self.stage_graph.run(
+                self.__stages__(params=self.params), ["model"]
+            )["model"]
+            return
         # check dataset exists and not empty
         if not hasattr(self, "train_set"):
             raise ValueError("no attribute train_set")
         if self.train_set is None:
             raise ValueError("train_set attribute is empty")
-        if self.train_set.num_data() == 0:
+        if self.incremental:
+            # EXPLAIN: unconstructed datasets do not know their size
+            # yet, and there are no binaries to load them from
+            pass
+        elif self.train_set.num_data() == 0:
             logging.info(
                 "train_set not found in memory, loading from bucket"
             )
@@ -291,28 +1667,276 @@ class RankingPipeline(BaseMachineLearningPipeline):
                 self.__load__datasets__()
             except ValueError:
                 logging.info("Failed to load file from the location")
-        if self.train_set.num_feature() != self.n_features:
+        if (
+            not self.incremental
+            and self.train_set.num_feature() != self.n_features
+        ):
             raise ValueError(
                 "Some of the features were lost during preprocessing"
             )
-        lgb_train_set = self.train_set
-        lgb_valid_set = self.val_set
-        self.model = lgb.train(
+        with self.profile_stage("train") as stage:
+            self.model = self.__boost__(params)
+            stage.set_output(self.train_set)
+
+    def __boost__(self, params: Dict[str, Any]) -> Any:
+        """Run `lgb.train` on the datasets with early stopping."""
+        evals_logs: Dict[Any, Any] = {}
+        return lgb.train(
             params=params,
-            train_set=lgb_train_set,
-            valid_sets=[lgb_valid_set, lgb_train_set],
+            train_set=self.train_set,
+            valid_sets=[self.val_set, self.train_set],
             valid_names=["val", "train"],
             verbose_eval=25,
             evals_result=evals_logs,
             early_stopping_rounds=25,
+            init_model=self.init_model,
+        )
+
+    def search(
+        self,
+        search_space: Dict[str, List[Any]],
+        base_params: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Dict[str, Any]]:
+        """
+        Search LightGBM parameters with successive halving.
+
+        The datasets are prepared (or loaded from the dataset cache)
+        once and saved as binaries, which every worker loads once and
+        trains all its configurations on.
+
+        Parameters
+        ----------
+        search_space : Dict[str, List[Any]]
+            Candidate values per parameter, e.g.
+            {"num_leaves": [31, 127], "learning_rate": [0.05, 0.1]}.
+        base_params : Dict[str, Any], optional
+            Parameters shared by all configurations, by default
+            __DEFAULT__LGB__PARAMS__.
+        **kwargs
+            Passed to `tuning.successive_halving`, e.g. `n_workers`,
+            `executor`, `min_rounds`, `max_rounds` and `eta`.
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            The leaderboard, best configuration first.
+        """
+        if self.incremental or self.distributed_workers is not None:
+            raise ValueError(
+                "Parameter search trains on saved binaries in this "
+                "process, it cannot be combined with init_model_path "
+                "or distributed_workers"
+            )
+        if (
+            not hasattr(self, "train_set")
+            or self.train_set.num_data() == 0
+        ):
+            self.prepare_datasets()
+        base_params = dict(base_params or __DEFAULT__LGB__PARAMS__)
+        kwargs.setdefault(
+            "max_rounds", base_params.get("num_iterations", 100)
+        )
+        with self.profile_stage("search"):
+            self.leaderboard: List[Dict[str, Any]] = successive_halving(
+                self.train_data_path,
+                self.val_data_path,
+                expand_grid(search_space),
+                base_params=base_params,
+                **kwargs,
+            )
+        return self.leaderboard
+
+    def share_feature_matrix(
+        self, directory: Optional[str] = None
+    ) -> SharedFeatureMatrix:
+        """
+        Write the feature matrix of all ranking rows for parallel workers.
+
+        The float32 features, labels and session offsets are written
+        once, sorted by session and rank column, and memory-mapped by
+        every worker the matrix is passed to, see `SharedFeatureMatrix`.
+        Uses the ranking data kept by `prepare_datasets` in memory, or
+        else joins the sessions and venues without splitting them.
+
+        Parameters
+        ----------
+        directory : str, optional
+            Where to write the matrix, by default a new directory in
+            shared memory.
+
+        Returns
+        -------
+        SharedFeatureMatrix
+            The matrix, attached in this process.
+        """
+        if (
+            isinstance(self.ranking_data, pl.DataFrame)
+            and self.ranking_data.is_empty()
+        ):
+            if self.inputs_deferred:
+                self.__read__inputs__()
+            if not hasattr(self, "sessions"):
+                raise ValueError(
+                    "The ranking data was released, share the feature "
+                    "matrix before or instead of prepare_datasets"
+                )
+            with self.profile_stage("drop_nulls") as stage:
+                self.__drop__nulls__()
+                stage.set_output(self.sessions)
+            with self.profile_stage("join") as stage:
+                self.__join__sessions__and__venues__()
+                stage.set_output(self.ranking_data)
+            self.ranking_data = self.__engineer__features__(
+                self.ranking_data
+            )
+        self.__collect__ranking__data__()
+        ranking_data: pl.DataFrame = self.ranking_data  # type: ignore[assignment]
+        with self.profile_stage("share_feature_matrix") as stage:
+            matrix = SharedFeatureMatrix.build(
+                ranking_data,
+                self.features,
+                self.label_column,
+                self.group_column,
+                directory=directory,
+                sort_columns=[self.group_column, self.rank_column],
+                chunk_size=self.dataset_chunk_size
+                or DEFAULT_CHUNK_SIZE,
+            )
+            stage.set_output(ranking_data)
+        return matrix
+
+    def cross_validate(
+        self,
+        params: Optional[Dict[str, Any]] = None,
+        n_folds: int = 5,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        """
+        Estimate the ranking metrics with grouped k-fold cross-validation.
+
+        All sessions, rather than the train and val splits, are assigned
+        to folds by `split_seed`. Their rows are shared with the fold
+        workers through `share_feature_matrix` and binned once, see
+        `cross_validation.cross_validate`.
+
+        Parameters
+        ----------
+        params : Dict[str, Any], optional
+            LightGBM parameters, by default __DEFAULT__LGB__PARAMS__;
+            `num_iterations` sets the boosting rounds of every fold.
+        n_folds : int, optional
+            Number of folds, by default 5.
+        **kwargs
+            Passed to `cross_validation.cross_validate`, e.g.
+            `n_workers`, `executor`, `total_threads` and
+            `early_stopping_rounds`.
+
+        Returns
+        -------
+        Dict[str, Any]
+            The per-fold results and the mean and std of every metric.
+        """
+        params = dict(params or __DEFAULT__LGB__PARAMS__)
+        kwargs.setdefault(
+            "num_boost_round", params.get("num_iterations", 100)
+        )
+        kwargs.setdefault("seed", self.split_seed)
+        kwargs.setdefault("dataset_params", self.dataset_params)
+        matrix = self.share_feature_matrix()
+        try:
+            with self.profile_stage("cross_validation"):
+                self.cv_results: Dict[str, Any] = cross_validate(
+                    matrix, params, n_folds, **kwargs
+                )
+        finally:
+            matrix.remove()
+        return self.cv_results
+
+    def export_model_artifact(
+        self,
+        model_path: str,
+        artifact_format: Optional[str] = None,
+        compression: Optional[str] = None,
+    ) -> None:
+        """
+        Save the trained model.
+
+        Parameters
+        ----------
+        model_path : str
+            Directory of a native artifact, or file of a joblib one.
+        artifact_format : str, optional
+            "native" saves LightGBM's model text with a manifest of the
+            features, params, data fingerprint and best scores, which
+            loads faster and does not depend on the Python version.
+            "joblib" pickles the booster. By default "joblib" for a
+            `model_path` with a file suffix, e.g. "model.joblib", and
+            "native" otherwise, see `default_artifact_format`.
+        compression : str, optional
+            None, "gzip" or "lzma", native artifacts only.
+        """
+        artifact_format = artifact_format or default_artifact_format(
+            model_path
         )
+        if self.stage_graph is not None:
+            if not hasattr(self, "params"):
+                raise ValueError("Train the model before exporting it")
+            self.stage_graph.run(
+                self.__stages__(
+                    params=self.params,
+                    export=(model_path, artifact_format, compression),
+                ),
+                ["artifact"],
+            )
+            return
+        with self.profile_stage("export"):
+            self.__export__model__(
+                model_path, artifact_format, compression
+            )
 
-    def export_model_artifact(self, model_path: str) -> None:
+    def __export__model__(
+        self,
+        model_path: str,
+        artifact_format: str,
+        compression: Optional[str],
+    ) -> None:
+        if artifact_format == "joblib":
+            save_model_to_file(
+                traine_model=self.model, model_path=model_path
+            )
+            return
         save_model_to_file(
-            traine_model=self.model, model_path=model_path
+            traine_model=self.model,
+            model_path=model_path,
+            artifact_format=artifact_format,
+            compression=compression,
+            params=getattr(self, "params", None),
+            data_fingerprint=self.__dataset__cache__key__(),
+            metrics={
+                name: dict(scores)
+                for name, scores in getattr(
+                    self.model, "best_score", {}
+                ).items()
+            }
+            or (
+                {"val": self.val_metrics}
+                if hasattr(self, "val_metrics")
+                else {}
+            ),
+            partitions=self.__trained__partitions__(),
+            # EXPLAIN: loaded with the datasets on a dataset cache hit
+            # or a construct checkpoint
+            bin_reference=self.bin_reference,
         )
         # TODO: add MLFlow integration and gcs integration
 
+    def __trained__partitions__(self) -> List[Dict[str, str]]:
+        """The partitions consumed before, plus the current one."""
+        if self.partition_consumed:
+            return list(self.consumed_partitions)
+        return [*self.consumed_partitions, dict(self.partition)]
+
     def __del__(self) -> None:
         """
         Clean up any resources used by the RankingPipeline object.
@@ -0,0 +1,113 @@
+"""
+Compact dtypes of the sessions and venues columns, planned before reading.
+"""
+from typing import (
+    Dict,
+    List,
+    Mapping,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+import polars as pl
+from polars.type_aliases import PolarsDataType
+
+SESSION_ID_COLUMN = "session_id"
+# seed of the 64-bit session id hash, fixed so ids agree across runs
+SESSION_ID_HASH_SEED = 0
+
+# EXPLAIN: positions and price ranges are small counts and the rates
+# fit float32, which is also the precision LightGBM bins; booleans stay
+# Boolean and become Int8 after the join
+SESSIONS_DTYPES: Dict[str, PolarsDataType] = {
+    "purchased": pl.Boolean,
+    SESSION_ID_COLUMN: pl.Utf8,
+    "position_in_list": pl.Int16,
+    "venue_id": pl.Int64,
+    "has_seen_venue_in_this_session": pl.Boolean,
+    "is_new_user": pl.Boolean,
+    "is_from_order_again": pl.Boolean,
+    "is_recommended": pl.Boolean,
+}
+VENUES_DTYPES: Dict[str, PolarsDataType] = {
+    "venue_id": pl.Int64,
+    "conversions_per_impression": pl.Float32,
+    "price_range": pl.Int8,
+    "rating": pl.Float32,
+    "popularity": pl.Float32,
+    "retention_rate": pl.Float32,
+}
+
+FrameT = TypeVar("FrameT", pl.DataFrame, pl.LazyFrame)
+
+
+def plan_read(
+    available: Sequence[str],
+    needed: Sequence[str],
+    dtypes: Mapping[str, PolarsDataType],
+) -> Tuple[List[str], Dict[str, PolarsDataType]]:
+    """Pick the columns to read from a file and their dtypes.
+
+    Args:
+        available: Columns of the file, in file order.
+        needed: Columns used downstream.
+        dtypes: Planned dtypes of known columns, e.g. `SESSIONS_DTYPES`.
+
+    Returns:
+        The needed columns of the file in file order, and the planned
+        dtypes of those of them that have one.
+    """
+    wanted = set(needed)
+    columns = [column for column in available if column in wanted]
+    return columns, {
+        column: dtypes[column] for column in columns if column in dtypes
+    }
+
+
+def csv_parse_dtypes(
+    dtypes: Mapping[str, PolarsDataType]
+) -> Dict[str, PolarsDataType]:
+    """The planned dtypes the csv reader can parse into directly.
+
+    The reader turns integers that overflow a narrow dtype into nulls
+    without an error, so integers are parsed as inferred and narrowed by
+    `cast_dtypes`, which fails on overflow instead.
+    """
+    return {
+        column: dtype
+        for column, dtype in dtypes.items()
+        if dtype not in pl.INTEGER_DTYPES
+    }
+
+
+def cast_dtypes(
+    frame: FrameT, dtypes: Mapping[str, PolarsDataType]
+) -> FrameT:
+    """Cast columns to their planned dtypes, failing on overflow."""
+    casts = [
+        pl.col(column).cast(dtype, strict=True)
+        for column, dtype in dtypes.items()
+        if column in frame.columns and frame.schema[column] != dtype
+    ]
+    return frame.with_columns(casts) if casts else frame
+
+
+def hash_session_id(frame: FrameT) -> FrameT:
+    """Replace string session ids by their 64-bit hash.
+
+    A UInt64 takes 8 bytes instead of a 36 character UUID plus its
+    offset, and sorts and compares faster. Two of n sessions collide
+    with probability about n**2 / 2**65, which only merges two queries.
+
+    Args:
+        frame: A frame with a `session_id` column.
+
+    Returns:
+        The frame with a UInt64 `session_id`.
+    """
+    if frame.schema[SESSION_ID_COLUMN] == pl.UInt64:
+        return frame
+    return frame.with_columns(
+        pl.col(SESSION_ID_COLUMN).hash(seed=SESSION_ID_HASH_SEED)
+    )
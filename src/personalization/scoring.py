@@ -0,0 +1,289 @@
+"""
+Batched real-time scoring of candidate venues with a trained booster.
+"""
+from typing import (
+    Any,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+)
+
+import numpy as np
+import polars as pl
+
+from .dataset_utils import to_float32_vector
+from .feature_engineering import (
+    DEFAULT_AGGREGATES,
+    FeatureCache,
+    WindowAggregate,
+    window_aggregates,
+)
+from .feature_store import (
+    VENUE_ID_COLUMN,
+    VenueFeatureStore,
+)
+from .model_artifact import load_model_from_artifact
+
+
+class RankingScorer:
+    """
+    Rank candidate venues of many sessions with one `predict` call.
+
+    The venue features are kept in a dense float32 table with one row
+    per venue of a `VenueFeatureStore`, so building the feature matrix
+    of a batch is a hash lookup and a gather instead of a join. Features
+    the venues table does not hold (e.g. `position_in_list`) come with
+    each request, either one value per candidate or one per session.
+    Window features are read from the history of every cached window of
+    a `FeatureCache`, merged once when the scorer is built, and joined
+    by their keys, e.g. `venue_id` and the `is_new_user` of the request.
+
+    Parameters
+    ----------
+    booster : lgb.Booster
+        Trained model, its feature names define the feature order.
+    venues : pl.DataFrame or VenueFeatureStore
+        Venue features with a `venue_id` column, or a store of them
+        shared with the training pipeline.
+    feature_cache : FeatureCache, optional
+        The window statistics of the training, needed by models with
+        window features.
+    aggregates : Sequence[WindowAggregate]
+        The window features the model may use.
+
+    Raises
+    ------
+    ValueError
+        If the model uses window features and no `feature_cache` is
+        given.
+    """
+
+    def __init__(
+        self,
+        booster: Any,
+        venues: Union[pl.DataFrame, VenueFeatureStore],
+        feature_cache: Optional[FeatureCache] = None,
+        aggregates: Sequence[WindowAggregate] = DEFAULT_AGGREGATES,
+    ) -> None:
+        self.booster = booster
+        self.features: List[str] = list(booster.feature_name())
+        self.store = (
+            venues
+            if isinstance(venues, VenueFeatureStore)
+            else VenueFeatureStore(venues)
+        )
+        self.venue_features = [
+            feature
+            for feature in self.features
+            if feature in self.store.feature_columns
+        ]
+        self.window_aggregates = {
+            aggregate.name: aggregate
+            for aggregate in window_aggregates(
+                self.features, aggregates
+            )
+        }
+        if self.window_aggregates and feature_cache is None:
+            raise ValueError(
+                "The model uses the window features "
+                f"{list(self.window_aggregates)}, "
+                "score it with the feature cache it was trained with"
+            )
+        self.window_histories: Dict[str, Optional[pl.DataFrame]] = {}
+        for aggregate in self.window_aggregates.values():
+            assert feature_cache is not None
+            history = feature_cache.history(aggregate, None)
+            self.window_histories[aggregate.name] = (
+                None if history is None else history.collect()
+            )
+        self.request_features = [
+            feature
+            for feature in self.features
+            if feature not in self.venue_features
+            and feature not in self.window_aggregates
+            and feature != VENUE_ID_COLUMN
+        ]
+        # EXPLAIN: the keys of the window features besides `venue_id`
+        # come with the requests like the request features
+        self.context_columns = list(
+            dict.fromkeys(
+                self.request_features
+                + [
+                    key
+                    for aggregate in self.window_aggregates.values()
+                    for key in aggregate.keys
+                    if key != VENUE_ID_COLUMN
+                ]
+            )
+        )
+        self.venue_table = self.store.feature_table(self.venue_features)
+
+    @classmethod
+    def from_artifact(
+        cls,
+        model_artifact_path: str,
+        venues_path: str,
+        feature_cache_dir: Optional[str] = None,
+    ) -> "RankingScorer":
+        """Load the booster, the venues table and the window features."""
+        return cls(
+            load_model_from_artifact(model_artifact_path),
+            VenueFeatureStore.from_path(venues_path),
+            None
+            if feature_cache_dir is None
+            else FeatureCache(feature_cache_dir),
+        )
+
+    def venue_rows(self, venue_ids: np.ndarray) -> np.ndarray:
+        """Rows of `venue_table` for the given ids, the NaN row if unknown."""
+        rows = self.store.rows(venue_ids)
+        return np.where(rows >= 0, rows, len(self.store))
+
+    def window_feature(
+        self,
+        aggregate: WindowAggregate,
+        venue_ids: np.ndarray,
+        context: Mapping[str, Any],
+    ) -> np.ndarray:
+        """The window feature of the candidates, NaN without history."""
+        history = self.window_histories[aggregate.name]
+        if history is None:
+            return np.full(len(venue_ids), np.nan, dtype=np.float32)
+        # EXPLAIN: missing or NaN key values become null and match no
+        # history, like the null features of the training
+        keys = pl.DataFrame(
+            [
+                pl.Series(key, venue_ids)
+                if key == VENUE_ID_COLUMN
+                else pl.Series(
+                    key,
+                    np.broadcast_to(
+                        np.asarray(
+                            context.get(key, np.nan), dtype=np.float64
+                        ),
+                        (len(venue_ids),),
+                    ),
+                ).cast(pl.Int64, strict=False)
+                for key in aggregate.keys
+            ]
+        ).with_columns(
+            [
+                pl.col(key).cast(history.schema[key])
+                for key in aggregate.keys
+            ]
+        )
+        return to_float32_vector(
+            keys.join(history, on=aggregate.keys, how="left"),
+            aggregate.name,
+        )
+
+    def feature_matrix(
+        self,
+        venue_ids: np.ndarray,
+        context: Mapping[str, Any],
+    ) -> np.ndarray:
+        """Build the model input of a list of candidates.
+
+        Args:
+            venue_ids: The candidate venues.
+            context: Values of the request features and of the keys of
+                the window features, e.g. `is_new_user`, either scalars
+                or one value per candidate. Missing features are NaN.
+
+        Returns:
+            A (len(venue_ids), len(features)) float32 matrix.
+        """
+        venue_ids = np.asarray(venue_ids, dtype=np.int64)
+        matrix = np.empty(
+            (len(venue_ids), len(self.features)), dtype=np.float32
+        )
+        venue_block = self.venue_table[self.venue_rows(venue_ids)]
+        for position, feature in enumerate(self.features):
+            if feature == VENUE_ID_COLUMN:
+                matrix[:, position] = venue_ids
+            elif feature in self.venue_features:
+                matrix[:, position] = venue_block[
+                    :, self.venue_features.index(feature)
+                ]
+            elif feature in self.window_aggregates:
+                matrix[:, position] = self.window_feature(
+                    self.window_aggregates[feature], venue_ids, context
+                )
+            else:
+                matrix[:, position] = np.asarray(
+                    context.get(feature, np.nan), dtype=np.float32
+                )
+        return matrix
+
+    def score(
+        self, venue_ids: np.ndarray, **context: Any
+    ) -> np.ndarray:
+        """Score the candidates of a single session."""
+        return np.asarray(
+            self.booster.predict(
+                self.feature_matrix(venue_ids, context)
+            )
+        )
+
+    def rank_batch(
+        self, requests: Sequence[Mapping[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Rank the candidates of many sessions with one predict call.
+
+        Args:
+            requests: One mapping per session holding `venue_ids` and the
+                request features, e.g.
+                {"session_id": "...", "venue_ids": [...],
+                 "position_in_list": [...], "is_recommended": 0}.
+
+        Returns:
+            Per request, in order: the `session_id`, the `venue_ids`
+            sorted best first and their `scores`.
+        """
+        if not requests:
+            return []
+        lengths = [len(request["venue_ids"]) for request in requests]
+        venue_ids = np.concatenate(
+            [
+                np.asarray(request["venue_ids"], dtype=np.int64)
+                for request in requests
+            ]
+        )
+        context = {
+            feature: np.concatenate(
+                [
+                    np.broadcast_to(
+                        np.asarray(
+                            request.get(feature, np.nan),
+                            dtype=np.float32,
+                        ),
+                        (length,),
+                    )
+                    for request, length in zip(requests, lengths)
+                ]
+            )
+            for feature in self.context_columns
+        }
+        offsets = np.cumsum([0] + lengths)
+        scores = np.asarray(
+            self.booster.predict(
+                self.feature_matrix(venue_ids, context)
+            )
+        )
+        ranked = []
+        for index, request in enumerate(requests):
+            request_scores = scores[offsets[index] : offsets[index + 1]]
+            order = np.argsort(-request_scores, kind="stable")
+            ranked.append(
+                {
+                    "session_id": request.get("session_id"),
+                    "venue_ids": venue_ids[
+                        offsets[index] : offsets[index + 1]
+                    ][order],
+                    "scores": request_scores[order],
+                }
+            )
+        return ranked
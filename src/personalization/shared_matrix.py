@@ -0,0 +1,274 @@
+"""
+A float32 feature matrix memory-mapped by every process that uses it.
+"""
+import json
+import logging
+import os
+import pathlib
+import shutil
+import tempfile
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import lightgbm as lgb
+import numpy as np
+import polars as pl
+
+from .dataset_utils import (
+    DEFAULT_CHUNK_SIZE,
+    group_sizes,
+    to_float32_matrix,
+    to_float32_vector,
+)
+
+MATRIX_FILE_NAME = "features.npy"
+LABELS_FILE_NAME = "labels.npy"
+OFFSETS_FILE_NAME = "group_offsets.npy"
+MANIFEST_FILE_NAME = "matrix.json"
+# RAM-backed file system of Linux, where the files are never written out
+SHARED_MEMORY_DIR = "/dev/shm"
+
+
+def default_matrix_dir(n_bytes: int = 0) -> str:
+    """A new directory in shared memory where available, else in tmp.
+
+    Args:
+        n_bytes: Size of the files to be written. Shared memory without
+            that much free space is not used: writing to a full tmpfs
+            through a memory map raises SIGBUS instead of an error.
+
+    Returns:
+        The path of the new directory.
+    """
+    parent = None
+    if os.path.isdir(SHARED_MEMORY_DIR):
+        free = shutil.disk_usage(SHARED_MEMORY_DIR).free
+        if n_bytes < free:
+            parent = SHARED_MEMORY_DIR
+        else:
+            logging.info(
+                "%s has %s bytes free for a %s byte matrix, "
+                "writing it to the temp directory",
+                SHARED_MEMORY_DIR,
+                free,
+                n_bytes,
+            )
+    return tempfile.mkdtemp(prefix="feature_matrix_", dir=parent)
+
+
+class SharedFeatureMatrix:
+    """
+    Features, labels and group offsets of ranking rows in `.npy` files.
+
+    The files are memory-mapped read-only, so every process attached
+    to the same directory reads the same pages of the page cache: N
+    workers cost one copy of the matrix rather than N. The object
+    pickles as its directory only, so passing it to a worker process
+    attaches the worker instead of copying the data.
+
+    Rows are sorted by group, and the rows of group i are
+    `group_offsets[i]:group_offsets[i + 1]`, so any set of whole groups
+    can be selected, e.g. for cross-validation folds.
+
+    Parameters
+    ----------
+    directory : str
+        Directory written by `SharedFeatureMatrix.build`.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        path = pathlib.Path(directory)
+        with open(path / MANIFEST_FILE_NAME) as file:
+            manifest = json.load(file)
+        self.features: List[str] = manifest["features"]
+        self.matrix: np.ndarray = np.load(
+            path / MATRIX_FILE_NAME, mmap_mode="r"
+        )
+        self.labels: np.ndarray = np.load(
+            path / LABELS_FILE_NAME, mmap_mode="r"
+        )
+        self.group_offsets: np.ndarray = np.load(
+            path / OFFSETS_FILE_NAME, mmap_mode="r"
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"SharedFeatureMatrix({self.directory!r}, rows={self.n_rows}, "
+            f"groups={self.n_groups})"
+        )
+
+    def __reduce__(self) -> Tuple[Any, Tuple[str]]:
+        # EXPLAIN: workers re-attach to the files instead of receiving
+        # a pickled copy of the arrays
+        return (SharedFeatureMatrix, (self.directory,))
+
+    @property
+    def n_rows(self) -> int:
+        return int(self.matrix.shape[0])
+
+    @property
+    def n_groups(self) -> int:
+        return len(self.group_offsets) - 1
+
+    @property
+    def group_sizes(self) -> np.ndarray:
+        """Rows per group, in row order."""
+        sizes: np.ndarray = np.diff(self.group_offsets)
+        return sizes
+
+    @classmethod
+    def build(
+        cls,
+        frame: pl.DataFrame,
+        features: Sequence[str],
+        label_column: str,
+        group_column: str,
+        directory: Optional[str] = None,
+        sort_columns: Optional[Sequence[str]] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> "SharedFeatureMatrix":
+        """Write the matrix of a frame once and attach to it.
+
+        The rows are written in group order `chunk_size` rows at a
+        time, so besides the frame only one chunk is ever in memory.
+
+        Args:
+            frame: Ranking rows, in any order.
+            features: The feature columns, in matrix order.
+            label_column: The relevance label column.
+            group_column: The query column, e.g. `session_id`.
+            directory: Where to write the files, by default a new
+                directory of `default_matrix_dir`.
+            sort_columns: Order of the rows, by default `group_column`;
+                must start with it.
+            chunk_size: Rows written at a time.
+
+        Returns:
+            The attached matrix.
+        """
+        sort_columns = list(sort_columns or [group_column])
+        if sort_columns[0] != group_column:
+            raise ValueError(
+                f"Rows must be sorted by {group_column} first"
+            )
+        # EXPLAIN: the float32 features and labels of every row
+        directory = directory or default_matrix_dir(
+            frame.height * (len(features) + 1) * 4
+        )
+        path = pathlib.Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        order = (
+            frame.select(pl.arg_sort_by(sort_columns))
+            .to_series()
+            .to_numpy()
+        )
+        matrix = np.lib.format.open_memmap(
+            path / MATRIX_FILE_NAME,
+            mode="w+",
+            dtype=np.float32,
+            shape=(frame.height, len(features)),
+        )
+        labels = np.lib.format.open_memmap(
+            path / LABELS_FILE_NAME,
+            mode="w+",
+            dtype=np.float32,
+            shape=(frame.height,),
+        )
+        rows = frame.select(
+            list(dict.fromkeys([*features, label_column]))
+        )
+        for start in range(0, frame.height, chunk_size):
+            chunk = rows[order[start : start + chunk_size]]
+            stop = start + chunk.height
+            matrix[start:stop] = to_float32_matrix(chunk, features)
+            labels[start:stop] = to_float32_vector(chunk, label_column)
+        matrix.flush()
+        labels.flush()
+        del matrix, labels
+        sizes = group_sizes(
+            frame.select(group_column)[order], group_column
+        )
+        np.save(
+            path / OFFSETS_FILE_NAME,
+            np.concatenate([[0], np.cumsum(sizes, dtype=np.int64)]),
+        )
+        # EXPLAIN: the manifest is written last, a directory without
+        # one is an interrupted build
+        with open(path / MANIFEST_FILE_NAME, "w") as file:
+            json.dump({"features": list(features)}, file, indent=2)
+        logging.info(
+            "Wrote a %s x %s feature matrix to %s",
+            frame.height,
+            len(features),
+            directory,
+        )
+        return cls(directory)
+
+    def group_rows(self, groups: np.ndarray) -> np.ndarray:
+        """Row indices of whole groups, in the order of `groups`.
+
+        Args:
+            groups: Group numbers, 0 to `n_groups - 1`.
+
+        Returns:
+            The int64 row indices.
+        """
+        groups = np.asarray(groups, dtype=np.int64)
+        starts = np.asarray(self.group_offsets)[groups]
+        sizes = self.group_sizes[groups]
+        # EXPLAIN: each row is the start of its group plus its rank
+        # within the group, without a Python loop over groups
+        run_starts = np.cumsum(sizes) - sizes
+        rows: np.ndarray = np.repeat(starts - run_starts, sizes) + (
+            np.arange(int(sizes.sum()), dtype=np.int64)
+        )
+        return rows
+
+    def dataset(
+        self,
+        groups: Optional[np.ndarray] = None,
+        reference: Optional[Any] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        """An unconstructed lgb.Dataset of whole groups.
+
+        Args:
+            groups: Group numbers to include, by default all.
+            reference: Dataset whose bins to use, e.g. the train set of
+                a validation set.
+            params: LightGBM Dataset parameters.
+
+        Returns:
+            The dataset, holding a copy of the selected rows only; all
+            groups are passed to LightGBM as the mapped matrix itself.
+        """
+        if groups is None:
+            data, label, sizes = (
+                self.matrix,
+                self.labels,
+                self.group_sizes,
+            )
+        else:
+            rows = self.group_rows(groups)
+            data, label = self.matrix[rows], self.labels[rows]
+            sizes = self.group_sizes[np.asarray(groups, dtype=np.int64)]
+        return lgb.Dataset(
+            data,
+            label=label,
+            group=sizes,
+            feature_name=list(self.features),
+            reference=reference,
+            params=params,
+            free_raw_data=False,
+        )
+
+    def remove(self) -> None:
+        """Delete the files; attached processes keep their mappings."""
+        shutil.rmtree(self.directory, ignore_errors=True)
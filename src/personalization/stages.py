@@ -0,0 +1,393 @@
+"""
+Declared pipeline stages whose outputs are checkpointed by a hash of
+their upstream inputs and config.
+"""
+import json
+import logging
+import os
+import pathlib
+import shutil
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import lightgbm as lgb
+import polars as pl
+
+from .dataset_cache import cache_key
+from .profiling import (
+    StageProfiler,
+    StageRecord,
+)
+
+MANIFEST_FILE_NAME = "checkpoint.json"
+STAGING_SUFFIX = ".staging"
+# python type of each kind of stage output
+ARTIFACT_TYPES: Dict[str, Any] = {
+    "frame": pl.DataFrame,
+    "dataset": lgb.Dataset,
+    "booster": lgb.Booster,
+    "path": str,
+}
+# file suffix of each kind of output that can be checkpointed
+ARTIFACT_SUFFIXES = {
+    "frame": ".parquet",
+    "dataset": ".bin",
+    "booster": ".txt",
+}
+
+Profile = Callable[[str], ContextManager[StageRecord]]
+
+
+class Stage:
+    """
+    A step of a pipeline with named, typed inputs and outputs.
+
+    Parameters
+    ----------
+    name : str
+        Name of the stage, unique in its graph.
+    run : Callable[..., Dict[str, Any]]
+        Called with the inputs as keyword arguments, returns the
+        outputs by name.
+    inputs : Sequence[str]
+        Outputs of upstream stages the stage reads.
+    outputs : Mapping[str, str]
+        Kind of every output by name, a key of `ARTIFACT_TYPES`.
+    config : Mapping[str, Any], optional
+        JSON-serializable values the outputs depend on besides the
+        inputs, e.g. input fingerprints or parameters.
+    checkpoint : bool, optional
+        Save the outputs, by default True; stages with "path" outputs,
+        e.g. an export, are always run.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[..., Dict[str, Any]],
+        inputs: Sequence[str],
+        outputs: Mapping[str, str],
+        config: Optional[Mapping[str, Any]] = None,
+        checkpoint: bool = True,
+    ) -> None:
+        unknown = set(outputs.values()) - set(ARTIFACT_TYPES)
+        if unknown:
+            raise ValueError(
+                f"Unknown output kinds {sorted(unknown)} of stage {name}, "
+                f"expected {sorted(ARTIFACT_TYPES)}"
+            )
+        if checkpoint and not set(outputs.values()) <= set(
+            ARTIFACT_SUFFIXES
+        ):
+            raise ValueError(
+                f"Outputs of stage {name} cannot be checkpointed"
+            )
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = dict(outputs)
+        self.config = dict(config or {})
+        self.checkpoint = checkpoint
+
+    def __repr__(self) -> str:
+        return f"Stage({self.name!r}, {self.inputs} -> {list(self.outputs)})"
+
+    def check_outputs(self, outputs: Mapping[str, Any]) -> None:
+        """Raise if the outputs of a run do not match the declaration."""
+        if set(outputs) != set(self.outputs):
+            raise ValueError(
+                f"Stage {self.name} returned {sorted(outputs)}, "
+                f"declared {sorted(self.outputs)}"
+            )
+        for name, kind in self.outputs.items():
+            if not isinstance(outputs[name], ARTIFACT_TYPES[kind]):
+                raise TypeError(
+                    f"Output {name} of stage {self.name} is a "
+                    f"{type(outputs[name]).__name__}, expected {kind}"
+                )
+
+
+class CheckpointStore:
+    """
+    Directory of stage outputs keyed by stage name and key.
+
+    Every checkpoint is a sub-directory `<stage>/<key>` holding one file
+    per output, frames as Parquet, datasets as LightGBM binaries and
+    boosters as model text, plus a manifest. It is written to a staging
+    directory and renamed, so an interrupted run leaves no checkpoint.
+
+    Parameters
+    ----------
+    root : str
+        Directory holding the checkpoints.
+    dataset_params : Dict[str, Any], optional
+        Parameters to load the LightGBM datasets with.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        dataset_params: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.root = pathlib.Path(root)
+        self.dataset_params = dict(dataset_params or {})
+
+    def _entry_dir(self, stage: str, key: str) -> pathlib.Path:
+        return self.root / stage / key
+
+    def has(self, stage: str, key: str) -> bool:
+        """Whether the stage has a checkpoint for `key`."""
+        return (
+            self._entry_dir(stage, key) / MANIFEST_FILE_NAME
+        ).is_file()
+
+    def output_path(
+        self, stage: Stage, key: str, name: str
+    ) -> pathlib.Path:
+        """File of one output of a checkpoint."""
+        suffix = ARTIFACT_SUFFIXES[stage.outputs[name]]
+        return self._entry_dir(stage.name, key) / f"{name}{suffix}"
+
+    def save(
+        self, stage: Stage, key: str, outputs: Mapping[str, Any]
+    ) -> None:
+        """Write the outputs of a stage as the checkpoint of `key`."""
+        entry_dir = self._entry_dir(stage.name, key)
+        staging_dir = entry_dir.with_name(
+            entry_dir.name + STAGING_SUFFIX
+        )
+        if staging_dir.exists():
+            shutil.rmtree(staging_dir)
+        staging_dir.mkdir(parents=True)
+        attributes: Dict[str, Dict[str, Any]] = {}
+        for name, kind in stage.outputs.items():
+            path = staging_dir / self.output_path(stage, key, name).name
+            value = outputs[name]
+            if kind == "frame":
+                value.write_parquet(path)
+            elif kind == "dataset":
+                value.save_binary(str(path))
+            else:
+                value.save_model(str(path), num_iteration=-1)
+                # EXPLAIN: the model text does not hold the early
+                # stopping results
+                attributes[name] = {
+                    "best_iteration": value.best_iteration,
+                    "best_score": {
+                        data: dict(scores)
+                        for data, scores in value.best_score.items()
+                    },
+                }
+        with open(staging_dir / MANIFEST_FILE_NAME, "w") as file:
+            json.dump(
+                {
+                    "stage": stage.name,
+                    "key": key,
+                    "config": stage.config,
+                    "outputs": stage.outputs,
+                    "attributes": attributes,
+                },
+                file,
+                indent=2,
+                default=str,
+            )
+        if entry_dir.exists():
+            shutil.rmtree(entry_dir)
+        os.replace(staging_dir, entry_dir)
+
+    def load(self, stage: Stage, key: str) -> Dict[str, Any]:
+        """Read the outputs of the checkpoint of `key`.
+
+        The datasets of a stage are loaded in declaration order, each
+        one after the first with the first as its reference, like a
+        train set and its validation sets.
+        """
+        with open(
+            self._entry_dir(stage.name, key) / MANIFEST_FILE_NAME
+        ) as file:
+            attributes = json.load(file)["attributes"]
+        outputs: Dict[str, Any] = {}
+        reference = None
+        for name, kind in stage.outputs.items():
+            path = self.output_path(stage, key, name)
+            if kind == "frame":
+                outputs[name] = pl.read_parquet(path)
+            elif kind == "dataset":
+                outputs[name] = lgb.Dataset(
+                    path,
+                    reference=reference,
+                    params=self.dataset_params,
+                ).construct()
+                reference = reference or outputs[name]
+            else:
+                booster = lgb.Booster(model_file=str(path))
+                booster.best_iteration = attributes[name][
+                    "best_iteration"
+                ]
+                booster.best_score = attributes[name]["best_score"]
+                outputs[name] = booster
+        return outputs
+
+
+class StageGraph:
+    """
+    Runs declared stages, resuming from their checkpoints.
+
+    Each stage is keyed by a hash of its name, config, outputs and the
+    keys of the stages producing its inputs, so a key changes whenever
+    anything upstream of a stage or the outputs it declares change. To
+    produce some outputs, the graph loads the checkpoint of every
+    needed stage whose key is unchanged and runs the others; stages
+    upstream of a checkpoint are not touched at all. Outputs are kept
+    in memory between `run` calls and intermediate ones are released
+    as soon as no pending stage needs them.
+
+    Parameters
+    ----------
+    store : CheckpointStore
+        Where the outputs are saved.
+    profile : Callable[[str], ContextManager[StageRecord]], optional
+        Measures every stage, e.g. `BaseMachineLearningPipeline
+        .profile_stage`.
+    """
+
+    def __init__(
+        self, store: CheckpointStore, profile: Optional[Profile] = None
+    ) -> None:
+        self.store = store
+        self.profile = profile or StageProfiler(enabled=False).stage
+        self.values: Dict[Tuple[str, str], Any] = {}
+        self.statuses: Dict[str, str] = {}
+
+    @staticmethod
+    def keys(stages: Sequence[Stage]) -> Dict[str, str]:
+        """The key of every stage, which must come in dependency order."""
+        producers: Dict[str, str] = {}
+        keys: Dict[str, str] = {}
+        for stage in stages:
+            missing = [
+                name for name in stage.inputs if name not in producers
+            ]
+            if missing:
+                raise ValueError(
+                    f"Inputs {missing} of stage {stage.name} are not "
+                    "produced by an earlier stage"
+                )
+            keys[stage.name] = cache_key(
+                stage=stage.name,
+                config=stage.config,
+                outputs=stage.outputs,
+                upstream={
+                    name: keys[producers[name]] for name in stage.inputs
+                },
+            )
+            for name in stage.outputs:
+                producers[name] = stage.name
+        return keys
+
+    def plan(
+        self, stages: Sequence[Stage], targets: Sequence[str]
+    ) -> Dict[str, str]:
+        """How each needed stage gets its outputs.
+
+        Returns:
+            "memory", "load" or "run" by stage name, for the stages
+            needed for `targets` only.
+        """
+        keys = self.keys(stages)
+        producer = {
+            name: stage for stage in stages for name in stage.outputs
+        }
+        plan: Dict[str, str] = {}
+        pending = [producer[name] for name in targets]
+        while pending:
+            stage = pending.pop()
+            if stage.name in plan:
+                continue
+            key = keys[stage.name]
+            if all(
+                (key, name) in self.values for name in stage.outputs
+            ):
+                plan[stage.name] = "memory"
+            elif stage.checkpoint and self.store.has(stage.name, key):
+                plan[stage.name] = "load"
+            else:
+                plan[stage.name] = "run"
+                pending.extend(producer[name] for name in stage.inputs)
+        return plan
+
+    def run(
+        self, stages: Sequence[Stage], targets: Sequence[str]
+    ) -> Dict[str, Any]:
+        """Produce `targets`, outputs of `stages` in dependency order.
+
+        Returns:
+            The target outputs by name.
+        """
+        keys = self.keys(stages)
+        plan = self.plan(stages, targets)
+        logging.info("Stage plan %s", plan)
+        producer_key = {
+            name: keys[stage.name]
+            for stage in stages
+            for name in stage.outputs
+        }
+        consumers: Dict[str, int] = {}
+        for stage in stages:
+            if plan.get(stage.name) == "run":
+                for name in stage.inputs:
+                    consumers[name] = consumers.get(name, 0) + 1
+        for stage in stages:
+            action = plan.get(stage.name)
+            if action is None or action == "memory":
+                continue
+            key = keys[stage.name]
+            if action == "load":
+                with self.profile(f"load_{stage.name}") as record:
+                    outputs = self.store.load(stage, key)
+                    record.set_output(next(iter(outputs.values())))
+            else:
+                inputs = {
+                    name: self.values[(producer_key[name], name)]
+                    for name in stage.inputs
+                }
+                with self.profile(stage.name) as record:
+                    outputs = stage.run(**inputs)
+                    stage.check_outputs(outputs)
+                    record.set_output(next(iter(outputs.values())))
+                del inputs
+                if stage.checkpoint:
+                    self.store.save(stage, key, outputs)
+                for name in stage.inputs:
+                    consumers[name] -= 1
+                    if consumers[name] == 0 and name not in targets:
+                        del self.values[(producer_key[name], name)]
+            self.statuses[stage.name] = action
+            for name, value in outputs.items():
+                self.values[(key, name)] = value
+        return {
+            name: self.values[(producer_key[name], name)]
+            for name in targets
+        }
+
+    def output_paths(
+        self, stages: Sequence[Stage], stage_name: str
+    ) -> List[str]:
+        """Checkpoint files of the outputs of one stage."""
+        stage = next(
+            stage for stage in stages if stage.name == stage_name
+        )
+        key = self.keys(stages)[stage_name]
+        return [
+            str(self.store.output_path(stage, key, name))
+            for name in stage.outputs
+        ]
@@ -0,0 +1,293 @@
+"""
+Seeded synthetic sessions and venues shaped like the production data.
+
+    python -m personalization.synthetic --rows 1000000 --output-dir data
+"""
+import argparse
+import os
+from typing import (
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+import numpy as np
+import polars as pl
+
+SESSIONS_FILE_NAME = "sessions.csv"
+VENUES_FILE_NAME = "venues.csv"
+# median and spread of the lognormal number of impressions per session
+SESSION_LENGTH_MEDIAN = 20
+SESSION_LENGTH_SIGMA = 0.9
+MAX_SESSION_LENGTH = 500
+# spread of the lognormal venue popularity, impressions follow it, so a
+# few venues get most of them like in the production data
+POPULARITY_SIGMA = 1.2
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+def default_n_venues(n_rows: int) -> int:
+    """About one venue per 100 impressions, within [100, 1M]."""
+    return int(np.clip(n_rows // 100, 100, 1_000_000))
+
+
+def generate_venues(
+    n_venues: int, seed: int = 0, null_fraction: float = 0.0
+) -> pl.DataFrame:
+    """Generate a venues table with the columns of `venues.csv`.
+
+    Args:
+        n_venues: Number of venues.
+        seed: Seed of the generator.
+        null_fraction: Fraction of venues with a missing `rating`,
+            to exercise dropping nulls.
+
+    Returns:
+        One row per venue with a unique `venue_id`.
+    """
+    rng = np.random.default_rng([seed, 0])
+    venue_ids = np.unique(
+        rng.integers(-(2**63), 2**63 - 1, n_venues, dtype=np.int64)
+    )
+    while len(venue_ids) < n_venues:
+        venue_ids = np.unique(
+            np.concatenate(
+                [
+                    venue_ids,
+                    rng.integers(
+                        -(2**63),
+                        2**63 - 1,
+                        n_venues - len(venue_ids),
+                        dtype=np.int64,
+                    ),
+                ]
+            )
+        )
+    rng.shuffle(venue_ids)
+    rating = np.round(np.clip(rng.normal(8.7, 0.4, n_venues), 6, 10), 1)
+    venues = pl.DataFrame(
+        {
+            "venue_id": venue_ids,
+            "conversions_per_impression": rng.beta(2, 8, n_venues),
+            "price_range": rng.integers(1, 5, n_venues),
+            "rating": rating,
+            "popularity": rng.lognormal(1, POPULARITY_SIGMA, n_venues),
+            "retention_rate": rng.beta(3, 5, n_venues),
+        }
+    )
+    if null_fraction > 0:
+        missing = pl.Series(rng.random(n_venues) < null_fraction)
+        venues = venues.with_columns(
+            pl.when(missing)
+            .then(None)
+            .otherwise(pl.col("rating"))
+            .alias("rating")
+        )
+    return venues
+
+
+def session_lengths(
+    n_rows: int, rng: np.random.Generator
+) -> np.ndarray:
+    """Draw lognormal session lengths summing to exactly `n_rows`."""
+    lengths: List[np.ndarray] = []
+    total = 0
+    while total < n_rows:
+        batch = np.clip(
+            np.round(
+                rng.lognormal(
+                    np.log(SESSION_LENGTH_MEDIAN),
+                    SESSION_LENGTH_SIGMA,
+                    max(16, (n_rows - total) // SESSION_LENGTH_MEDIAN),
+                )
+            ),
+            1,
+            MAX_SESSION_LENGTH,
+        ).astype(np.int64)
+        lengths.append(batch)
+        total += int(batch.sum())
+    all_lengths: np.ndarray = np.concatenate(lengths)
+    ends = np.cumsum(all_lengths)
+    n_sessions = int(np.searchsorted(ends, n_rows)) + 1
+    all_lengths = all_lengths[:n_sessions]
+    all_lengths[-1] -= int(ends[n_sessions - 1]) - n_rows
+    return all_lengths
+
+
+def session_ids(n_sessions: int, rng: np.random.Generator) -> List[str]:
+    """Random ids formatted like the production UUIDs."""
+    halves = rng.integers(0, 2**63, (n_sessions, 2), dtype=np.int64)
+    ids = []
+    for high, low in halves:
+        digits = f"{high:016x}{low:016x}"
+        ids.append(
+            f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-"
+            f"{digits[16:20]}-{digits[20:]}"
+        )
+    return ids
+
+
+def generate_sessions(
+    n_rows: int,
+    venues: pl.DataFrame,
+    seed: int = 0,
+    chunk_index: int = 0,
+) -> pl.DataFrame:
+    """Generate impressions of whole sessions with the columns of `sessions.csv`.
+
+    Venues are shown in proportion to their popularity and the label
+    `has_seen_venue_in_this_session` depends on the venue conversion
+    rate, the list position and the recommendation flags, so a model
+    has something to learn.
+
+    Args:
+        n_rows: Number of impressions.
+        venues: Venues to show, from `generate_venues`.
+        seed: Seed of the generator.
+        chunk_index: Index of this chunk, chunks with different indexes
+            get independent random streams.
+
+    Returns:
+        The impressions, rows of a session are contiguous.
+    """
+    rng = np.random.default_rng([seed, 1, chunk_index])
+    lengths = session_lengths(n_rows, rng)
+    n_sessions = len(lengths)
+    session_index = np.repeat(np.arange(n_sessions), lengths)
+
+    popularity = venues.get_column("popularity").to_numpy()
+    venue_rows = rng.choice(
+        len(popularity), n_rows, p=popularity / popularity.sum()
+    )
+    conversions = venues.get_column(
+        "conversions_per_impression"
+    ).to_numpy()[venue_rows]
+
+    # EXPLAIN: positions grow by random gaps within a session and
+    # restart at each session start
+    gaps = rng.geometric(0.5, n_rows)
+    cumulative = np.cumsum(gaps)
+    starts = np.cumsum(lengths) - lengths
+    position_in_list = cumulative - np.repeat(
+        cumulative[starts] - gaps[starts], lengths
+    )
+
+    is_new_user = np.repeat(rng.random(n_sessions) < 0.2, lengths)
+    is_from_order_again = (rng.random(n_rows) < 0.1) & ~is_new_user
+    is_recommended = rng.random(n_rows) < 0.15
+    logit = (
+        -1.0
+        + 6.0 * conversions
+        - 0.02 * position_in_list
+        + 0.5 * is_recommended
+        + 1.0 * is_from_order_again
+    )
+    seen = rng.random(n_rows) < 1 / (1 + np.exp(-logit))
+    purchased = seen & (rng.random(n_rows) < conversions)
+
+    return pl.DataFrame(
+        {
+            "purchased": purchased,
+            "session_id": pl.Series(session_ids(n_sessions, rng)).take(
+                session_index
+            ),
+            "position_in_list": position_in_list,
+            "venue_id": venues.get_column("venue_id").take(venue_rows),
+            "has_seen_venue_in_this_session": seen,
+            "is_new_user": is_new_user,
+            "is_from_order_again": is_from_order_again,
+            "is_recommended": is_recommended,
+        }
+    )
+
+
+def iter_sessions(
+    n_rows: int,
+    venues: pl.DataFrame,
+    seed: int = 0,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Iterator[pl.DataFrame]:
+    """Generate `n_rows` impressions in chunks of at most `chunk_rows`.
+
+    Args:
+        n_rows: Total number of impressions.
+        venues: Venues to show, from `generate_venues`.
+        seed: Seed of the generator.
+        chunk_rows: Rows per chunk, bounds the memory use.
+
+    Yields:
+        Chunks of whole sessions.
+    """
+    for chunk_index, start in enumerate(range(0, n_rows, chunk_rows)):
+        yield generate_sessions(
+            min(chunk_rows, n_rows - start), venues, seed, chunk_index
+        )
+
+
+def write_synthetic_csvs(
+    output_dir: str,
+    n_rows: int,
+    n_venues: Optional[int] = None,
+    seed: int = 0,
+    null_fraction: float = 0.0,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Tuple[str, str]:
+    """Write `sessions.csv` and `venues.csv` for `RankingPipeline`.
+
+    The sessions are written chunk by chunk, so 100M rows need no more
+    memory than `chunk_rows`. The output is the same for the same
+    arguments.
+
+    Args:
+        output_dir: The directory to write to.
+        n_rows: Number of impressions.
+        n_venues: Number of venues, by default `default_n_venues`.
+        seed: Seed of the generator.
+        null_fraction: Fraction of venues with a missing `rating`.
+        chunk_rows: Impressions generated at a time.
+
+    Returns:
+        The paths of the sessions and venues files.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    venues = generate_venues(
+        n_venues or default_n_venues(n_rows), seed, null_fraction
+    )
+    sessions_path = os.path.join(output_dir, SESSIONS_FILE_NAME)
+    venues_path = os.path.join(output_dir, VENUES_FILE_NAME)
+    venues.write_csv(venues_path)
+    with open(sessions_path, "wb") as file:
+        for chunk_index, chunk in enumerate(
+            iter_sessions(n_rows, venues, seed, chunk_rows)
+        ):
+            # EXPLAIN: polars writes to open binary files as well, its
+            # stubs only list paths and BytesIO
+            chunk.write_csv(
+                file, has_header=chunk_index == 0  # type: ignore[call-overload]
+            )
+    return sessions_path, venues_path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Write synthetic sessions.csv and venues.csv"
+    )
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--venues", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--null-fraction", type=float, default=0.0)
+    parser.add_argument("--output-dir", type=str, required=True)
+    args = parser.parse_args()
+    for path in write_synthetic_csvs(
+        args.output_dir,
+        args.rows,
+        args.venues,
+        args.seed,
+        args.null_fraction,
+    ):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Successive-halving hyperparameter search over constructed LightGBM datasets.
+"""
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import (
+    Any,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import lightgbm as lgb
+
+EXECUTORS = ("process", "thread")
+
+# datasets loaded by the current worker process, keyed by their
+# binary paths
+_worker_datasets: Dict[Tuple[str, str], Tuple[Any, Any]] = {}
+
+
+def expand_grid(
+    search_space: Mapping[str, Sequence[Any]]
+) -> List[Dict[str, Any]]:
+    """Expand lists of candidate values into all their combinations.
+
+    Args:
+        search_space: Candidate values per LightGBM parameter.
+
+    Returns:
+        One parameter dict per combination.
+    """
+    names = list(search_space)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(
+            *(search_space[name] for name in names)
+        )
+    ]
+
+
+def construct_datasets(
+    train_path: str, val_path: str
+) -> Tuple[Any, Any]:
+    """The train and val sets of their LightGBM binaries, constructed."""
+    train_set = lgb.Dataset(train_path).construct()
+    val_set = lgb.Dataset(val_path, reference=train_set).construct()
+    return train_set, val_set
+
+
+def _load_datasets(train_path: str, val_path: str) -> Tuple[Any, Any]:
+    """Load the binaries once per worker and reuse them across configs."""
+    if (train_path, val_path) not in _worker_datasets:
+        _worker_datasets[(train_path, val_path)] = construct_datasets(
+            train_path, val_path
+        )
+    return _worker_datasets[(train_path, val_path)]
+
+
+def evaluate_config(
+    train_set: Union[Any, str],
+    val_set: Union[Any, str],
+    params: Dict[str, Any],
+    num_boost_round: int,
+    metric_name: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Train one configuration and report its best validation score.
+
+    Args:
+        train_set: Constructed train set, or its LightGBM binary,
+            loaded once per worker process.
+        val_set: Constructed val set, or its LightGBM binary.
+        params: LightGBM parameters of the configuration.
+        num_boost_round: Boosting rounds of this rung.
+        metric_name: Validation metric to rank by, e.g. "ndcg@10", by
+            default the first metric LightGBM reports.
+
+    Returns:
+        The score, best iteration and wall time of the configuration.
+    """
+    if isinstance(train_set, str):
+        train_set, val_set = _load_datasets(train_set, val_set)
+    evals_logs: Dict[str, Dict[str, List[float]]] = {}
+    params = {
+        key: value
+        for key, value in params.items()
+        if key
+        not in ("num_iterations", "num_boost_round", "n_estimators")
+    }
+    params.setdefault("verbosity", -1)
+    start = time.perf_counter()
+    booster = lgb.train(
+        params=params,
+        train_set=train_set,
+        num_boost_round=num_boost_round,
+        valid_sets=[val_set],
+        valid_names=["val"],
+        callbacks=[
+            lgb.record_evaluation(evals_logs),
+            lgb.early_stopping(
+                max(5, num_boost_round // 5), verbose=False
+            ),
+        ],
+    )
+    val_logs = evals_logs["val"]
+    metric_name = metric_name or next(iter(val_logs))
+    return {
+        "score": max(val_logs[metric_name]),
+        "metric": metric_name,
+        "best_iteration": booster.best_iteration,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def make_executor(executor: str, n_workers: int) -> Executor:
+    """A pool of `n_workers` threads or spawned processes."""
+    if executor == "thread":
+        return ThreadPoolExecutor(max_workers=n_workers)
+    # EXPLAIN: forking a process that already ran OpenMP threads can
+    # deadlock, so workers are spawned
+    return ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def successive_halving(
+    train_path: str,
+    val_path: str,
+    configs: Sequence[Dict[str, Any]],
+    base_params: Optional[Dict[str, Any]] = None,
+    min_rounds: int = 10,
+    max_rounds: int = 100,
+    eta: int = 3,
+    n_workers: Optional[int] = None,
+    executor: str = "process",
+    total_threads: Optional[int] = None,
+    metric_name: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Evaluate configurations with successive halving.
+
+    All configurations are trained for `min_rounds`, the best 1/`eta`
+    of them for `eta` times more rounds, and so on until `max_rounds`
+    or a single configuration is left. Thread workers share one
+    constructed train and val set, process workers load the binaries
+    once each, so the data is never re-parsed or re-binned.
+
+    Args:
+        train_path: LightGBM binary of the train set.
+        val_path: LightGBM binary of the val set.
+        configs: Parameters to search over, merged into `base_params`.
+        base_params: Parameters shared by all configurations.
+        min_rounds: Boosting rounds of the first rung.
+        max_rounds: Boosting rounds of the last rung.
+        eta: Fraction of configurations dropped at each rung.
+        n_workers: Parallel trainings, by default one per configuration
+            up to the number of CPUs.
+        executor: "process" or "thread".
+        total_threads: Thread budget split between the workers'
+            `num_threads`, by default the number of CPUs.
+        metric_name: Validation metric to rank by, higher is better.
+
+    Returns:
+        The leaderboard, best configuration first.
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(
+            f"Unknown executor {executor}, expected one of {EXECUTORS}"
+        )
+    if not configs:
+        raise ValueError("No configurations to search over")
+    if eta < 2:
+        raise ValueError("eta must be at least 2")
+    total_threads = total_threads or os.cpu_count() or 1
+    n_workers = n_workers or min(len(configs), total_threads)
+    num_threads = max(1, total_threads // n_workers)
+    candidates = [
+        {**(base_params or {}), **config, "num_threads": num_threads}
+        for config in configs
+    ]
+    results: List[Dict[str, Any]] = [
+        {"config": dict(config), "rounds": 0, "score": -math.inf}
+        for config in configs
+    ]
+    survivors = list(range(len(candidates)))
+    rounds = min(min_rounds, max_rounds)
+    datasets: Tuple[Any, Any] = (train_path, val_path)
+    if executor == "thread":
+        # EXPLAIN: training only reads a constructed dataset, so the
+        # threads share one copy instead of loading one each
+        datasets = construct_datasets(train_path, val_path)
+    with make_executor(executor, n_workers) as pool:
+        while True:
+            logging.info(
+                "Training %s configurations for %s rounds",
+                len(survivors),
+                rounds,
+            )
+            futures = {
+                index: pool.submit(
+                    evaluate_config,
+                    *datasets,
+                    candidates[index],
+                    rounds,
+                    metric_name,
+                )
+                for index in survivors
+            }
+            for index, future in futures.items():
+                results[index].update(future.result(), rounds=rounds)
+            if len(survivors) == 1 or rounds >= max_rounds:
+                break
+            survivors = sorted(
+                survivors, key=lambda index: -results[index]["score"]
+            )[: max(1, len(survivors) // eta)]
+            rounds = min(rounds * eta, max_rounds)
+    return sorted(
+        results,
+        key=lambda result: (-result["rounds"], -result["score"]),
+    )
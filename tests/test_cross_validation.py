@@ -0,0 +1,144 @@
+import json
+import os
+
+import numpy as np
+import polars as pl
+import pytest
+
+from personalization.__main__ import main
+from personalization.cross_validation import (
+    assign_folds,
+    cross_validate,
+)
+from personalization.ranking_pipeline import RankingPipeline
+from personalization.shared_matrix import SharedFeatureMatrix
+from personalization.synthetic import write_synthetic_csvs
+
+FEATURES = ["rating", "price_range"]
+PARAMS = {
+    "objective": "lambdarank",
+    "metric": "ndcg",
+    "num_leaves": 7,
+    "min_data_in_leaf": 5,
+}
+
+
+@pytest.fixture
+def matrix(tmp_path):
+    rng = np.random.default_rng(0)
+    n_rows = 3_000
+    frame = pl.DataFrame(
+        {
+            "session_id": np.repeat(np.arange(n_rows // 10), 10),
+            "rating": rng.random(n_rows) * 10,
+            "price_range": rng.integers(1, 5, n_rows),
+        }
+    ).with_columns((pl.col("rating") > 7).cast(pl.Int8).alias("label"))
+    return SharedFeatureMatrix.build(
+        frame,
+        FEATURES,
+        "label",
+        "session_id",
+        directory=str(tmp_path / "matrix"),
+    )
+
+
+def test_assign_folds():
+    folds = assign_folds(103, 5, seed=1)
+    assert sorted(np.bincount(folds)) == [20, 20, 21, 21, 21]
+    np.testing.assert_array_equal(folds, assign_folds(103, 5, seed=1))
+    assert not np.array_equal(folds, assign_folds(103, 5, seed=2))
+    with pytest.raises(ValueError):
+        assign_folds(10, 1)
+    with pytest.raises(ValueError):
+        assign_folds(3, 5)
+
+
+def test_folds_cover_every_session_once(matrix):
+    results = cross_validate(
+        matrix, PARAMS, n_folds=3, num_boost_round=5, n_workers=2
+    )
+    folds = results["folds"]
+    assert [fold["fold"] for fold in folds] == [0, 1, 2]
+    assert (
+        sum(fold["val_sessions"] for fold in folds) == matrix.n_groups
+    )
+    for fold in folds:
+        assert (
+            fold["train_sessions"] + fold["val_sessions"]
+            == matrix.n_groups
+        )
+        assert fold["metrics"]["sessions"] > 0
+    # EXPLAIN: the label is a threshold of a feature, so every fold
+    # learns to rank the relevant rows first
+    assert results["mean"]["ndcg@10"] > 0.99
+    ndcg = [fold["metrics"]["ndcg@10"] for fold in folds]
+    assert results["mean"]["ndcg@10"] == pytest.approx(np.mean(ndcg))
+    assert results["std"]["ndcg@10"] == pytest.approx(np.std(ndcg))
+
+
+def test_process_workers_match_threads(matrix):
+    kwargs = {"n_folds": 2, "num_boost_round": 3, "total_threads": 2}
+    threads = cross_validate(
+        matrix, PARAMS, executor="thread", **kwargs
+    )
+    processes = cross_validate(
+        matrix, PARAMS, executor="process", **kwargs
+    )
+    assert processes["mean"] == pytest.approx(threads["mean"])
+    with pytest.raises(ValueError):
+        cross_validate(matrix, PARAMS, executor="cluster")
+
+
+def test_early_stopping_sets_best_iteration(matrix):
+    results = cross_validate(
+        matrix,
+        {**PARAMS, "learning_rate": 0.5},
+        n_folds=2,
+        num_boost_round=50,
+        early_stopping_rounds=2,
+    )
+    for fold in results["folds"]:
+        assert 0 < fold["best_iteration"] < 50
+
+
+def test_pipeline_cross_validate(tmp_path):
+    sessions_path, venues_path = write_synthetic_csvs(
+        str(tmp_path), n_rows=5_000, n_venues=50, seed=0
+    )
+    pipeline = RankingPipeline(sessions_path, venues_path, profile=True)
+    results = pipeline.cross_validate(
+        {**PARAMS, "num_iterations": 3}, n_folds=3
+    )
+    assert len(results["folds"]) == 3
+    assert set(results["mean"]) >= {"ndcg@10", "map@10", "mrr"}
+    assert "cross_validation" in [
+        record["stage"] for record in pipeline.profile_report
+    ]
+
+
+def test_cv_command(tmp_path, capsys):
+    sessions_path, venues_path = write_synthetic_csvs(
+        os.path.join(tmp_path, "data"), 5_000, seed=0
+    )
+    metrics_path = os.path.join(tmp_path, "cv.json")
+    main(
+        [
+            "cv",
+            "--sessions-bucket-path",
+            sessions_path,
+            "--venues-bucket-path",
+            venues_path,
+            "--no-cache",
+            "--num_iterations",
+            "3",
+            "--n-folds",
+            "2",
+            "--metrics-path",
+            metrics_path,
+        ]
+    )
+    with open(metrics_path) as file:
+        results = json.load(file)
+    assert len(results["folds"]) == 2
+    assert "ndcg@10" in capsys.readouterr().out
@@ -0,0 +1,398 @@
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+import polars as pl
+import pytest
+
+from personalization.data_sources import (
+    ConnectionPool,
+    FileSource,
+    PrefetchingFileSource,
+    SqlSource,
+    as_source,
+    partition_bounds,
+    sqlite_connect,
+)
+from personalization.ranking_pipeline import RankingPipeline
+from personalization.schema import (
+    SESSIONS_DTYPES,
+    plan_read,
+)
+from personalization.synthetic import (
+    generate_sessions,
+    generate_venues,
+)
+
+BOOLEAN_DTYPES = {
+    column: dtype
+    for column, dtype in SESSIONS_DTYPES.items()
+    if dtype == pl.Boolean
+}
+
+
+def write_sqlite(database_path, table, frame):
+    columns = ", ".join(f'"{column}"' for column in frame.columns)
+    markers = ", ".join("?" for _ in frame.columns)
+    with sqlite3.connect(database_path) as connection:
+        connection.execute(f'CREATE TABLE "{table}" ({columns})')
+        connection.executemany(
+            f'INSERT INTO "{table}" VALUES ({markers})', frame.rows()
+        )
+    connection.close()
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Synthetic sessions and venues as csv files and SQLite tables."""
+    venues = generate_venues(100, seed=0)
+    sessions = generate_sessions(3_000, venues, seed=0)
+    database_path = os.path.join(tmp_path, "ranking.db")
+    write_sqlite(database_path, "venues", venues)
+    write_sqlite(database_path, "sessions", sessions)
+    sessions_path = os.path.join(tmp_path, "sessions.csv")
+    venues_path = os.path.join(tmp_path, "venues.csv")
+    sessions.write_csv(sessions_path)
+    venues.write_csv(venues_path)
+    return database_path, sessions_path, venues_path
+
+
+def sorted_frame(frame):
+    return frame.sort(frame.columns)
+
+
+@pytest.mark.parametrize("num_partitions", [1, 4])
+def test_sql_source_matches_csv(database, num_partitions):
+    database_path, sessions_path, _ = database
+    source = SqlSource(
+        sqlite_connect(database_path),
+        table="sessions",
+        partition_column="venue_id",
+        num_partitions=num_partitions,
+        dtypes=BOOLEAN_DTYPES,
+    )
+    expected = FileSource(sessions_path).read()
+    assert source.columns == expected.columns
+    assert sorted_frame(source.read()).frame_equal(
+        sorted_frame(expected)
+    )
+    assert len(source.partition_predicates()) == num_partitions
+
+
+def test_sql_source_reads_only_requested_columns(database):
+    database_path, _, venues_path = database
+    source = SqlSource(
+        sqlite_connect(database_path),
+        query="SELECT * FROM venues WHERE price_range > 1",
+        partition_column="venue_id",
+        num_partitions=3,
+    )
+    frame = source.read(["venue_id", "rating"], {"rating": pl.Float32})
+    assert frame.columns == ["venue_id", "rating"]
+    assert frame.schema["rating"] == pl.Float32
+    assert (
+        frame.height
+        == pl.read_csv(venues_path)
+        .filter(pl.col("price_range") > 1)
+        .height
+    )
+
+
+def test_partitions_by_date_keep_null_keys(tmp_path):
+    database_path = os.path.join(tmp_path, "days.db")
+    days = [
+        (
+            datetime.date(2023, 1, 1) + datetime.timedelta(days=day)
+        ).isoformat()
+        for day in range(10)
+    ]
+    write_sqlite(
+        database_path,
+        "events",
+        pl.DataFrame({"day": days + [None], "value": list(range(11))}),
+    )
+    source = SqlSource(
+        sqlite_connect(database_path),
+        table="events",
+        partition_column="day",
+        num_partitions=3,
+    )
+    predicates = source.partition_predicates()
+    assert [params for _, params in predicates] == [
+        ["2023-01-01", "2023-01-04"],
+        ["2023-01-04", "2023-01-07"],
+        ["2023-01-07", "2023-01-10"],
+    ]
+    assert sorted(source.read().get_column("value")) == list(range(11))
+
+
+def test_partition_bounds():
+    assert partition_bounds(0, 10, 2) == [0, 5, 10]
+    assert partition_bounds(0, 1, 4) == [0, 1]
+    assert partition_bounds(0.0, 1.0, 4) == [0.0, 0.25, 0.5, 0.75, 1.0]
+    assert partition_bounds(
+        datetime.date(2023, 1, 1), datetime.date(2023, 1, 3), 2
+    ) == [
+        datetime.date(2023, 1, 1),
+        datetime.date(2023, 1, 2),
+        datetime.date(2023, 1, 3),
+    ]
+    with pytest.raises(ValueError):
+        partition_bounds("a", "b", 2)
+
+
+def test_connection_pool_bounds_connections(database):
+    database_path, _, _ = database
+    source = SqlSource(
+        sqlite_connect(database_path),
+        table="sessions",
+        partition_column="position_in_list",
+        num_partitions=8,
+        pool_size=2,
+    )
+    source.read()
+    assert source.pool.opened <= 2
+    source.pool.close()
+
+
+def test_connection_pool_reuses_connections():
+    opened = []
+    pool = ConnectionPool(lambda: opened.append(1) or object(), 2)
+    for _ in range(3):
+        with pool.connection():
+            pass
+    assert pool.opened == len(opened) == 1
+
+
+def test_fingerprint_changes_with_rows(database):
+    database_path, _, _ = database
+    source = SqlSource(sqlite_connect(database_path), table="venues")
+    before = source.fingerprint()
+    assert source.fingerprint() == before
+    with sqlite3.connect(database_path) as connection:
+        connection.execute("DELETE FROM venues WHERE rowid = 1")
+    connection.close()
+    assert source.fingerprint() == before
+    assert (
+        SqlSource(
+            sqlite_connect(database_path), table="venues"
+        ).fingerprint()
+        != before
+    )
+
+
+def test_key_range_is_queried_once(database, mocker):
+    database_path, _, _ = database
+    source = SqlSource(
+        sqlite_connect(database_path),
+        table="sessions",
+        partition_column="position_in_list",
+        num_partitions=4,
+    )
+    execute = mocker.spy(source, "_execute")
+    source.fingerprint()
+    source.read()
+    source.fingerprint()
+    counts = [
+        call
+        for call in execute.call_args_list
+        if "COUNT(*)" in call.args[0]
+    ]
+    assert len(counts) == 1
+
+
+def test_invalid_sql_sources(database):
+    database_path, _, _ = database
+    connect = sqlite_connect(database_path)
+    with pytest.raises(ValueError):
+        SqlSource(connect)
+    with pytest.raises(ValueError):
+        SqlSource(connect, table="venues", query="SELECT 1")
+    with pytest.raises(ValueError):
+        SqlSource(connect, table="venues", num_partitions=2)
+    with pytest.raises(FileNotFoundError):
+        as_source(os.path.join(database_path, "missing.csv"))
+
+
+@pytest.mark.parametrize("compact_dtypes", [False, True])
+def test_pipeline_reads_sql_sources(database, compact_dtypes):
+    database_path, sessions_path, venues_path = database
+    connect = sqlite_connect(database_path)
+    from_sql = RankingPipeline(
+        SqlSource(
+            connect,
+            table="sessions",
+            partition_column="venue_id",
+            num_partitions=4,
+            dtypes=BOOLEAN_DTYPES,
+        ),
+        SqlSource(connect, table="venues"),
+        split_strategy="session",
+        compact_dtypes=compact_dtypes,
+    )
+    from_csv = RankingPipeline(
+        sessions_path,
+        venues_path,
+        split_strategy="session",
+        compact_dtypes=compact_dtypes,
+    )
+    for pipeline in (from_sql, from_csv):
+        pipeline.prepare_datasets()
+    assert sorted_frame(from_sql.ranking_data).frame_equal(
+        sorted_frame(from_csv.ranking_data)
+    )
+    assert from_sql.partition["path"] == 'sql:SELECT * FROM "sessions"'
+
+
+class ThrottledFile:
+    """A local file standing in for a slow network mount."""
+
+    def __init__(self, path, latency, stats):
+        self.file = open(path, "rb")
+        self.latency = latency
+        self.stats = stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+    def seek(self, offset):
+        return self.file.seek(offset)
+
+    def read(self, size=-1):
+        with self.stats["lock"]:
+            self.stats["active"] += 1
+            self.stats["peak"] = max(
+                self.stats["peak"], self.stats["active"]
+            )
+        time.sleep(self.latency)
+        with self.stats["lock"]:
+            self.stats["active"] -= 1
+        return self.file.read(size)
+
+
+def throttled_opener(latency):
+    stats = {"lock": threading.Lock(), "active": 0, "peak": 0}
+    return (lambda path: ThrottledFile(path, latency, stats)), stats
+
+
+@pytest.mark.parametrize("chunk_size", [100, 4096, 1 << 20])
+def test_prefetching_source_matches_file_source(database, chunk_size):
+    _, sessions_path, _ = database
+    source = PrefetchingFileSource(
+        sessions_path, chunk_size=chunk_size, prefetch_chunks=3
+    )
+    assert source.read().frame_equal(FileSource(sessions_path).read())
+    columns, dtypes = plan_read(
+        source.columns,
+        ["session_id", "venue_id", "position_in_list", "purchased"],
+        SESSIONS_DTYPES,
+    )
+    assert source.read(columns, dtypes).frame_equal(
+        FileSource(sessions_path).read(columns, dtypes)
+    )
+
+
+@pytest.mark.parametrize("extension", [".arrow", ".parquet"])
+def test_prefetching_source_reads_columnar_files(database, extension):
+    _, _, venues_path = database
+    venues = pl.read_csv(venues_path)
+    path = venues_path.replace(".csv", extension)
+    if extension == ".arrow":
+        venues.write_ipc(path)
+    else:
+        venues.write_parquet(path)
+    source = PrefetchingFileSource(path, chunk_size=512)
+    assert source.read().frame_equal(venues)
+    assert source.read(["rating"]).frame_equal(venues.select("rating"))
+
+
+def test_prefetching_source_edge_cases(tmp_path):
+    path = os.path.join(tmp_path, "header.csv")
+    with open(path, "w") as file:
+        file.write("venue_id,rating\n")
+    assert PrefetchingFileSource(path, chunk_size=4).read().columns == [
+        "venue_id",
+        "rating",
+    ]
+    with open(path, "w") as file:
+        file.write("venue_id,rating\n1,4.5\n2,3.0")
+    frame = PrefetchingFileSource(path, chunk_size=5).read()
+    assert frame["rating"].to_list() == [4.5, 3.0]
+    with pytest.raises(ValueError):
+        PrefetchingFileSource(path, prefetch_chunks=0)
+
+
+def test_prefetching_overlaps_throttled_reads(database):
+    _, sessions_path, _ = database
+    size = os.path.getsize(sessions_path)
+    latency = 0.02
+    opener, stats = throttled_opener(latency)
+    source = PrefetchingFileSource(
+        sessions_path,
+        chunk_size=size // 20 + 1,
+        prefetch_chunks=4,
+        opener=opener,
+    )
+    start = time.perf_counter()
+    frame = source.read()
+    seconds = time.perf_counter() - start
+    assert frame.frame_equal(FileSource(sessions_path).read())
+    assert 1 < stats["peak"] <= 4
+    # EXPLAIN: 20 sequential reads would wait 20 latencies
+    assert seconds < 20 * latency
+
+
+@pytest.mark.parametrize("compact_dtypes", [False, True])
+def test_pipeline_prefetches_files(database, compact_dtypes):
+    _, sessions_path, venues_path = database
+    pipelines = [
+        RankingPipeline(
+            sessions_path,
+            venues_path,
+            split_strategy="session",
+            compact_dtypes=compact_dtypes,
+            **kwargs,
+        )
+        for kwargs in (
+            {},
+            {"prefetch_chunks": 2, "prefetch_chunk_size": 4096},
+        )
+    ]
+    for pipeline in pipelines:
+        pipeline.prepare_datasets()
+    assert pipelines[0].ranking_data.frame_equal(
+        pipelines[1].ranking_data
+    )
+
+
+def test_pipeline_prefetches_files_into_the_cache(
+    database, tmp_path, mocker
+):
+    _, sessions_path, venues_path = database
+    cache_dir = os.path.join(tmp_path, "cache")
+    read = mocker.spy(PrefetchingFileSource, "read")
+    pipelines = [
+        RankingPipeline(
+            sessions_path,
+            venues_path,
+            cache_dir=cache_dir,
+            prefetch_chunks=2,
+            prefetch_chunk_size=4096,
+        )
+        for _ in range(2)
+    ]
+    # EXPLAIN: the csv files are prefetched by the first conversion
+    # only, the columnar copies are never
+    assert read.call_count == 2
+    for pipeline in pipelines:
+        for source in pipeline.input_sources:
+            assert type(source) is FileSource
+            assert source.path.startswith(cache_dir)
+    assert pipelines[0].sessions.frame_equal(
+        RankingPipeline(sessions_path, venues_path).sessions
+    )
@@ -0,0 +1,50 @@
+import os
+
+from personalization.dataset_cache import (
+    DatasetCache,
+    cache_key,
+)
+
+
+def stage_entry(cache, key, size):
+    train_path, val_path = cache.staging_paths(key)
+    for path in (train_path, val_path):
+        with open(path, "wb") as file:
+            file.write(b"0" * size)
+    return cache.commit(key)
+
+
+def test_cache_key_is_stable_and_sensitive():
+    key = cache_key(features=["a", "b"], split_seed=0)
+    assert key == cache_key(split_seed=0, features=["a", "b"])
+    assert key != cache_key(features=["a", "b"], split_seed=1)
+    assert key != cache_key(features=["b", "a"], split_seed=0)
+
+
+def test_lookup_after_commit(tmp_path):
+    cache = DatasetCache(str(tmp_path))
+    assert cache.lookup("key") is None
+    paths = stage_entry(cache, "key", 10)
+    assert cache.lookup("key") == paths
+    assert all(os.path.isfile(path) for path in paths)
+    assert [entry["key"] for entry in cache.entries()] == ["key"]
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DatasetCache(str(tmp_path), max_bytes=50)
+    stage_entry(cache, "old", 10)
+    stage_entry(cache, "used", 10)
+    os.utime(tmp_path / "old", (1, 1))
+    os.utime(tmp_path / "used", (2, 2))
+    # a hit makes "old" the most recently used entry
+    cache.lookup("old")
+    stage_entry(cache, "new", 10)
+    assert cache.lookup("used") is None
+    assert cache.lookup("old") is not None
+    assert cache.lookup("new") is not None
+
+
+def test_never_evicts_the_committed_entry(tmp_path):
+    cache = DatasetCache(str(tmp_path), max_bytes=1)
+    stage_entry(cache, "big", 10)
+    assert cache.lookup("big") is not None
@@ -0,0 +1,107 @@
+import numpy as np
+import polars as pl
+import pytest
+
+from personalization.dataset_utils import (
+    PolarsSequence,
+    build_lgb_dataset,
+    group_sizes,
+    to_float32_matrix,
+)
+
+
+@pytest.fixture
+def ranking_frame():
+    rng = np.random.default_rng(0)
+    n_rows = 2_000
+    return pl.DataFrame(
+        {
+            "session_id": np.repeat(np.arange(n_rows // 10), 10),
+            "price_range": rng.integers(1, 4, n_rows),
+            "rating": rng.random(n_rows) * 10,
+            "is_recommended": rng.integers(0, 2, n_rows).astype(
+                np.int8
+            ),
+            "label": rng.integers(0, 2, n_rows),
+        }
+    ).with_columns(
+        pl.when(pl.col("price_range") == 3)
+        .then(None)
+        .otherwise(pl.col("rating"))
+        .alias("rating")
+    )
+
+
+FEATURES = ["price_range", "rating", "is_recommended"]
+
+
+def test_to_float32_matrix(ranking_frame):
+    matrix = to_float32_matrix(ranking_frame, FEATURES)
+    assert matrix.dtype == np.float32
+    assert matrix.flags["C_CONTIGUOUS"]
+    assert matrix.shape == (ranking_frame.height, len(FEATURES))
+    expected = ranking_frame.select(FEATURES).to_pandas().to_numpy()
+    np.testing.assert_allclose(matrix, expected.astype(np.float32))
+
+
+def groupby_group_sizes(frame, group_column):
+    """The groupby/count/sort aggregation `group_sizes` replaces."""
+    return (
+        frame.groupby(group_column)
+        .agg(pl.col(group_column).count().alias("count"))
+        .sort(group_column)
+        .get_column("count")
+        .to_numpy()
+    )
+
+
+@pytest.mark.parametrize("n_rows", [0, 1, 5, 2_000])
+def test_group_sizes_match_groupby(n_rows):
+    rng = np.random.default_rng(0)
+    frame = pl.DataFrame(
+        {"session_id": rng.integers(0, 50, n_rows).astype(str)}
+    ).sort("session_id")
+    sizes = group_sizes(frame, "session_id")
+    assert sizes.dtype == np.int32
+    np.testing.assert_array_equal(
+        sizes, groupby_group_sizes(frame, "session_id")
+    )
+    assert sizes.sum() == n_rows
+
+
+def test_group_sizes_of_one_group():
+    frame = pl.DataFrame({"session_id": ["a"] * 7})
+    np.testing.assert_array_equal(group_sizes(frame, "session_id"), [7])
+
+
+def test_polars_sequence_access(ranking_frame):
+    sequence = PolarsSequence(ranking_frame, FEATURES, batch_size=64)
+    matrix = to_float32_matrix(ranking_frame, FEATURES)
+    assert len(sequence) == ranking_frame.height
+    np.testing.assert_allclose(sequence[5], matrix[5], rtol=1e-6)
+    np.testing.assert_array_equal(sequence[10:20], matrix[10:20])
+    np.testing.assert_array_equal(sequence[[1, 7]], matrix[[1, 7]])
+    with pytest.raises(TypeError):
+        sequence["rating"]
+
+
+def test_chunked_dataset_matches_matrix_dataset(
+    ranking_frame, tmp_path
+):
+    group = np.full(ranking_frame.height // 10, 10)
+    matrix_set = build_lgb_dataset(
+        ranking_frame, FEATURES, "label", group=group
+    )
+    chunked_set = build_lgb_dataset(
+        ranking_frame, FEATURES, "label", group=group, chunk_size=128
+    )
+    assert chunked_set.num_data() == matrix_set.num_data()
+    assert chunked_set.get_feature_name() == FEATURES
+    np.testing.assert_array_equal(
+        chunked_set.get_label(), matrix_set.get_label()
+    )
+    matrix_set.save_binary(str(tmp_path / "matrix.bin"))
+    chunked_set.save_binary(str(tmp_path / "chunked.bin"))
+    assert (tmp_path / "matrix.bin").read_bytes() == (
+        tmp_path / "chunked.bin"
+    ).read_bytes()
@@ -0,0 +1,126 @@
+import os
+
+import numpy as np
+import polars as pl
+import pytest
+
+from personalization.distributed import (
+    find_free_ports,
+    network_params,
+    train_distributed,
+)
+from personalization.model_artifact import read_manifest
+from personalization.ranking_pipeline import RankingPipeline
+from personalization.synthetic import write_synthetic_csvs
+
+FEATURES = ["rating", "price_range"]
+
+
+@pytest.fixture
+def shard_paths(tmp_path):
+    rng = np.random.default_rng(0)
+    paths = []
+    for shard in range(2):
+        n_rows = 2_000
+        frame = pl.DataFrame(
+            {
+                "session_id": np.repeat(
+                    np.arange(n_rows // 10) + shard * n_rows, 10
+                ),
+                "rating": rng.random(n_rows) * 10,
+                "price_range": rng.integers(1, 5, n_rows),
+            }
+        ).with_columns(
+            (pl.col("rating") > 7).cast(pl.Int8).alias("label")
+        )
+        path = os.path.join(tmp_path, f"shard-{shard}.arrow")
+        frame.write_ipc(path, compression="uncompressed")
+        paths.append(path)
+    return paths
+
+
+def test_network_params():
+    machines = [("10.0.0.1", 12400), ("10.0.0.2", 12400)]
+    params = network_params(machines, 1, "voting")
+    assert params["machines"] == "10.0.0.1:12400,10.0.0.2:12400"
+    assert params["num_machines"] == 2
+    assert params["tree_learner"] == "voting"
+    with pytest.raises(ValueError):
+        network_params(machines, 2)
+    with pytest.raises(ValueError):
+        network_params(machines, 0, "feature")
+
+
+def test_free_ports_are_distinct():
+    ports = find_free_ports(4)
+    assert len(set(ports)) == 4
+
+
+@pytest.mark.parametrize("tree_learner", ["data", "voting"])
+def test_train_distributed(shard_paths, tree_learner):
+    booster = train_distributed(
+        shard_paths,
+        FEATURES,
+        "label",
+        "session_id",
+        {
+            "objective": "lambdarank",
+            "num_iterations": 5,
+            "verbosity": -1,
+        },
+        tree_learner=tree_learner,
+    )
+    assert booster.num_trees() == 5
+    assert booster.feature_name() == FEATURES
+    scores = booster.predict(np.array([[9.0, 1.0], [1.0, 1.0]]))
+    assert scores[0] > scores[1]
+
+
+def test_failed_worker_stops_training(shard_paths, tmp_path):
+    with pytest.raises(RuntimeError):
+        train_distributed(
+            [shard_paths[0], os.path.join(tmp_path, "missing.arrow")],
+            FEATURES,
+            "label",
+            "session_id",
+            {"objective": "lambdarank", "num_iterations": 5},
+        )
+
+
+def test_distributed_pipeline(tmp_path):
+    sessions_path, venues_path = write_synthetic_csvs(
+        os.path.join(tmp_path, "data"), 20_000, seed=0
+    )
+    pipeline = RankingPipeline(
+        sessions_path,
+        venues_path,
+        split_strategy="session",
+        distributed_workers=2,
+        out_of_core_dir=os.path.join(tmp_path, "partitions"),
+    )
+    assert pipeline.lazy
+    pipeline.prepare_datasets()
+    assert len(pipeline.partition_paths["train"]) == 2
+    pipeline.train(
+        params={
+            "objective": "lambdarank",
+            "num_iterations": 5,
+            "ndcg_eval_at": [5, 10],
+        }
+    )
+    assert pipeline.model.num_trees() == 5
+    assert 0 < pipeline.val_metrics["ndcg@10"] <= 1
+    assert os.listdir(os.path.join(tmp_path, "partitions")) == []
+    model_path = os.path.join(tmp_path, "model")
+    pipeline.export_model_artifact(model_path)
+    assert "ndcg@10" in read_manifest(model_path)["metrics"]["val"]
+
+
+def test_distributed_pipeline_needs_session_split(tmp_path):
+    sessions_path, venues_path = write_synthetic_csvs(
+        os.path.join(tmp_path, "data"), 1_000, seed=0
+    )
+    with pytest.raises(ValueError):
+        RankingPipeline(
+            sessions_path, venues_path, distributed_workers=2
+        )
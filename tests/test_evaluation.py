@@ -0,0 +1,182 @@
+import lightgbm as lgb
+import numpy as np
+import polars as pl
+import pytest
+
+from personalization.dataset_utils import to_float32_matrix
+from personalization.evaluation import (
+    POSITION_BASELINE,
+    evaluate_model,
+    evaluate_scores,
+    ranking_metrics,
+)
+from personalization.feature_store import VenueFeatureStore
+from personalization.synthetic import (
+    generate_sessions,
+    generate_venues,
+)
+
+CUTOFFS = (1, 3, 10)
+
+
+def reference_metrics(groups, scores, labels, cutoffs):
+    """Per-session loop computing the metrics one session at a time."""
+    per_session = {"mrr": []}
+    for group in np.unique(groups):
+        rows = groups == group
+        ranked = labels[rows][np.argsort(-scores[rows], kind="stable")]
+        if not (ranked > 0).any():
+            continue
+        ideal = np.sort(labels[rows])[::-1]
+        discounts = 1 / np.log2(np.arange(len(ranked)) + 2)
+        per_session["mrr"].append(1 / (np.argmax(ranked > 0) + 1))
+        for k in cutoffs:
+            dcg = ((2 ** ranked[:k] - 1) * discounts[:k]).sum()
+            idcg = ((2 ** ideal[:k] - 1) * discounts[:k]).sum()
+            hits = np.cumsum(ranked[:k] > 0)
+            precision = hits / np.arange(1, len(hits) + 1)
+            n_relevant = (ranked > 0).sum()
+            average_precision = (
+                precision * (ranked[:k] > 0)
+            ).sum() / min(n_relevant, k)
+            for name, value in [
+                (f"ndcg@{k}", dcg / idcg),
+                (f"map@{k}", average_precision),
+                (f"recall@{k}", hits[-1] / n_relevant),
+            ]:
+                per_session.setdefault(name, []).append(value)
+    return {
+        name: np.mean(values) for name, values in per_session.items()
+    }
+
+
+@pytest.fixture
+def rankings():
+    rng = np.random.default_rng(0)
+    groups = rng.integers(0, 300, 5_000)
+    scores = rng.random(5_000)
+    labels = rng.integers(0, 3, 5_000) * (rng.random(5_000) < 0.3)
+    return groups, scores, labels.astype(np.float64)
+
+
+def test_metrics_match_per_session_loop(rankings):
+    groups, scores, labels = rankings
+    metrics = ranking_metrics(groups, scores, labels, CUTOFFS)
+    expected = reference_metrics(groups, scores, labels, CUTOFFS)
+    for name, value in expected.items():
+        assert metrics[name] == pytest.approx(value), name
+    assert metrics["sessions"] + metrics[
+        "sessions_without_relevant"
+    ] == len(np.unique(groups))
+
+
+def test_metrics_do_not_depend_on_row_order(rankings):
+    groups, scores, labels = rankings
+    frame = pl.DataFrame(
+        {
+            "session_id": groups.astype(str),
+            "score": scores,
+            "label": labels,
+        }
+    )
+    metrics = evaluate_scores(
+        frame, "score", label_column="label", cutoffs=CUTOFFS
+    )
+    shuffled = frame.sample(frac=1.0, shuffle=True, seed=1)
+    assert evaluate_scores(
+        shuffled, "score", label_column="label", cutoffs=CUTOFFS
+    ) == pytest.approx(metrics)
+
+
+def test_perfect_ranking():
+    groups = np.array([0, 0, 0, 1, 1])
+    labels = np.array([0.0, 2.0, 1.0, 1.0, 0.0])
+    metrics = ranking_metrics(groups, labels, labels, CUTOFFS)
+    for name, value in metrics.items():
+        if name.startswith(("ndcg", "map", "mrr")):
+            assert value == pytest.approx(1.0), name
+
+
+def test_sessions_without_relevant_rows_are_skipped():
+    metrics = ranking_metrics(
+        np.array([0, 0, 1, 1]),
+        np.array([0.2, 0.1, 0.2, 0.1]),
+        np.array([0.0, 1.0, 0.0, 0.0]),
+        CUTOFFS,
+    )
+    assert metrics["sessions"] == 1
+    assert metrics["sessions_without_relevant"] == 1
+    assert metrics["mrr"] == pytest.approx(0.5)
+    assert metrics["recall@1"] == 0
+
+
+def test_empty_rankings():
+    empty = np.zeros(0)
+    metrics = ranking_metrics(empty, empty, empty, CUTOFFS)
+    assert metrics["sessions"] == 0
+    assert np.isnan(metrics["ndcg@10"])
+
+
+def train_booster(store, sessions):
+    """A few trees ranking sessions by two features."""
+    features = ["conversions_per_impression", "position_in_list"]
+    train = store.enrich(sessions).sort("session_id")
+    return lgb.train(
+        {"objective": "lambdarank", "verbosity": -1},
+        lgb.Dataset(
+            to_float32_matrix(train, features),
+            label=train.get_column("has_seen_venue_in_this_session")
+            .cast(pl.Float32)
+            .to_numpy(),
+            group=train.groupby("session_id", maintain_order=True)
+            .count()
+            .get_column("count")
+            .to_numpy(),
+            feature_name=features,
+        ),
+        num_boost_round=5,
+    )
+
+
+def test_evaluate_model_with_position_baseline():
+    venues = generate_venues(200, seed=0)
+    sessions = generate_sessions(5_000, venues, seed=0)
+    store = VenueFeatureStore(venues)
+    booster = train_booster(store, sessions)
+    results = evaluate_model(
+        booster, sessions, store, cutoffs=CUTOFFS, batch_size=1_000
+    )
+    assert set(results) == {"model", POSITION_BASELINE}
+    assert results["model"]["sessions"] > 0
+    assert results["model"]["ndcg@10"] > 0
+    assert evaluate_model(
+        booster, sessions, venues, cutoffs=CUTOFFS, baseline=False
+    )["model"] == pytest.approx(results["model"])
+
+
+def test_evaluate_model_drops_nulls_like_training():
+    """Test that rows with a null in any column are not evaluated."""
+    venues = generate_venues(200, seed=0)
+    sessions = generate_sessions(5_000, venues, seed=0)
+    booster = train_booster(VenueFeatureStore(venues), sessions)
+    venues = venues.with_columns(
+        pl.when(pl.col("venue_id") % 4 == 0)
+        .then(None)
+        .otherwise(pl.col("rating"))
+        .alias("rating")
+    )
+    sessions = sessions.with_row_count().with_columns(
+        pl.when(pl.col("row_nr") % 7 == 0)
+        .then(None)
+        .otherwise(pl.col("is_new_user"))
+        .alias("is_new_user")
+    )
+    complete_venues = venues.drop_nulls()
+    complete_sessions = sessions.drop_nulls().join(
+        complete_venues.select("venue_id"), on="venue_id"
+    )
+    assert evaluate_model(
+        booster, sessions, venues, cutoffs=CUTOFFS
+    ) == evaluate_model(
+        booster, complete_sessions, complete_venues, cutoffs=CUTOFFS
+    )
@@ -0,0 +1,143 @@
+import polars as pl
+import pytest
+
+from personalization import feature_engineering
+from personalization.feature_engineering import (
+    DEFAULT_AGGREGATES,
+    FeatureCache,
+    WindowAggregate,
+    add_window_features,
+    ratio,
+)
+
+LABEL = "has_seen_venue_in_this_session"
+
+
+def window_rows(venue_ids, labels):
+    return pl.DataFrame(
+        {
+            "venue_id": venue_ids,
+            LABEL: labels,
+            "purchased": [False] * len(venue_ids),
+            "is_new_user": [True] * len(venue_ids),
+        }
+    ).lazy()
+
+
+@pytest.fixture
+def ctr():
+    return WindowAggregate(
+        "venue_ctr",
+        ["venue_id"],
+        {
+            "impressions": pl.count(),
+            "clicks": pl.col(LABEL).cast(pl.Int64).sum(),
+        },
+        ratio("clicks", "impressions"),
+    )
+
+
+def test_input_columns():
+    assert DEFAULT_AGGREGATES[2].input_columns == [
+        "venue_id",
+        "is_new_user",
+        LABEL,
+    ]
+
+
+def test_first_window_has_no_history(ctr, tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    rows = window_rows([1, 2], [True, False])
+    features = add_window_features(
+        rows, [ctr], cache, "day-0"
+    ).collect()
+    assert features.get_column("venue_ctr").null_count() == 2
+    assert features.get_column("venue_ctr").dtype == pl.Float32
+    assert cache.windows(ctr) == ["day-0"]
+
+
+def test_history_merges_earlier_windows(ctr, tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    cache.add_window(ctr, "day-0", window_rows([1, 1, 2], [1, 0, 0]))
+    cache.add_window(ctr, "day-1", window_rows([1, 2], [1, 1]))
+    rows = window_rows([2, 3, 1], [0, 0, 0])
+    features = add_window_features(
+        rows, [ctr], cache, "day-2"
+    ).collect()
+    assert features.get_column("venue_id").to_list() == [2, 3, 1]
+    assert features.get_column("venue_ctr").to_list() == pytest.approx(
+        [0.5, None, 2 / 3]
+    )
+
+
+def test_history_excludes_later_windows(ctr, tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    for day in range(3):
+        cache.add_window(ctr, f"day-{day}", window_rows([1], [day]))
+    assert cache.history_windows(ctr, "day-1") == ["day-0"]
+    assert cache.history_windows(ctr, "day-0") == []
+    assert cache.history_windows(ctr, "new") == [
+        "day-0",
+        "day-1",
+        "day-2",
+    ]
+
+
+def test_windows_are_computed_once(ctr, tmp_path, mocker):
+    cache = FeatureCache(str(tmp_path))
+    statistics = mocker.spy(
+        feature_engineering, "shared_window_statistics"
+    )
+    assert cache.add_window(ctr, "day-0", window_rows([1], [1]))
+    assert not cache.add_window(ctr, "day-0", window_rows([1], [0]))
+    assert statistics.call_count == 1
+    assert FeatureCache(str(tmp_path)).windows(ctr) == ["day-0"]
+
+
+def test_changed_statistics_do_not_reuse_windows(ctr, tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    cache.add_window(ctr, "day-0", window_rows([1], [1]))
+    other = WindowAggregate(
+        "venue_clicks",
+        ["venue_id"],
+        {"clicks": pl.col(LABEL).cast(pl.Int64).sum()},
+        pl.col("clicks"),
+    )
+    assert ctr.fingerprint != other.fingerprint
+    assert cache.windows(other) == []
+
+
+def test_shared_window_statistics_match_each_aggregate():
+    rows = pl.DataFrame(
+        {
+            "venue_id": [1, 1, 2, 2, 3],
+            LABEL: [True, False, True, True, False],
+            "purchased": [False, True, False, True, False],
+            "is_new_user": [True, False, True, True, None],
+        }
+    ).lazy()
+    shared = feature_engineering.shared_window_statistics(
+        DEFAULT_AGGREGATES, rows
+    )
+    for aggregate, statistics in zip(DEFAULT_AGGREGATES, shared):
+        expected = aggregate.window_statistics(rows).collect()
+        assert statistics.schema == expected.schema
+        assert statistics.sort(aggregate.keys).frame_equal(
+            expected.sort(aggregate.keys), null_equal=True
+        )
+
+
+def test_window_features_scan_rows_once(tmp_path):
+    scans = []
+
+    def scan(frame):
+        scans.append(frame.height)
+        return frame
+
+    add_window_features(
+        window_rows([1, 2], [True, False]).map(scan),
+        DEFAULT_AGGREGATES,
+        FeatureCache(str(tmp_path)),
+        "day-0",
+    )
+    assert scans == [2]
@@ -0,0 +1,83 @@
+import numpy as np
+import polars as pl
+import pytest
+
+from personalization.feature_store import VenueFeatureStore
+from personalization.synthetic import (
+    generate_sessions,
+    generate_venues,
+)
+
+
+@pytest.fixture
+def venues():
+    return generate_venues(1_000, seed=2, null_fraction=0.05)
+
+
+def test_rows_of_known_and_unknown_ids(venues):
+    store = VenueFeatureStore(venues)
+    ids = store.venue_ids
+    np.testing.assert_array_equal(
+        store.rows(ids[::-1]), np.arange(len(ids))[::-1]
+    )
+    missing = np.array(
+        [ids.min() - 1, ids.max() + 1, 2**50, -(2**50)],
+        dtype=np.int64,
+    )
+    assert (store.rows(missing) == -1).all()
+    assert len(store.rows(np.zeros(0, dtype=np.int64))) == 0
+
+
+def test_enrich_matches_inner_join(venues):
+    sessions = generate_sessions(5_000, venues, seed=1)
+    unknown = pl.DataFrame(
+        {"venue_id": [123, None]}, schema={"venue_id": pl.Int64}
+    )
+    sessions = pl.concat(
+        [
+            sessions,
+            sessions.head(2).with_columns(
+                unknown.get_column("venue_id")
+            ),
+        ]
+    )
+    store = VenueFeatureStore(venues)
+    expected = sessions.join(venues, on="venue_id")
+    assert store.enrich(sessions).frame_equal(expected, null_equal=True)
+
+
+def test_store_sorts_and_rejects_duplicated_ids(venues):
+    store = VenueFeatureStore(venues.reverse())
+    assert len(store) == venues.height
+    assert (np.diff(store.venue_ids) > 0).all()
+    assert "venue_id" not in store.feature_columns
+    with pytest.raises(ValueError, match="10 venue ids"):
+        VenueFeatureStore(pl.concat([venues, venues.head(10)]))
+
+
+def test_enrich_suffixes_clashing_columns(venues):
+    sessions = pl.DataFrame(
+        {
+            "venue_id": venues.get_column("venue_id").head(3),
+            "rating": [1.0, 2.0, 3.0],
+        }
+    )
+    enriched = VenueFeatureStore(venues).enrich(sessions)
+    assert enriched.get_column("rating").to_list() == [1.0, 2.0, 3.0]
+    assert "rating_right" in enriched.columns
+
+
+def test_feature_table_has_missing_row(venues):
+    store = VenueFeatureStore(venues)
+    table = store.feature_table(["price_range", "popularity"])
+    assert table.shape == (venues.height + 1, 2)
+    assert table.dtype == np.float32
+    assert np.isnan(table[-1]).all()
+    assert store.feature_table(["price_range", "popularity"]) is table
+
+
+def test_store_needs_integer_ids():
+    with pytest.raises(ValueError):
+        VenueFeatureStore(pl.DataFrame({"venue_id": ["a", "b"]}))
+    with pytest.raises(ValueError):
+        VenueFeatureStore(pl.DataFrame({"id": [1, 2]}))
@@ -0,0 +1,101 @@
+import os
+
+import polars as pl
+import pytest
+
+from personalization.file_utils import (
+    cache_as_columnar,
+    file_fingerprint,
+    read_table,
+    scan_table,
+)
+
+from .utils import generate_venues_dataframe
+
+
+@pytest.fixture
+def venues_csv_path(tmp_path):
+    """Create a temporary CSV file with venue data and return its path."""
+    venues_csv_path_str = os.path.join(tmp_path, "venues.csv")
+    generate_venues_dataframe().write_csv(venues_csv_path_str)
+    return venues_csv_path_str
+
+
+def test_fingerprint_changes_with_content(venues_csv_path):
+    fingerprint = file_fingerprint(venues_csv_path)
+    assert fingerprint == file_fingerprint(venues_csv_path)
+    generate_venues_dataframe().head(3).write_csv(venues_csv_path)
+    assert fingerprint != file_fingerprint(venues_csv_path)
+
+
+@pytest.mark.parametrize("file_format", ["ipc", "parquet"])
+def test_cache_as_columnar_roundtrip(
+    venues_csv_path, tmp_path, file_format
+):
+    cache_dir = os.path.join(tmp_path, "cache")
+    cache_path = cache_as_columnar(
+        venues_csv_path, cache_dir, file_format=file_format
+    )
+    assert read_table(cache_path).frame_equal(
+        pl.read_csv(venues_csv_path)
+    )
+    assert (
+        scan_table(cache_path)
+        .collect()
+        .frame_equal(pl.read_csv(venues_csv_path))
+    )
+
+
+def test_cache_as_columnar_reuses_and_rebuilds(
+    venues_csv_path, tmp_path
+):
+    cache_dir = os.path.join(tmp_path, "cache")
+    cache_path = cache_as_columnar(venues_csv_path, cache_dir)
+    mtime = os.stat(cache_path).st_mtime_ns
+    assert cache_as_columnar(venues_csv_path, cache_dir) == cache_path
+    assert os.stat(cache_path).st_mtime_ns == mtime
+
+    rebuilt_path = cache_as_columnar(
+        venues_csv_path, cache_dir, rebuild=True
+    )
+    assert rebuilt_path == cache_path
+    assert os.stat(cache_path).st_mtime_ns != mtime
+
+
+def test_cache_as_columnar_drops_stale_copies(
+    venues_csv_path, tmp_path
+):
+    cache_dir = os.path.join(tmp_path, "cache")
+    cache_path = cache_as_columnar(venues_csv_path, cache_dir)
+    generate_venues_dataframe().head(3).write_csv(venues_csv_path)
+    new_cache_path = cache_as_columnar(venues_csv_path, cache_dir)
+    assert new_cache_path != cache_path
+    assert os.listdir(cache_dir) == [os.path.basename(new_cache_path)]
+    assert read_table(new_cache_path).shape[0] == 3
+
+
+def test_cache_as_columnar_unknown_format(venues_csv_path, tmp_path):
+    with pytest.raises(ValueError):
+        cache_as_columnar(venues_csv_path, str(tmp_path), "feather")
+
+
+@pytest.mark.parametrize("file_format", [None, "ipc", "parquet"])
+def test_read_table_projects_and_casts(
+    venues_csv_path, tmp_path, file_format
+):
+    path = (
+        cache_as_columnar(
+            venues_csv_path,
+            os.path.join(tmp_path, "cache"),
+            file_format=file_format,
+        )
+        if file_format
+        else venues_csv_path
+    )
+    columns = ["venue_id", "price_range", "rating"]
+    dtypes = {"price_range": pl.Int8, "rating": pl.Float32}
+    expected = {"venue_id": pl.Int64, **dtypes}
+    assert read_table(path, columns, dtypes).schema == expected
+    assert (
+        scan_table(path, columns, dtypes).collect().schema == expected
+    )
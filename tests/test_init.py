@@ -1,8 +1,104 @@
 """test __init__
     """
+import json
+import os
+import pathlib
+import subprocess
+import sys
+
+import lightgbm as lgb
+import numpy as np
+import pytest
+
+import personalization
 from personalization import __version__
+from personalization.model_artifact import save_model_artifact
+
+# modules that dominate the import time and RSS of the package
+HEAVY_MODULES = [
+    "joblib",
+    "lightgbm",
+    "numpy",
+    "polars",
+    "pyarrow",
+    "sklearn",
+]
+# startup budgets: heavy modules each entry point may import
+CLI_BUDGET = []
+LOADER_BUDGET = []
+
+
+def imported_heavy_modules(code):
+    """Heavy modules imported by `code` run in a fresh interpreter."""
+    package_root = pathlib.Path(personalization.__file__).parents[1]
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(
+            [str(package_root), os.environ.get("PYTHONPATH", "")]
+        ),
+    }
+    report = (
+        "\nimport json, sys\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} "
+        "if m in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code + report],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
 
 
 def test_version():
     """test __version__ value"""
     assert __version__ == "0.0.1"
+
+
+def test_public_names_are_imported_on_access():
+    from personalization.ranking_pipeline import RankingPipeline
+
+    assert personalization.RankingPipeline is RankingPipeline
+    assert "load_model_from_artifact" in dir(personalization)
+    with pytest.raises(AttributeError):
+        personalization.Missing
+
+
+def test_import_budget():
+    assert imported_heavy_modules("import personalization") == []
+
+
+def test_cli_budget():
+    code = (
+        "import contextlib, io, runpy, sys\n"
+        "sys.argv = ['personalization', 'cv', '--help']\n"
+        "with contextlib.redirect_stdout(io.StringIO()):\n"
+        "    try:\n"
+        "        runpy.run_module('personalization', run_name='__main__')\n"
+        "    except SystemExit:\n"
+        "        pass"
+    )
+    assert imported_heavy_modules(code) == CLI_BUDGET
+
+
+def test_loader_budget(tmp_path):
+    matrix = np.random.default_rng(0).random((100, 2))
+    booster = lgb.train(
+        {"objective": "regression", "verbosity": -1},
+        lgb.Dataset(matrix, label=matrix[:, 0]),
+        num_boost_round=2,
+    )
+    artifact_path = str(tmp_path / "model")
+    save_model_artifact(booster, artifact_path)
+    code = (
+        "from personalization import load_model_from_artifact\n"
+        f"booster = load_model_from_artifact({artifact_path!r}, lazy=True)\n"
+        "assert booster.feature_name() == ['Column_0', 'Column_1']"
+    )
+    assert imported_heavy_modules(code) == LOADER_BUDGET
+    loaded = imported_heavy_modules(
+        code + "\nassert booster.num_trees() == 2"
+    )
+    assert "lightgbm" in loaded
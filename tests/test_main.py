@@ -0,0 +1,285 @@
+import json
+import os
+
+import numpy as np
+import polars as pl
+import pytest
+
+from personalization.__main__ import (
+    main,
+    parse_arguments,
+)
+from personalization.evaluation import evaluate_model
+from personalization.feature_engineering import (
+    DEFAULT_AGGREGATES,
+    FeatureCache,
+)
+from personalization.file_utils import read_table
+from personalization.model_artifact import (
+    load_model_from_artifact,
+    read_manifest,
+)
+from personalization.scoring import RankingScorer
+from personalization.synthetic import write_synthetic_csvs
+
+from .utils import (
+    generate_sessions_dataframe,
+    generate_venues_dataframe,
+)
+
+DATA_ARGUMENTS = [
+    "--sessions-bucket-path",
+    "sessions.csv",
+    "--venues-bucket-path",
+    "venues.csv",
+]
+
+
+def test_parse_train_arguments():
+    args = parse_arguments(DATA_ARGUMENTS + ["--num_leaves", "31"])
+    assert args.command == "train"
+    assert args.num_leaves == 31
+    assert os.path.isabs(args.feature_cache_dir)
+
+
+def test_parse_tune_arguments():
+    args = parse_arguments(
+        ["tune"]
+        + DATA_ARGUMENTS
+        + ["--num_leaves", "31", "63", "--learning_rate", "0.1"]
+    )
+    assert args.command == "tune"
+    assert args.num_leaves == [31, 63]
+    assert args.learning_rate == [0.1]
+    assert args.min_sum_hessian_in_leaf == [1, 10]
+
+
+def test_train_command_profile(tmp_path, capsys):
+    sessions_path = os.path.join(tmp_path, "sessions.csv")
+    venues_path = os.path.join(tmp_path, "venues.csv")
+    generate_sessions_dataframe().write_csv(sessions_path)
+    generate_venues_dataframe().write_csv(venues_path)
+    profile_path = os.path.join(tmp_path, "profile.json")
+    trace_path = os.path.join(tmp_path, "trace.json")
+    main(
+        [
+            "--sessions-bucket-path",
+            sessions_path,
+            "--venues-bucket-path",
+            venues_path,
+            "--no-cache",
+            "--num_iterations",
+            "2",
+            "--trained-model-path",
+            os.path.join(tmp_path, "model"),
+            "--profile",
+            "--profile-json",
+            profile_path,
+            "--profile-trace",
+            trace_path,
+        ]
+    )
+    with open(profile_path) as file:
+        stages = [record["stage"] for record in json.load(file)]
+    assert stages[0] == "read"
+    assert stages[-2:] == ["train", "export"]
+    with open(trace_path) as file:
+        assert len(json.load(file)["traceEvents"]) == len(stages)
+    assert "dataset_construction" in capsys.readouterr().out
+
+
+def test_train_command_keeps_joblib_model_files(tmp_path):
+    sessions_path = os.path.join(tmp_path, "sessions.csv")
+    venues_path = os.path.join(tmp_path, "venues.csv")
+    generate_sessions_dataframe().write_csv(sessions_path)
+    generate_venues_dataframe().write_csv(venues_path)
+    model_path = os.path.join(tmp_path, "model.joblib")
+    main(
+        [
+            "--sessions-bucket-path",
+            sessions_path,
+            "--venues-bucket-path",
+            venues_path,
+            "--no-cache",
+            "--num_iterations",
+            "2",
+            "--trained-model-path",
+            model_path,
+        ]
+    )
+    assert os.path.isfile(model_path)
+    assert load_model_from_artifact(model_path).num_trees() > 0
+
+
+def test_tune_command(tmp_path):
+    sessions_path = os.path.join(tmp_path, "sessions.csv")
+    venues_path = os.path.join(tmp_path, "venues.csv")
+    generate_sessions_dataframe().write_csv(sessions_path)
+    generate_venues_dataframe().write_csv(venues_path)
+    leaderboard_path = os.path.join(tmp_path, "leaderboard.json")
+    model_path = os.path.join(tmp_path, "model")
+    main(
+        [
+            "tune",
+            "--sessions-bucket-path",
+            sessions_path,
+            "--venues-bucket-path",
+            venues_path,
+            "--no-cache",
+            "--num_leaves",
+            "2",
+            "4",
+            "--learning_rate",
+            "0.1",
+            "--min_sum_hessian_in_leaf",
+            "1",
+            "--num_iterations",
+            "4",
+            "--min-rounds",
+            "2",
+            "--executor",
+            "thread",
+            "--leaderboard-path",
+            leaderboard_path,
+            "--trained-model-path",
+            model_path,
+        ]
+    )
+    with open(leaderboard_path) as file:
+        leaderboard = json.load(file)
+    assert len(leaderboard) == 2
+    manifest = read_manifest(model_path)
+    assert (
+        manifest["params"]["num_leaves"]
+        == leaderboard[0]["config"]["num_leaves"]
+    )
+
+
+def test_evaluate_command(tmp_path, capsys):
+    sessions_path, venues_path = write_synthetic_csvs(
+        os.path.join(tmp_path, "data"), 20_000, seed=0
+    )
+    model_path = os.path.join(tmp_path, "model")
+    data_arguments = [
+        "--sessions-bucket-path",
+        sessions_path,
+        "--venues-bucket-path",
+        venues_path,
+    ]
+    main(
+        data_arguments
+        + [
+            "--no-cache",
+            "--split-strategy",
+            "session",
+            "--num_iterations",
+            "5",
+            "--trained-model-path",
+            model_path,
+        ]
+    )
+    metrics_path = os.path.join(tmp_path, "metrics.json")
+    main(
+        ["evaluate", "--model-path", model_path]
+        + data_arguments
+        + [
+            "--split",
+            "test",
+            "--cutoffs",
+            "5",
+            "10",
+            "--metrics-path",
+            metrics_path,
+        ]
+    )
+    with open(metrics_path) as file:
+        results = json.load(file)
+    assert set(results) == {"model", "position_baseline"}
+    assert set(results["model"]) >= {"ndcg@5", "map@10", "mrr"}
+    assert 0 < results["model"]["sessions"]
+    assert "recall@10" in capsys.readouterr().out
+
+
+def test_window_feature_model_evaluates_and_scores(tmp_path):
+    cache_dir = os.path.join(tmp_path, "features")
+    model_path = os.path.join(tmp_path, "model")
+    # EXPLAIN: the first day only fills the cache, the model of the
+    # second day learns from the history of the first
+    for day in range(2):
+        sessions_path, venues_path = write_synthetic_csvs(
+            os.path.join(tmp_path, f"day{day}"), 10_000, seed=day
+        )
+        data_arguments = [
+            "--sessions-bucket-path",
+            sessions_path,
+            "--venues-bucket-path",
+            venues_path,
+        ]
+        main(
+            data_arguments
+            + [
+                "--no-cache",
+                "--split-strategy",
+                "session",
+                "--window-features",
+                "--feature-cache-dir",
+                cache_dir,
+                "--num_iterations",
+                "3",
+                "--trained-model-path",
+                model_path,
+            ]
+        )
+    booster = load_model_from_artifact(model_path)
+    assert {"venue_ctr", "venue_user_type_ctr"} <= set(
+        booster.feature_name()
+    )
+
+    metrics_path = os.path.join(tmp_path, "metrics.json")
+    main(
+        ["evaluate", "--model-path", model_path]
+        + data_arguments
+        + [
+            "--split",
+            "test",
+            "--feature-cache-dir",
+            cache_dir,
+            "--metrics-path",
+            metrics_path,
+        ]
+    )
+    with open(metrics_path) as file:
+        assert json.load(file)["model"]["sessions"] > 0
+
+    venues = read_table(venues_path)
+    with pytest.raises(ValueError, match="window features"):
+        evaluate_model(booster, read_table(sessions_path), venues)
+    with pytest.raises(ValueError, match="window features"):
+        RankingScorer(booster, venues)
+
+    scorer = RankingScorer.from_artifact(
+        model_path, venues_path, feature_cache_dir=cache_dir
+    )
+    venue_ids = venues.get_column("venue_id").to_numpy()[:50]
+    matrix = scorer.feature_matrix(
+        venue_ids, {"is_new_user": 1, "position_in_list": 0}
+    )
+    ctr = FeatureCache(cache_dir).history(DEFAULT_AGGREGATES[0], None)
+    assert ctr is not None
+    expected = (
+        pl.DataFrame({"venue_id": venue_ids})
+        .join(ctr.collect(), on="venue_id", how="left")
+        .get_column("venue_ctr")
+        .fill_null(np.nan)
+        .to_numpy()
+    )
+    column = matrix[:, scorer.features.index("venue_ctr")]
+    np.testing.assert_allclose(column, expected, rtol=1e-6)
+    assert np.isfinite(column).any()
+    assert np.isfinite(
+        matrix[:, scorer.features.index("venue_user_type_ctr")]
+    ).any()
+    ranked = scorer.rank_batch(
+        [{"session_id": "a", "venue_ids": venue_ids, "is_new_user": 0}]
+    )
+    assert np.isfinite(ranked[0]["scores"]).all()
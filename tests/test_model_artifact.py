@@ -0,0 +1,176 @@
+import os
+
+import joblib
+import lightgbm as lgb
+import numpy as np
+import polars as pl
+import pytest
+
+from personalization.dataset_utils import build_bin_reference
+from personalization.model_artifact import (
+    LazyBooster,
+    default_artifact_format,
+    is_native_artifact,
+    load_bin_reference,
+    load_model_from_artifact,
+    load_native_booster,
+    read_manifest,
+    save_model_artifact,
+    save_model_to_file,
+)
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(500, 4))
+    return matrix, matrix[:, 0] + rng.random(500)
+
+
+@pytest.fixture
+def booster(data):
+    matrix, label = data
+    return lgb.train(
+        {"objective": "regression", "verbosity": -1},
+        lgb.Dataset(
+            matrix, label=label, feature_name=["a", "b", "c", "d"]
+        ),
+        num_boost_round=5,
+    )
+
+
+@pytest.mark.parametrize("compression", [None, "gzip", "lzma"])
+def test_native_artifact_roundtrip(
+    booster, data, tmp_path, compression
+):
+    artifact_path = str(tmp_path / "model")
+    save_model_artifact(
+        booster,
+        artifact_path,
+        compression=compression,
+        params={"num_leaves": 31},
+        data_fingerprint="abc",
+        metrics={"val": {"l2": 0.5}},
+    )
+    manifest = read_manifest(artifact_path)
+    assert manifest["features"] == ["a", "b", "c", "d"]
+    assert manifest["params"] == {"num_leaves": 31}
+    assert manifest["data_fingerprint"] == "abc"
+    assert manifest["metrics"] == {"val": {"l2": 0.5}}
+    assert manifest["compression"] == compression
+    loaded = load_native_booster(artifact_path, verify=True)
+    matrix, _ = data
+    np.testing.assert_allclose(
+        loaded.predict(matrix), booster.predict(matrix)
+    )
+
+
+def test_native_artifact_overwrites(booster, tmp_path):
+    artifact_path = str(tmp_path / "model")
+    save_model_artifact(booster, artifact_path, compression="gzip")
+    save_model_artifact(booster, artifact_path)
+    assert sorted(os.listdir(artifact_path)) == [
+        "manifest.json",
+        "model.txt",
+    ]
+    assert sorted(os.listdir(tmp_path)) == ["model"]
+
+
+def test_native_artifact_keeps_other_directories(booster, tmp_path):
+    notes_path = tmp_path / "notes.txt"
+    notes_path.write_text("not a model")
+    with pytest.raises(FileExistsError):
+        save_model_artifact(booster, str(tmp_path))
+    assert notes_path.read_text() == "not a model"
+    empty_path = tmp_path / "empty"
+    empty_path.mkdir()
+    save_model_artifact(booster, str(empty_path))
+    assert is_native_artifact(str(empty_path))
+
+
+@pytest.mark.parametrize(
+    "name, artifact_format",
+    [
+        ("model", "native"),
+        ("model.joblib", "joblib"),
+        ("m.pkl", "joblib"),
+    ],
+)
+def test_default_artifact_format(name, artifact_format, tmp_path):
+    assert (
+        default_artifact_format(str(tmp_path / name)) == artifact_format
+    )
+
+
+def test_native_artifact_checksum(booster, tmp_path):
+    artifact_path = str(tmp_path / "model")
+    save_model_artifact(booster, artifact_path)
+    with open(os.path.join(artifact_path, "model.txt"), "a") as file:
+        file.write("\n")
+    with pytest.raises(ValueError):
+        load_native_booster(artifact_path, verify=True)
+
+
+def test_unknown_compression(booster, tmp_path):
+    with pytest.raises(ValueError):
+        save_model_artifact(
+            booster, str(tmp_path / "m"), compression="zip"
+        )
+
+
+def test_lazy_booster_loads_on_first_use(booster, data, tmp_path):
+    artifact_path = str(tmp_path / "model")
+    save_model_to_file(booster, artifact_path, artifact_format="native")
+    lazy_booster = load_model_from_artifact(artifact_path, lazy=True)
+    assert isinstance(lazy_booster, LazyBooster)
+    assert lazy_booster.feature_name() == ["a", "b", "c", "d"]
+    assert not lazy_booster.is_loaded
+    matrix, _ = data
+    np.testing.assert_allclose(
+        lazy_booster.predict(matrix), booster.predict(matrix)
+    )
+    assert lazy_booster.is_loaded
+
+
+def test_load_model_from_artifact_falls_back_to_joblib(
+    booster, data, tmp_path
+):
+    model_path = str(tmp_path / "model.joblib")
+    save_model_to_file(booster, model_path)
+    loaded = load_model_from_artifact(model_path)
+    assert isinstance(loaded, lgb.Booster)
+    assert isinstance(joblib.load(model_path), lgb.Booster)
+    matrix, _ = data
+    np.testing.assert_allclose(
+        loaded.predict(matrix), booster.predict(matrix)
+    )
+
+
+def test_native_artifact_keeps_bins_and_partitions(
+    booster, data, tmp_path
+):
+    matrix, _ = data
+    bins = build_bin_reference(
+        pl.DataFrame(matrix, schema=["a", "b", "c", "d"]),
+        ["a", "b", "c", "d"],
+    )
+    partitions = [{"path": "day-0.csv", "fingerprint": "abc"}]
+    artifact_path = str(tmp_path / "model")
+    save_model_artifact(
+        booster,
+        artifact_path,
+        partitions=partitions,
+        bin_reference=bins,
+    )
+    assert read_manifest(artifact_path)["partitions"] == partitions
+    loaded = load_bin_reference(artifact_path)
+    assert loaded.num_data() == bins.num_data()
+    assert loaded.get_feature_name() == ["a", "b", "c", "d"]
+    assert load_bin_reference(str(tmp_path / "missing")) is None
+
+
+def test_native_artifact_without_bins(booster, tmp_path):
+    artifact_path = str(tmp_path / "model")
+    save_model_artifact(booster, artifact_path)
+    assert read_manifest(artifact_path)["partitions"] == []
+    assert load_bin_reference(artifact_path) is None
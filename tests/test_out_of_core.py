@@ -0,0 +1,172 @@
+import os
+
+import numpy as np
+import polars as pl
+import pytest
+
+from personalization.out_of_core import (
+    build_partitioned_dataset,
+    drop_nulls,
+    partition_expression,
+    read_partition,
+    sample_reference,
+    write_partitions,
+)
+from personalization.ranking_pipeline import RankingPipeline
+from personalization.synthetic import write_synthetic_csvs
+
+FEATURES = ["rating", "price_range"]
+
+
+@pytest.fixture
+def ranking_plan():
+    rng = np.random.default_rng(0)
+    n_rows = 3_000
+    return pl.DataFrame(
+        {
+            "session_id": np.repeat(np.arange(n_rows // 10), 10).astype(
+                str
+            ),
+            "rating": rng.random(n_rows) * 10,
+            "price_range": rng.integers(1, 5, n_rows),
+            "label": rng.integers(0, 2, n_rows),
+        }
+    ).lazy()
+
+
+@pytest.fixture
+def synthetic_csvs(tmp_path):
+    return write_synthetic_csvs(
+        os.path.join(tmp_path, "data"),
+        20_000,
+        seed=0,
+        null_fraction=0.01,
+    )
+
+
+def test_partitions_keep_sessions_whole(ranking_plan, tmp_path, mocker):
+    sink = mocker.spy(pl.LazyFrame, "sink_ipc")
+    paths = write_partitions(
+        ranking_plan,
+        str(tmp_path),
+        4,
+        partition=partition_expression("session_id", 4, seed=1),
+        split=(pl.col("session_id").cast(pl.Int64) % 3).cast(pl.UInt32),
+        sort_columns=["session_id", "rating"],
+        chunk_size=256,
+    )
+    # EXPLAIN: the query runs once, whatever the number of partitions
+    assert sink.call_count == 1
+    assert len(paths["train"]) == len(paths["val"]) == 4
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        os.path.basename(path)
+        for split_paths in paths.values()
+        for path in split_paths
+    )
+    sessions = [
+        set(read_partition(path).get_column("session_id"))
+        for split_paths in paths.values()
+        for path in split_paths
+    ]
+    assert sum(len(session_ids) for session_ids in sessions) == 200
+    assert len(set().union(*sessions)) == 200
+    for path in paths["train"]:
+        partition = read_partition(path)
+        assert "__split__" not in partition.columns
+        assert partition.frame_equal(
+            partition.sort(["session_id", "rating"])
+        )
+
+
+def test_partitioned_dataset_matches_in_memory_rows(
+    ranking_plan, tmp_path
+):
+    paths = write_partitions(
+        ranking_plan,
+        str(tmp_path),
+        3,
+        partition=partition_expression("session_id", 3, seed=1),
+        split=pl.lit(0),
+        sort_columns=["session_id", "rating"],
+        splits=("train",),
+    )["train"]
+    reference = sample_reference(paths, FEATURES, 500)
+    dataset = build_partitioned_dataset(
+        paths, FEATURES, "label", "session_id", reference, chunk_size=64
+    )
+    frame = ranking_plan.collect()
+    assert dataset.num_data() == frame.height
+    assert dataset.get_feature_name() == FEATURES
+    assert dataset.get_label().sum() == frame.get_column("label").sum()
+    groups = dataset.get_field("group")
+    assert len(groups) == 301 and groups[-1] == frame.height
+
+
+def test_drop_nulls_matches_polars():
+    frame = pl.DataFrame(
+        {"a": [1, None, 3, 4], "b": ["x", "y", None, "z"]}
+    )
+    assert (
+        drop_nulls(frame.lazy())
+        .collect()
+        .frame_equal(frame.drop_nulls())
+    )
+
+
+def test_sample_reference_needs_partitions():
+    with pytest.raises(ValueError):
+        sample_reference([], FEATURES)
+
+
+def test_out_of_core_pipeline_matches_in_memory(
+    synthetic_csvs, tmp_path
+):
+    sessions_path, venues_path = synthetic_csvs
+
+    def prepare(name, **kwargs):
+        pipeline = RankingPipeline(
+            sessions_path,
+            venues_path,
+            split_strategy="session",
+            train_data_path=os.path.join(tmp_path, f"{name}-train.bin"),
+            val_data_path=os.path.join(tmp_path, f"{name}-val.bin"),
+            **kwargs,
+        )
+        pipeline.prepare_datasets()
+        return pipeline
+
+    partition_dir = os.path.join(tmp_path, "partitions")
+    in_memory = prepare("in-memory")
+    out_of_core = prepare(
+        "out-of-core",
+        out_of_core_partitions=4,
+        out_of_core_dir=partition_dir,
+        dataset_chunk_size=1_000,
+    )
+    assert out_of_core.lazy
+    assert os.listdir(partition_dir) == []
+    for name in ("train_set", "val_set"):
+        expected = getattr(in_memory, name)
+        actual = getattr(out_of_core, name)
+        assert actual.num_data() == expected.num_data()
+        assert actual.get_label().sum() == expected.get_label().sum()
+        np.testing.assert_array_equal(
+            np.sort(np.diff(actual.get_field("group"))),
+            np.sort(np.diff(expected.get_field("group"))),
+        )
+    assert os.path.isfile(out_of_core.train_data_path)
+    out_of_core.train(
+        params={"objective": "lambdarank", "num_iterations": 3}
+    )
+    assert out_of_core.model.num_trees() > 0
+
+
+def test_out_of_core_needs_session_split(synthetic_csvs):
+    with pytest.raises(ValueError):
+        RankingPipeline(*synthetic_csvs, out_of_core_partitions=4)
+    with pytest.raises(ValueError):
+        RankingPipeline(
+            *synthetic_csvs,
+            split_strategy="session",
+            out_of_core_partitions=0,
+        )
@@ -0,0 +1,86 @@
+import json
+import sys
+import time
+
+import polars as pl
+
+from personalization import profiling
+from personalization.profiling import StageProfiler
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = StageProfiler()
+    with profiler.stage("read") as stage:
+        stage.set_output(pl.DataFrame({"a": [1, 2]}))
+    assert profiler.report() == []
+
+
+def test_stage_records():
+    profiler = StageProfiler(enabled=True)
+    with profiler.stage("read") as stage:
+        time.sleep(0.01)
+        stage.set_output(pl.DataFrame({"a": [1, 2], "b": [3, 4]}))
+    (record,) = profiler.report()
+    assert record["stage"] == "read"
+    assert record["wall_seconds"] >= 0.01
+    assert record["cpu_seconds"] >= 0
+    assert record["peak_rss_mb"] > 0
+    assert record["rows"] == 2
+    assert record["columns"] == 2
+
+
+def test_nested_stages():
+    profiler = StageProfiler(enabled=True)
+    with profiler.stage("outer"):
+        with profiler.stage("inner"):
+            pass
+    inner, outer = profiler.report()
+    assert inner["stage"] == "inner"
+    assert inner["peak_rss_scope"] == "enclosing"
+    assert outer["peak_rss_scope"] in ("stage", "process")
+    assert outer["wall_seconds"] >= inner["wall_seconds"]
+
+
+def test_stage_is_recorded_when_it_raises():
+    profiler = StageProfiler(enabled=True)
+    try:
+        with profiler.stage("fails"):
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert [record["stage"] for record in profiler.report()] == [
+        "fails"
+    ]
+
+
+def test_write_json_and_chrome_trace(tmp_path):
+    profiler = StageProfiler(enabled=True)
+    with profiler.stage("join"):
+        pass
+    json_path = tmp_path / "profile.json"
+    trace_path = tmp_path / "trace.json"
+    profiler.write_json(str(json_path))
+    profiler.write_chrome_trace(str(trace_path))
+    assert json.loads(json_path.read_text()) == profiler.report()
+    (event,) = json.loads(trace_path.read_text())["traceEvents"]
+    assert event["name"] == "join"
+    assert event["ph"] == "X"
+    assert event["dur"] >= 0
+
+
+def test_profiling_without_resource_or_proc(monkeypatch, tmp_path):
+    """Test that the profiler works where Windows lacks both."""
+    monkeypatch.setitem(sys.modules, "resource", None)
+    monkeypatch.setattr(sys, "platform", "win32")
+    monkeypatch.setattr(
+        profiling, "PROC_STATUS_PATH", str(tmp_path / "status")
+    )
+    assert not profiling.reset_peak_rss()
+    assert profiling.peak_rss_mb() is None
+    profiler = StageProfiler(enabled=True)
+    with profiler.stage("read"):
+        pass
+    (record,) = profiler.report()
+    assert record["peak_rss_mb"] is None
+    assert record["peak_rss_scope"] == "process"
+    assert profiling.format_mb(record["peak_rss_mb"]) == "n/a"
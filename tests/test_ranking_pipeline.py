@@ -1,10 +1,33 @@
+import gc
+import importlib.metadata
 import os
+import shutil
 
+import lightgbm as lgb
+import numpy as np
 import pandas as pd
 import polars as pl
 import pytest
 
-from personalization.ranking_pipeline import RankingPipeline
+from personalization.dataset_cache import BINS_FILE_NAME
+from personalization.feature_engineering import (
+    DEFAULT_AGGREGATES,
+    FeatureCache,
+)
+from personalization.model_artifact import (
+    load_bin_reference,
+    load_model_from_artifact,
+    read_manifest,
+    save_model_artifact,
+)
+from personalization.ranking_pipeline import (
+    RankingPipeline,
+    group_sizes,
+)
+from personalization.synthetic import (
+    generate_sessions,
+    generate_venues,
+)
 
 from .utils import (
     generate_sessions_dataframe,
@@ -143,6 +166,34 @@ def test_join_sessions_and_venues_no_duplicate_columns(
     )
 
 
+def test_join_uses_venue_feature_store(
+    sessions_csv_path, venues_csv_path
+):
+    """Test that the eager join gathers from the venue store like a join."""
+    pipeline = RankingPipeline(sessions_csv_path, venues_csv_path)
+    expected = pipeline.sessions.join(pipeline.venues, on="venue_id")
+    pipeline.__join__sessions__and__venues__()
+    assert len(pipeline.venue_store) == pipeline.venues.height
+    assert pipeline.ranking_data.select(expected.columns).frame_equal(
+        expected.with_columns(
+            pl.col(pl.Boolean).cast(pl.Int8, strict=False)
+        ),
+        null_equal=True,
+    )
+
+
+def test_join_fans_out_duplicated_venues(
+    sessions_csv_path, venues_csv_path
+):
+    """Test that duplicated venue ids are joined, not deduplicated."""
+    pipeline = RankingPipeline(sessions_csv_path, venues_csv_path)
+    pipeline.venues = pl.concat([pipeline.venues, pipeline.venues])
+    expected = pipeline.sessions.join(pipeline.venues, on="venue_id")
+    pipeline.__join__sessions__and__venues__()
+    assert not hasattr(pipeline, "venue_store")
+    assert pipeline.ranking_data.height == expected.height
+
+
 def test_save_datasets(sessions_csv_path, venues_csv_path):
     # Set up the test
     train_data_path = "/tmp/train_data.binary"
@@ -202,3 +253,665 @@ def test_train_succeeds(sessions_csv_path, venues_csv_path) -> None:
         pipeline.train(params=lgb_params)
     except Exception as e:
         pytest.fail(f"Failed with unexpected error: {e}")
+
+
+def test_export_native_model_artifact(
+    sessions_csv_path, venues_csv_path, tmp_path
+):
+    pipeline = RankingPipeline(sessions_csv_path, venues_csv_path)
+    pipeline.prepare_datasets()
+    pipeline.train(
+        params={"objective": "lambdarank", "num_iterations": 2}
+    )
+    model_path = os.path.join(tmp_path, "model")
+    pipeline.export_model_artifact(model_path, compression="gzip")
+    manifest = read_manifest(model_path)
+    assert manifest["features"] == pipeline.model.feature_name()
+    assert manifest["params"]["num_iterations"] == 2
+    assert manifest["data_fingerprint"]
+    assert "val" in manifest["metrics"]
+    loaded = load_model_from_artifact(model_path)
+    assert loaded.num_trees() == pipeline.model.num_trees()
+
+
+def test_profile_records_every_stage(
+    sessions_csv_path, venues_csv_path
+):
+    pipeline = RankingPipeline(
+        sessions_csv_path, venues_csv_path, profile=True
+    )
+    pipeline.prepare_datasets()
+    pipeline.train(
+        params={"objective": "lambdarank", "num_iterations": 2}
+    )
+    report = {
+        record["stage"]: record for record in pipeline.profile_report
+    }
+    assert list(report) == [
+        "read",
+        "drop_nulls",
+        "join",
+        "split",
+        "dataset_construction",
+        "save_datasets",
+        "train",
+    ]
+    assert report["read"]["rows"] == 9
+    assert report["join"]["rows"] == 9
+    assert report["dataset_construction"]["columns"] == len(
+        pipeline.features
+    )
+    assert report["join"]["estimated_mb"] > 0
+
+
+def test_profile_is_off_by_default(sessions_csv_path, venues_csv_path):
+    pipeline = RankingPipeline(sessions_csv_path, venues_csv_path)
+    pipeline.prepare_datasets()
+    assert pipeline.profile_report == []
+
+
+def test_lazy_mode_defers_reading(sessions_csv_path, venues_csv_path):
+    """Test that nothing is materialized before prepare_datasets in lazy mode."""
+    pipeline = RankingPipeline(
+        sessions_csv_path, venues_csv_path, lazy=True
+    )
+    assert isinstance(pipeline.sessions, pl.LazyFrame)
+    assert isinstance(pipeline.venues, pl.LazyFrame)
+    pipeline.__drop__nulls__()
+    pipeline.__join__sessions__and__venues__()
+    assert isinstance(pipeline.ranking_data, pl.LazyFrame)
+
+
+def test_lazy_mode_matches_eager_mode(
+    sessions_csv_path, venues_csv_path
+):
+    """Test that the lazy plan yields the same rows as the eager join."""
+    eager = RankingPipeline(sessions_csv_path, venues_csv_path)
+    eager.__drop__nulls__()
+    eager.__join__sessions__and__venues__()
+    lazy = RankingPipeline(
+        sessions_csv_path, venues_csv_path, lazy=True
+    )
+    lazy.__drop__nulls__()
+    lazy.__join__sessions__and__venues__()
+    lazy.__collect__ranking__data__()
+    columns = lazy.ranking_data.columns
+    assert columns == [
+        lazy.group_column,
+        lazy.label_column,
+        *lazy.features,
+    ]
+    assert lazy.ranking_data.sort("venue_id").frame_equal(
+        eager.ranking_data.select(columns).sort("venue_id")
+    )
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_compact_dtypes(sessions_csv_path, venues_csv_path, lazy):
+    """Test that compact reads drop unused columns and narrow dtypes."""
+    pipeline = RankingPipeline(
+        sessions_csv_path,
+        venues_csv_path,
+        compact_dtypes=True,
+        lazy=lazy,
+    )
+    assert "is_new_user" not in pipeline.sessions.columns
+    assert pipeline.sessions.schema["session_id"] == pl.UInt64
+    assert pipeline.sessions.schema["position_in_list"] == pl.Int16
+    assert pipeline.venues.schema["price_range"] == pl.Int8
+    assert pipeline.venues.schema["rating"] == pl.Float32
+    pipeline.prepare_datasets()
+    assert pipeline.train_set.num_data() > 0
+    assert pipeline.train_set.num_feature() == pipeline.n_features
+    default = RankingPipeline(sessions_csv_path, venues_csv_path)
+    assert (
+        pipeline.__dataset__cache__key__()
+        != default.__dataset__cache__key__()
+    )
+
+
+def test_lazy_mode_prepare_datasets(sessions_csv_path, venues_csv_path):
+    """Test that datasets are built from a lazy pipeline."""
+    pipeline = RankingPipeline(
+        sessions_csv_path, venues_csv_path, lazy=True
+    )
+    pipeline.prepare_datasets()
+    assert pipeline.train_set.num_feature() == pipeline.n_features
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_columnar_cache(
+    sessions_csv_path, venues_csv_path, tmp_path, lazy
+):
+    """Test that cached columnar inputs give the same data as the csv files."""
+    cache_dir = os.path.join(tmp_path, "cache")
+    pipeline = RankingPipeline(
+        sessions_csv_path,
+        venues_csv_path,
+        cache_dir=cache_dir,
+        lazy=lazy,
+    )
+    assert len(os.listdir(cache_dir)) == 2
+    sessions = pipeline.sessions
+    if isinstance(sessions, pl.LazyFrame):
+        sessions = sessions.collect()
+    assert sessions.frame_equal(pl.read_csv(sessions_csv_path))
+    pipeline.prepare_datasets()
+    assert pipeline.train_set.num_feature() == pipeline.n_features
+
+
+def test_split_by_session_keeps_sessions_whole(
+    sessions_csv_path, venues_csv_path
+):
+    """Test that no session is shared between the train, val and test sets."""
+    pipeline = RankingPipeline(
+        sessions_csv_path,
+        venues_csv_path,
+        split_strategy="session",
+        split_fractions=(0.4, 0.3),
+    )
+    pipeline.__drop__nulls__()
+    pipeline.__join__sessions__and__venues__()
+    splits = pipeline.__split__by__session__()
+    assert sum(split.shape[0] for split in splits) == 9
+    session_sets = [set(split["session_id"]) for split in splits]
+    assert not session_sets[0] & session_sets[1]
+    assert not session_sets[0] & session_sets[2]
+    assert not session_sets[1] & session_sets[2]
+    # the assignment is reproducible for a given seed
+    again = pipeline.__split__by__session__()
+    assert all(a.frame_equal(b) for a, b in zip(splits, again))
+
+
+def test_split_by_session_fractions(sessions_csv_path, venues_csv_path):
+    """Test that the split fractions hold over many sessions."""
+    pipeline = RankingPipeline(
+        sessions_csv_path, venues_csv_path, split_strategy="session"
+    )
+    n_sessions = 20_000
+    pipeline.ranking_data = pl.DataFrame(
+        {"session_id": [f"session-{i}" for i in range(n_sessions)]}
+    )
+    train_set, val_set, test_set = pipeline.__split__by__session__()
+    assert abs(train_set.shape[0] / n_sessions - 0.2) < 0.02
+    assert abs(val_set.shape[0] / n_sessions - 0.16) < 0.02
+    assert abs(test_set.shape[0] / n_sessions - 0.64) < 0.02
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"split_strategy": "stratified"},
+        {"split_fractions": (0.8, 0.3)},
+        {"split_fractions": (0.0, 0.3)},
+    ],
+)
+def test_invalid_split_parameters(
+    sessions_csv_path, venues_csv_path, kwargs
+):
+    with pytest.raises(ValueError):
+        RankingPipeline(sessions_csv_path, venues_csv_path, **kwargs)
+
+
+@pytest.mark.parametrize("n_rows", [0, 1, 9, 10_000])
+def test_group_sizes_match_groupby_count(n_rows):
+    """Test that the run-length group sizes match the groupby count."""
+    rng = np.random.default_rng(n_rows)
+    frame = pl.DataFrame(
+        {
+            "session_id": rng.integers(0, max(n_rows // 7, 1), n_rows)
+            .astype(str)
+            .tolist(),
+            "rating": rng.random(n_rows),
+        },
+        schema={"session_id": pl.Utf8, "rating": pl.Float64},
+    ).sort(by=["session_id", "rating"])
+    expected = (
+        frame.groupby("session_id")
+        .agg(pl.col("session_id").count().alias("count"))
+        .sort("session_id")
+        .select("count")
+        .to_numpy()
+        .ravel()
+    )
+    sizes = group_sizes(frame, "session_id")
+    np.testing.assert_array_equal(sizes, expected)
+    assert sizes.sum() == n_rows
+
+
+def test_prepare_datasets_in_chunks(sessions_csv_path, venues_csv_path):
+    """Test that datasets built in row chunks keep the feature names."""
+    pipeline = RankingPipeline(
+        sessions_csv_path, venues_csv_path, dataset_chunk_size=2
+    )
+    pipeline.prepare_datasets()
+    assert pipeline.train_set.get_feature_name() == pipeline.features
+    assert pipeline.val_set.get_feature_name() == pipeline.features
+
+
+def test_dataset_cache_skips_preparation(
+    sessions_csv_path, venues_csv_path, tmp_path, mocker
+):
+    """Test that a second pipeline loads the cached binary datasets."""
+    dataset_cache_dir = os.path.join(tmp_path, "datasets")
+    first = RankingPipeline(
+        sessions_csv_path,
+        venues_csv_path,
+        dataset_cache_dir=dataset_cache_dir,
+    )
+    first.prepare_datasets()
+    assert first.train_data_path.startswith(dataset_cache_dir)
+    assert os.path.isfile(first.train_data_path)
+
+    read = mocker.spy(RankingPipeline, "__read__table__")
+    second = RankingPipeline(
+        sessions_csv_path,
+        venues_csv_path,
+        dataset_cache_dir=dataset_cache_dir,
+    )
+    assert second.inputs_deferred
+    join = mocker.spy(second, "__join__sessions__and__venues__")
+    second.prepare_datasets()
+    join.assert_not_called()
+    read.assert_not_called()
+    assert second.train_data_path == first.train_data_path
+    assert second.train_set.num_data() == first.train_set.num_data()
+    assert second.train_set.num_feature() == second.n_features
+    second.train(
+        params={
+            "objective": "lambdarank",
+            "metric": "ndcg",
+            "num_iterations": 2,
+        }
+    )
+
+    other_seed = RankingPipeline(
+        sessions_csv_path,
+        venues_csv_path,
+        dataset_cache_dir=dataset_cache_dir,
+        split_seed=1,
+    )
+    assert not other_seed.inputs_deferred
+    other_seed.prepare_datasets()
+    assert other_seed.train_data_path != first.train_data_path
+
+
+def test_dataset_cache_reads_evicted_inputs(
+    sessions_csv_path, venues_csv_path, tmp_path
+):
+    """Test that an entry evicted after construction is rebuilt."""
+    dataset_cache_dir = os.path.join(tmp_path, "datasets")
+    RankingPipeline(
+        sessions_csv_path,
+        venues_csv_path,
+        dataset_cache_dir=dataset_cache_dir,
+    ).prepare_datasets()
+    pipeline = RankingPipeline(
+        sessions_csv_path,
+        venues_csv_path,
+        dataset_cache_dir=dataset_cache_dir,
+    )
+    assert pipeline.inputs_deferred
+    shutil.rmtree(dataset_cache_dir)
+    pipeline.prepare_datasets()
+    assert not pipeline.inputs_deferred
+    assert pipeline.train_set.num_data() > 0
+    assert os.path.isfile(pipeline.train_data_path)
+
+
+def test_runs_write_datasets_to_their_own_directories(
+    sessions_csv_path, venues_csv_path
+):
+    """Test that default binaries are per run and removed with it."""
+    pipelines = [
+        RankingPipeline(sessions_csv_path, venues_csv_path)
+        for _ in range(2)
+    ]
+    for pipeline in pipelines:
+        pipeline.prepare_datasets()
+        assert os.path.isfile(pipeline.train_data_path)
+        assert os.path.isfile(pipeline.val_data_path)
+    assert pipelines[0].dataset_dir != pipelines[1].dataset_dir
+    dataset_dir = pipelines[0].dataset_dir
+    del pipeline, pipelines
+    gc.collect()
+    assert not os.path.exists(dataset_dir)
+
+
+def test_dataset_cache_keeps_bins(
+    sessions_csv_path, venues_csv_path, tmp_path
+):
+    """Test that a model trained on cached datasets exports its bins."""
+    dataset_cache_dir = os.path.join(tmp_path, "datasets")
+    first = RankingPipeline(
+        sessions_csv_path,
+        venues_csv_path,
+        dataset_cache_dir=dataset_cache_dir,
+    )
+    first.prepare_datasets()
+    assert os.path.isfile(
+        os.path.join(
+            os.path.dirname(first.train_data_path), BINS_FILE_NAME
+        )
+    )
+    second = RankingPipeline(
+        sessions_csv_path,
+        venues_csv_path,
+        dataset_cache_dir=dataset_cache_dir,
+    )
+    assert second.inputs_deferred
+    second.prepare_datasets()
+    second.train(
+        params={"objective": "lambdarank", "num_iterations": 2}
+    )
+    model_path = os.path.join(tmp_path, "model")
+    second.export_model_artifact(model_path)
+    bins = load_bin_reference(model_path, params=second.dataset_params)
+    assert bins is not None
+    assert bins.num_feature() == second.n_features
+
+
+def test_dataset_cache_rebuilds_entries_without_bins(
+    sessions_csv_path, venues_csv_path, tmp_path
+):
+    """Test that an entry cached before the bins were kept misses."""
+    dataset_cache_dir = os.path.join(tmp_path, "datasets")
+    first = RankingPipeline(
+        sessions_csv_path,
+        venues_csv_path,
+        dataset_cache_dir=dataset_cache_dir,
+    )
+    first.prepare_datasets()
+    bins_path = os.path.join(
+        os.path.dirname(first.train_data_path), BINS_FILE_NAME
+    )
+    os.remove(bins_path)
+    second = RankingPipeline(
+        sessions_csv_path,
+        venues_csv_path,
+        dataset_cache_dir=dataset_cache_dir,
+    )
+    assert not second.inputs_deferred
+    second.prepare_datasets()
+    assert os.path.isfile(bins_path)
+
+
+def test_dataset_cache_key_tracks_split_library_versions(
+    sessions_csv_path, venues_csv_path, monkeypatch
+):
+    """Test that upgrading the libraries the splits use misses."""
+    random_split = RankingPipeline(sessions_csv_path, venues_csv_path)
+    session_split = RankingPipeline(
+        sessions_csv_path, venues_csv_path, split_strategy="session"
+    )
+    keys = [
+        pipeline.__dataset__cache__key__()
+        for pipeline in (random_split, session_split)
+    ]
+    monkeypatch.setattr(pl, "__version__", "0.0.0")
+    assert random_split.__dataset__cache__key__() != keys[0]
+    assert session_split.__dataset__cache__key__() != keys[1]
+    monkeypatch.undo()
+    monkeypatch.setattr(
+        importlib.metadata, "version", lambda name: "0.0.0"
+    )
+    assert random_split.__dataset__cache__key__() != keys[0]
+    assert session_split.__dataset__cache__key__() == keys[1]
+
+
+@pytest.fixture
+def session_days(tmp_path):
+    """Two days of synthetic sessions on the same venues."""
+    venues = generate_venues(200, seed=0)
+    venues_path = os.path.join(tmp_path, "venues.csv")
+    venues.write_csv(venues_path)
+    day_paths = []
+    for day in range(2):
+        day_path = os.path.join(tmp_path, f"sessions-{day}.csv")
+        generate_sessions(5_000, venues, seed=day).write_csv(day_path)
+        day_paths.append(day_path)
+    return day_paths, venues_path
+
+
+def train_day(sessions_path, venues_path, model_path, **kwargs):
+    pipeline = RankingPipeline(
+        sessions_path,
+        venues_path,
+        split_strategy="session",
+        **kwargs,
+    )
+    pipeline.prepare_datasets()
+    pipeline.train(
+        params={
+            "objective": "lambdarank",
+            "num_iterations": 3,
+            "verbosity": -1,
+        }
+    )
+    pipeline.export_model_artifact(model_path)
+    return pipeline
+
+
+def test_incremental_training_continues_boosting(
+    session_days, tmp_path
+):
+    (first_day, second_day), venues_path = session_days
+    first_path = os.path.join(tmp_path, "model-0")
+    second_path = os.path.join(tmp_path, "model-1")
+    first = train_day(first_day, venues_path, first_path)
+    assert os.path.isfile(os.path.join(first_path, "bins.bin"))
+
+    second = train_day(
+        second_day,
+        venues_path,
+        second_path,
+        init_model_path=first_path,
+    )
+    assert second.incremental
+    assert second.model.num_trees() > first.model.num_trees()
+    manifest = read_manifest(second_path)
+    assert [
+        partition["fingerprint"] for partition in manifest["partitions"]
+    ] == [
+        first.partition["fingerprint"],
+        second.partition["fingerprint"],
+    ]
+    # EXPLAIN: the new day is binned with the bins of the first
+    assert second.train_set.reference is second.bin_reference
+    assert (
+        second.bin_reference.num_data()
+        == first.bin_reference.num_data()
+    )
+
+
+def test_incremental_training_skips_consumed_partition(
+    session_days, tmp_path, mocker
+):
+    (first_day, _), venues_path = session_days
+    first_path = os.path.join(tmp_path, "model-0")
+    again_path = os.path.join(tmp_path, "model-again")
+    first = train_day(first_day, venues_path, first_path)
+    join = mocker.spy(
+        RankingPipeline, "__join__sessions__and__venues__"
+    )
+    again = train_day(
+        first_day,
+        venues_path,
+        again_path,
+        init_model_path=first_path,
+    )
+    join.assert_not_called()
+    assert again.partition_consumed
+    assert again.model.num_trees() == first.model.num_trees()
+    assert (
+        read_manifest(again_path)["partitions"]
+        == read_manifest(first_path)["partitions"]
+    )
+
+
+def test_incremental_training_checks_init_model(
+    sessions_csv_path, venues_csv_path, tmp_path
+):
+    matrix = np.random.default_rng(0).random((100, 2))
+    booster = lgb.train(
+        {"objective": "regression", "verbosity": -1},
+        lgb.Dataset(
+            matrix, label=matrix[:, 0], feature_name=["a", "b"]
+        ),
+        num_boost_round=2,
+    )
+    model_path = os.path.join(tmp_path, "model")
+    save_model_artifact(booster, model_path)
+    with pytest.raises(ValueError):
+        RankingPipeline(
+            sessions_csv_path,
+            venues_csv_path,
+            init_model_path=model_path,
+        )
+    with pytest.raises(ValueError):
+        RankingPipeline(
+            sessions_csv_path,
+            venues_csv_path,
+            init_model_path=model_path,
+            out_of_core_partitions=2,
+            split_strategy="session",
+        )
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_window_features_use_earlier_days(session_days, tmp_path, lazy):
+    (first_day, second_day), venues_path = session_days
+    feature_cache_dir = os.path.join(tmp_path, "features")
+
+    def day_pipeline(sessions_path, window):
+        pipeline = RankingPipeline(
+            sessions_path,
+            venues_path,
+            lazy=lazy,
+            split_strategy="session",
+            feature_aggregates=DEFAULT_AGGREGATES,
+            feature_cache_dir=feature_cache_dir,
+            feature_window=window,
+        )
+        pipeline.prepare_datasets()
+        return pipeline
+
+    first = day_pipeline(first_day, "day-0")
+    second = day_pipeline(second_day, "day-1")
+    for aggregate in DEFAULT_AGGREGATES:
+        assert aggregate.name in second.features
+        assert (
+            first.ranking_data.get_column(aggregate.name).null_count()
+            == first.ranking_data.height
+        )
+    assert (
+        second.ranking_data.get_column("venue_ctr").null_count()
+        < second.ranking_data.height
+    )
+    assert FeatureCache(feature_cache_dir).windows(
+        DEFAULT_AGGREGATES[0]
+    ) == ["day-0", "day-1"]
+
+
+def test_window_features_need_a_cache(
+    sessions_csv_path, venues_csv_path
+):
+    with pytest.raises(ValueError):
+        RankingPipeline(
+            sessions_csv_path,
+            venues_csv_path,
+            feature_aggregates=DEFAULT_AGGREGATES,
+        )
+
+
+def staged_run(sessions_path, venues_path, checkpoint_dir, **kwargs):
+    pipeline = RankingPipeline(
+        sessions_path,
+        venues_path,
+        split_strategy="session",
+        checkpoint_dir=checkpoint_dir,
+        **kwargs,
+    )
+    pipeline.prepare_datasets()
+    pipeline.train(
+        params={
+            "objective": "lambdarank",
+            "num_iterations": 3,
+            "verbosity": -1,
+        }
+    )
+    return pipeline
+
+
+def test_staged_run_resumes_after_failed_training(
+    session_days, tmp_path, mocker
+):
+    (sessions_path, _), venues_path = session_days
+    checkpoint_dir = os.path.join(tmp_path, "checkpoints")
+    mocker.patch(
+        "personalization.ranking_pipeline.lgb.train",
+        side_effect=MemoryError,
+    )
+    with pytest.raises(MemoryError):
+        staged_run(sessions_path, venues_path, checkpoint_dir)
+    mocker.stopall()
+
+    ingest = mocker.spy(RankingPipeline, "__ingest__")
+    resumed = staged_run(sessions_path, venues_path, checkpoint_dir)
+    ingest.assert_not_called()
+    assert resumed.stage_graph.statuses == {
+        "construct": "load",
+        "train": "run",
+    }
+    assert resumed.train_data_path.startswith(checkpoint_dir)
+    model_path = os.path.join(tmp_path, "model")
+    resumed.export_model_artifact(model_path)
+    assert read_manifest(model_path)["metrics"]["val"]
+    bins = load_bin_reference(model_path, resumed.dataset_params)
+    assert bins is not None
+    assert bins.num_feature() == resumed.n_features
+
+    changed_split = staged_run(
+        sessions_path, venues_path, checkpoint_dir, split_seed=1
+    )
+    assert changed_split.stage_graph.statuses == {
+        "join": "load",
+        "split": "run",
+        "construct": "run",
+        "train": "run",
+    }
+
+
+def test_staged_run_matches_unstaged_datasets(
+    sessions_csv_path, venues_csv_path, tmp_path
+):
+    staged = RankingPipeline(
+        sessions_csv_path,
+        venues_csv_path,
+        checkpoint_dir=os.path.join(tmp_path, "checkpoints"),
+    )
+    staged.prepare_datasets()
+    unstaged = RankingPipeline(sessions_csv_path, venues_csv_path)
+    unstaged.prepare_datasets()
+    for name in ("train_set", "val_set"):
+        assert (
+            getattr(staged, name).num_data()
+            == getattr(unstaged, name).num_data()
+        )
+        np.testing.assert_array_equal(
+            getattr(staged, name).get_label(),
+            getattr(unstaged, name).get_label(),
+        )
+
+
+def test_checkpoints_need_the_in_memory_mode(
+    sessions_csv_path, venues_csv_path, tmp_path
+):
+    with pytest.raises(ValueError):
+        RankingPipeline(
+            sessions_csv_path,
+            venues_csv_path,
+            split_strategy="session",
+            out_of_core_partitions=2,
+            checkpoint_dir=os.path.join(tmp_path, "checkpoints"),
+        )
@@ -0,0 +1,58 @@
+import polars as pl
+import pytest
+
+from personalization.schema import (
+    SESSIONS_DTYPES,
+    VENUES_DTYPES,
+    cast_dtypes,
+    csv_parse_dtypes,
+    hash_session_id,
+    plan_read,
+)
+
+from .utils import generate_sessions_dataframe
+
+
+def test_plan_read_keeps_needed_columns_in_file_order():
+    columns, dtypes = plan_read(
+        ["purchased", "session_id", "position_in_list", "venue_id"],
+        ["venue_id", "position_in_list", "session_id", "rating"],
+        SESSIONS_DTYPES,
+    )
+    assert columns == ["session_id", "position_in_list", "venue_id"]
+    assert dtypes == {
+        "session_id": pl.Utf8,
+        "position_in_list": pl.Int16,
+        "venue_id": pl.Int64,
+    }
+
+
+def test_integers_are_narrowed_after_parsing():
+    assert set(csv_parse_dtypes(VENUES_DTYPES)) == {
+        "conversions_per_impression",
+        "rating",
+        "popularity",
+        "retention_rate",
+    }
+    frame = pl.DataFrame({"price_range": [1, 4]})
+    assert cast_dtypes(frame, VENUES_DTYPES).schema == {
+        "price_range": pl.Int8
+    }
+    with pytest.raises(pl.ComputeError):
+        cast_dtypes(
+            pl.DataFrame({"price_range": [1, 300]}), VENUES_DTYPES
+        )
+
+
+def test_hash_session_id_keeps_sessions_apart():
+    sessions = generate_sessions_dataframe()
+    hashed = hash_session_id(sessions)
+    assert hashed.schema["session_id"] == pl.UInt64
+    assert (
+        hashed.get_column("session_id").n_unique()
+        == sessions.get_column("session_id").n_unique()
+    )
+    assert hash_session_id(hashed).frame_equal(hashed)
+    assert (
+        hash_session_id(sessions.lazy()).collect().frame_equal(hashed)
+    )
@@ -0,0 +1,135 @@
+import joblib
+import lightgbm as lgb
+import numpy as np
+import polars as pl
+import pytest
+
+from personalization.scoring import RankingScorer
+
+from .utils import generate_venues_dataframe
+
+FEATURES = [
+    "venue_id",
+    "conversions_per_impression",
+    "price_range",
+    "rating",
+    "popularity",
+    "retention_rate",
+    "position_in_list",
+    "is_from_order_again",
+    "is_recommended",
+]
+
+
+@pytest.fixture
+def venues():
+    return generate_venues_dataframe()
+
+
+@pytest.fixture
+def booster(venues):
+    """Train a small ranker on candidates sampled from the venues."""
+    rng = np.random.default_rng(0)
+    n_rows = 3_000
+    frame = venues.sample(n_rows, with_replacement=True, seed=0)
+    frame = frame.with_columns(
+        [
+            pl.Series("position_in_list", rng.integers(0, 500, n_rows)),
+            pl.Series(
+                "is_from_order_again", rng.integers(0, 2, n_rows)
+            ),
+            pl.Series("is_recommended", rng.integers(0, 2, n_rows)),
+        ]
+    )
+    matrix = frame.select(FEATURES).to_numpy().astype(np.float32)
+    label = (matrix[:, 1] + rng.random(n_rows) * 0.2 > 0.4).astype(int)
+    return lgb.train(
+        {
+            "objective": "lambdarank",
+            "verbosity": -1,
+            "min_data_in_leaf": 5,
+        },
+        lgb.Dataset(
+            matrix,
+            label=label,
+            group=np.full(n_rows // 30, 30),
+            feature_name=FEATURES,
+        ),
+        num_boost_round=10,
+    )
+
+
+def expected_matrix(venues, venue_ids, context):
+    """Join the candidates with the venues the way training does."""
+    candidates = pl.DataFrame({"venue_id": venue_ids, **context})
+    joined = candidates.join(venues, on="venue_id", how="left")
+    return joined.select(FEATURES).to_numpy().astype(np.float32)
+
+
+def test_feature_matrix_matches_join(booster, venues):
+    scorer = RankingScorer(booster, venues)
+    venue_ids = venues["venue_id"].to_list()[::-1]
+    context = {
+        "position_in_list": list(range(9)),
+        "is_from_order_again": [1] * 9,
+        "is_recommended": [0, 1] * 4 + [0],
+    }
+    np.testing.assert_array_equal(
+        scorer.feature_matrix(np.array(venue_ids), context),
+        expected_matrix(venues, venue_ids, context),
+    )
+
+
+def test_unknown_venues_are_missing(booster, venues):
+    scorer = RankingScorer(booster, venues)
+    matrix = scorer.feature_matrix(
+        np.array([123, venues["venue_id"][0]]), {"position_in_list": 3}
+    )
+    assert np.isnan(matrix[0, 1:6]).all()
+    assert not np.isnan(matrix[1, 1:6]).any()
+    np.testing.assert_array_equal(matrix[:, 6], [3, 3])
+    assert np.isnan(matrix[:, 7:]).all()
+
+
+def test_rank_batch_matches_per_session_scores(booster, venues):
+    scorer = RankingScorer(booster, venues)
+    all_ids = venues["venue_id"].to_numpy()
+    requests = [
+        {
+            "session_id": "a",
+            "venue_ids": all_ids[:5],
+            "position_in_list": np.arange(5),
+            "is_recommended": 1,
+        },
+        {
+            "session_id": "b",
+            "venue_ids": all_ids[5:],
+            "is_recommended": 0,
+        },
+    ]
+    ranked = scorer.rank_batch(requests)
+    assert [result["session_id"] for result in ranked] == ["a", "b"]
+    for request, result in zip(requests, ranked):
+        context = {
+            key: value
+            for key, value in request.items()
+            if key not in ("session_id", "venue_ids")
+        }
+        scores = scorer.score(request["venue_ids"], **context)
+        order = np.argsort(-scores, kind="stable")
+        np.testing.assert_allclose(result["scores"], scores[order])
+        np.testing.assert_array_equal(
+            result["venue_ids"], request["venue_ids"][order]
+        )
+        assert np.all(np.diff(result["scores"]) <= 0)
+    assert scorer.rank_batch([]) == []
+
+
+def test_from_artifact(booster, venues, tmp_path):
+    model_path = str(tmp_path / "model.joblib")
+    venues_path = str(tmp_path / "venues.csv")
+    joblib.dump(booster, model_path)
+    venues.write_csv(venues_path)
+    scorer = RankingScorer.from_artifact(model_path, venues_path)
+    assert scorer.features == FEATURES
+    assert scorer.request_features == FEATURES[6:]
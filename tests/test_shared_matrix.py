@@ -0,0 +1,172 @@
+import multiprocessing
+import os
+import pickle
+import types
+
+import numpy as np
+import polars as pl
+import pytest
+
+from personalization import shared_matrix
+from personalization.dataset_utils import (
+    group_sizes,
+    to_float32_matrix,
+)
+from personalization.ranking_pipeline import RankingPipeline
+from personalization.shared_matrix import SharedFeatureMatrix
+from personalization.synthetic import write_synthetic_csvs
+
+FEATURES = ["rating", "price_range"]
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    n_rows = 1_000
+    return pl.DataFrame(
+        {
+            "session_id": rng.integers(0, 100, n_rows),
+            "rating": rng.random(n_rows) * 10,
+            "price_range": rng.integers(1, 5, n_rows),
+        }
+    ).with_columns((pl.col("rating") > 7).cast(pl.Int8).alias("label"))
+
+
+@pytest.fixture
+def matrix(frame, tmp_path):
+    return SharedFeatureMatrix.build(
+        frame,
+        FEATURES,
+        "label",
+        "session_id",
+        directory=str(tmp_path / "matrix"),
+        sort_columns=["session_id", "rating"],
+        chunk_size=64,
+    )
+
+
+def column_sums(matrix):
+    return matrix.matrix.sum(axis=0, dtype=np.float64)
+
+
+def test_build_writes_rows_in_group_order(frame, matrix):
+    expected = frame.sort(["session_id", "rating"])
+    np.testing.assert_array_equal(
+        matrix.matrix, to_float32_matrix(expected, FEATURES)
+    )
+    np.testing.assert_array_equal(
+        matrix.labels, expected.get_column("label").to_numpy()
+    )
+    np.testing.assert_array_equal(
+        matrix.group_sizes, group_sizes(expected, "session_id")
+    )
+    assert matrix.group_offsets[-1] == matrix.n_rows == frame.height
+    assert matrix.features == FEATURES
+    assert isinstance(matrix.matrix, np.memmap)
+
+
+def test_pickles_as_its_directory(matrix):
+    payload = pickle.dumps(matrix)
+    assert len(payload) < 1_000
+    attached = pickle.loads(payload)
+    assert isinstance(attached.matrix, np.memmap)
+    np.testing.assert_array_equal(attached.matrix, matrix.matrix)
+
+
+def test_workers_attach_to_the_matrix(matrix):
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(2) as pool:
+        sums = pool.map(column_sums, [matrix, matrix])
+    for worker_sums in sums:
+        np.testing.assert_allclose(worker_sums, column_sums(matrix))
+
+
+def test_group_rows_select_whole_groups(matrix):
+    groups = np.array([5, 0, 7])
+    rows = matrix.group_rows(groups)
+    expected = np.concatenate(
+        [
+            np.arange(
+                matrix.group_offsets[g], matrix.group_offsets[g + 1]
+            )
+            for g in groups
+        ]
+    )
+    np.testing.assert_array_equal(rows, expected)
+    dataset = matrix.dataset(groups).construct()
+    assert dataset.num_data() == len(rows)
+    np.testing.assert_array_equal(
+        np.diff(dataset.get_field("group")), matrix.group_sizes[groups]
+    )
+    assert matrix.dataset().construct().num_data() == matrix.n_rows
+
+
+def test_rows_must_be_sorted_by_group_first(frame, tmp_path):
+    with pytest.raises(ValueError):
+        SharedFeatureMatrix.build(
+            frame,
+            FEATURES,
+            "label",
+            "session_id",
+            directory=str(tmp_path),
+            sort_columns=["rating"],
+        )
+
+
+def test_remove(matrix):
+    matrix.remove()
+    with pytest.raises(FileNotFoundError):
+        SharedFeatureMatrix(matrix.directory)
+
+
+@pytest.mark.parametrize("free", [0, 2**40])
+def test_default_dir_needs_free_shared_memory(
+    free, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(
+        shared_matrix, "SHARED_MEMORY_DIR", str(tmp_path)
+    )
+    monkeypatch.setattr(
+        shared_matrix.shutil,
+        "disk_usage",
+        lambda path: types.SimpleNamespace(free=free),
+    )
+    directory = shared_matrix.default_matrix_dir(2**20)
+    try:
+        assert (os.path.dirname(directory) == str(tmp_path)) == bool(
+            free
+        )
+    finally:
+        os.rmdir(directory)
+
+
+@pytest.mark.parametrize("prepared", [False, True])
+def test_pipeline_shares_its_ranking_data(tmp_path, prepared):
+    sessions_path, venues_path = write_synthetic_csvs(
+        str(tmp_path), n_rows=2_000, n_venues=50, seed=0
+    )
+    pipeline = RankingPipeline(sessions_path, venues_path)
+    if prepared:
+        pipeline.prepare_datasets()
+    matrix = pipeline.share_feature_matrix(str(tmp_path / "matrix"))
+    assert matrix.features == pipeline.features
+    assert matrix.n_rows == pipeline.ranking_data.height
+    assert (
+        matrix.n_groups
+        == pipeline.ranking_data.get_column("session_id").n_unique()
+    )
+
+
+def test_pipeline_needs_its_ranking_data(tmp_path):
+    sessions_path, venues_path = write_synthetic_csvs(
+        str(tmp_path), n_rows=500, n_venues=20, seed=0
+    )
+    pipeline = RankingPipeline(
+        sessions_path,
+        venues_path,
+        split_strategy="session",
+        out_of_core_partitions=2,
+    )
+    pipeline.prepare_datasets()
+    with pytest.raises(ValueError):
+        pipeline.share_feature_matrix(str(tmp_path / "matrix"))
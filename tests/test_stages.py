@@ -0,0 +1,162 @@
+import lightgbm as lgb
+import numpy as np
+import polars as pl
+import pytest
+
+from personalization.stages import (
+    CheckpointStore,
+    Stage,
+    StageGraph,
+)
+
+
+def frame_stages(calls, offset=1):
+    def source():
+        calls.append("source")
+        return {"numbers": pl.DataFrame({"x": [1, 2, 3]})}
+
+    def shift(numbers):
+        calls.append("shift")
+        return {"shifted": numbers.with_columns(pl.col("x") + offset)}
+
+    def total(shifted):
+        calls.append("total")
+        return {"total": shifted.select(pl.col("x").sum())}
+
+    return [
+        Stage("source", source, [], {"numbers": "frame"}),
+        Stage(
+            "shift",
+            shift,
+            ["numbers"],
+            {"shifted": "frame"},
+            config={"offset": offset},
+        ),
+        Stage("total", total, ["shifted"], {"total": "frame"}),
+    ]
+
+
+def test_rerun_loads_the_last_checkpoint(tmp_path):
+    calls = []
+    store = CheckpointStore(str(tmp_path))
+    first = StageGraph(store).run(frame_stages(calls), ["total"])
+    assert calls == ["source", "shift", "total"]
+    assert first["total"].item() == 9
+
+    calls.clear()
+    graph = StageGraph(store)
+    again = graph.run(frame_stages(calls), ["total"])
+    assert calls == []
+    assert graph.statuses == {"total": "load"}
+    assert again["total"].frame_equal(first["total"])
+
+
+def test_changed_config_reruns_downstream_stages(tmp_path):
+    calls = []
+    store = CheckpointStore(str(tmp_path))
+    StageGraph(store).run(frame_stages(calls), ["total"])
+    calls.clear()
+    graph = StageGraph(store)
+    result = graph.run(frame_stages(calls, offset=2), ["total"])
+    assert calls == ["shift", "total"]
+    assert graph.statuses == {
+        "source": "load",
+        "shift": "run",
+        "total": "run",
+    }
+    assert result["total"].item() == 12
+
+
+def test_failed_stage_resumes_after_last_checkpoint(tmp_path):
+    calls = []
+    stages = frame_stages(calls)
+
+    def fail(shifted):
+        raise RuntimeError("crash")
+
+    failing = stages[:2] + [
+        Stage("total", fail, ["shifted"], {"total": "frame"})
+    ]
+    store = CheckpointStore(str(tmp_path))
+    with pytest.raises(RuntimeError):
+        StageGraph(store).run(failing, ["total"])
+    assert not any(tmp_path.glob("total/*"))
+
+    calls.clear()
+    graph = StageGraph(store)
+    graph.run(stages, ["total"])
+    assert calls == ["total"]
+    assert graph.statuses == {"shift": "load", "total": "run"}
+
+
+def test_outputs_are_kept_in_memory_between_runs(tmp_path):
+    calls = []
+    stages = frame_stages(calls)
+    graph = StageGraph(CheckpointStore(str(tmp_path)))
+    graph.run(stages, ["shifted"])
+    graph.run(stages, ["total"])
+    assert calls == ["source", "shift", "total"]
+    assert graph.statuses["total"] == "run"
+
+
+def test_outputs_are_type_checked(tmp_path):
+    stage = Stage(
+        "source", lambda: {"numbers": [1, 2]}, [], {"numbers": "frame"}
+    )
+    with pytest.raises(TypeError):
+        StageGraph(CheckpointStore(str(tmp_path))).run(
+            [stage], ["numbers"]
+        )
+
+
+def test_invalid_stages():
+    with pytest.raises(ValueError):
+        Stage("source", dict, [], {"numbers": "table"})
+    with pytest.raises(ValueError):
+        Stage("export", dict, [], {"artifact": "path"})
+    with pytest.raises(ValueError):
+        StageGraph.keys(
+            [Stage("shift", dict, ["numbers"], {"shifted": "frame"})]
+        )
+
+
+def test_datasets_and_boosters_round_trip(tmp_path):
+    matrix = np.random.default_rng(0).random((200, 3))
+    train_set = lgb.Dataset(matrix, label=matrix[:, 0]).construct()
+    val_set = lgb.Dataset(
+        matrix[:50], label=matrix[:50, 0], reference=train_set
+    ).construct()
+    booster = lgb.train(
+        {"objective": "regression", "verbosity": -1},
+        train_set,
+        num_boost_round=5,
+        valid_sets=[val_set],
+        early_stopping_rounds=2,
+        verbose_eval=False,
+    )
+    stage = Stage(
+        "train",
+        dict,
+        [],
+        {
+            "train_set": "dataset",
+            "val_set": "dataset",
+            "model": "booster",
+        },
+    )
+    store = CheckpointStore(str(tmp_path))
+    store.save(
+        stage,
+        "key",
+        {"train_set": train_set, "val_set": val_set, "model": booster},
+    )
+    loaded = store.load(stage, "key")
+    assert loaded["train_set"].num_data() == 200
+    assert loaded["val_set"].reference is loaded["train_set"]
+    assert loaded["model"].best_iteration == booster.best_iteration
+    assert loaded["model"].best_score["valid_0"]["l2"] == pytest.approx(
+        booster.best_score["valid_0"]["l2"]
+    )
+    np.testing.assert_allclose(
+        loaded["model"].predict(matrix), booster.predict(matrix)
+    )
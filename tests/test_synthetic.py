@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+import polars as pl
+import pytest
+
+from personalization.ranking_pipeline import (
+    RankingPipeline,
+    group_sizes,
+)
+from personalization.synthetic import (
+    generate_sessions,
+    generate_venues,
+    iter_sessions,
+    session_lengths,
+    write_synthetic_csvs,
+)
+
+from .utils import (
+    generate_sessions_dataframe,
+    generate_venues_dataframe,
+)
+
+
+@pytest.fixture
+def venues():
+    return generate_venues(500, seed=1)
+
+
+def test_schemas_match_fixtures(venues):
+    sessions = generate_sessions(1_000, venues)
+    assert sessions.schema == generate_sessions_dataframe().schema
+    assert venues.schema == generate_venues_dataframe().schema
+
+
+def test_generator_is_seeded(venues):
+    assert generate_venues(500, seed=1).frame_equal(venues)
+    assert generate_sessions(1_000, venues, seed=3).frame_equal(
+        generate_sessions(1_000, venues, seed=3)
+    )
+    assert not generate_sessions(1_000, venues, seed=3).frame_equal(
+        generate_sessions(1_000, venues, seed=4)
+    )
+
+
+@pytest.mark.parametrize("n_rows", [1, 17, 10_000])
+def test_session_lengths_sum_to_rows(n_rows):
+    lengths = session_lengths(n_rows, np.random.default_rng(0))
+    assert lengths.sum() == n_rows
+    assert lengths.min() >= 1
+
+
+def test_sessions_are_contiguous_and_use_known_venues(venues):
+    sessions = generate_sessions(5_000, venues)
+    sizes = group_sizes(sessions, "session_id")
+    assert len(sizes) == sessions.get_column("session_id").n_unique()
+    assert (
+        sessions.get_column("venue_id")
+        .is_in(venues.get_column("venue_id"))
+        .all()
+    )
+    first_positions = sessions.groupby("session_id").agg(
+        pl.col("position_in_list").min()
+    )
+    assert first_positions.get_column("position_in_list").max() < 50
+
+
+def test_iter_sessions_chunks(venues):
+    chunks = list(iter_sessions(2_500, venues, chunk_rows=1_000))
+    assert [chunk.height for chunk in chunks] == [1_000, 1_000, 500]
+
+
+def test_venue_nulls():
+    venues = generate_venues(1_000, null_fraction=0.1)
+    assert 0 < venues.get_column("rating").null_count() < 200
+    assert venues.get_column("venue_id").n_unique() == 1_000
+
+
+def test_pipeline_trains_on_synthetic_csvs(tmp_path):
+    sessions_path, venues_path = write_synthetic_csvs(
+        str(tmp_path),
+        20_000,
+        seed=0,
+        null_fraction=0.01,
+        chunk_rows=7_000,
+    )
+    assert pl.read_csv(sessions_path).height == 20_000
+    pipeline = RankingPipeline(
+        sessions_path,
+        venues_path,
+        train_data_path=os.path.join(tmp_path, "train.binary"),
+        val_data_path=os.path.join(tmp_path, "val.binary"),
+    )
+    pipeline.prepare_datasets()
+    pipeline.train(
+        params={"objective": "lambdarank", "num_iterations": 5}
+    )
+    assert pipeline.model.num_trees() > 0
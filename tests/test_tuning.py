@@ -0,0 +1,109 @@
+import numpy as np
+import polars as pl
+import pytest
+
+from personalization import tuning
+from personalization.dataset_utils import build_lgb_dataset
+from personalization.tuning import (
+    expand_grid,
+    successive_halving,
+)
+
+FEATURES = ["feature_0", "feature_1", "feature_2"]
+
+
+@pytest.fixture
+def dataset_paths(tmp_path):
+    """Save small train and val ranking datasets as LightGBM binaries."""
+    rng = np.random.default_rng(0)
+    paths = []
+    reference = None
+    for name, n_rows in [("train", 2_000), ("val", 500)]:
+        columns = {feature: rng.random(n_rows) for feature in FEATURES}
+        columns["label"] = (
+            columns["feature_0"] + 0.1 * rng.random(n_rows) > 0.7
+        ).astype(np.int64)
+        dataset = build_lgb_dataset(
+            pl.DataFrame(columns),
+            FEATURES,
+            "label",
+            group=np.full(n_rows // 10, 10),
+            reference=reference,
+        )
+        reference = reference or dataset
+        path = str(tmp_path / f"{name}.binary")
+        dataset.save_binary(path)
+        paths.append(path)
+    return paths
+
+
+BASE_PARAMS = {
+    "objective": "lambdarank",
+    "metric": "ndcg",
+    "ndcg_eval_at": [5],
+}
+
+
+def test_expand_grid():
+    assert expand_grid({"a": [1, 2], "b": ["x"]}) == [
+        {"a": 1, "b": "x"},
+        {"a": 2, "b": "x"},
+    ]
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_successive_halving(dataset_paths, executor):
+    configs = expand_grid(
+        {"num_leaves": [2, 4, 8], "learning_rate": [0.001, 0.3]}
+    )
+    leaderboard = successive_halving(
+        *dataset_paths,
+        configs,
+        base_params=BASE_PARAMS,
+        min_rounds=2,
+        max_rounds=18,
+        eta=3,
+        n_workers=2,
+        executor=executor,
+        total_threads=2,
+    )
+    assert len(leaderboard) == len(configs)
+    # 6 configurations for 2 rounds, the best 2 for 6, the best for 18
+    assert [result["rounds"] for result in leaderboard] == [
+        18,
+        6,
+        2,
+        2,
+        2,
+        2,
+    ]
+    assert leaderboard[0]["metric"] == "ndcg@5"
+    first_rung_scores = [result["score"] for result in leaderboard[2:]]
+    assert first_rung_scores == sorted(first_rung_scores, reverse=True)
+    assert {
+        tuple(sorted(result["config"].items()))
+        for result in leaderboard
+    } == {tuple(sorted(config.items())) for config in configs}
+
+
+def test_threads_share_one_dataset_pair(dataset_paths, mocker):
+    construct = mocker.spy(tuning, "construct_datasets")
+    successive_halving(
+        *dataset_paths,
+        expand_grid({"num_leaves": [2, 4, 8, 16]}),
+        base_params=BASE_PARAMS,
+        min_rounds=2,
+        max_rounds=4,
+        eta=2,
+        n_workers=4,
+        executor="thread",
+    )
+    construct.assert_called_once_with(*dataset_paths)
+    assert tuning._worker_datasets == {}
+
+
+def test_successive_halving_invalid_arguments(dataset_paths):
+    with pytest.raises(ValueError):
+        successive_halving(*dataset_paths, [], executor="thread")
+    with pytest.raises(ValueError):
+        successive_halving(*dataset_paths, [{}], executor="dask")